@@ -0,0 +1,107 @@
+"""
+Load-test client for the Stock Mitra API server.
+
+Opens several keep-alive connections and issues requests for a fixed
+duration, then reports throughput and latency percentiles.
+
+    python -m api.load_test --path "/api/products?q=apx" --concurrency 20 --duration 10
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from config.settings import API_HOST, API_PORT
+
+
+async def _worker(host, port, requests, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    i = 0
+    try:
+        while time.perf_counter() < deadline:
+            method, path, body = requests[i % len(requests)]
+            i += 1
+            payload = json.dumps(body).encode('utf-8') if body is not None else b''
+            request = (f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+                       f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n").encode('latin-1') + payload
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+
+            status_line = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.strip().lower() == 'content-length':
+                    length = int(value.strip())
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+
+            status = int(status_line.split()[1]) if status_line else 0
+            if status >= 400:
+                errors[status] = errors.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run_load_test(host, port, requests, concurrency, duration):
+    """Run the load test and return a results dict."""
+    latencies = []
+    errors = {}
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _worker(host, port, requests, deadline, latencies, errors) for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p):
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    return {
+        'requests': len(latencies),
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'errors': errors,
+    }
+
+
+def main(argv=None):
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Load-test the Stock Mitra API server.")
+    parser.add_argument('--host', default=API_HOST)
+    parser.add_argument('--port', type=int, default=API_PORT)
+    parser.add_argument('--path', action='append',
+                        help="GET path to request; repeat to rotate (default: products, dashboard and health)")
+    parser.add_argument('--sell', metavar='PRODUCT',
+                        help="Also POST a 1-piece sale of PRODUCT in the rotation (mutates stock!)")
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    paths = args.path or ['/api/products?q=', '/api/dashboard', '/api/health']
+    requests = [('GET', path, None) for path in paths]
+    if args.sell:
+        requests.append(('POST', '/api/sell', {'product': args.sell, 'loose_pieces': 1}))
+
+    results = asyncio.run(run_load_test(args.host, args.port, requests, args.concurrency, args.duration))
+    print(f"Requests:      {results['requests']} in {results['seconds']:.2f}s")
+    print(f"Throughput:    {results['requests_per_second']:.1f} req/s")
+    print(f"Latency (ms):  p50 {results['p50_ms']:.2f}  p95 {results['p95_ms']:.2f}  p99 {results['p99_ms']:.2f}")
+    if results['errors']:
+        print(f"Errors:        {results['errors']}")
+
+
+if __name__ == "__main__":
+    main()
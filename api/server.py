@@ -0,0 +1,402 @@
+"""
+Headless HTTP/JSON API for POS terminals and barcode scanners.
+
+Reads are answered from an in-memory snapshot of the company's stock. All
+mutations go through a single writer task which commits them with the same
+optimistic-concurrency transaction used by the desktop app, then swaps in a
+fresh snapshot, so readers never observe a half-applied change.
+"""
+
+import asyncio
+import datetime
+import json
+import os
+from urllib.parse import urlsplit, parse_qs
+
+from config.settings import API_HOST, API_PORT
+from database.stock_cache import load_stock_data_cached
+from database.stock_data import StockConflictError, load_stock_data, load_threshold_rules
+from services.stock_index import StockIndex
+from services.pick_list import build_pick_list
+from services.locations import location_summary, child_locations, cartons_at_location
+from services.stock_manager import StockAnalyzer
+from services.thresholds import ThresholdRules, StockAlerts
+from services.stock_operations import StockOperationError, sell_product, add_cartons, run_stock_transaction
+from services.stock_search import _get_product_for_action
+from utils.date_utils import parse_date
+from utils.file_lock import LockTimeoutError
+from utils.money import to_paise, to_rupees
+
+MAX_BODY_BYTES = 1024 * 1024
+EXTERNAL_CHANGE_POLL_SECONDS = 2.0
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error',
+                503: 'Service Unavailable'}
+
+
+class ApiError(Exception):
+    """An error returned to the client as a JSON body with an HTTP status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _file_stamp(filepath):
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+def _product_stock(product_id, cartons, expiry, today):
+    """Summarise one product's cartons for the API (``expiry`` is the index's ExpiryIndex)."""
+    live_units = 0
+    damaged_units = 0
+    expired_units = 0
+    locations = set()
+    active_cartons = []
+    for carton in cartons:
+        locations.add(carton['location'])
+        if carton['date_outwarded'] is not None:
+            continue
+        is_expired = expiry.is_expired(carton['carton_id'], today)
+        if is_expired:
+            expired_units += carton['quantity_per_carton']
+        else:
+            live_units += carton['quantity_per_carton']
+            damaged_units += carton['damaged_units']
+        active_cartons.append({
+            'carton_id': carton['carton_id'],
+            'quantity': carton['quantity_per_carton'],
+            'damaged_units': carton['damaged_units'],
+            'location': carton['location'],
+            'expiry_date': carton['expiry_date'],
+            'sales_price': to_rupees(carton.get('sales_price_paise', 0)),
+            'mrp': to_rupees(carton.get('mrp_paise', 0)),
+            'is_expired': is_expired,
+        })
+    return {
+        'product_id': product_id,
+        'product_name': cartons[0]['product_name'] if cartons else '',
+        'live_units': live_units,
+        'damaged_units': damaged_units,
+        'expired_units': expired_units,
+        'locations': sorted(locations),
+        'active_cartons': active_cartons,
+    }
+
+
+class StockApiServer:
+    """Serves one company's stock over a small JSON API."""
+
+    def __init__(self, company, json_file, host=API_HOST, port=API_PORT):
+        self.company = company
+        self.json_file = json_file
+        self.host = host
+        self.port = port
+        try:
+            self.threshold_rules = ThresholdRules.from_dict(load_threshold_rules(json_file))
+        except ValueError:
+            self.threshold_rules = ThresholdRules()
+        stock_data, stock_index = load_stock_data_cached(json_file, StockIndex)
+        self._set_snapshot(stock_data, stock_index)
+        self._write_queue = None
+        self._server = None
+
+    def _set_snapshot(self, stock_data, stock_index):
+        # Replaced as a whole; request handlers only ever read the current pair
+        self.stock_data = stock_data
+        self.stock_index = stock_index
+        self.stock_alerts = StockAlerts(stock_index, self.threshold_rules)
+        self._file_stamp = _file_stamp(self.json_file)
+
+    # --- Writer ---------------------------------------------------------
+
+    async def _writer_loop(self):
+        """Apply queued mutations one at a time."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                operation, product_id, future = await asyncio.wait_for(self._write_queue.get(),
+                                                                       EXTERNAL_CHANGE_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                await self._reload_if_changed()
+                continue
+            try:
+                result = await loop.run_in_executor(None, self._commit, operation, product_id)
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            else:
+                stock_data, change = result
+                if change.reloaded:
+                    # Retried on the file's contents after a conflict: everything may have moved
+                    stock_index = await loop.run_in_executor(None, StockIndex, stock_data)
+                    self._set_snapshot(stock_data, stock_index)
+                else:
+                    self._apply_commit(stock_data, change)
+                if not future.cancelled():
+                    future.set_result(change)
+
+    def _commit(self, operation, product_id):
+        """Run a transaction off the event loop on a new list sharing the snapshot's cartons.
+
+        Only ``product_id``'s cartons, the ones the operation may modify, are
+        copied, so readers of the current snapshot never see them change.
+        """
+        working_copy = [dict(carton) if carton['product_id'] == product_id else carton for carton in self.stock_data]
+        change = run_stock_transaction(self.json_file, working_copy, operation)
+        return working_copy, change
+
+    def _apply_commit(self, stock_data, change):
+        """Swap in the committed stock, re-indexing only the cartons the change touched.
+
+        Runs on the event loop between requests, so no reader sees it half done.
+        """
+        touched_products = self.stock_index.apply_change(change)
+        self.stock_data = stock_data
+        self.stock_alerts.refresh(*touched_products)
+        self._file_stamp = _file_stamp(self.json_file)
+
+    async def _reload_if_changed(self):
+        """Pick up edits made by other terminals while idle."""
+        if _file_stamp(self.json_file) == self._file_stamp:
+            return
+        loop = asyncio.get_running_loop()
+        stock_data = await loop.run_in_executor(None, load_stock_data, self.json_file)
+        self._set_snapshot(stock_data, StockIndex(stock_data))
+
+    async def _submit(self, operation, product_id=None):
+        """Queue ``operation`` for the writer; it may modify only ``product_id``'s cartons."""
+        future = asyncio.get_running_loop().create_future()
+        await self._write_queue.put((operation, product_id, future))
+        try:
+            return await future
+        except StockOperationError as e:
+            raise ApiError(400, str(e))
+        except StockConflictError as e:
+            raise ApiError(409, str(e))
+        except LockTimeoutError as e:
+            raise ApiError(503, str(e))
+
+    # --- Handlers -------------------------------------------------------
+
+    def handle_products(self, query, body):
+        """GET /api/products?q=... - product lookup by ID or name."""
+        text = query.get('q', [''])[0].strip().lower()
+        limit = int(query.get('limit', ['20'])[0])
+        results = []
+        for product_id, product_name in self.stock_index.product_names.items():
+            if text and text not in product_id.lower() and text not in product_name.lower():
+                continue
+            results.append({'product_id': product_id, 'product_name': product_name})
+        results.sort(key=lambda p: (not p['product_id'].lower().startswith(text), p['product_id']))
+        return {'products': results[:limit], 'total': len(results)}
+
+    def handle_stock_summary(self, query, body):
+        """GET /api/stock/summary?product=... - live stock for one product."""
+        product_query = query.get('product', [''])[0].strip()
+        if not product_query:
+            raise ApiError(400, "Missing 'product' parameter.")
+        product_id = self._resolve_product(product_query)
+        cartons = self.stock_index.cartons_by_product.get(product_id, [])
+        return _product_stock(product_id, cartons, self.stock_index.expiry, datetime.date.today())
+
+    def handle_locations(self, query, body):
+        """GET /api/locations?prefix=W1-S01 - rollups and cartons for a location."""
+        prefix = query.get('prefix', [''])[0].strip()
+        summary = location_summary(self.stock_index, prefix)
+        if summary is None:
+            raise ApiError(404, f"No stock is stored at location '{prefix}'.")
+        result = {'summary': summary, 'children': child_locations(self.stock_index, prefix)}
+        if prefix:
+            result['cartons'] = [{
+                'carton_id': c['carton_id'],
+                'product_id': c['product_id'],
+                'product_name': c['product_name'],
+                'location': c['location'],
+                'quantity': c['quantity_per_carton'],
+                'damaged_units': c['damaged_units'],
+            } for c in cartons_at_location(self.stock_index, prefix)]
+        return result
+
+    def handle_dashboard(self, query, body):
+        """GET /api/dashboard - dashboard statistics."""
+        stats = StockAnalyzer(self.stock_data, self.stock_index, self.stock_alerts).get_dashboard_stats()
+        stats['company'] = self.company
+        return stats
+
+    async def handle_sell(self, query, body):
+        """POST /api/sell - sell full cartons and/or loose pieces of a product."""
+        product_query = str(body.get('product', '')).strip()
+        if not product_query:
+            raise ApiError(400, "Missing 'product'.")
+        try:
+            full_cartons = int(body.get('full_cartons', 0))
+            loose_pieces = int(body.get('loose_pieces', 0))
+        except (TypeError, ValueError):
+            raise ApiError(400, 'Quantities must be whole numbers.')
+        if full_cartons < 0 or loose_pieces < 0 or (full_cartons == 0 and loose_pieces == 0):
+            raise ApiError(400, 'Please enter a positive quantity to sell.')
+        product_id = self._resolve_product(product_query)
+
+        change = await self._submit(lambda stock_data: sell_product(stock_data, product_id, full_cartons, loose_pieces),
+                                    product_id)
+        summary = dict(change.summary)
+        summary['total_sales_value'] = to_rupees(summary.pop('total_sales_value_paise'))
+        return {'product_id': product_id, **summary, 'pick_list': build_pick_list(change)}
+
+    async def handle_inward(self, query, body):
+        """POST /api/inward - add new cartons for a product."""
+        product_id = str(body.get('product_id', '')).strip().upper()
+        product_name = str(body.get('product_name', '')).strip()
+        location = str(body.get('location', '')).strip().upper()
+        date_inwarded = str(body.get('date_inwarded') or datetime.date.today().strftime("%Y-%m-%d"))
+        expiry_date = body.get('expiry_date') or None
+        if not all([product_id, product_name, location]):
+            raise ApiError(400, "'product_id', 'product_name' and 'location' are required.")
+        if not parse_date(date_inwarded) or (expiry_date and not parse_date(expiry_date)):
+            raise ApiError(400, 'Invalid date format. Please use YYYY-MM-DD.')
+
+        cartons_detail = []
+        for carton in body.get('cartons') or []:
+            try:
+                detail = {
+                    'quantity': int(carton['quantity']),
+                    'damaged': int(carton.get('damaged', 0)),
+                    'sales_price_paise': to_paise(carton['sales_price']),
+                    'purchase_price_paise': to_paise(carton['purchase_price']),
+                    'mrp_paise': to_paise(carton.get('mrp', 0) or 0),
+                }
+            except (KeyError, TypeError, ValueError):
+                raise ApiError(400, 'Each carton needs quantity, sales_price and purchase_price.')
+            if (detail['quantity'] <= 0 or detail['damaged'] < 0 or detail['damaged'] > detail['quantity']
+                    or detail['sales_price_paise'] < 0 or detail['purchase_price_paise'] < 0 or detail['mrp_paise'] < 0):
+                raise ApiError(400, 'Carton quantities and prices must be valid non-negative numbers (damaged <= quantity).')
+            cartons_detail.append(detail)
+        if not cartons_detail:
+            raise ApiError(400, "At least one carton is required in 'cartons'.")
+
+        change = await self._submit(lambda stock_data: add_cartons(
+            stock_data, product_id, product_name, self.company, location, date_inwarded, expiry_date, cartons_detail))
+        return {'product_id': product_id, **change.summary}
+
+    def handle_health(self, query, body):
+        """GET /api/health - liveness probe."""
+        return {'status': 'ok', 'company': self.company, 'cartons': len(self.stock_data)}
+
+    def _resolve_product(self, product_query):
+        if product_query.upper() in self.stock_index.product_names:
+            return product_query.upper()
+        product_id, product_name, message = _get_product_for_action(product_query, self.stock_data)
+        if not product_id:
+            raise ApiError(404, message)
+        return product_id
+
+    ROUTES = {
+        ('GET', '/api/health'): 'handle_health',
+        ('GET', '/api/products'): 'handle_products',
+        ('GET', '/api/stock/summary'): 'handle_stock_summary',
+        ('GET', '/api/dashboard'): 'handle_dashboard',
+        ('GET', '/api/locations'): 'handle_locations',
+        ('POST', '/api/sell'): 'handle_sell',
+        ('POST', '/api/inward'): 'handle_inward',
+    }
+
+    # --- HTTP plumbing --------------------------------------------------
+
+    async def handle_client(self, reader, writer):
+        """Serve requests on one keep-alive connection."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, {'error': 'Malformed request line.'}, keep_alive=False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                length = int(headers.get('content-length', 0) or 0)
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {'error': 'Request body too large.'}, keep_alive=False)
+                    break
+                raw_body = await reader.readexactly(length) if length else b''
+
+                status, payload = await self._dispatch(method, target, raw_body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, target, raw_body):
+        url = urlsplit(target)
+        handler_name = self.ROUTES.get((method, url.path))
+        if handler_name is None:
+            if any(path == url.path for _, path in self.ROUTES):
+                return 405, {'error': f'{method} not allowed on {url.path}.'}
+            return 404, {'error': f'No such endpoint: {url.path}'}
+        try:
+            body = json.loads(raw_body) if raw_body else {}
+            if not isinstance(body, dict):
+                raise ApiError(400, 'Request body must be a JSON object.')
+            result = getattr(self, handler_name)(parse_qs(url.query), body)
+            if asyncio.iscoroutine(result):
+                result = await result
+            return 200, result
+        except json.JSONDecodeError:
+            return 400, {'error': 'Request body is not valid JSON.'}
+        except ApiError as e:
+            return e.status, {'error': e.message}
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': f'Internal error: {e}'}
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        body = json.dumps(payload, default=str).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def serve_forever(self):
+        """Start listening and process requests until cancelled."""
+        self._write_queue = asyncio.Queue()
+        writer_task = asyncio.create_task(self._writer_loop())
+        self._server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        print(f"Stock Mitra API serving {self.company} on http://{self.host}:{self.port}/api/")
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            writer_task.cancel()
+
+
+def run_server(company, json_file, host=API_HOST, port=API_PORT):
+    """Run the API server until interrupted."""
+    server = StockApiServer(company, json_file, host, port)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
@@ -2,18 +2,148 @@
 """
 Stock Manager Application Launcher
 This script properly sets up the Python path and launches the application.
+
+Run without arguments to start the desktop app, or with ``--serve`` to run
+the headless HTTP/JSON API for POS terminals:
+
+    python app.py --serve --company "Apex Solutions" [--host 127.0.0.1] [--port 8765]
+
+or with ``--import-csv`` to bulk-import cartons from a CSV file:
+
+    python app.py --import-csv delivery.csv --company "Apex Solutions"
+
+or with ``--as-of`` to print stock levels as they stood on a past date:
+
+    python app.py --as-of 2025-03-31 --company "Apex Solutions"
+
+or with ``--archive-logs`` to move closed months of the transaction logs
+into compressed monthly segments (the app also does this in the background):
+
+    python app.py --archive-logs --company "Apex Solutions"
+
+or with ``--reconcile`` to check stock against the transaction logs (exits
+with status 1 if they disagree):
+
+    python app.py --reconcile --company "Apex Solutions"
 """
 
 import sys
 import os
+import argparse
 
 # Add the current directory to Python path for absolute imports
 current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
-# Now import and run the main application
-from main import main
+
+def resolve_company_file(args):
+    """Find the stock file for the company given on the command line."""
+    from database.stock_data import load_company_configs
+    if args.stock_file:
+        return args.company or os.path.splitext(os.path.basename(args.stock_file))[0], args.stock_file
+    configs = load_company_configs()
+    if args.company in configs:
+        return args.company, configs[args.company]
+    sys.exit(f"Unknown company '{args.company}'. Configured companies: {', '.join(configs) or 'none'}. "
+             f"Use --stock-file to point at a stock JSON file directly.")
+
+
+def parse_args(argv=None):
+    """Parse launcher command-line options."""
+    from config.settings import API_HOST, API_PORT
+    parser = argparse.ArgumentParser(description="Stock Mitra inventory management")
+    parser.add_argument('--serve', action='store_true', help="Run the headless HTTP/JSON API instead of the desktop app")
+    parser.add_argument('--company', help="Company name from company_config.json")
+    parser.add_argument('--stock-file', help="Company stock JSON file (overrides --company lookup)")
+    parser.add_argument('--host', default=API_HOST, help="API listen address (default: localhost only)")
+    parser.add_argument('--port', type=int, default=API_PORT, help="API listen port")
+    parser.add_argument('--import-csv', metavar='CSV', help="Bulk-import cartons from a CSV file and exit")
+    parser.add_argument('--compact-logs', action='store_true', help="Purge deleted cartons from the transaction logs and exit")
+    parser.add_argument('--archive-logs', action='store_true', help="Compress closed months of the transaction logs and exit")
+    parser.add_argument('--as-of', metavar='DATE', help="Print stock per product as of YYYY-MM-DD[ HH:MM:SS] and exit")
+    parser.add_argument('--reconcile', action='store_true', help="Check stock against the transaction logs and exit")
+    return parser.parse_args(argv)
+
+
+def run_import(args):
+    """Import a carton CSV into a company's stock from the command line."""
+    from database.stock_data import load_stock_data
+    from services.bulk_import import import_stock_csv, BulkImportError
+    company, json_file = resolve_company_file(args)
+    try:
+        change = import_stock_csv(args.import_csv, json_file, load_stock_data(json_file), company)
+    except BulkImportError as e:
+        for line, message in e.errors:
+            print(f"Line {line}: {message}", file=sys.stderr)
+        sys.exit(f"Import failed: {e}")
+    except Exception as e:
+        sys.exit(f"Import failed: {e}")
+    print(f"Imported {len(change.added)} carton(s) into {company}.")
+
+
+def run_as_of(args):
+    """Print per-product stock replayed from the event log as of a date."""
+    from database.event_store import EventStore
+    company, json_file = resolve_company_file(args)
+    store = EventStore(json_file)
+    if not store.exists():
+        sys.exit(f"No event history recorded for {company} yet.")
+    totals = {}
+    for carton in store.state_as_of(args.as_of):
+        if carton.get('date_outwarded') and carton['date_outwarded'] <= args.as_of[:10]:
+            continue
+        product = totals.setdefault(carton['product_id'], [carton['product_name'], 0, 0])
+        product[1] += 1
+        product[2] += carton['quantity_per_carton'] - carton['damaged_units']
+    print(f"Stock for {company} as of {args.as_of}:")
+    for product_id, (name, cartons, units) in sorted(totals.items()):
+        print(f"  {product_id:<12} {name:<30} {cartons:>4} cartons {units:>8} units")
+
+
+def run_reconcile(args):
+    """Print discrepancies between stock and its logs; exit status 1 if there are any."""
+    from services.reconciliation import reconcile_stock, format_reconciliation
+    company, json_file = resolve_company_file(args)
+    report = reconcile_stock(json_file)
+    print(format_reconciliation(company, report))
+    if report['discrepancies']:
+        sys.exit(1)
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.compact_logs:
+        if not args.company and not args.stock_file:
+            sys.exit("--compact-logs needs --company or --stock-file")
+        from database.log_store import compact_logs
+        company, json_file = resolve_company_file(args)
+        print(f"Removed {compact_logs(json_file)} log entries of deleted cartons from {company}.")
+    elif args.archive_logs:
+        if not args.company and not args.stock_file:
+            sys.exit("--archive-logs needs --company or --stock-file")
+        from database.log_archive import archive_logs
+        company, json_file = resolve_company_file(args)
+        print(f"Archived {archive_logs(json_file)} log entries of closed months for {company}.")
+    elif args.as_of:
+        if not args.company and not args.stock_file:
+            sys.exit("--as-of needs --company or --stock-file")
+        run_as_of(args)
+    elif args.reconcile:
+        if not args.company and not args.stock_file:
+            sys.exit("--reconcile needs --company or --stock-file")
+        run_reconcile(args)
+    elif args.import_csv:
+        if not args.company and not args.stock_file:
+            sys.exit("--import-csv needs --company or --stock-file")
+        run_import(args)
+    elif args.serve:
+        if not args.company and not args.stock_file:
+            sys.exit("--serve needs --company or --stock-file")
+        from api.server import run_server
+        company, json_file = resolve_company_file(args)
+        run_server(company, json_file, args.host, args.port)
+    else:
+        # Now import and run the main application
+        from main import main
+        main()
@@ -13,6 +13,56 @@ COMPANY_CONFIG_FILE = os.path.join(os.path.dirname(__file__), '..', '..', 'compa
 # Stock alert thresholds
 LOW_STOCK_THRESHOLD = 10
 EXPIRY_SOON_DAYS = 60
+EXPIRY_WARNING_DAYS = 30  # "Expiring Soon" status in the company stock view
+DASHBOARD_ALERT_TOP_K = 5  # Most urgent alerts shown inline on the dashboard
+ALERT_PAGE_SIZE = 50
+DEMAND_HISTORY_DAYS = 90  # Daily sales buckets kept per product
+VELOCITY_WINDOWS = (7, 30, 90)
+REORDER_LEAD_TIME_DAYS = 7  # Days between placing and receiving an order
+REORDER_SAFETY_DAYS = 3  # Extra days of demand held as safety stock
+COST_METHOD = 'fifo'  # 'fifo' or 'average' cost layers for COGS and valuation
+
+# Reason codes for carton adjustments (code -> label)
+ADJUSTMENT_REASONS = {
+    'count': 'Stock count correction',
+    'damage': 'Damaged',
+    'expired': 'Expired',
+    'theft': 'Theft / loss',
+    'return': 'Customer return',
+    'other': 'Other',
+}
+DEFAULT_ADJUSTMENT_REASON = 'count'
+
+# Company session cache (fast company switching)
+SESSION_CACHE_MAX_COMPANIES = 8
+SESSION_CACHE_MEMORY_MB = 256
+
+# Consolidated report: worker processes (None = one per CPU core)
+CONSOLIDATED_MAX_WORKERS = None
+
+# Search across all companies
+GLOBAL_SEARCH_WORKERS = 8
+GLOBAL_SEARCH_TIMEOUT_SECONDS = 0.1  # Per search; slower companies are reported as still loading
+GLOBAL_SEARCH_LIMIT = 50
+
+# Shared-folder concurrency
+FILE_LOCK_TIMEOUT_SECONDS = 10
+STOCK_COMMIT_RETRIES = 5
+
+# Inventory event log: write a full-state checkpoint every N events
+EVENT_CHECKPOINT_INTERVAL = 500
+
+# Log streaming and export
+LOG_READ_CHUNK_BYTES = 64 * 1024
+LOG_SCAN_CHUNK_BYTES = 8 * 1024 * 1024  # Bulk quantity scans (reconciliation)
+CSV_EXPORT_CHUNK_ROWS = 5000
+TOMBSTONE_COMPACT_THRESHOLD = 50  # Deleted cartons before logs are compacted in the background
+LOG_ARCHIVE_OPEN_MONTHS = 1  # Months (the current one included) kept in the live logs; older ones are archived
+LOG_ARCHIVE_COMPRESSLEVEL = 6  # gzip level of archive segments
+
+# Headless API server
+API_HOST = "127.0.0.1"
+API_PORT = 8765
 
 # Font configurations
 FONTS = {
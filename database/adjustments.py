@@ -0,0 +1,119 @@
+"""
+Append-only log of manual carton adjustments.
+
+Every quantity or damage correction made through Update Carton is recorded
+in ``<company>_adjustments.jsonl`` with its reason code, the old and new
+values and a timestamp, one compact JSON line per adjustment. Lines are
+only ever appended, so ``AdjustmentLog`` keeps its indexes (by product, by
+date, and shrinkage per product and month) current by reading just the
+lines added since it last looked.
+"""
+
+import bisect
+import json
+import os
+from utils.file_lock import FileLock
+from utils.file_utils import get_adjustments_file_path
+
+
+def append_adjustments(json_file, records):
+    """Append adjustment records to a company's adjustments log."""
+    if not records:
+        return
+    adjustments_file = get_adjustments_file_path(json_file)
+    with FileLock(adjustments_file):
+        with open(adjustments_file, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records))
+
+
+def sellable_delta(record):
+    """Change in sellable units (quantity less damaged) made by an adjustment."""
+    return (record['new_quantity'] - record['new_damaged']) - (record['old_quantity'] - record['old_damaged'])
+
+
+class AdjustmentLog:
+    """Indexed, incrementally loaded view of a company's adjustments log."""
+
+    def __init__(self, json_file):
+        self.adjustments_file = get_adjustments_file_path(json_file)
+        self._reset()
+
+    def _reset(self):
+        self.records = []
+        self.by_product = {}  # product_id -> [record index]
+        self.by_date = []     # sorted (ts, record index)
+        self.shrinkage = {}   # (product_id, 'YYYY-MM') -> totals, see _add
+        self._read_upto = 0
+
+    def _add(self, record):
+        index = len(self.records)
+        self.records.append(record)
+        product_id = record.get('product_id', '')
+        self.by_product.setdefault(product_id, []).append(index)
+        ts = record.get('ts', '')
+        # Appends arrive in time order, so this is nearly always a plain append
+        if self.by_date and ts < self.by_date[-1][0]:
+            bisect.insort(self.by_date, (ts, index))
+        else:
+            self.by_date.append((ts, index))
+
+        delta = sellable_delta(record)
+        totals = self.shrinkage.setdefault((product_id, ts[:7]), {
+            'product_name': '', 'adjustments': 0, 'units_lost': 0, 'units_found': 0, 'value_lost': 0, 'reasons': {}})
+        totals['product_name'] = record.get('product_name') or totals['product_name']
+        totals['adjustments'] += 1
+        if delta < 0:
+            totals['units_lost'] += -delta
+            totals['value_lost'] += -delta * record.get('purchase_price_paise', 0)
+            reason = record.get('reason', 'other')
+            totals['reasons'][reason] = totals['reasons'].get(reason, 0) - delta
+        else:
+            totals['units_found'] += delta
+
+    def refresh(self):
+        """Index lines appended since the last call (starting over if the file was replaced)."""
+        if not os.path.exists(self.adjustments_file):
+            if self._read_upto:
+                self._reset()
+            return
+        if os.path.getsize(self.adjustments_file) < self._read_upto:
+            self._reset()
+        with open(self.adjustments_file, 'rb') as f:
+            f.seek(self._read_upto)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                self._read_upto += len(line)
+                try:
+                    record = json.loads(line)
+                    sellable_delta(record)
+                except (ValueError, KeyError, TypeError):
+                    continue
+                self._add(record)
+
+    def for_product(self, product_id):
+        """Adjustments of one product, oldest first."""
+        self.refresh()
+        return [self.records[index] for index in self.by_product.get(product_id, ())]
+
+    def between(self, start=None, end=None):
+        """Adjustments dated ``start`` to ``end`` inclusive (YYYY-MM-DD strings), oldest first."""
+        self.refresh()
+        lo = bisect.bisect_left(self.by_date, (start,)) if start else 0
+        hi = bisect.bisect_left(self.by_date, (f"{end}\x7f",)) if end else len(self.by_date)
+        return [self.records[index] for _, index in self.by_date[lo:hi]]
+
+    def shrinkage_report(self, month=None):
+        """Shrinkage per product and month, newest month first then most value lost.
+
+        Rows are dicts with month, product_id, product_name, adjustments,
+        units_lost, units_found, net_units, value_lost (paise, at purchase price) and
+        reasons (reason code -> units lost).
+        """
+        self.refresh()
+        rows = [dict(totals, month=row_month, product_id=product_id, reasons=dict(totals['reasons']),
+                     net_units=totals['units_found'] - totals['units_lost'])
+                for (product_id, row_month), totals in self.shrinkage.items()
+                if month is None or row_month == month]
+        rows.sort(key=lambda row: (row['month'], row['value_lost'], row['units_lost']), reverse=True)
+        return rows
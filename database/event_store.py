@@ -0,0 +1,263 @@
+"""
+Append-only inventory event log with periodic checkpoints.
+
+Every committed stock change is recorded as events (inward, sale, adjust,
+damage, outward, delete) in ``<company>_events.jsonl`` next to the stock
+file. The stock file itself is the materialised current state; a head marker
+records how much of the event log it reflects, so a crash between appending
+events and writing the state is repaired by replaying. Compact checkpoints of
+the full state are written every ``EVENT_CHECKPOINT_INTERVAL`` events, so
+rebuilding the state or answering "stock as of" queries only replays the
+events after the nearest checkpoint.
+
+Writers must hold the stock file lock (see ``commit_stock_changes``).
+"""
+
+import bisect
+import datetime
+import json
+import os
+from config.settings import EVENT_CHECKPOINT_INTERVAL
+from utils.money import migrate_money_fields
+
+# Event types
+INWARD = 'inward'
+SALE = 'sale'
+ADJUST = 'adjust'
+DAMAGE = 'damage'
+OUTWARD = 'outward'
+DELETE = 'delete'
+
+
+def _now_str():
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _dump_json(path, data):
+    """Write compact JSON through a temporary file."""
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp_file, path)
+
+
+def _read_json(path, default):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def events_from_change(change, originals):
+    """Describe a StockChange as events (without seq/ts).
+
+    ``originals`` maps carton_id to the carton as it was on disk before the
+    change, used to tell sales, adjustments, damage and outwarding apart.
+    """
+    events = []
+    for carton in change.added:
+        events.append({'type': INWARD, 'carton_id': carton['carton_id'],
+                       'product_id': carton['product_id'], 'data': dict(carton)})
+
+    sold = {}
+    for entry in change.sales_log:
+        totals = sold.setdefault(entry['carton_id'], {'quantity': 0, 'sales_value_paise': 0})
+        totals['quantity'] += entry.get('quantity', 0)
+        totals['sales_value_paise'] += entry.get('sales_value_paise', 0)
+
+    deleted_ids = set(change.deleted_ids)
+    for carton in change.updated:
+        carton_id = carton['carton_id']
+        if carton_id in deleted_ids:
+            events.append({'type': DELETE, 'carton_id': carton_id, 'product_id': carton['product_id'], 'data': {}})
+            continue
+        original = originals.get(carton_id, {})
+        stamp = {'version': carton.get('version'), 'last_updated': carton.get('last_updated')}
+        carton_events = []
+        units_sold = sold.get(carton_id, {}).get('quantity', 0)
+        if units_sold:
+            carton_events.append((SALE, dict(sold[carton_id])))
+        if carton['quantity_per_carton'] != original.get('quantity_per_carton', 0) - units_sold:
+            carton_events.append((ADJUST, {'quantity_per_carton': carton['quantity_per_carton']}))
+        if carton['damaged_units'] != original.get('damaged_units'):
+            carton_events.append((DAMAGE, {'damaged_units': carton['damaged_units']}))
+        if carton.get('date_outwarded') != original.get('date_outwarded'):
+            carton_events.append((OUTWARD, {'date_outwarded': carton.get('date_outwarded')}))
+        if not carton_events:
+            carton_events.append((ADJUST, {'quantity_per_carton': carton['quantity_per_carton']}))
+        for event_type, data in carton_events:
+            data.update(stamp)
+            events.append({'type': event_type, 'carton_id': carton_id, 'product_id': carton['product_id'], 'data': data})
+    return events
+
+
+def apply_event(state, event):
+    """Apply one event to a carton_id -> carton dict."""
+    event_type = event['type']
+    carton_id = event['carton_id']
+    data = event['data']
+    if event_type == INWARD:
+        state[carton_id] = dict(data)
+        migrate_money_fields(state[carton_id])  # Logged before amounts moved to paise
+        return
+    if event_type == DELETE:
+        state.pop(carton_id, None)
+        return
+    carton = state.get(carton_id)
+    if carton is None:
+        return
+    if event_type == SALE:
+        carton['quantity_per_carton'] -= data['quantity']
+    elif event_type == ADJUST:
+        carton['quantity_per_carton'] = data['quantity_per_carton']
+    elif event_type == DAMAGE:
+        carton['damaged_units'] = data['damaged_units']
+    elif event_type == OUTWARD:
+        carton['date_outwarded'] = data['date_outwarded']
+    for name in ('version', 'last_updated'):
+        if data.get(name) is not None:
+            carton[name] = data[name]
+
+
+class EventStore:
+    """The event log, head marker and checkpoints of one company stock file."""
+
+    def __init__(self, json_file):
+        self.json_file = json_file
+        base_dir = os.path.dirname(json_file)
+        company_name = os.path.splitext(os.path.basename(json_file))[0]
+        self.events_file = os.path.join(base_dir, f"{company_name}_events.jsonl")
+        self.head_file = os.path.join(base_dir, f"{company_name}_events_head.json")
+        self.checkpoint_dir = os.path.join(base_dir, f"{company_name}_checkpoints")
+        self.index_file = os.path.join(self.checkpoint_dir, "index.json")
+
+    def exists(self):
+        return os.path.exists(self.events_file)
+
+    def read_head(self):
+        """The last event reflected in the stock file: {'seq', 'offset', 'timestamp'}."""
+        return _read_json(self.head_file, {'seq': 0, 'offset': 0, 'timestamp': ''})
+
+    def read_index(self):
+        """Checkpoint list, oldest first: {'seq', 'offset', 'timestamp', 'file'}."""
+        return _read_json(self.index_file, [])
+
+    def needs_recovery(self):
+        """True when the event log holds events the stock file may be missing."""
+        if not self.exists():
+            return False
+        if not os.path.exists(self.head_file):
+            return True
+        return os.path.getsize(self.events_file) != self.read_head()['offset']
+
+    def bootstrap(self, cartons):
+        """Start the log for an existing stock file with a genesis checkpoint."""
+        if self.exists():
+            return
+        timestamp = _now_str()
+        open(self.events_file, 'a').close()
+        self.write_checkpoint(cartons, 0, 0, timestamp)
+        _dump_json(self.head_file, {'seq': 0, 'offset': 0, 'timestamp': timestamp})
+
+    def append(self, events):
+        """Append events, assigning sequence numbers and timestamps; returns the new head."""
+        head = self.read_head()
+        # Keep timestamps non-decreasing even if terminal clocks disagree
+        timestamp = max(_now_str(), head['timestamp'])
+        seq = head['seq']
+        lines = []
+        for event in events:
+            seq += 1
+            lines.append(json.dumps(dict(event, seq=seq, ts=timestamp), separators=(',', ':')))
+        with open(self.events_file, 'ab') as f:
+            if lines:
+                f.write(('\n'.join(lines) + '\n').encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+            offset = f.tell()
+        return {'seq': seq, 'offset': offset, 'timestamp': timestamp}
+
+    def mark_head(self, head, cartons):
+        """Record that the stock file reflects ``head``; checkpoint if one is due."""
+        _dump_json(self.head_file, head)
+        index = self.read_index()
+        last_seq = index[-1]['seq'] if index else 0
+        if head['seq'] - last_seq >= EVENT_CHECKPOINT_INTERVAL:
+            self.write_checkpoint(cartons, head['seq'], head['offset'], head['timestamp'])
+
+    def write_checkpoint(self, cartons, seq, offset, timestamp):
+        """Save the full state after event ``seq`` (ending at byte ``offset``)."""
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        name = f"{seq:010d}.json"
+        _dump_json(os.path.join(self.checkpoint_dir, name), cartons)
+        index = [entry for entry in self.read_index() if entry['seq'] < seq]
+        index.append({'seq': seq, 'offset': offset, 'timestamp': timestamp, 'file': name})
+        _dump_json(self.index_file, index)
+
+    def _iter_events(self, offset):
+        """Yield (event, end_offset) from ``offset``, stopping at a torn final line."""
+        with open(self.events_file, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                yield json.loads(line), offset
+
+    def _replay(self, checkpoint, until=None):
+        """Replay from a checkpoint; returns (cartons, head of the last event applied).
+
+        A checkpoint without a ``file`` starts from the stock file itself.
+        """
+        base_file = os.path.join(self.checkpoint_dir, checkpoint['file']) if 'file' in checkpoint else self.json_file
+        with open(base_file, 'r') as f:
+            state = {c['carton_id']: c for c in json.load(f)}
+        for carton in state.values():
+            migrate_money_fields(carton)
+        head = {'seq': checkpoint['seq'], 'offset': checkpoint['offset'], 'timestamp': checkpoint['timestamp']}
+        for event, offset in self._iter_events(checkpoint['offset']):
+            if until is not None and event['ts'] > until:
+                break
+            apply_event(state, event)
+            head = {'seq': event['seq'], 'offset': offset, 'timestamp': event['ts']}
+        return list(state.values()), head
+
+    def current_state(self):
+        """The current state replayed from the last checkpoint, writing nothing; returns (cartons, head).
+
+        Without a checkpoint (bootstrap was interrupted) the stock file is
+        taken to reflect the recorded head, and replay starts from there.
+        """
+        index = self.read_index()
+        return self._replay(index[-1] if index else self.read_head())
+
+    def recover(self):
+        """Rebuild the current state from the last checkpoint; returns (cartons, head).
+
+        A torn final event line is cut off so later appends stay readable.
+        """
+        cartons, head = self.current_state()
+        if os.path.getsize(self.events_file) != head['offset']:
+            with open(self.events_file, 'r+b') as f:
+                f.truncate(head['offset'])
+        return cartons, head
+
+    def state_as_of(self, when):
+        """Stock as it stood at ``when`` ('YYYY-MM-DD' means end of that day).
+
+        History starts at the genesis checkpoint; for earlier dates the genesis
+        cartons already inwarded by then are returned as an approximation.
+        """
+        if len(when) == 10:
+            when = f"{when} 23:59:59"
+        index = self.read_index()
+        if not index:
+            return []
+        position = bisect.bisect_right([entry['timestamp'] for entry in index], when)
+        if position == 0:
+            cartons, _ = self._replay(index[0], until='')
+            day = when[:10]
+            return [c for c in cartons if (c.get('date_inwarded') or '') <= day]
+        cartons, _ = self._replay(index[position - 1], until=when)
+        return cartons
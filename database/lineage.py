@@ -0,0 +1,196 @@
+"""
+Carton lineage: where each carton's history sits in the company logs.
+
+``<company>_lineage.jsonl`` maps carton IDs to byte offsets in the purchase
+log, the sales log and the inventory event log, one compact
+``[source, offset, end, carton_id]`` line per entry (a sale record gets a
+line for each carton it sold from). Stock transactions
+append lines as they append log entries; anything written without them
+(older versions, the event log) is picked up by reading just the part of
+each source appended since its last indexed entry. If a source no longer
+holds that entry where it was indexed (the log was cleared or compacted),
+the whole index is rebuilt.
+
+Looking up a carton's history then reads only its own entries. Months
+moved to the log archive are not indexed here; their segments' rollups
+say which months a carton appears in.
+"""
+
+import json
+import os
+from database.log_store import iter_log_offsets, read_log_entry_at, expand_log_record
+from database.event_store import EventStore, INWARD, SALE
+from database.log_archive import archived_carton_entries
+from utils.file_lock import FileLock
+from utils.file_utils import get_log_file_path
+
+SOURCES = ('purchase', 'sales', 'events')
+
+
+def get_lineage_file_path(json_file):
+    """Get the path of a company's carton lineage index."""
+    base_dir = os.path.dirname(json_file)
+    company_name = os.path.splitext(os.path.basename(json_file))[0]
+    return os.path.join(base_dir, f"{company_name}_lineage.jsonl")
+
+
+def _source_file(json_file, source):
+    if source == 'events':
+        return EventStore(json_file).events_file
+    return get_log_file_path(json_file, source)
+
+
+def _read_event_at(events_file, offset):
+    """Decode the event line starting at ``offset``; returns ``(event, end)`` or ``(None, None)``."""
+    try:
+        with open(events_file, 'rb') as f:
+            f.seek(offset)
+            line = f.readline()
+    except OSError:
+        return None, None
+    if not line.endswith(b'\n'):
+        return None, None
+    try:
+        return json.loads(line), offset + len(line)
+    except ValueError:
+        return None, None
+
+
+def _entries(source, record):
+    """The per-carton entries of a log record or event (a sale record covers several cartons)."""
+    if not isinstance(record, dict):
+        return []
+    return [record] if source == 'events' else expand_log_record(record)
+
+
+def _iter_event_offsets(events_file, start=0):
+    """Yield ``(offset, end, event)`` for complete event lines from ``start``."""
+    if not os.path.exists(events_file):
+        return
+    with open(events_file, 'rb') as f:
+        f.seek(start)
+        offset = start
+        for line in f:
+            if not line.endswith(b'\n'):
+                return
+            end = offset + len(line)
+            try:
+                yield offset, end, json.loads(line)
+            except ValueError:
+                pass
+            offset = end
+
+
+def _append_lines(lineage_file, records):
+    if records:
+        with open(lineage_file, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records))
+
+
+def record_lineage(json_file, source, records, spans):
+    """Index log records just appended at ``spans`` (see ``append_log_entries``).
+
+    Does nothing until the index has been built once; the first lookup
+    builds it from the logs.
+    """
+    lineage_file = get_lineage_file_path(json_file)
+    if not records or not os.path.exists(lineage_file):
+        return
+    with FileLock(lineage_file):
+        _append_lines(lineage_file, [[source, offset, end, entry['carton_id']]
+                                     for record, (offset, end) in zip(records, spans)
+                                     for entry in _entries(source, record) if entry.get('carton_id')])
+
+
+def invalidate_lineage(json_file):
+    """Drop the index so it is rebuilt on next use (after logs are rewritten)."""
+    try:
+        os.remove(get_lineage_file_path(json_file))
+    except FileNotFoundError:
+        pass
+
+
+class CartonLineage:
+    """In-memory view of a company's lineage index, kept in step with the file."""
+
+    def __init__(self, json_file):
+        self.json_file = json_file
+        self.lineage_file = get_lineage_file_path(json_file)
+        self._reset()
+
+    def _reset(self):
+        self.offsets = {}   # carton_id -> {(source, offset, end)}
+        self.last = {}      # source -> (offset, end, carton_id) of the furthest indexed entry
+        self._read_upto = 0
+
+    def _add(self, source, offset, end, carton_id):
+        self.offsets.setdefault(carton_id, set()).add((source, offset, end))
+        if offset >= self.last.get(source, (-1,))[0]:
+            self.last[source] = (offset, end, carton_id)
+
+    def _load_new_lines(self):
+        """Read lines appended to the index file since the last call."""
+        if not os.path.exists(self.lineage_file):
+            return False
+        if os.path.getsize(self.lineage_file) < self._read_upto:
+            self._reset()
+        with open(self.lineage_file, 'rb') as f:
+            f.seek(self._read_upto)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                self._read_upto += len(line)
+                try:
+                    self._add(*json.loads(line))
+                except (ValueError, TypeError):
+                    continue
+        return True
+
+    def _still_valid(self, source):
+        """True if the last indexed entry of a source is still where it was indexed."""
+        if source not in self.last:
+            return True
+        offset, end, carton_id = self.last[source]
+        source_file = _source_file(self.json_file, source)
+        read_at = _read_event_at if source == 'events' else read_log_entry_at
+        record, record_end = read_at(source_file, offset)
+        return record_end == end and any(entry.get('carton_id') == carton_id for entry in _entries(source, record))
+
+    def _scan(self, source, start):
+        source_file = _source_file(self.json_file, source)
+        scan = _iter_event_offsets if source == 'events' else iter_log_offsets
+        return [[source, offset, end, entry['carton_id']] for offset, end, record in scan(source_file, start)
+                for entry in _entries(source, record) if entry.get('carton_id')]
+
+    def refresh(self):
+        """Bring the index up to date with the logs, rebuilding it if they were rewritten."""
+        with FileLock(self.lineage_file):
+            built = self._load_new_lines()
+            if not built or not all(self._still_valid(source) for source in SOURCES):
+                self._reset()
+                records = [record for source in SOURCES for record in self._scan(source, 0)]
+                with open(self.lineage_file, 'w', encoding='utf-8'):
+                    pass
+            else:
+                records = [record for source in SOURCES for record in self._scan(source, self.last.get(source, (0, 0))[1])]
+            _append_lines(self.lineage_file, records)
+            self._load_new_lines()
+
+    def history(self, carton_id):
+        """Every logged entry for a carton, oldest first, as ``(source, entry)`` pairs."""
+        self.refresh()
+        rows = [(source, entry) for source in ('purchase', 'sales')
+                for entry in archived_carton_entries(_source_file(self.json_file, source), carton_id)]
+        for source, offset, _ in sorted(self.offsets.get(carton_id, ()), key=lambda o: (SOURCES.index(o[0]), o[1])):
+            source_file = _source_file(self.json_file, source)
+            read_at = _read_event_at if source == 'events' else read_log_entry_at
+            record, _ = read_at(source_file, offset)
+            for entry in _entries(source, record):
+                if entry.get('carton_id') != carton_id:
+                    continue
+                # Inward and sale events repeat what the purchase and sales logs already hold
+                if source == 'events' and entry.get('type') in (INWARD, SALE):
+                    continue
+                rows.append((source, entry))
+        rows.sort(key=lambda row: (row[1].get('ts') or row[1].get('date', ''), SOURCES.index(row[0])))
+        return rows
@@ -0,0 +1,372 @@
+"""
+Monthly archive segments of the purchase and sales logs.
+
+Entries from closed months are moved out of the live ``indent=4`` log into
+one gzip-compressed JSON-lines segment per month,
+``<log>_archive/<YYYY-MM>.jsonl.gz``. The archive's ``manifest.json`` lists
+each segment's date range, counts and sizes; a ``<YYYY-MM>.rollup.json``
+beside each segment holds its per-carton and per-product totals.
+
+Readers in ``database.log_store`` take the archive in transparently: they
+decompress only the segments overlapping the dates asked for, and answer
+totals from the rollups wherever no deleted carton gets in the way.
+"""
+
+import datetime
+import gzip
+import json
+import os
+import re
+import shutil
+from collections import Counter
+from config.settings import LOG_ARCHIVE_OPEN_MONTHS, LOG_ARCHIVE_COMPRESSLEVEL
+from database.stock_data import _read_json_list, _write_json_atomic
+from database.log_store import expand_log_record, is_tombstoned, pack_sales_entries, iter_log_offsets
+from utils.file_lock import FileLock
+from utils.file_utils import get_log_file_path
+
+MANIFEST_FILE = 'manifest.json'
+_MONTH_RE = re.compile(r'\d{4}-\d{2}$')
+
+_rollups = {}  # rollup path -> ((mtime_ns, size), rollup)
+
+
+def get_archive_dir(log_file):
+    """Directory holding a log's archive segments."""
+    return f"{os.path.splitext(log_file)[0]}_archive"
+
+
+def load_manifest(log_file):
+    """A log's archive segments, oldest month first (empty if it has no archive)."""
+    return sorted(_read_json_list(os.path.join(get_archive_dir(log_file), MANIFEST_FILE)),
+                  key=lambda segment: segment['month'])
+
+
+def _write_manifest(log_file, segments):
+    _write_json_atomic(os.path.join(get_archive_dir(log_file), MANIFEST_FILE),
+                       sorted(segments, key=lambda segment: segment['month']))
+
+
+def _overlaps(segment, start, end):
+    return (not start or segment['last_date'][:10] >= start) and (not end or segment['first_date'][:10] <= end)
+
+
+def segments_in_range(log_file, start=None, end=None):
+    """Archive segments with entries between the inclusive 'YYYY-MM-DD' dates."""
+    return [segment for segment in load_manifest(log_file) if _overlaps(segment, start, end)]
+
+
+def archived_bytes(log_file, start=None, end=None):
+    """Uncompressed size of the segments a read between the dates goes through, for progress."""
+    return sum(segment['raw_bytes'] for segment in segments_in_range(log_file, start, end))
+
+
+def iter_segment_records(log_file, segment):
+    """Decompress one segment's records."""
+    with gzip.open(os.path.join(get_archive_dir(log_file), segment['file']), 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _rollup(records):
+    """Per-carton units and per-product totals of a month's records."""
+    entries = 0
+    cartons = {}
+    products = {}
+    for record in records:
+        for entry in expand_log_record(record):
+            entries += 1
+            carton_id = entry.get('carton_id')
+            if carton_id:
+                cartons[carton_id] = cartons.get(carton_id, 0) + entry.get('quantity', 0)
+            row = products.setdefault((entry.get('product_id', ''), entry.get('product_name', '')), [0, 0, 0, 0])
+            row[0] += 1
+            row[1] += entry.get('quantity', 0)
+            row[2] += entry.get('sales_value_paise', 0)
+            row[3] += entry.get('purchase_value_paise', 0)
+    return {
+        'entries': entries,
+        'cartons': cartons,
+        # [product_id, product_name, entries, quantity, sales_value_paise, purchase_value_paise]
+        'products': [[product_id, product_name, *row] for (product_id, product_name), row in products.items()],
+    }
+
+
+def _write_compact(path, data):
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_file, path)
+
+
+def _rollup_path(log_file, month):
+    return os.path.join(get_archive_dir(log_file), f"{month}.rollup.json")
+
+
+def load_rollup(log_file, segment):
+    """A segment's rollup, rebuilt from the segment if its file is missing."""
+    path = _rollup_path(log_file, segment['month'])
+    try:
+        stat = os.stat(path)
+        cached = _rollups.get(path)
+        if cached is not None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            return cached[1]
+        with open(path, 'r', encoding='utf-8') as f:
+            rollup = json.load(f)
+        _rollups[path] = ((stat.st_mtime_ns, stat.st_size), rollup)
+        return rollup
+    except (OSError, ValueError):
+        return _rollup(iter_segment_records(log_file, segment))
+
+
+def _write_segment(log_file, month, records):
+    """Write a month's records as a compressed segment with its rollup; returns its manifest entry."""
+    raw = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records).encode('utf-8')
+    segment_file = f"{month}.jsonl.gz"
+    segment_path = os.path.join(get_archive_dir(log_file), segment_file)
+    _write_compact(segment_path, gzip.compress(raw, compresslevel=LOG_ARCHIVE_COMPRESSLEVEL, mtime=0))
+    rollup = _rollup(records)
+    _write_compact(_rollup_path(log_file, month), json.dumps(rollup, separators=(',', ':')).encode('utf-8'))
+    dates = [record.get('date', '') for record in records]
+    return {
+        'month': month,
+        'file': segment_file,
+        'first_date': min(dates),
+        'last_date': max(dates),
+        'records': len(records),
+        'entries': rollup['entries'],
+        'raw_bytes': len(raw),
+        'bytes': os.path.getsize(segment_path),
+    }
+
+
+def _remove_segment(log_file, segment):
+    for path in (os.path.join(get_archive_dir(log_file), segment['file']), _rollup_path(log_file, segment['month'])):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _segment_contents(log_type, entries):
+    """Records to store for a month's per-carton entries (sales are packed per sale)."""
+    return pack_sales_entries(entries) if log_type == 'sales' else entries
+
+
+def _entry_key(entry):
+    if entry.get('type') == 'sale':
+        # Compare as stored in a segment: per-carton sale entries written before
+        # compact records can lack fields (e.g. MRP) that expanding one fills in
+        entry = expand_log_record(pack_sales_entries([entry])[0])[0]
+    return json.dumps(entry, sort_keys=True)
+
+
+def _first_open_month(today=None):
+    today = today or datetime.date.today()
+    months = today.year * 12 + today.month - 1 - (LOG_ARCHIVE_OPEN_MONTHS - 1)
+    return f"{months // 12:04d}-{months % 12 + 1:02d}"
+
+
+def _closed_month(record, first_open):
+    month = record.get('date', '')[:7] if isinstance(record, dict) else ''
+    return month if _MONTH_RE.match(month) and month < first_open else None
+
+
+def logs_need_archiving(json_file, today=None):
+    """True if a company's purchase or sales log still starts in a closed month (a cheap check)."""
+    first_open = _first_open_month(today)
+    for log_type in ('purchase', 'sales'):
+        first = next(iter_log_offsets(get_log_file_path(json_file, log_type)), None)
+        if first is not None and _closed_month(first[2], first_open):
+            return True
+    return False
+
+
+def archive_logs(json_file, today=None):
+    """Move closed months out of a company's purchase and sales logs into compressed segments.
+
+    Months before the last ``LOG_ARCHIVE_OPEN_MONTHS`` (the current month
+    included) are archived; entries turning up later for a month already
+    archived are merged into its segment. Each log is locked while it is
+    rewritten. Returns the number of (per-carton) log entries archived.
+    """
+    first_open = _first_open_month(today)
+    archived = 0
+    for log_type in ('purchase', 'sales'):
+        log_file = get_log_file_path(json_file, log_type)
+        if not os.path.exists(log_file):
+            continue
+        with FileLock(log_file):
+            closed = {}
+            kept = []
+            for record in _read_json_list(log_file):
+                month = _closed_month(record, first_open)
+                if month:
+                    closed.setdefault(month, []).extend(expand_log_record(record))
+                else:
+                    kept.append(record)
+            if not closed:
+                continue
+            os.makedirs(get_archive_dir(log_file), exist_ok=True)
+            manifest = {segment['month']: segment for segment in load_manifest(log_file)}
+            for month, entries in sorted(closed.items()):
+                if month in manifest:
+                    in_segment = [entry for record in iter_segment_records(log_file, manifest[month])
+                                  for entry in expand_log_record(record)]
+                    if not Counter(map(_entry_key, entries)) - Counter(map(_entry_key, in_segment)):
+                        continue  # Left behind by a run interrupted before the live log was rewritten
+                    archived += len(entries)
+                    entries = in_segment + entries
+                else:
+                    archived += len(entries)
+                manifest[month] = _write_segment(log_file, month, _segment_contents(log_type, entries))
+            # Segments before the live log: an interruption leaves entries in both places, never in neither
+            _write_manifest(log_file, manifest.values())
+            _write_json_atomic(log_file, kept)
+    if archived:
+        from database.lineage import invalidate_lineage
+        invalidate_lineage(json_file)
+    return archived
+
+
+def purge_archived(log_file, log_type, tombstones):
+    """Drop tombstoned entries from a log's segments; returns how many. Call with the log locked."""
+    manifest = {segment['month']: segment for segment in load_manifest(log_file)}
+    removed = 0
+    for month, segment in list(manifest.items()):
+        if not tombstones.keys() & load_rollup(log_file, segment)['cartons'].keys():
+            continue
+        entries = [entry for record in iter_segment_records(log_file, segment) for entry in expand_log_record(record)]
+        kept = [entry for entry in entries if not is_tombstoned(entry, tombstones)]
+        if len(kept) == len(entries):
+            continue
+        removed += len(entries) - len(kept)
+        if kept:
+            manifest[month] = _write_segment(log_file, month, _segment_contents(log_type, kept))
+        else:
+            _remove_segment(log_file, segment)
+            del manifest[month]
+    if removed:
+        _write_manifest(log_file, manifest.values())
+    return removed
+
+
+def clear_log(log_file):
+    """Empty a log, its archive included."""
+    with FileLock(log_file):
+        _write_json_atomic(log_file, [])
+        shutil.rmtree(get_archive_dir(log_file), ignore_errors=True)
+
+
+def iter_archived_records(log_file, start=None, end=None, product_ids=None, on_read=None, segments=None):
+    """Records of the segments overlapping the dates (and holding any of ``product_ids``), oldest first.
+
+    ``segments`` is a manifest already read (by default it is read now).
+    ``on_read`` is called with each segment's uncompressed size once it has
+    been read or skipped, matching ``archived_bytes``.
+    """
+    if segments is None:
+        segments = load_manifest(log_file)
+    for segment in segments:
+        if not _overlaps(segment, start, end):
+            continue
+        if product_ids is None or any(row[0] in product_ids for row in load_rollup(log_file, segment)['products']):
+            yield from iter_segment_records(log_file, segment)
+        if on_read is not None:
+            on_read(segment['raw_bytes'])
+
+
+def archived_duplicate_filter(log_file, segments):
+    """A predicate for live log entries that one of ``segments`` already holds.
+
+    An archive run interrupted before it rewrote the live log, or one that
+    finished while a reader held the old live log open, leaves entries in
+    both places. Each live entry dated in an archived month is matched
+    against that segment's entries (decompressed once, on first need).
+    """
+    by_month = {segment['month']: segment for segment in segments}
+    archived = {}
+
+    def is_archived(entry):
+        month = entry.get('date', '')[:7]
+        if month not in by_month:
+            return False
+        counts = archived.get(month)
+        if counts is None:
+            counts = archived[month] = Counter(_entry_key(e) for record in iter_segment_records(log_file, by_month[month])
+                                               for e in expand_log_record(record))
+        key = _entry_key(entry)
+        if counts[key] <= 0:
+            return False
+        counts[key] -= 1
+        return True
+
+    return is_archived
+
+
+def archived_quantities(log_file, tombstones=None):
+    """Total archived quantity per carton as ``(totals, entries)``, from the rollups.
+
+    A segment is only decompressed for cartons deleted part-way through
+    its month.
+    """
+    totals = {}
+    count = 0
+    for segment in load_manifest(log_file):
+        rollup = load_rollup(log_file, segment)
+        count += rollup['entries']
+        unsure = set()
+        for carton_id, units in rollup['cartons'].items():
+            deleted_at = tombstones.get(carton_id) if tombstones else None
+            # Same rule as is_tombstoned, for every entry of the segment at once
+            if deleted_at is None or deleted_at < segment['first_date']:
+                totals[carton_id] = totals.get(carton_id, 0) + units
+            elif deleted_at <= segment['last_date']:
+                unsure.add(carton_id)  # Deleted part-way through the month (or in the same second as its last entry)
+        if unsure:
+            for record in iter_segment_records(log_file, segment):
+                for entry in expand_log_record(record):
+                    if entry.get('carton_id') in unsure and not is_tombstoned(entry, tombstones):
+                        totals[entry['carton_id']] = totals.get(entry['carton_id'], 0) + entry.get('quantity', 0)
+    return totals, count
+
+
+def archived_monthly_totals(log_file, tombstones=None):
+    """Per (month, product_id, product_name) ``[entries, quantity, sales_value_paise, purchase_value_paise]``.
+
+    Read from the rollups, except for segments holding a deleted carton,
+    which are decompressed so its entries can be left out.
+    """
+    totals = {}
+
+    def add(key, entries, quantity, sales_value, purchase_value):
+        row = totals.setdefault(key, [0, 0, 0, 0])
+        row[0] += entries
+        row[1] += quantity
+        row[2] += sales_value
+        row[3] += purchase_value
+
+    for segment in load_manifest(log_file):
+        rollup = load_rollup(log_file, segment)
+        if tombstones and any(tombstones.get(carton_id, '') >= segment['first_date'] for carton_id in rollup['cartons']):
+            for record in iter_segment_records(log_file, segment):
+                for entry in expand_log_record(record):
+                    if not is_tombstoned(entry, tombstones):
+                        add((entry.get('date', '')[:7], entry.get('product_id', ''), entry.get('product_name', '')),
+                            1, entry.get('quantity', 0), entry.get('sales_value_paise', 0),
+                            entry.get('purchase_value_paise', 0))
+            continue
+        for product_id, product_name, *row in rollup['products']:
+            add((segment['month'], product_id, product_name), *row)
+    return totals
+
+
+def archived_carton_entries(log_file, carton_id):
+    """A carton's archived entries, decompressing only the segments its rollups list it in."""
+    for segment in load_manifest(log_file):
+        if carton_id not in load_rollup(log_file, segment)['cartons']:
+            continue
+        for record in iter_segment_records(log_file, segment):
+            for entry in expand_log_record(record):
+                if entry.get('carton_id') == carton_id:
+                    yield entry
@@ -0,0 +1,497 @@
+"""
+Streaming reads of the purchase and sales log files.
+
+Log files are JSON arrays holding the current month; closed months are
+moved to compressed monthly segments (see ``database.log_archive``), which
+these readers include transparently. They decode one entry at a time so
+callers never hold a whole log in memory.
+
+Each sale is logged as one compact record: a header with the time, product,
+totals and prices, and a short list of ``lines`` (carton ID and quantity,
+plus any price that differs from the header's). Readers see it through
+``expand_log_record`` as the per-carton entries sales were logged as before,
+so older logs and new records read the same.
+
+Deleting a carton does not rewrite history: a tombstone is appended to the
+company's tombstone log and readers skip that carton's earlier entries until
+``compact_logs`` purges them in bulk. Entries and tombstones carry the event
+sequence number (``seq``) of the commit that wrote them, which settles the
+order of an entry logged in the same second as a deletion.
+"""
+
+import datetime
+import json
+import os
+import re
+from config.settings import LOG_READ_CHUNK_BYTES, LOG_SCAN_CHUNK_BYTES
+from database.stock_data import append_log_entries, _read_json_list, _write_json_atomic
+from utils.file_lock import FileLock
+from utils.file_utils import get_log_file_path
+from utils.money import migrate_money_fields
+
+_decoder = json.JSONDecoder()
+
+
+def _iter_json_array(f, chunk_size=LOG_READ_CHUNK_BYTES, on_read=None, start=None):
+    """Yield the elements of a JSON array from a text file, reading it in chunks.
+
+    ``on_read(n)`` is called with the number of characters read per chunk.
+    A missing opening bracket or a truncated file ends iteration quietly.
+    With ``start`` (a file position just past an element, already seeked
+    to) iteration resumes mid-array and yields ``(offset, end, element)``
+    with the element's absolute character span.
+    """
+    buffer = ''
+    pos = 0
+    eof = False
+    started = start is not None
+    base = start or 0  # File position of buffer[0]
+
+    def fill():
+        nonlocal buffer, pos, eof, base
+        chunk = f.read(chunk_size)
+        if on_read is not None:
+            on_read(len(chunk))
+        if not chunk:
+            eof = True
+        base += pos
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    while True:
+        # Skip whitespace and separators up to the next value
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            fill()
+        if pos >= len(buffer):
+            return
+        if not started:
+            if buffer[pos] != '[':
+                return
+            started = True
+            pos += 1
+            continue
+        if buffer[pos] == ']':
+            return
+        try:
+            value, end = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                return
+            fill()  # Value straddles the chunk boundary
+            continue
+        # A number is only complete once a delimiter follows it
+        if (not eof and not isinstance(value, (dict, list, str))
+                and (end == len(buffer) or buffer[end] not in ' \t\r\n,]')):
+            fill()
+            continue
+        offset = base + pos
+        pos = end
+        yield (offset, base + end, value) if start is not None else value
+
+
+def _in_range(entry, start, end, product_ids):
+    day = entry.get('date', '')[:10]
+    if start and day < start:
+        return False
+    if end and day > end:
+        return False
+    if product_ids is not None and entry.get('product_id') not in product_ids:
+        return False
+    return True
+
+
+# Per-carton prices of a sale; a compact record holds them once, its lines only where they differ
+SALE_PRICE_FIELDS = ('sales_price_paise', 'purchase_price_paise', 'mrp_paise')
+
+
+def pack_sales_entries(entries):
+    """Fold per-carton sale entries into one compact record per sale (time and product)."""
+    records = []
+    by_sale = {}
+    for entry in entries:
+        key = (entry.get('date', ''), entry.get('product_id'), entry.get('seq'))
+        record = by_sale.get(key)
+        if record is None:
+            record = by_sale[key] = {
+                'date': key[0],
+                'product_id': key[1],
+                'product_name': entry.get('product_name', ''),
+                'type': 'sale',
+                'quantity': 0,
+                'sales_value_paise': 0,
+                'purchase_value_paise': 0,
+                **{name: entry.get(name, 0) for name in SALE_PRICE_FIELDS},
+                **({'seq': key[2]} if key[2] is not None else {}),
+                'lines': [],
+            }
+            records.append(record)
+        line = {'carton_id': entry.get('carton_id'), 'quantity': entry.get('quantity', 0)}
+        line.update((name, entry.get(name, 0)) for name in SALE_PRICE_FIELDS if entry.get(name, 0) != record[name])
+        record['lines'].append(line)
+        record['quantity'] += line['quantity']
+        record['sales_value_paise'] += entry.get('sales_value_paise', 0)
+        record['purchase_value_paise'] += entry.get('purchase_value_paise', 0)
+    return records
+
+
+def expand_log_record(record):
+    """The per-carton entries a log record stands for.
+
+    A compact sale record gives one entry per line, with its values worked
+    out from quantity and price; any other entry is returned as it is.
+    """
+    lines = record.get('lines')
+    if not isinstance(lines, list):
+        return [record]
+    entries = []
+    for line in lines:
+        prices = {name: line.get(name, record.get(name, 0)) for name in SALE_PRICE_FIELDS}
+        quantity = line.get('quantity', 0)
+        entries.append({
+            'date': record.get('date', ''),
+            'product_id': record.get('product_id'),
+            'product_name': record.get('product_name', ''),
+            'carton_id': line.get('carton_id'),
+            'quantity': quantity,
+            **prices,
+            'sales_value_paise': quantity * prices['sales_price_paise'],
+            'purchase_value_paise': quantity * prices['purchase_price_paise'],
+            'type': record.get('type', 'sale'),
+            **({'seq': record['seq']} if 'seq' in record else {}),
+        })
+    return entries
+
+
+def iter_log_entries(log_file, start=None, end=None, product_ids=None, on_read=None, tombstones=None):
+    """Stream entries from a log file, optionally filtered.
+
+    ``start``/``end`` are inclusive 'YYYY-MM-DD' dates and ``product_ids`` an
+    optional collection of product IDs; archive segments outside them are
+    not decompressed. ``on_read(n)`` reports characters consumed (bytes, for
+    these ASCII files), for progress against ``log_read_size``. Entries
+    hidden by ``tombstones`` (see ``load_tombstones``) are skipped. Compact
+    sale records are expanded into their per-carton entries.
+    """
+    from database.log_archive import iter_archived_records, load_manifest, archived_duplicate_filter
+    if product_ids is not None:
+        product_ids = set(product_ids)
+    # The manifest is read before the live log is opened, and read again after:
+    # if an archive run moved entries out of the live log in between, retry
+    segments = load_manifest(log_file)
+    while True:
+        f = open(log_file, 'r', encoding='utf-8') if os.path.exists(log_file) else None
+        current = load_manifest(log_file)
+        if current == segments:
+            break
+        if f is not None:
+            f.close()
+        segments = current
+    # A run interrupted (or finishing) after this snapshot leaves entries in both places
+    is_archived = archived_duplicate_filter(log_file, segments)
+
+    def visible(records, live):
+        for record in records:
+            # A record's lines share its date and product, so the filter applies to the record
+            if not isinstance(record, dict) or not _in_range(record, start, end, product_ids):
+                continue
+            for entry in expand_log_record(record):
+                if live and is_archived(entry):
+                    continue
+                if not is_tombstoned(entry, tombstones):
+                    yield entry
+
+    try:
+        yield from visible(iter_archived_records(log_file, start, end, product_ids, on_read, segments), False)
+        if f is not None:
+            yield from visible(_iter_json_array(f, on_read=on_read), True)
+    finally:
+        if f is not None:
+            f.close()
+
+
+def _iter_live_entries(log_file, tombstones=None):
+    """Entries of the live log only, leaving the archive out."""
+    if not os.path.exists(log_file):
+        return
+    with open(log_file, 'r', encoding='utf-8') as f:
+        for record in _iter_json_array(f):
+            if isinstance(record, dict):
+                for entry in expand_log_record(record):
+                    if not is_tombstoned(entry, tombstones):
+                        yield entry
+
+
+def log_read_size(log_file, start=None, end=None):
+    """Characters ``iter_log_entries`` reads for the dates: the live log plus overlapping segments."""
+    from database.log_archive import archived_bytes
+    size = os.path.getsize(log_file) if os.path.exists(log_file) else 0
+    return size + archived_bytes(log_file, start, end)
+
+
+def iter_log_offsets(log_file, start=0):
+    """Yield ``(offset, end, record)`` for log records, with their byte spans in the file.
+
+    ``start`` is 0 or the end of an entry, to read only what was appended
+    after it. Logs are written as ASCII JSON, so character and byte
+    positions agree.
+    """
+    if not os.path.exists(log_file):
+        return
+    with open(log_file, 'r', encoding='utf-8') as f:
+        if start:
+            f.seek(start)
+            yield from _iter_json_array(f, start=start)
+            return
+        # Locate the opening bracket, then read on from just past it
+        head = f.read(LOG_READ_CHUNK_BYTES)
+        bracket = head.find('[')
+        if bracket < 0 or head[:bracket].strip():
+            return
+        f.seek(bracket + 1)
+        yield from _iter_json_array(f, start=bracket + 1)
+
+
+def read_log_entry_at(log_file, offset):
+    """Decode the log entry starting at ``offset``; returns ``(entry, end)`` or ``(None, None)``."""
+    try:
+        with open(log_file, 'r', encoding='utf-8') as f:
+            f.seek(offset)
+            buffer = ''
+            while True:
+                chunk = f.read(4096)
+                buffer += chunk
+                try:
+                    entry, end = _decoder.raw_decode(buffer)
+                    return entry, offset + end
+                except json.JSONDecodeError:
+                    if not chunk:
+                        return None, None
+    except (OSError, ValueError):
+        return None, None
+
+
+# Layout written by append_log_entries/_write_json_atomic: one indent=4 object per entry
+_ENTRY_START = b'\n    {'
+_ENTRY_END = b'\n    }'
+# A carton and its quantity: a whole entry's, or a line of a compact sale record
+_LINE_RE = re.compile(rb'\n( {8}| {16})"carton_id": "([^"\\]*)",\n\1"quantity": (-?\d+)(?=,?\n)')
+_CARTON_ID = b'"carton_id": '
+_QUANTITY_RE = re.compile(rb'\n        "quantity": (-?\d+)(?=,?\n)')
+_DATE = b'\n        "date": "'
+# Entry dates and carton lines in file order, so each line gets its entry's date
+_DATED_LINE_RE = re.compile(rb'\n        "date": "([^"\\]*)"'
+                            rb'|\n( {8}| {16})"carton_id": "([^"\\]*)",\n\2"quantity": (-?\d+)(?=,?\n)')
+
+
+def _scan_quantities(f, chunk_size, tombstones):
+    """Sum quantities per carton by pattern-matching whole chunks of an indent=4 log.
+
+    Every entry, and every line of a compact sale record, is a carton_id
+    followed by an integer quantity. Returns None as soon as a chunk does
+    not fit that layout, so the caller can fall back to decoding.
+    """
+    head = f.read(len(_ENTRY_START) + 1).lstrip()
+    if head.startswith(b'[') and head[1:].strip() in (b'', b']'):
+        return {}, 0
+    if not head.startswith(b'[' + _ENTRY_START):
+        return None
+    f.seek(0)
+    # Compared as bytes, like the matches (these logs are ASCII)
+    deleted_at = {carton_id.encode(): date.encode() for carton_id, date in (tombstones or {}).items()}
+    totals = {}
+    count = 0
+    carry = b''
+    while True:
+        chunk = f.read(chunk_size)
+        data = carry + chunk
+        cut = data.rfind(_ENTRY_END) if chunk else len(data)
+        if cut < 0:
+            carry = data
+            continue
+        block, carry = data[:cut], data[cut:]
+        entries = block.count(_ENTRY_START)
+        if len(_QUANTITY_RE.findall(block)) != entries:
+            return None
+        if deleted_at:
+            if block.count(_DATE) != entries:
+                return None
+            rows = []
+            lines = 0
+            entry_date = b''
+            for date, indent, carton_id, quantity in _DATED_LINE_RE.findall(block):
+                if not indent:
+                    entry_date = date
+                    continue
+                lines += 1
+                # Same rule as is_tombstoned; a same-second tie needs the entry's seq, so decode instead
+                if carton_id in deleted_at and entry_date == deleted_at[carton_id]:
+                    return None
+                if carton_id not in deleted_at or entry_date > deleted_at[carton_id]:
+                    rows.append((carton_id, quantity))
+        else:
+            rows = [(carton_id, quantity) for _, carton_id, quantity in _LINE_RE.findall(block)]
+            lines = len(rows)
+        if lines != block.count(_CARTON_ID):
+            return None
+        for carton_id, quantity in rows:
+            totals[carton_id] = totals.get(carton_id, 0) + int(quantity)
+        count += len(rows)  # Tombstoned lines are checked above but not counted
+        if not chunk:
+            return {carton_id.decode(): units for carton_id, units in totals.items()}, count
+
+
+def sum_log_quantities(log_file, tombstones=None, chunk_size=LOG_SCAN_CHUNK_BYTES):
+    """Total logged quantity per carton, returned as ``(totals, entries)`` (one entry per carton line).
+
+    Logs in the layout this app writes are scanned with a handful of regex
+    passes per multi-megabyte chunk instead of decoding every entry, which
+    keeps a million-entry log to a few seconds; any other layout is decoded
+    entry by entry. Archived months come from their segments' rollups.
+    Entries hidden by ``tombstones`` are not counted.
+    """
+    from database.log_archive import archived_quantities
+    totals, count = archived_quantities(log_file, tombstones)
+    if not os.path.exists(log_file):
+        return totals, count
+    with open(log_file, 'rb') as f:
+        scanned = _scan_quantities(f, chunk_size, tombstones)
+    if scanned is None:
+        live, live_count = {}, 0
+        for entry in _iter_live_entries(log_file, tombstones):
+            live_count += 1
+            carton_id = entry.get('carton_id')
+            if carton_id:
+                live[carton_id] = live.get(carton_id, 0) + entry.get('quantity', 0)
+        scanned = live, live_count
+    for carton_id, units in scanned[0].items():
+        totals[carton_id] = totals.get(carton_id, 0) + units
+    return totals, count + scanned[1]
+
+
+def monthly_log_totals(log_file, tombstones=None):
+    """Per (month, product_id, product_name) ``[entries, quantity, sales_value_paise, purchase_value_paise]``.
+
+    Archived months are read from their segments' rollups; only the live log
+    is decoded entry by entry. A log not yet migrated to paise is converted
+    as it is read, so read-only reports need not rewrite it.
+    """
+    from database.log_archive import archived_monthly_totals
+    totals = archived_monthly_totals(log_file, tombstones)
+    for entry in _iter_live_entries(log_file, tombstones):
+        migrate_money_fields(entry)
+        row = totals.setdefault((entry.get('date', '')[:7], entry.get('product_id', ''),
+                                 entry.get('product_name', '')), [0, 0, 0, 0])
+        row[0] += 1
+        row[1] += entry.get('quantity', 0)
+        row[2] += entry.get('sales_value_paise', 0)
+        row[3] += entry.get('purchase_value_paise', 0)
+    return totals
+
+
+class Tombstones(dict):
+    """Deleted carton ID -> the time it was deleted, with the deleting commit's seq in ``seqs``."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.seqs = {}
+
+    def position(self, carton_id):
+        """Sort key of a carton's deletion: ``(date, seq)``."""
+        return self.get(carton_id, ''), self.seqs.get(carton_id, 0)
+
+
+def _tombstone_position(entry):
+    return entry.get('date', ''), entry.get('seq') or 0
+
+
+def load_tombstones(json_file):
+    """Map each deleted carton ID to the time it was deleted (see ``Tombstones``)."""
+    tombstones = Tombstones()
+    for entry in _read_json_list(get_log_file_path(json_file, 'tombstones')):
+        carton_id = entry.get('carton_id')
+        if carton_id and _tombstone_position(entry) > tombstones.position(carton_id):
+            tombstones[carton_id] = entry.get('date', '')
+            if entry.get('seq'):
+                tombstones.seqs[carton_id] = entry['seq']
+    return tombstones
+
+
+def is_tombstoned(entry, tombstones):
+    """True if the entry belongs to a carton deleted after it was logged."""
+    if not tombstones:
+        return False
+    deleted_at = tombstones.get(entry.get('carton_id'))
+    if deleted_at is None:
+        return False
+    # A later carton reusing the ID keeps its own entries
+    date = entry.get('date', '')
+    if date != deleted_at:
+        return date < deleted_at
+    # Logged in the same second: the commit sequence numbers decide, where both were recorded
+    deleted_seq = getattr(tombstones, 'seqs', {}).get(entry.get('carton_id'))
+    return entry.get('seq') is None or deleted_seq is None or entry['seq'] <= deleted_seq
+
+
+def read_company_log(json_file, log_type, start=None, end=None, product_ids=None, on_read=None, tombstones=None):
+    """Stream a company's 'purchase' or 'sales' log with deleted cartons hidden."""
+    if tombstones is None:
+        tombstones = load_tombstones(json_file)
+    return iter_log_entries(get_log_file_path(json_file, log_type), start, end, product_ids, on_read, tombstones)
+
+
+def record_tombstones(json_file, cartons, seq=None):
+    """Mark cartons as deleted in O(1), leaving their log history in place until compaction.
+
+    ``seq`` is the event sequence number of the commit that deleted them.
+    """
+    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    append_log_entries(get_log_file_path(json_file, 'tombstones'), [
+        {'date': now, 'carton_id': carton['carton_id'], 'product_id': carton['product_id'], 'type': 'tombstone',
+         **({'seq': seq} if seq else {})}
+        for carton in cartons
+    ])
+
+
+def tombstone_count(json_file):
+    """Number of tombstones waiting for compaction."""
+    return len(_read_json_list(get_log_file_path(json_file, 'tombstones')))
+
+
+def compact_logs(json_file):
+    """Purge tombstoned entries from the purchase and sales logs in one pass each.
+
+    Each log is locked only while it is rewritten. Tombstones recorded while
+    compaction runs are kept for the next pass. A rewritten sales log is
+    packed into compact sale records, older per-carton entries included, and
+    archive segments holding deleted cartons are rewritten too. Returns the
+    number of (per-carton) entries removed.
+    """
+    from database.log_archive import purge_archived
+    tombstone_file = get_log_file_path(json_file, 'tombstones')
+    tombstones = load_tombstones(json_file)
+    if not tombstones:
+        return 0
+    removed = 0
+    for log_type in ('purchase', 'sales'):
+        log_file = get_log_file_path(json_file, log_type)
+        with FileLock(log_file):
+            removed += purge_archived(log_file, log_type, tombstones)
+            if not os.path.exists(log_file):
+                continue
+            entries = [entry for record in _read_json_list(log_file) for entry in expand_log_record(record)]
+            kept = [entry for entry in entries if not is_tombstoned(entry, tombstones)]
+            if len(kept) != len(entries):
+                _write_json_atomic(log_file, pack_sales_entries(kept) if log_type == 'sales' else kept)
+                removed += len(entries) - len(kept)
+    with FileLock(tombstone_file):
+        pending = [entry for entry in _read_json_list(tombstone_file)
+                   if _tombstone_position(entry) > tombstones.position(entry.get('carton_id'))]
+        _write_json_atomic(tombstone_file, pending)
+    if removed:
+        from database.lineage import invalidate_lineage
+        invalidate_lineage(json_file)
+    return removed
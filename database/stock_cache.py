@@ -0,0 +1,118 @@
+"""
+Warm-start cache of loaded stock data and its derived index.
+
+The cache is keyed by the company file's path, size, modification time and
+content hash. Any mismatch, unreadable cache or version change falls back to
+a full reload and rebuild.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+
+from config.settings import DATA_DIR
+from database.event_store import EventStore
+from database.stock_data import (load_stock_data, migrate_money_to_paise, recover_stock_file, read_stock_data,
+                                 _LEGACY_MONEY_RE)
+
+CACHE_VERSION = 2
+
+
+def get_cache_file_path(filepath):
+    """Get the cache file path for a company stock file."""
+    abs_path = os.path.abspath(filepath)
+    name = os.path.splitext(os.path.basename(abs_path))[0]
+    path_hash = hashlib.sha1(abs_path.encode('utf-8')).hexdigest()[:10]
+    return os.path.join(DATA_DIR, f"{name}_{path_hash}.cache")
+
+
+def _stat_fingerprint(filepath):
+    st = os.stat(filepath)
+    return {'path': os.path.abspath(filepath), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def _read_cache(cache_file):
+    try:
+        with open(cache_file, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        return None
+
+
+def _write_cache(cache_file, payload):
+    tmp_file = f"{cache_file}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except Exception:
+        # The cache is only an accelerator; never fail a load because of it
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+
+
+def load_stock_data_cached(filepath, index_cls, read_only=False):
+    """Load stock data and its index, reusing the on-disk cache when still valid.
+
+    Returns a ``(stock_data, index)`` tuple where ``index`` is an instance of
+    ``index_cls`` built from ``stock_data``. A ``read_only`` load never
+    writes to the company's files (see ``read_stock_data``): a file still
+    needing recovery or migration is brought up to date in memory and is
+    not cached.
+    """
+    if not os.path.exists(filepath):
+        stock_data = [] if read_only else load_stock_data(filepath)
+        return stock_data, index_cls(stock_data)
+
+    if read_only:
+        if EventStore(filepath).needs_recovery():
+            stock_data = read_stock_data(filepath)
+            return stock_data, index_cls(stock_data)
+    else:
+        # A commit interrupted after its event append leaves the file behind
+        # the event log; bring it up to date before it is fingerprinted
+        recover_stock_file(filepath)
+        migrate_money_to_paise(filepath)
+    cache_file = get_cache_file_path(filepath)
+    fingerprint = _stat_fingerprint(filepath)
+    version = (CACHE_VERSION, index_cls.VERSION)
+
+    with open(filepath, 'rb') as f:
+        raw = f.read()
+
+    if read_only and _LEGACY_MONEY_RE.search(raw):
+        stock_data = read_stock_data(filepath)
+        return stock_data, index_cls(stock_data)
+
+    digest = hashlib.sha256(raw).hexdigest()
+    cached = _read_cache(cache_file)
+    if (isinstance(cached, dict)
+            and cached.get('version') == version
+            and cached.get('fingerprint', {}).get('path') == fingerprint['path']
+            and cached['fingerprint'].get('size') == fingerprint['size']
+            and cached['fingerprint'].get('mtime_ns') == fingerprint['mtime_ns']):
+        # Stat matches; the content hash confirms nothing changed underneath
+        if cached['fingerprint'].get('sha256') == digest:
+            try:
+                return cached['stock_data'], cached['index']
+            except KeyError:
+                pass
+
+    try:
+        stock_data = json.loads(raw) if raw.strip() else []
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        stock_data = []
+    index = index_cls(stock_data)
+
+    fingerprint['sha256'] = digest
+    _write_cache(cache_file, {
+        'version': version,
+        'fingerprint': fingerprint,
+        'stock_data': stock_data,
+        'index': index,
+    })
+    return stock_data, index
@@ -4,7 +4,113 @@ Stock data management and persistence layer.
 
 import json
 import os
-from tkinter import messagebox
+import re
+import textwrap
+from config.settings import LOG_READ_CHUNK_BYTES
+from utils.file_lock import FileLock
+from utils.file_utils import get_log_file_path, get_adjustments_file_path
+from utils.money import migrate_money_fields
+from database.event_store import EventStore, events_from_change
+
+# A rupee-valued money key, as written before amounts moved to integer paise
+_LEGACY_MONEY_RE = re.compile(rb'"(?:sales_price|purchase_price|mrp|sales_value|purchase_value)":')
+
+
+class StockConflictError(Exception):
+    """Raised when a carton changed on disk since it was read (optimistic concurrency)."""
+
+    def __init__(self, carton_id, disk_data):
+        super().__init__(f"Carton {carton_id} was changed by another terminal. Please try again.")
+        self.carton_id = carton_id
+        self.disk_data = disk_data
+
+
+def _read_json_list(filepath):
+    """Read a JSON array file, treating a missing or corrupt file as empty."""
+    try:
+        with open(filepath, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+
+def _write_json_atomic(filepath, data):
+    """Write JSON to a temporary file and move it into place."""
+    tmp_file = f"{filepath}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_file, filepath)
+
+
+def _recover_from_events(filepath, store):
+    """Bring the stock file up to the event log head after an interrupted commit.
+
+    Caller must hold the stock file lock.
+    """
+    if store.needs_recovery():
+        cartons, head = store.recover()
+        _write_json_atomic(filepath, cartons)
+        store.mark_head(head, cartons)
+
+
+def recover_stock_file(filepath):
+    """Replay any events the stock file is missing after an interrupted commit."""
+    store = EventStore(filepath)
+    if store.needs_recovery():
+        with FileLock(filepath):
+            _recover_from_events(filepath, store)
+
+
+def _has_legacy_money(filepath, head_only=False):
+    """True if a file still holds rupee amounts (logs are judged by their oldest entries)."""
+    try:
+        with open(filepath, 'rb') as f:
+            data = f.read(LOG_READ_CHUNK_BYTES) if head_only else f.read()
+    except OSError:
+        return False
+    return _LEGACY_MONEY_RE.search(data) is not None
+
+
+def migrate_money_to_paise(filepath):
+    """Convert a company's stock file and logs from rupee floats to integer paise.
+
+    A no-op once done. Logs are converted before the stock file so a
+    converted stock file means the whole company is. Returns True if
+    anything was rewritten.
+    """
+    migrated = False
+    for log_file in (get_log_file_path(filepath, 'purchase'), get_log_file_path(filepath, 'sales')):
+        if _has_legacy_money(log_file, head_only=True):
+            with FileLock(log_file):
+                entries = _read_json_list(log_file)
+                if any([migrate_money_fields(entry) for entry in entries if isinstance(entry, dict)]):
+                    _write_json_atomic(log_file, entries)
+                    migrated = True
+
+    adjustments_file = get_adjustments_file_path(filepath)
+    if _has_legacy_money(adjustments_file, head_only=True):
+        with FileLock(adjustments_file):
+            with open(adjustments_file, 'r', encoding='utf-8') as f:
+                records = [json.loads(line) for line in f if line.strip()]
+            if any([migrate_money_fields(record) for record in records]):
+                tmp_file = f"{adjustments_file}.tmp"
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    f.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records))
+                os.replace(tmp_file, adjustments_file)
+                migrated = True
+
+    if _has_legacy_money(filepath):
+        with FileLock(filepath):
+            cartons = _read_json_list(filepath)
+            if any([migrate_money_fields(carton) for carton in cartons]):
+                _write_json_atomic(filepath, cartons)
+                migrated = True
+
+    if migrated:
+        # Log entries moved, so their byte offsets must be indexed again
+        from database.lineage import invalidate_lineage
+        invalidate_lineage(filepath)
+    return migrated
 
 
 def load_stock_data(filepath):
@@ -13,6 +119,8 @@ def load_stock_data(filepath):
         with open(filepath, 'w') as f:
             json.dump([], f)
         return []
+    recover_stock_file(filepath)
+    migrate_money_to_paise(filepath)
     try:
         with open(filepath, 'r') as f:
             return json.load(f)
@@ -20,13 +128,91 @@ def load_stock_data(filepath):
         return []
 
 
-def save_stock_data(data, filepath):
-    """Saves stock data to a JSON file."""
-    try:
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=4)
-    except Exception as e:
-        messagebox.showerror("Save Error", f"Error saving data to {filepath}: {e}")
+def read_stock_data(filepath):
+    """Load stock data without writing to any of the company's files.
+
+    For reports over companies this session does not own: events left
+    unapplied by an interrupted commit are replayed, and rupee amounts
+    converted to paise, in memory only. The files themselves are repaired
+    when the company is next loaded with ``load_stock_data``.
+    """
+    store = EventStore(filepath)
+    if store.needs_recovery():
+        cartons, _ = store.current_state()
+    else:
+        cartons = _read_json_list(filepath)
+    for carton in cartons:
+        migrate_money_fields(carton)
+    return cartons
+
+
+def commit_stock_changes(filepath, stock_data, change):
+    """Merge a StockChange into the stock file with a compare-and-swap on carton versions.
+
+    Under the file lock the file is reread and only the cartons touched by
+    ``change`` are compared against the versions they had when read. On
+    success the merged file contents replace ``stock_data`` in place, picking
+    up any unrelated changes made by other terminals. On conflict nothing is
+    written and StockConflictError carries the current file contents.
+    """
+    with FileLock(filepath):
+        store = EventStore(filepath)
+        _recover_from_events(filepath, store)
+        disk_data = _read_json_list(filepath)
+        store.bootstrap(disk_data)
+        disk_by_id = {c['carton_id']: c for c in disk_data}
+
+        for carton_id, base_version in change.base_versions.items():
+            disk_carton = disk_by_id.get(carton_id)
+            if disk_carton is None or disk_carton.get('version', 0) != base_version:
+                raise StockConflictError(carton_id, disk_data)
+        for carton in change.added:
+            if carton['carton_id'] in disk_by_id:
+                raise StockConflictError(carton['carton_id'], disk_data)
+
+        deleted_ids = set(change.deleted_ids)
+        updated_by_id = {}
+        for carton in change.updated:
+            if carton['carton_id'] not in deleted_ids:
+                carton['version'] = change.base_versions[carton['carton_id']] + 1
+                updated_by_id[carton['carton_id']] = carton
+        for carton in change.added:
+            carton['version'] = 1
+
+        # Only cartons in the change come from memory; everything else is
+        # written back as it is on disk, so uncommitted in-memory edits are
+        # never saved. In-memory objects identical to disk are kept so derived
+        # indexes can be updated incrementally; anything that differs is noted
+        memory_by_id = {c['carton_id']: c for c in stock_data}
+        added_ids = {c['carton_id'] for c in change.added}
+        merged = []
+        for disk_carton in disk_data:
+            carton_id = disk_carton['carton_id']
+            if carton_id in deleted_ids:
+                continue
+            if carton_id in updated_by_id:
+                merged.append(updated_by_id[carton_id])
+                continue
+            memory_carton = memory_by_id.get(carton_id)
+            if memory_carton == disk_carton:
+                merged.append(memory_carton)
+            else:
+                merged.append(disk_carton)
+                change.external_changed.append(disk_carton)
+        change.external_deleted_ids = [carton_id for carton_id in memory_by_id
+                                       if carton_id not in disk_by_id and carton_id not in added_ids
+                                       and carton_id not in deleted_ids]
+        merged.extend(change.added)
+
+        # Record the change in the event log first, so a crash before the
+        # state write is repaired by replaying it
+        head = store.append(events_from_change(change, disk_by_id))
+        change.seq = head['seq']
+        _write_json_atomic(filepath, merged)
+        store.mark_head(head, merged)
+
+    stock_data[:] = merged
+    return merged
 
 
 def load_company_configs():
@@ -48,25 +234,97 @@ def save_company_configs(configs):
         with open(COMPANY_CONFIG_FILE, 'w') as f:
             json.dump(configs, f, indent=4)
     except Exception as e:
+        from tkinter import messagebox
         messagebox.showerror("Save Error", f"Error saving company configs: {e}")
 
 
-def load_log(log_file):
-    """Load log entries from a log file."""
-    if not os.path.exists(log_file):
-        with open(log_file, 'w') as f:
-            json.dump([], f)
-        return []
+def load_threshold_rules(json_file):
+    """Load a company's alert threshold rules (empty when none are set)."""
+    from utils.file_utils import get_thresholds_file_path
+    thresholds_file = get_thresholds_file_path(json_file)
+    if not os.path.exists(thresholds_file):
+        return {}
     try:
-        with open(log_file, 'r') as f:
+        with open(thresholds_file, 'r') as f:
             return json.load(f)
-    except json.JSONDecodeError:
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_threshold_rules(json_file, rules):
+    """Save a company's alert threshold rules."""
+    from utils.file_utils import get_thresholds_file_path
+    _write_json_atomic(get_thresholds_file_path(json_file), rules)
+
+
+def _find_array_tail(f):
+    """Locate where new elements go in a JSON array file.
+
+    Returns ``(insert_pos, is_empty)`` where ``insert_pos`` is just past the
+    last element (or the opening bracket), or None if the file does not end
+    in a JSON array.
+    """
+    f.seek(0, os.SEEK_END)
+    end = f.tell()
+    chunk_size = 256
+    tail = b''
+    pos = end
+    while pos > 0:
+        step = min(chunk_size, pos)
+        pos -= step
+        f.seek(pos)
+        tail = f.read(step) + tail
+        if len(tail.strip()) >= 2:
+            break
+    stripped = tail.rstrip()
+    if not stripped.endswith(b']'):
+        return None
+    before_bracket = stripped[:-1].rstrip()
+    if not before_bracket:
+        return None
+    insert_pos = pos + len(before_bracket)
+    return insert_pos, before_bracket.endswith(b'[')
+
+
+def append_log_entries(log_file, entries):
+    """Append entries to a log file in place, without rewriting existing history.
+
+    The file stays a valid, ``indent=4`` formatted JSON array. Writers on
+    other terminals are serialised by the file lock. Returns the
+    ``(offset, end)`` byte span of each appended entry, for indexing.
+    """
+    if not entries:
         return []
+    texts = [textwrap.indent(json.dumps(entry, indent=4), '    ') for entry in entries]
+    body = ',\n'.join(texts)
+    with FileLock(log_file):
+        if os.path.exists(log_file) and os.path.getsize(log_file) > 0:
+            with open(log_file, 'r+b') as f:
+                tail = _find_array_tail(f)
+                if tail is not None:
+                    insert_pos, is_empty = tail
+                    separator = '\n' if is_empty else ',\n'
+                    f.seek(insert_pos)
+                    f.write(f"{separator}{body}\n]".encode('utf-8'))
+                    f.truncate()
+                    spans = []
+                    line_start = insert_pos + len(separator)
+                    for text in texts:
+                        size = len(text.encode('utf-8'))
+                        spans.append((line_start + 4, line_start + size))  # Past the indent, to the closing brace
+                        line_start += size + 2
+                    return spans
+            # Not a well-formed array tail; fall back to a full rewrite
+            existing = _read_json_list(log_file)
+            existing.extend(entries)
+        else:
+            existing = list(entries)
+        _write_json_atomic(log_file, existing)
+        from database.log_store import iter_log_offsets
+        spans = [(offset, end) for offset, end, _ in iter_log_offsets(log_file)]
+        return spans[len(spans) - len(entries):]
 
 
 def append_log_entry(log_file, entry):
     """Append an entry to a log file."""
-    log = load_log(log_file)
-    log.append(entry)
-    with open(log_file, 'w') as f:
-        json.dump(log, f, indent=4)
\ No newline at end of file
+    append_log_entries(log_file, [entry])
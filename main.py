@@ -3,11 +3,25 @@ Main Stock Manager Application - Refactored Version
 This is the entry point for the refactored Stock Manager application.
 """
 
+import datetime
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
 from config.settings import WINDOW_GEOMETRY, APP_TITLE, ensure_data_directory
 from config.colors import FRAME_BG
-from database.stock_data import load_stock_data, load_company_configs, save_company_configs
+from database.stock_data import load_company_configs, save_company_configs, load_threshold_rules
+from database.stock_cache import load_stock_data_cached
+from database.lineage import CartonLineage
+from database.adjustments import AdjustmentLog
+from database.log_archive import archive_logs, logs_need_archiving
+from services.stock_index import StockIndex
+from services.session_cache import CompanySessionCache
+from services.cost_layers import CostLedger
+from services.demand import DemandTracker
+from services.global_search import GlobalProductSearch
+from services.thresholds import ThresholdRules, StockAlerts
+from services.event_bus import EventBus, InventoryEvent, STOCK_RELOADED, LOGS_CLEARED, CARTON_EXPIRED, DAY_CHANGED, events_for_change
 from ui.base import configure_styles
 from ui.dashboard import DashboardUI
 from ui.find_stock import FindStockUI
@@ -16,6 +30,10 @@ from ui.sell_stock import SellStockUI
 from ui.update_carton import UpdateCartonUI
 from ui.sales_summary import SalesSummaryUI
 from ui.transaction_log import TransactionLogUI
+from ui.locations import LocationsUI
+from ui.consolidated import ConsolidatedUI
+from ui.thresholds import ThresholdSettingsWindow
+from ui.reconciliation import ReconciliationWindow
 
 
 class StockManagerApp(tk.Tk):
@@ -35,6 +53,18 @@ class StockManagerApp(tk.Tk):
         self.selected_company = None
         self.selected_json_file = None
         self.stock_data = []
+        self.stock_index = StockIndex()
+        self.stock_alerts = StockAlerts(self.stock_index)
+        self.session_cache = CompanySessionCache()
+        self.global_search = GlobalProductSearch()
+        self.event_bus = EventBus(scheduler=self.after_idle)
+        self.cost_ledger = None  # Built from the logs on first use
+        self.demand_tracker = None  # Built from the sales log on a background thread
+        self.demand_generation = 0  # Bumped when an in-progress build would come out stale
+        self.demand_loading = False
+        self.carton_lineage = None
+        self.adjustment_log = None
+        self.event_bus.subscribe(lambda events: self.reset_log_analytics(), (LOGS_CLEARED,))
         
         # Setup menu
         self.menu_bar = tk.Menu(self)
@@ -62,6 +92,7 @@ class StockManagerApp(tk.Tk):
         
         # Create main interface
         self.create_main_interface()
+        self.schedule_day_rollover()
     
     def create_header(self):
         """Create application header."""
@@ -98,12 +129,25 @@ class StockManagerApp(tk.Tk):
         self.transaction_log_ui = TransactionLogUI(self.notebook, self)
         self.notebook.add(self.transaction_log_ui.frame, text="Transaction Log")
         
+        self.locations_ui = LocationsUI(self.notebook, self)
+        self.notebook.add(self.locations_ui.frame, text="Locations")
+        
+        self.consolidated_ui = ConsolidatedUI(self.notebook, self)
+        self.notebook.add(self.consolidated_ui.frame, text="All Companies")
+        
         # Bind tab change event
         self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_change)
         
         # Initialize data
         self.find_stock_ui.update_find_stock_suggestions()
         self.dashboard_ui.update_dashboard()
+        
+        # Keep tabs in sync with stock changes
+        self.dashboard_ui.subscribe(self.event_bus)
+        self.find_stock_ui.subscribe(self.event_bus)
+        self.sales_summary_ui.subscribe(self.event_bus)
+        self.transaction_log_ui.subscribe(self.event_bus)
+        self.locations_ui.subscribe(self.event_bus)
     
 
     
@@ -112,6 +156,12 @@ class StockManagerApp(tk.Tk):
         selected_tab_text = self.notebook.tab(self.notebook.select(), "text")
         if selected_tab_text == "Dashboard":
             self.dashboard_ui.update_dashboard()
+        elif selected_tab_text == "Sales Summary":
+            self.sales_summary_ui.on_show()
+        elif selected_tab_text == "Transaction Log":
+            self.transaction_log_ui.on_show()
+        elif selected_tab_text == "All Companies":
+            self.consolidated_ui.on_show()
     
     def prompt_for_company(self):
         """Prompt user to select a company."""
@@ -159,14 +209,196 @@ class StockManagerApp(tk.Tk):
     def load_selected_company_data(self):
         """Load data for the selected company."""
         if self.selected_json_file:
-            self.stock_data = load_stock_data(self.selected_json_file)
+            session = self.session_cache.get(
+                self.selected_json_file,
+                lambda json_file: load_stock_data_cached(json_file, StockIndex)
+            )
+            self.stock_data = session.stock_data
+            self.stock_index = session.stock_index
+            # A warm-started or long-cached index may still hold an older day
+            self.stock_index.expiry.advance(datetime.date.today())
+            self.stock_alerts = StockAlerts(self.stock_index, self.load_threshold_rules())
+            self.carton_lineage = None
+            self.adjustment_log = None
+            self.reset_log_analytics()
+            self.archive_logs_if_due()
+    
+    def archive_logs_if_due(self):
+        """Compress closed months of the selected company's logs on a background thread."""
+        json_file = self.selected_json_file
+        if not json_file or not logs_need_archiving(json_file):
+            return
+        
+        results = queue.Queue()
+        
+        def worker():
+            try:
+                archive_logs(json_file)
+                results.put(None)
+            except Exception as e:
+                results.put(e)
+        
+        def poll():
+            try:
+                error = results.get_nowait()
+            except queue.Empty:
+                self.after(100, poll)
+                return
+            if error is not None:
+                messagebox.showerror("Log Archive", f"Error archiving transaction logs: {error}")
+        
+        threading.Thread(target=worker, daemon=True).start()
+        self.after(100, poll)
+    
+    def load_threshold_rules(self):
+        """Alert threshold rules for the selected company, or the defaults if they cannot be read."""
+        try:
+            return ThresholdRules.from_dict(load_threshold_rules(self.selected_json_file))
+        except ValueError as e:
+            messagebox.showwarning("Alert Thresholds", f"Ignoring invalid threshold rules: {e}")
+            return ThresholdRules()
+    
+    def get_cost_ledger(self):
+        """Cost layers for the selected company, replaying its logs the first time."""
+        if self.cost_ledger is None:
+            self.cost_ledger = CostLedger.from_logs(self.selected_json_file, self.stock_data)
+        return self.cost_ledger
+    
+    def get_demand_tracker(self):
+        """Sales velocity for the selected company, or None while its sales log is first read."""
+        if self.demand_tracker is None and not self.demand_loading:
+            self.load_demand_tracker()
+        return self.demand_tracker
+    
+    def load_demand_tracker(self):
+        """Read the sales log on a background thread, then refresh the dashboard."""
+        json_file = self.selected_json_file
+        generation = self.demand_generation
+        results = queue.Queue()
+        
+        def worker():
+            try:
+                results.put(('done', DemandTracker.from_logs(json_file)))
+            except Exception as e:
+                results.put(('error', e))
+        
+        def poll():
+            try:
+                kind, payload = results.get_nowait()
+            except queue.Empty:
+                self.after(100, poll)
+                return
+            self.demand_loading = False
+            if generation != self.demand_generation:
+                # Company switched or sales committed meanwhile; read the log again
+                self.load_demand_tracker()
+                return
+            if kind == 'error':
+                messagebox.showerror("Error", f"Error reading sales history: {payload}")
+                return
+            payload.refresh_on_hand(self.stock_index)
+            self.demand_tracker = payload
+            self.dashboard_ui.update_dashboard()
+        
+        self.demand_loading = True
+        threading.Thread(target=worker, daemon=True).start()
+        self.after(100, poll)
+    
+    def get_carton_lineage(self):
+        """Carton lineage index for the selected company, brought up to date on each lookup."""
+        if self.carton_lineage is None:
+            self.carton_lineage = CartonLineage(self.selected_json_file)
+        return self.carton_lineage
+    
+    def get_adjustment_log(self):
+        """Indexed adjustments log for the selected company, caught up on each query."""
+        if self.adjustment_log is None:
+            self.adjustment_log = AdjustmentLog(self.selected_json_file)
+        return self.adjustment_log
+    
+    def reset_log_analytics(self):
+        """Drop state derived from the logs so it is rebuilt on next use."""
+        self.cost_ledger = None
+        self.demand_tracker = None
+        self.demand_generation += 1
+    
+    def on_stock_data_changed(self, change=None):
+        """Update derived state after a commit and notify the tabs.
+
+        With a StockChange only the touched cartons are re-indexed; without one
+        (or after a conflict reload) everything is rebuilt.
+        """
+        self.session_cache.mark_saved(self.selected_json_file)
+        if change is None or change.reloaded:
+            self.stock_index.rebuild(self.stock_data)
+            self.stock_alerts.rebuild()
+            self.reset_log_analytics()
+            self.event_bus.publish(InventoryEvent(STOCK_RELOADED))
+            return
+        touched_products = self.stock_index.apply_change(change)
+        self.stock_alerts.refresh(*touched_products)
+        if self.cost_ledger is not None:
+            self.cost_ledger.apply_change(change)
+        if self.demand_tracker is not None:
+            self.demand_tracker.apply_change(change, self.stock_index)
+        elif change.sales_log:
+            self.demand_generation += 1
+        self.event_bus.publish(*events_for_change(change))
+    
+    def schedule_day_rollover(self):
+        """Run ``on_day_changed`` just after the next midnight."""
+        now = datetime.datetime.now()
+        midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+        self.after(int((midnight - now).total_seconds() * 1000) + 1000, self.on_day_changed)
+    
+    def on_day_changed(self):
+        """Move the expiry boundary to the new day and notify the tabs.
+
+        Only the cartons whose expiry day was crossed are looked at; the rest
+        of the stock is not rescanned.
+        """
+        if self.demand_tracker is not None:
+            self.demand_tracker.advance(datetime.date.today())
+        events = [InventoryEvent(DAY_CHANGED)]
+        for carton_id in self.stock_index.expiry.advance(datetime.date.today()):
+            carton = self.stock_index.cartons_by_id.get(carton_id)
+            events.append(InventoryEvent(CARTON_EXPIRED, carton_id, carton and carton['product_id'], carton))
+        expired_products = {event.product_id for event in events[1:] if event.product_id}
+        self.stock_alerts.refresh(*expired_products)
+        if self.demand_tracker is not None:
+            # Expired units are no longer sellable, so cover drops for these products
+            self.demand_tracker.refresh_on_hand(self.stock_index, expired_products)
+        self.event_bus.publish(*events)
+        self.archive_logs_if_due()
+        self.schedule_day_rollover()
     
     def create_menu_bar(self):
         """Create the application menu bar."""
         company_menu = tk.Menu(self.menu_bar, tearoff=0)
         self.menu_bar.add_cascade(label="Company", menu=company_menu)
         company_menu.add_command(label="Switch Company", command=self.switch_company)
+        self.switch_to_menu = tk.Menu(company_menu, tearoff=0, postcommand=self.populate_switch_to_menu)
+        company_menu.add_cascade(label="Switch To", menu=self.switch_to_menu)
         company_menu.add_command(label="Add New Company", command=self.add_new_company_and_reload)
+        company_menu.add_separator()
+        company_menu.add_command(label="Alert Thresholds...", command=lambda: ThresholdSettingsWindow(self))
+        company_menu.add_command(label="Reconcile Stock...", command=lambda: ReconciliationWindow(self))
+    
+    def populate_switch_to_menu(self):
+        """List configured companies for one-click switching, recently used ones marked."""
+        self.switch_to_menu.delete(0, tk.END)
+        for company, json_file in self.company_configs.items():
+            label = f"{company} (loaded)" if json_file in self.session_cache else company
+            self.switch_to_menu.add_command(label=label, command=lambda c=company: self.switch_to_company(c))
+    
+    def switch_to_company(self, company):
+        """Switch directly to a configured company without prompting."""
+        if company not in self.company_configs or company == self.selected_company:
+            return
+        self.selected_company = company
+        self.selected_json_file = self.company_configs[company]
+        self.load_selected_company_data()
+        self.refresh_all_ui()
     
     def switch_company(self):
         """Switch to a different company."""
@@ -184,14 +416,11 @@ class StockManagerApp(tk.Tk):
     
     def refresh_all_ui(self):
         """Refresh all UI components."""
-        self.find_stock_ui.update_find_stock_suggestions()
-        self.dashboard_ui.update_dashboard()
+        self.event_bus.publish(InventoryEvent(STOCK_RELOADED))
         self.add_stock_ui.add_company_label.config(text=self.selected_company)
         
-        # Update company stock view if it exists
+        # Update company stock view tab title if it exists
         if hasattr(self, 'company_stock_view_ui'):
-            self.company_stock_view_ui.update_company_stock_view()
-            # Update tab title
             for i, tab in enumerate(self.notebook.tabs()):
                 if str(tab) == str(self.company_stock_view_ui.frame):
                     self.notebook.tab(i, text=f"{self.selected_company} Stock")
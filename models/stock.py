@@ -2,9 +2,9 @@
 Stock and carton data models.
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import date
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 @dataclass
@@ -18,9 +18,9 @@ class StockCarton:
     date_inwarded: str
     expiry_date: Optional[str]
     location: str
-    sales_price: float
-    purchase_price: float
-    mrp: float = 0
+    sales_price_paise: int
+    purchase_price_paise: int
+    mrp_paise: int = 0
     date_outwarded: Optional[str] = None
     
     def to_dict(self):
@@ -34,9 +34,9 @@ class StockCarton:
             'date_inwarded': self.date_inwarded,
             'expiry_date': self.expiry_date,
             'location': self.location,
-            'sales_price': self.sales_price,
-            'purchase_price': self.purchase_price,
-            'mrp': self.mrp,
+            'sales_price_paise': self.sales_price_paise,
+            'purchase_price_paise': self.purchase_price_paise,
+            'mrp_paise': self.mrp_paise,
             'date_outwarded': self.date_outwarded
         }
     
@@ -52,8 +52,41 @@ class StockCarton:
             date_inwarded=data['date_inwarded'],
             expiry_date=data.get('expiry_date'),
             location=data['location'],
-            sales_price=data['sales_price'],
-            purchase_price=data['purchase_price'],
-            mrp=data.get('mrp', 0),
+            sales_price_paise=data['sales_price_paise'],
+            purchase_price_paise=data['purchase_price_paise'],
+            mrp_paise=data.get('mrp_paise', 0),
             date_outwarded=data.get('date_outwarded')
-        )
\ No newline at end of file
+        )
+
+
+@dataclass
+class StockChange:
+    """A set of carton changes to commit to a company stock file in one step."""
+    added: List[dict] = field(default_factory=list)
+    updated: List[dict] = field(default_factory=list)
+    deleted_ids: List[str] = field(default_factory=list)
+    base_versions: Dict[str, int] = field(default_factory=dict)
+    purchase_log: List[dict] = field(default_factory=list)
+    sales_log: List[dict] = field(default_factory=list)  # Per carton; packed into one record per sale when logged
+    adjustment_log: List[dict] = field(default_factory=list)
+    summary: Dict = field(default_factory=dict)
+    # Filled in on commit: cartons other terminals changed since we last read
+    external_changed: List[dict] = field(default_factory=list)
+    external_deleted_ids: List[str] = field(default_factory=list)
+    seq: int = 0  # Event sequence number the commit ended at; orders its log entries against tombstones
+    reloaded: bool = False
+    # Contents of touched cartons before modification, to roll back a failed commit
+    originals: Dict[str, dict] = field(default_factory=dict)
+    
+    def touch(self, carton):
+        """Record a carton's version and contents before it is modified in memory."""
+        carton_id = carton['carton_id']
+        if carton_id not in self.base_versions:
+            self.base_versions[carton_id] = carton.get('version', 0)
+            self.originals[carton_id] = dict(carton)
+            self.updated.append(carton)
+    
+    def delete(self, carton):
+        """Record a carton for deletion."""
+        self.touch(carton)
+        self.deleted_ids.append(carton['carton_id'])
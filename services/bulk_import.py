@@ -0,0 +1,131 @@
+"""
+Bulk stock import from CSV files.
+
+The CSV has one row per carton (or per group of identical cartons):
+
+    product_id,product_name,location,date_inwarded,expiry_date,quantity_per_carton,damaged_units,sales_price,purchase_price,mrp,cartons
+
+expiry_date, damaged_units, mrp and cartons (default 1) may be left empty.
+Every row is validated before anything is written; the import then adds all
+cartons in a single commit with one batched purchase-log append.
+"""
+
+import csv
+from services.stock_manager import StockValidator
+from services.stock_operations import import_cartons, run_stock_transaction
+from utils.date_utils import parse_date
+from utils.money import to_paise
+
+REQUIRED_COLUMNS = ('product_id', 'product_name', 'location', 'date_inwarded',
+                    'quantity_per_carton', 'sales_price', 'purchase_price')
+
+
+class BulkImportError(Exception):
+    """Raised when an import file has invalid rows; ``errors`` lists (line, message)."""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} problem(s) found in import file")
+        self.errors = errors
+
+
+def read_import_csv(path):
+    """Read an import CSV into ``(line_number, row)`` pairs with stripped values."""
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        columns = [name.strip() for name in (reader.fieldnames or [])]
+        missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+        if missing:
+            raise BulkImportError([(1, f"Missing column(s): {', '.join(missing)}")])
+        rows = []
+        for row in reader:
+            values = {(key or '').strip(): (value or '').strip() for key, value in row.items()}
+            if any(values.values()):
+                rows.append((reader.line_num, values))
+        return rows
+
+
+def validate_import_rows(rows, stock_data):
+    """Check every row, returning ``(cartons, errors)``.
+
+    ``cartons`` has one normalised entry per carton to add (rows with a
+    ``cartons`` count are expanded). ``errors`` lists (line, message) for
+    every problem found, so a file can be fixed in one go.
+    """
+    known_names = {}
+    for carton in stock_data:
+        known_names.setdefault(carton['product_id'], carton['product_name'])
+
+    cartons = []
+    errors = []
+    for line, row in rows:
+        # Optional columns default like the Add Stock form does
+        row.setdefault('damaged_units', '')
+        row['damaged_units'] = row['damaged_units'] or '0'
+        row_errors = StockValidator.validate_add_stock_data(row, require_carton_id=False)
+        product_id = row.get('product_id', '').upper()
+        product_name = row.get('product_name', '')
+
+        date_inwarded = row.get('date_inwarded', '')
+        expiry_date = row.get('expiry_date', '')
+        if not parse_date(date_inwarded):
+            row_errors.append("Date inwarded must be YYYY-MM-DD")
+        if expiry_date and not parse_date(expiry_date):
+            row_errors.append("Expiry date must be YYYY-MM-DD")
+
+        try:
+            mrp = to_paise(row.get('mrp') or 0)
+            if mrp < 0:
+                row_errors.append("MRP cannot be negative")
+        except ValueError:
+            row_errors.append("MRP must be a valid number")
+        try:
+            count = int(row.get('cartons') or 1)
+            if count <= 0:
+                row_errors.append("Cartons must be a positive number")
+        except ValueError:
+            row_errors.append("Cartons must be a valid number")
+
+        if not row_errors:
+            quantity = int(row['quantity_per_carton'])
+            damaged = int(row['damaged_units'])
+            if damaged > quantity:
+                row_errors.append("Damaged units cannot exceed quantity")
+
+        existing_name = known_names.get(product_id)
+        if product_id and product_name and existing_name is not None and existing_name != product_name:
+            row_errors.append(f"Product ID {product_id} is already used for '{existing_name}'")
+
+        if row_errors:
+            errors.extend((line, message) for message in row_errors)
+            continue
+
+        known_names.setdefault(product_id, product_name)
+        carton = {
+            'product_id': product_id,
+            'product_name': product_name,
+            'location': row['location'].upper(),
+            'date_inwarded': date_inwarded,
+            'expiry_date': expiry_date or None,
+            'quantity': quantity,
+            'damaged': damaged,
+            'sales_price_paise': to_paise(row['sales_price']),
+            'purchase_price_paise': to_paise(row['purchase_price']),
+            'mrp_paise': mrp,
+        }
+        cartons.extend(dict(carton) for _ in range(count))
+    return cartons, errors
+
+
+def import_stock_csv(path, json_file, stock_data, company):
+    """Validate and import a CSV file into a company's stock.
+
+    Raises BulkImportError listing every bad row, without importing anything,
+    if any row is invalid. Returns the committed StockChange.
+    """
+    rows = read_import_csv(path)
+    cartons, errors = validate_import_rows(rows, stock_data)
+    if errors:
+        raise BulkImportError(errors)
+    if not cartons:
+        raise BulkImportError([(1, "No cartons to import")])
+    return run_stock_transaction(json_file, stock_data, lambda data: import_cartons(data, cartons, company))
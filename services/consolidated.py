@@ -0,0 +1,112 @@
+"""
+Consolidated reporting across every configured company.
+
+Each company is loaded and summarised in its own worker process, so the
+wall time grows with the number of companies per core rather than with
+the number of companies. Workers only import the data and service
+modules below (never Tk) and send back small, picklable aggregates which
+are merged in the calling process.
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from config.settings import CONSOLIDATED_MAX_WORKERS
+from database.stock_cache import load_stock_data_cached
+from database.stock_data import load_threshold_rules
+from database.log_store import load_tombstones, monthly_log_totals
+from services.stock_index import StockIndex
+from services.stock_manager import StockAnalyzer
+from services.thresholds import ThresholdRules, StockAlerts
+from utils.file_utils import get_log_file_path
+
+# Dashboard figures that add up across companies
+SUMMED_STATS = ('total_live', 'total_damaged_expired', 'total_cartons', 'total_stock_value',
+                'low_stock_count', 'expiry_alert_count')
+
+
+def company_report(company, json_file):
+    """Dashboard figures, monthly sales and stock valuation for one company.
+
+    Runs in a worker process; everything returned is plain data, with money
+    in integer paise so totals merge exactly.
+    """
+    started = time.perf_counter()
+    if not os.path.exists(json_file):
+        raise FileNotFoundError(f"Stock file not found: {json_file}")
+    # Other companies' files belong to their own sessions: read, never repair or migrate
+    stock_data, stock_index = load_stock_data_cached(json_file, StockIndex, read_only=True)
+    try:
+        rules = ThresholdRules.from_dict(load_threshold_rules(json_file))
+    except ValueError:
+        rules = ThresholdRules()
+    stats = StockAnalyzer(stock_data, stock_index, StockAlerts(stock_index, rules)).get_dashboard_stats()
+
+    monthly_sales = {}  # month -> [units, sales_value, purchase_value], values in paise
+    # Archived months come straight from their rollups
+    for (month, _, _), (_, units, sales_value, purchase_value) in monthly_log_totals(
+            get_log_file_path(json_file, 'sales'), load_tombstones(json_file)).items():
+        totals = monthly_sales.setdefault(month, [0, 0, 0])
+        totals[0] += units
+        totals[1] += sales_value
+        totals[2] += purchase_value
+
+    units, at_sales, at_mrp = stock_index.total_valuation
+    return {
+        'company': company,
+        'stats': {name: stats[name] for name in SUMMED_STATS},
+        'monthly_sales': monthly_sales,
+        'valuation': {'units': units, 'at_sales': at_sales, 'at_mrp': at_mrp},
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def merge_reports(reports):
+    """Combine per-company reports into cross-company totals."""
+    totals = {name: 0 for name in SUMMED_STATS}
+    valuation = {'units': 0, 'at_sales': 0, 'at_mrp': 0}
+    monthly_sales = {}
+    for report in reports:
+        for name in SUMMED_STATS:
+            totals[name] += report['stats'][name]
+        for name in valuation:
+            valuation[name] += report['valuation'][name]
+        for month, (units, sales_value, purchase_value) in report['monthly_sales'].items():
+            merged = monthly_sales.setdefault(month, [0, 0, 0])
+            merged[0] += units
+            merged[1] += sales_value
+            merged[2] += purchase_value
+    return {'stats': totals, 'valuation': valuation, 'monthly_sales': monthly_sales}
+
+
+def build_consolidated_report(company_configs, max_workers=CONSOLIDATED_MAX_WORKERS):
+    """Summarise every company in parallel and merge the results.
+
+    ``company_configs`` maps company name to stock file. Returns a dict with
+    the per-company ``companies`` reports (sorted by name), the merged
+    ``totals`` (see ``merge_reports``), ``errors`` as (company, message)
+    pairs for companies that could not be read, and the wall ``seconds``.
+    """
+    started = time.perf_counter()
+    reports = []
+    errors = []
+    if company_configs:
+        workers = min(len(company_configs), max_workers or os.cpu_count() or 1)
+        # Spawned workers start clean instead of inheriting the UI process
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = {pool.submit(company_report, company, json_file): company
+                       for company, json_file in company_configs.items()}
+            for future in as_completed(futures):
+                try:
+                    reports.append(future.result())
+                except Exception as e:
+                    errors.append((futures[future], str(e)))
+    reports.sort(key=lambda r: r['company'])
+    errors.sort()
+    return {
+        'companies': reports,
+        'totals': merge_reports(reports),
+        'errors': errors,
+        'seconds': time.perf_counter() - started,
+    }
@@ -0,0 +1,230 @@
+"""
+Cost layers for cost of goods sold and inventory valuation.
+
+Every purchase log entry (one carton) opens a cost layer for its product;
+sales consume layers oldest first (FIFO) or at the running average cost
+('average'). COGS is therefore independent of which carton the FEFO
+allocation happened to draw from. Running totals make inventory cost an
+O(1) lookup, and monthly per-product margins are accumulated as sales are
+recorded, so the margin report never rereads the logs. Costs are whole
+paise; average-cost sales take their share of the pool rounded to the
+nearest paisa, so the pool itself always stays exact.
+
+Quantity corrections made with Update Carton (the adjustments log) add
+units to or write units off the carton's layer at its purchase price;
+damaged units stay in the layers until the carton is corrected or sold.
+"""
+
+import heapq
+from collections import deque
+from config.settings import COST_METHOD
+from database.adjustments import AdjustmentLog
+from database.log_store import iter_log_entries, load_tombstones
+from utils.file_utils import get_log_file_path
+
+COST_METHODS = ('fifo', 'average')
+
+
+def _pool_share(pool_cost, pool_units, units):
+    """Cost of ``units`` taken from an average-cost pool, to the nearest paisa."""
+    return (2 * pool_cost * units + pool_units) // (2 * pool_units)
+
+
+class CostLedger:
+    """Per-product cost layers and monthly margins for one company."""
+
+    def __init__(self, method=COST_METHOD):
+        if method not in COST_METHODS:
+            raise ValueError(f"Unknown costing method: {method}")
+        self.method = method
+        self.layers = {}         # product_id -> deque of [carton_id, units, unit_cost] (FIFO)
+        self.carton_layers = {}  # carton_id -> its layer
+        self.on_hand = {}        # product_id -> [units, cost]
+        self.total_units = 0
+        self.total_cost = 0
+        self.margins = {}        # (month, product_id) -> {'product_name', 'units', 'revenue', 'cogs'}
+
+    # --- Updates -------------------------------------------------------
+
+    def _adjust(self, product_id, units, cost):
+        totals = self.on_hand.setdefault(product_id, [0, 0])
+        totals[0] += units
+        totals[1] += cost
+        self.total_units += units
+        self.total_cost += cost
+
+    def record_purchase(self, entry, prepend=False):
+        """Open a cost layer for a purchase log entry (``prepend`` makes it the oldest)."""
+        product_id = entry['product_id']
+        units = entry.get('quantity', 0)
+        unit_cost = entry.get('purchase_price_paise', 0)
+        if units <= 0:
+            return
+        if self.method == 'fifo':
+            layer = [entry.get('carton_id'), units, unit_cost]
+            queue = self.layers.setdefault(product_id, deque())
+            if prepend:
+                queue.appendleft(layer)
+            else:
+                queue.append(layer)
+            self.carton_layers[layer[0]] = layer
+        self._adjust(product_id, units, units * unit_cost)
+
+    def _consume(self, product_id, units, fallback_cost):
+        """Take units out of stock; returns their cost."""
+        totals = self.on_hand.get(product_id, [0, 0])
+        available = min(units, totals[0])
+        shortfall_cost = (units - available) * fallback_cost  # Sold stock that predates the logs
+        if available <= 0:
+            return shortfall_cost
+        if self.method == 'average':
+            cost = _pool_share(totals[1], totals[0], available)
+            self._adjust(product_id, -available, -cost)
+            return cost + shortfall_cost
+
+        queue = self.layers[product_id]
+        remaining = available
+        cost = 0
+        while remaining > 0:
+            layer = queue[0]
+            taken = min(remaining, layer[1])
+            layer[1] -= taken
+            cost += taken * layer[2]
+            remaining -= taken
+            if layer[1] == 0:
+                queue.popleft()
+                self.carton_layers.pop(layer[0], None)
+        self._adjust(product_id, -available, -cost)
+        return cost + shortfall_cost
+
+    def record_sale(self, entry):
+        """Cost a sales log entry and add it to the monthly margins; returns its COGS."""
+        product_id = entry['product_id']
+        units = entry.get('quantity', 0)
+        cogs = self._consume(product_id, units, entry.get('purchase_price_paise', 0))
+        row = self.margins.setdefault((entry.get('date', '')[:7], product_id), {
+            'product_name': entry.get('product_name', ''), 'units': 0, 'revenue': 0, 'cogs': 0})
+        row['units'] += units
+        row['revenue'] += entry.get('sales_value_paise', 0)
+        row['cogs'] += cogs
+        return cogs
+
+    def record_adjustment(self, record):
+        """Apply a quantity correction from the adjustments log to the carton's layer."""
+        product_id = record['product_id']
+        units = record['new_quantity'] - record['old_quantity']
+        unit_cost = record.get('purchase_price_paise', 0)
+        layer = self.carton_layers.get(record['carton_id']) if self.method == 'fifo' else None
+        if units > 0:
+            if layer is not None:
+                layer[1] += units
+                self._adjust(product_id, units, units * layer[2])
+            else:
+                self.record_purchase({'product_id': product_id, 'carton_id': record['carton_id'],
+                                      'quantity': units, 'purchase_price_paise': unit_cost})
+            return
+        units = -units
+        if layer is not None and layer[1] > 0:
+            # Written off the carton's own layer first, then oldest first
+            taken = min(units, layer[1])
+            layer[1] -= taken
+            self._adjust(product_id, -taken, -taken * layer[2])
+            units -= taken
+            queue = self.layers[product_id]
+            while queue and queue[0][1] == 0:
+                self.carton_layers.pop(queue.popleft()[0], None)
+        if units > 0:
+            self._consume(product_id, units, unit_cost)
+
+    def remove_carton(self, carton):
+        """Write off what is left of a deleted carton."""
+        layer = self.carton_layers.pop(carton['carton_id'], None)
+        if self.method == 'fifo':
+            if layer is not None and layer[1] > 0:
+                self._adjust(carton['product_id'], -layer[1], -layer[1] * layer[2])
+                layer[1] = 0  # Skipped and dropped when the queue reaches it
+                queue = self.layers[carton['product_id']]
+                while queue and queue[0][1] == 0:
+                    queue.popleft()
+            return
+        units = min(carton.get('quantity_per_carton', 0), self.on_hand.get(carton['product_id'], [0, 0])[0])
+        if units > 0:
+            totals = self.on_hand[carton['product_id']]
+            self._adjust(carton['product_id'], -units, -_pool_share(totals[1], totals[0], units))
+
+    def apply_change(self, change):
+        """Fold a committed StockChange into the layers."""
+        for entry in change.purchase_log:
+            self.record_purchase(entry)
+        for entry in change.sales_log:
+            self.record_sale(entry)
+        for record in change.adjustment_log:
+            self.record_adjustment(record)
+        deleted_ids = set(change.deleted_ids)
+        for carton in change.updated:
+            if carton['carton_id'] in deleted_ids:
+                self.remove_carton(carton)
+
+    # --- Queries -------------------------------------------------------
+
+    def inventory_cost(self, product_id=None):
+        """Cost of stock on hand, for one product or the whole company."""
+        if product_id is None:
+            return self.total_cost
+        return self.on_hand.get(product_id, [0, 0])[1]
+
+    def margin_report(self, month=None):
+        """Rows of units, revenue, COGS and margin per month and product, newest month first."""
+        rows = []
+        for (row_month, product_id), data in self.margins.items():
+            if month and row_month != month:
+                continue
+            profit = data['revenue'] - data['cogs']
+            rows.append({
+                'month': row_month,
+                'product_id': product_id,
+                'product_name': data['product_name'],
+                'units': data['units'],
+                'revenue': data['revenue'],
+                'cogs': data['cogs'],
+                'profit': profit,
+                'margin': profit / data['revenue'] * 100 if data['revenue'] else 0,
+            })
+        rows.sort(key=lambda r: (r['month'], r['product_id']))
+        rows.sort(key=lambda r: r['month'], reverse=True)
+        return rows
+
+    # --- Construction --------------------------------------------------
+
+    @classmethod
+    def from_logs(cls, json_file, stock_data=(), method=COST_METHOD):
+        """Build the ledger by replaying a company's purchase, sales and adjustments logs in date order.
+
+        Active cartons with no purchase entry (stock entered before logging
+        began) become the oldest layers, at their own purchase price; their
+        adjustments are already in that price and are not replayed.
+        """
+        ledger = cls(method)
+        tombstones = load_tombstones(json_file)
+        purchases = ((e.get('date', ''), 0, e) for e in
+                     iter_log_entries(get_log_file_path(json_file, 'purchase'), tombstones=tombstones))
+        sales = ((e.get('date', ''), 1, e) for e in
+                 iter_log_entries(get_log_file_path(json_file, 'sales'), tombstones=tombstones))
+        adjustments = ((r.get('ts', ''), 2, r) for r in AdjustmentLog(json_file).between())
+        purchased = set()
+        for _, kind, entry in heapq.merge(purchases, sales, adjustments, key=lambda x: x[:2]):
+            if kind == 1:
+                ledger.record_sale(entry)
+            elif kind == 2:
+                # Deleted cartons and those predating the logs have no layer to correct
+                if entry.get('carton_id') in purchased:
+                    ledger.record_adjustment(entry)
+            else:
+                purchased.add(entry.get('carton_id'))
+                ledger.record_purchase(entry)
+        for carton in stock_data:
+            if carton['date_outwarded'] is None and carton['carton_id'] not in purchased:
+                ledger.record_purchase({'product_id': carton['product_id'], 'carton_id': carton['carton_id'],
+                                        'quantity': carton['quantity_per_carton'],
+                                        'purchase_price_paise': carton.get('purchase_price_paise', 0)}, prepend=True)
+        return ledger
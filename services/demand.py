@@ -0,0 +1,159 @@
+"""
+Sales velocity and reorder points from the sales log.
+
+Units sold are kept per product in a ring buffer of daily buckets covering
+the last ``DEMAND_HISTORY_DAYS`` days, with running 7/30/90-day sums that
+are adjusted as sales arrive and as days roll out of each window. Days of
+cover and reorder points follow from those sums and the sellable units on
+hand (unexpired, undamaged, as for low-stock alerts), and
+the set of products at or below their reorder point is kept up to date as
+products change, so reading it never rescans stock or logs.
+"""
+
+import datetime
+import heapq
+from config.settings import DEMAND_HISTORY_DAYS, VELOCITY_WINDOWS, REORDER_LEAD_TIME_DAYS, REORDER_SAFETY_DAYS
+from database.log_store import iter_log_entries, load_tombstones
+from utils.file_utils import get_log_file_path
+
+
+class DemandTracker:
+    """Rolling per-product sales velocity, days of cover and reorder status."""
+
+    def __init__(self, today=None):
+        self.today = today or datetime.date.today()
+        self.buckets = {}       # product_id -> units sold per day, indexed by ordinal % DEMAND_HISTORY_DAYS
+        self.window_sums = {}   # product_id -> units sold in each of VELOCITY_WINDOWS
+        self.on_hand = {}       # product_id -> units in stock
+        self.product_names = {}
+        self.reorder = {}       # product_id -> reorder row, for products at or below their reorder point
+
+    # --- Updates -------------------------------------------------------
+
+    def record_sale(self, entry):
+        """Add a sales log entry to its day's bucket."""
+        day = datetime.date.fromisoformat(entry.get('date', '')[:10])
+        if day > self.today:
+            self.advance(day)
+        age = (self.today - day).days
+        if age >= DEMAND_HISTORY_DAYS:
+            return
+        product_id = entry['product_id']
+        units = entry.get('quantity', 0)
+        buckets = self.buckets.get(product_id)
+        if buckets is None:
+            buckets = self.buckets[product_id] = [0] * DEMAND_HISTORY_DAYS
+            self.window_sums[product_id] = [0] * len(VELOCITY_WINDOWS)
+        buckets[day.toordinal() % DEMAND_HISTORY_DAYS] += units
+        sums = self.window_sums[product_id]
+        for i, window in enumerate(VELOCITY_WINDOWS):
+            if age < window:
+                sums[i] += units
+        self.product_names.setdefault(product_id, entry.get('product_name', ''))
+
+    def advance(self, today=None):
+        """Roll every window forward to ``today``, dropping the days that fall out."""
+        today = today or datetime.date.today()
+        days = (today - self.today).days
+        if days <= 0:
+            return
+        if days >= DEMAND_HISTORY_DAYS:
+            for product_id in self.buckets:
+                self.buckets[product_id] = [0] * DEMAND_HISTORY_DAYS
+                self.window_sums[product_id] = [0] * len(VELOCITY_WINDOWS)
+        else:
+            start = self.today.toordinal()
+            for product_id, buckets in self.buckets.items():
+                sums = self.window_sums[product_id]
+                for day in range(start + 1, start + days + 1):
+                    for i, window in enumerate(VELOCITY_WINDOWS):
+                        sums[i] -= buckets[(day - window) % DEMAND_HISTORY_DAYS]
+                    # The bucket that fell out of the history becomes the new day
+                    buckets[day % DEMAND_HISTORY_DAYS] = 0
+        self.today = today
+        for product_id in list(self.on_hand):
+            self._evaluate(product_id)
+
+    def set_on_hand(self, product_id, units, product_name=None):
+        """Record the units in stock for a product and re-check its reorder status."""
+        self.on_hand[product_id] = units
+        if product_name and not self.product_names.get(product_id):
+            self.product_names[product_id] = product_name
+        self._evaluate(product_id)
+
+    def refresh_on_hand(self, stock_index, product_ids=None):
+        """Take sellable units on hand from the StockIndex (every known product if None)."""
+        if product_ids is None:
+            # Products that sold out still need checking, with nothing on hand
+            product_ids = set(stock_index.cartons_by_product) | set(self.buckets) | set(self.on_hand)
+        for product_id in product_ids:
+            self.set_on_hand(product_id, stock_index.sellable_units(product_id),
+                             stock_index.product_names.get(product_id))
+
+    def apply_change(self, change, stock_index):
+        """Fold a committed StockChange in, taking units on hand from the StockIndex."""
+        touched = set()
+        for entry in change.sales_log:
+            self.record_sale(entry)
+            touched.add(entry['product_id'])
+        for carton in change.added + change.updated + change.external_changed:
+            touched.add(carton['product_id'])
+        self.refresh_on_hand(stock_index, touched)
+
+    # --- Queries -------------------------------------------------------
+
+    def velocity(self, product_id, window=30):
+        """Average units sold per day over the last ``window`` days."""
+        sums = self.window_sums.get(product_id)
+        return sums[VELOCITY_WINDOWS.index(window)] / window if sums else 0
+
+    def product_demand(self, product_id):
+        """Velocities, days of cover and reorder point for one product."""
+        velocities = {window: self.velocity(product_id, window) for window in VELOCITY_WINDOWS}
+        # React to a recent spike without letting one quiet week hide demand
+        daily_demand = max(velocities[7], velocities[30])
+        on_hand = self.on_hand.get(product_id, 0)
+        return {
+            'product_id': product_id,
+            'product_name': self.product_names.get(product_id, ''),
+            'on_hand': on_hand,
+            'velocity_7': velocities[7],
+            'velocity_30': velocities[30],
+            'velocity_90': velocities[90],
+            'days_of_cover': on_hand / daily_demand if daily_demand else None,
+            'reorder_point': daily_demand * (REORDER_LEAD_TIME_DAYS + REORDER_SAFETY_DAYS),
+        }
+
+    def _evaluate(self, product_id):
+        demand = self.product_demand(product_id)
+        if demand['reorder_point'] > 0 and demand['on_hand'] <= demand['reorder_point']:
+            self.reorder[product_id] = demand
+        else:
+            self.reorder.pop(product_id, None)
+
+    def reorder_list(self, limit=None):
+        """Products at or below their reorder point, fewest days of cover first."""
+        key = lambda d: (d['days_of_cover'], d['product_id'])
+        if limit is None:
+            return sorted(self.reorder.values(), key=key)
+        return heapq.nsmallest(limit, self.reorder.values(), key=key)
+
+    # --- Construction --------------------------------------------------
+
+    @classmethod
+    def from_logs(cls, json_file, today=None):
+        """Build the tracker's sales history in one pass over a company's sales log.
+
+        Only the sales log is read, so this is safe to run off the UI thread;
+        call ``refresh_on_hand`` afterwards to fill in the stock on hand.
+        """
+        tracker = cls(today)
+        start = (tracker.today - datetime.timedelta(days=DEMAND_HISTORY_DAYS - 1)).isoformat()
+        for entry in iter_log_entries(get_log_file_path(json_file, 'sales'), start=start,
+                                      tombstones=load_tombstones(json_file)):
+            try:
+                tracker.record_sale(entry)
+            except (KeyError, ValueError):
+                continue
+        tracker.advance(datetime.date.today())
+        return tracker
@@ -0,0 +1,115 @@
+"""
+Inventory change events and a publish/subscribe bus with coalesced delivery.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Event types
+CARTON_ADDED = 'carton_added'
+CARTON_UPDATED = 'carton_updated'
+CARTON_SOLD = 'carton_sold'
+CARTON_DELETED = 'carton_deleted'
+LOGS_CLEARED = 'logs_cleared'
+STOCK_RELOADED = 'stock_reloaded'  # Whole data set replaced (company switch, conflict reload)
+CARTON_EXPIRED = 'carton_expired'  # Crossed its expiry date at the day rollover
+DAY_CHANGED = 'day_changed'  # Midnight passed; date-relative windows have moved
+THRESHOLDS_CHANGED = 'thresholds_changed'  # Alert threshold rules edited
+
+# Everything that changes the cartons or their status (as opposed to only the logs)
+STOCK_EVENTS = (CARTON_ADDED, CARTON_UPDATED, CARTON_SOLD, CARTON_DELETED, STOCK_RELOADED,
+                CARTON_EXPIRED, DAY_CHANGED)
+
+
+@dataclass
+class InventoryEvent:
+    """A single change to the inventory or its logs."""
+    type: str
+    carton_id: Optional[str] = None
+    product_id: Optional[str] = None
+    carton: Optional[dict] = None
+    log_entry: Optional[dict] = None
+
+
+def events_for_change(change):
+    """Translate a committed StockChange into inventory events."""
+    if change.reloaded:
+        return [InventoryEvent(STOCK_RELOADED)]
+
+    events = []
+    purchases = {entry['carton_id']: entry for entry in change.purchase_log}
+    for carton in change.added:
+        events.append(InventoryEvent(CARTON_ADDED, carton['carton_id'], carton['product_id'], carton,
+                                     purchases.get(carton['carton_id'])))
+
+    sales = {}
+    for entry in change.sales_log:
+        sales.setdefault(entry['carton_id'], []).append(entry)
+    deleted_ids = set(change.deleted_ids)
+    for carton in change.updated:
+        carton_id = carton['carton_id']
+        if carton_id in deleted_ids:
+            events.append(InventoryEvent(CARTON_DELETED, carton_id, carton['product_id'], carton))
+        elif carton_id in sales:
+            for entry in sales[carton_id]:
+                events.append(InventoryEvent(CARTON_SOLD, carton_id, carton['product_id'], carton, entry))
+        else:
+            events.append(InventoryEvent(CARTON_UPDATED, carton_id, carton['product_id'], carton))
+
+    # Changes picked up from other terminals while committing
+    for carton in change.external_changed:
+        events.append(InventoryEvent(CARTON_UPDATED, carton['carton_id'], carton['product_id'], carton))
+    for carton_id in change.external_deleted_ids:
+        events.append(InventoryEvent(CARTON_DELETED, carton_id))
+    return events
+
+
+class EventBus:
+    """Publish/subscribe bus that delivers events to subscribers in batches.
+
+    Published events are queued and a single flush is scheduled through
+    ``scheduler`` (e.g. Tk's ``after_idle``), so a burst of changes reaches
+    each subscriber as one list. Without a scheduler events are delivered
+    immediately.
+    """
+
+    def __init__(self, scheduler=None):
+        self.scheduler = scheduler
+        self._subscribers = []
+        self._pending = []
+        self._flush_scheduled = False
+
+    def subscribe(self, callback, event_types=None):
+        """Call ``callback(events)`` with batches of events of the given types (all types if None)."""
+        self._subscribers.append((callback, set(event_types) if event_types else None))
+
+    def unsubscribe(self, callback):
+        """Stop delivering events to ``callback``."""
+        self._subscribers = [(cb, types) for cb, types in self._subscribers if cb != callback]
+
+    def publish(self, *events):
+        """Queue events for delivery."""
+        self._pending.extend(events)
+        if self.scheduler is None:
+            self.flush()
+        elif not self._flush_scheduled and self._pending:
+            self._flush_scheduled = True
+            self.scheduler(self.flush)
+
+    def flush(self):
+        """Deliver all queued events now."""
+        self._flush_scheduled = False
+        events, self._pending = self._pending, []
+        if not events:
+            return
+        for callback, event_types in list(self._subscribers):
+            matching = events if event_types is None else [e for e in events if e.type in event_types]
+            if matching:
+                try:
+                    callback(matching)
+                except Exception:
+                    # One failing subscriber must not stop delivery to the rest
+                    logger.exception("Error delivering inventory events to %r", callback)
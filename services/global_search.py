@@ -0,0 +1,165 @@
+"""
+Product search across every configured company.
+
+Each company gets a small lookup table of its products (lower-cased IDs and
+names with live stock totals), built from its cached stock index and kept
+between searches until the company file changes. A search matches every
+company's table concurrently on a thread pool and waits at most a fixed
+timeout; companies still loading are reported rather than holding up the
+answer, and carry on warming their table for the next search.
+"""
+
+import datetime
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from config.settings import GLOBAL_SEARCH_WORKERS, GLOBAL_SEARCH_TIMEOUT_SECONDS, GLOBAL_SEARCH_LIMIT
+from database.stock_cache import load_stock_data_cached
+from services.stock_index import StockIndex
+
+# Match quality, best first
+EXACT_ID, ID_PREFIX, NAME_PREFIX, CONTAINS = range(4)
+
+
+def _file_stamp(filepath):
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+class CompanyProducts:
+    """Searchable product table for one company."""
+
+    def __init__(self, stock_index, today=None):
+        today = today or datetime.date.today()
+        self.products = []  # (id_lower, name_lower, product_id, product_name, live_units, live_cartons, locations)
+        for product_id, cartons in stock_index.cartons_by_product.items():
+            live_units = live_cartons = 0
+            locations = set()
+            for c in cartons:
+                if c['date_outwarded'] is None and not stock_index.expiry.is_expired(c['carton_id'], today):
+                    live_units += c['quantity_per_carton'] - c['damaged_units']
+                    live_cartons += 1
+                    locations.add(c['location'])
+            product_name = stock_index.product_names.get(product_id, '')
+            self.products.append((product_id.lower(), product_name.lower(), product_id, product_name,
+                                  live_units, live_cartons, tuple(sorted(locations))))
+
+    def search(self, query):
+        """Yield ``(match, product row)`` for products matching a lower-cased query."""
+        for row in self.products:
+            id_lower, name_lower = row[0], row[1]
+            if id_lower == query:
+                yield EXACT_ID, row
+            elif id_lower.startswith(query):
+                yield ID_PREFIX, row
+            elif name_lower.startswith(query):
+                yield NAME_PREFIX, row
+            elif query in id_lower or query in name_lower:
+                yield CONTAINS, row
+
+
+class GlobalProductSearch:
+    """Concurrent product search over many companies with cached lookup tables."""
+
+    def __init__(self, max_workers=GLOBAL_SEARCH_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='global-search')
+        self._tables = {}  # abs path -> (file stamp, CompanyProducts)
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _table(self, json_file):
+        """The product table for a company file, rebuilt only when the file changed."""
+        key = os.path.abspath(json_file)
+        with self._lock:
+            company_lock = self._locks.setdefault(key, threading.Lock())
+        with company_lock:
+            stamp = _file_stamp(json_file)
+            if stamp is None:
+                raise FileNotFoundError(f"Stock file not found: {json_file}")
+            cached = self._tables.get(key)
+            if cached is not None and cached[0] == stamp:
+                return cached[1]
+            # Searching must not recover or migrate files other sessions own
+            _, stock_index = load_stock_data_cached(json_file, StockIndex, read_only=True)
+            table = CompanyProducts(stock_index)
+            self._tables[key] = (stamp, table)
+            return table
+
+    def _search_company(self, company, json_file, query, table=None):
+        table = table or self._table(json_file)
+        return [(match, company, row) for match, row in table.search(query)]
+
+    def warm(self, company_configs):
+        """Start building tables for every company in the background."""
+        for json_file in company_configs.values():
+            self._executor.submit(self._table, json_file)
+
+    def search(self, query, company_configs, live_indexes=None, limit=GLOBAL_SEARCH_LIMIT,
+               timeout=GLOBAL_SEARCH_TIMEOUT_SECONDS):
+        """Search every company for a product ID or name.
+
+        ``company_configs`` maps company name to stock file; ``live_indexes``
+        optionally maps a stock file to an up-to-date StockIndex already in
+        memory (e.g. the selected company), which is used instead of the
+        file. Returns ``(hits, timed_out, errors)``: hits are dicts with
+        company, product_id, product_name, live_units, live_cartons and
+        locations, best match first (then most stock); ``timed_out`` lists
+        companies that did not answer within ``timeout`` seconds and
+        ``errors`` (company, message) pairs.
+        """
+        query = query.strip().lower()
+        if not query:
+            return [], [], []
+        # Tables for in-memory indexes are taken here, on the thread that owns them
+        live_tables = {json_file: CompanyProducts(stock_index) for json_file, stock_index in (live_indexes or {}).items()}
+        futures = {
+            self._executor.submit(self._search_company, company, json_file, query, live_tables.get(json_file)): company
+            for company, json_file in company_configs.items()
+        }
+        done, pending = wait(futures, timeout=timeout)
+
+        matches = []
+        errors = []
+        for future in done:
+            try:
+                matches.extend(future.result())
+            except Exception as e:
+                errors.append((futures[future], str(e)))
+        matches.sort(key=lambda m: (m[0], -m[2][4], m[1], m[2][2]))
+        hits = [{
+            'company': company,
+            'product_id': row[2],
+            'product_name': row[3],
+            'live_units': row[4],
+            'live_cartons': row[5],
+            'locations': list(row[6]),
+        } for _, company, row in matches[:limit]]
+        return hits, sorted(futures[future] for future in pending), sorted(errors)
+
+    def invalidate(self, json_file=None):
+        """Forget one company's table, or all of them."""
+        with self._lock:
+            if json_file is None:
+                self._tables.clear()
+            else:
+                self._tables.pop(os.path.abspath(json_file), None)
+
+
+def format_search_hits(query, hits, timed_out=(), errors=()):
+    """Render global search results as text for the Find Stock tab."""
+    if not hits:
+        lines = [f"No stock matching '{query}' in any company."]
+    else:
+        lines = [f"Results for '{query}' across all companies:\n"]
+        for hit in hits:
+            locations = ', '.join(hit['locations']) or 'none'
+            lines.append(f"  [{hit['company']}] {hit['product_id']} - {hit['product_name']}: "
+                         f"{hit['live_units']} live units in {hit['live_cartons']} carton(s). Locations: {locations}")
+    if timed_out:
+        lines.append(f"\nStill loading (search again shortly): {', '.join(timed_out)}")
+    for company, error in errors:
+        lines.append(f"\nCould not search {company}: {error}")
+    return "\n".join(lines)
@@ -0,0 +1,61 @@
+"""
+Location-scoped stock queries backed by the StockIndex location tree.
+"""
+
+from services.stock_index import parse_location
+
+LOCATION_LEVELS = ('Warehouse', 'Section', 'Level', 'Position')
+
+
+def level_name(depth):
+    """Name of the hierarchy level at ``depth`` (1 = warehouse)."""
+    if depth == 0:
+        return 'All'
+    return LOCATION_LEVELS[depth - 1] if depth <= len(LOCATION_LEVELS) else f"Level {depth}"
+
+
+def normalise_location(location):
+    """Canonical 'W1-S01' form of a location or prefix ('' for everything)."""
+    return '-'.join(parse_location(location)) if location and location.strip() else ''
+
+
+def _summary(location, node):
+    depth = len(location.split('-')) if location else 0
+    return {
+        'location': location,
+        'level': level_name(depth),
+        'cartons': node.cartons,
+        'units': node.units,
+        'damaged_units': node.damaged,
+        'stock_value': node.value,
+        'positions': node.positions,
+        'occupied_positions': node.occupied,
+        'occupancy': node.occupied / node.positions * 100 if node.positions else 0,
+    }
+
+
+def location_summary(stock_index, prefix=''):
+    """Rollup of active stock under a location prefix, or None if nothing is stored there."""
+    location = normalise_location(prefix)
+    node = stock_index.locations.node(location)
+    return _summary(location, node) if node is not None else None
+
+
+def child_locations(stock_index, prefix=''):
+    """Rollups for the locations one level below a prefix, in name order."""
+    location = normalise_location(prefix)
+    node = stock_index.locations.node(location)
+    if node is None:
+        return []
+    return [_summary(f"{location}-{segment}" if location else segment, child)
+            for segment, child in sorted(node.children.items())]
+
+
+def cartons_at_location(stock_index, prefix, include_outwarded=False):
+    """Cartons stored under a location prefix, ordered by location then carton ID."""
+    cartons = [stock_index.cartons_by_id[carton_id]
+               for carton_id in stock_index.locations.carton_ids_under(normalise_location(prefix))]
+    if not include_outwarded:
+        cartons = [c for c in cartons if c['date_outwarded'] is None]
+    cartons.sort(key=lambda c: (c['location'], c['carton_id']))
+    return cartons
@@ -0,0 +1,94 @@
+"""
+Streaming CSV export of the purchase and sales logs.
+"""
+
+import csv
+import heapq
+import os
+from config.settings import CSV_EXPORT_CHUNK_ROWS
+from database.log_store import iter_log_entries, load_tombstones, log_read_size
+from utils.file_utils import get_log_file_path
+from utils.money import format_rupees
+
+EXPORT_COLUMNS = ["date", "type", "product_id", "product_name", "carton_id", "quantity",
+                  "purchase_price", "sales_price", "mrp", "purchase_value", "sales_value", "profit_loss"]
+
+
+class ExportCancelled(Exception):
+    """Raised when an export is cancelled before it finishes."""
+
+
+def _csv_row(entry, is_sale):
+    purchase_value = entry.get('purchase_value_paise', 0)
+    sales_value = entry.get('sales_value_paise', 0)
+    return [
+        entry.get('date', ''),
+        'sale' if is_sale else 'purchase',
+        entry.get('product_id', ''),
+        entry.get('product_name', ''),
+        entry.get('carton_id', ''),
+        entry.get('quantity', 0),
+        format_rupees(entry.get('purchase_price_paise', 0), grouping=False),
+        format_rupees(entry.get('sales_price_paise', 0), grouping=False),
+        format_rupees(entry.get('mrp_paise', 0), grouping=False),
+        format_rupees(purchase_value, grouping=False),
+        format_rupees(sales_value, grouping=False),
+        format_rupees(sales_value - purchase_value, grouping=False) if is_sale else '',
+    ]
+
+
+def export_transactions_csv(json_file, out_path, start=None, end=None, product_ids=None,
+                            progress=None, cancel_event=None, chunk_rows=CSV_EXPORT_CHUNK_ROWS):
+    """Stream the merged purchase and sales logs of a company to a CSV file.
+
+    Rows come out in date order (each log is appended chronologically, so the
+    two streams are merged rather than sorted) with plain numbers, money as
+    exact rupee amounts. Rows are written ``chunk_rows`` at a time; after each
+    chunk ``progress(rows, bytes_read, total_bytes)`` is called and
+    ``cancel_event`` is checked. On cancel the partial file is removed and
+    ExportCancelled is raised.
+    Returns the number of rows written.
+    """
+    log_files = [get_log_file_path(json_file, 'purchase'), get_log_file_path(json_file, 'sales')]
+    total_bytes = sum(log_read_size(path, start, end) for path in log_files)
+    bytes_read = 0
+
+    def on_read(n):
+        nonlocal bytes_read
+        bytes_read += n
+
+    tombstones = load_tombstones(json_file)
+
+    def tagged(log_file, is_sale):
+        for entry in iter_log_entries(log_file, start, end, product_ids, on_read=on_read, tombstones=tombstones):
+            yield entry.get('date', ''), is_sale, entry
+
+    merged = heapq.merge(tagged(log_files[0], False), tagged(log_files[1], True), key=lambda x: x[:2])
+
+    rows = 0
+    tmp_path = f"{out_path}.tmp"
+    try:
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(EXPORT_COLUMNS)
+            chunk = []
+            for _, is_sale, entry in merged:
+                chunk.append(_csv_row(entry, is_sale))
+                if len(chunk) >= chunk_rows:
+                    writer.writerows(chunk)
+                    rows += len(chunk)
+                    chunk = []
+                    if progress is not None:
+                        progress(rows, bytes_read, total_bytes)
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise ExportCancelled()
+            writer.writerows(chunk)
+            rows += len(chunk)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if progress is not None:
+        progress(rows, total_bytes, total_bytes)
+    return rows
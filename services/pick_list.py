@@ -0,0 +1,78 @@
+"""
+Pick lists for sales, ordered along the warehouse path.
+
+The FEFO allocation decides which cartons a sale takes units from; the pick
+list regroups those picks by location and sorts the stops by warehouse,
+section, level and position so a picker walks each aisle once.
+"""
+
+import datetime
+import re
+from services.stock_index import parse_location
+
+_NUMBER = re.compile(r'(\d+)')
+
+
+def location_sort_key(location):
+    """Natural sort key for a location code, so W1-S2 comes before W1-S10."""
+    return tuple(
+        tuple(int(part) if part.isdigit() else part for part in _NUMBER.split(segment))
+        for segment in parse_location(location)
+    )
+
+
+def build_pick_list(change):
+    """Group the picks of a committed sale by location, in walking order.
+
+    Returns a list of stops ``{'location', 'picks'}``; each pick has
+    carton_id, product_id, product_name, quantity and ``empties_carton``
+    (the whole remaining carton is taken).
+    """
+    cartons = {c['carton_id']: c for c in change.updated}
+    stops = {}
+    for entry in change.sales_log:
+        carton = cartons.get(entry['carton_id'], {})
+        location = '-'.join(parse_location(carton.get('location')))
+        picks = stops.setdefault(location, {})
+        pick = picks.get(entry['carton_id'])
+        if pick is None:
+            pick = picks[entry['carton_id']] = {
+                'carton_id': entry['carton_id'],
+                'product_id': entry['product_id'],
+                'product_name': entry['product_name'],
+                'quantity': 0,
+                'empties_carton': carton.get('quantity_per_carton') == 0,
+            }
+        pick['quantity'] += entry['quantity']
+
+    return [
+        {'location': location,
+         'picks': sorted(stops[location].values(), key=lambda p: (p['product_id'], p['carton_id']))}
+        for location in sorted(stops, key=location_sort_key)
+    ]
+
+
+def format_pick_list(stops, company='', reference=''):
+    """Render a pick list as printable plain text."""
+    total_picks = sum(len(stop['picks']) for stop in stops)
+    total_units = sum(pick['quantity'] for stop in stops for pick in stop['picks'])
+    lines = [
+        "PICK LIST",
+        f"Company: {company}" if company else "",
+        f"Order: {reference}" if reference else "",
+        f"Printed: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}",
+        f"{len(stops)} location(s), {total_picks} pick(s), {total_units} unit(s)",
+        "=" * 72,
+    ]
+    lines = [line for line in lines if line]
+    number = 0
+    for stop in stops:
+        lines.append(f"@ {stop['location']}")
+        for pick in stop['picks']:
+            number += 1
+            note = "  (whole carton)" if pick['empties_carton'] else ""
+            lines.append(f"  [ ] {number:>3}. {pick['carton_id']:<14} {pick['product_id']:<10} "
+                         f"{pick['product_name'][:28]:<28} x {pick['quantity']:>5}{note}")
+    lines.append("=" * 72)
+    lines.append("Picked by: ____________________    Checked by: ____________________")
+    return "\n".join(lines) + "\n"
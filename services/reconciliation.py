@@ -0,0 +1,86 @@
+"""
+Reconciliation of stock against the transaction logs.
+
+Replays every carton's logged history (purchased units, less units sold,
+plus manual adjustments) and compares the result with the carton's current
+quantity. Differences point at logs that were cleared or edited, or at
+stock changed outside the app.
+"""
+
+import time
+from database.stock_data import load_stock_data
+from database.log_store import load_tombstones, sum_log_quantities
+from database.adjustments import AdjustmentLog
+from utils.file_utils import get_log_file_path
+
+# Discrepancy kinds
+QUANTITY_MISMATCH = 'quantity_mismatch'  # Logged history does not add up to the carton's quantity
+NO_PURCHASE = 'no_purchase'              # Carton in stock with no purchase logged
+NOT_IN_STOCK = 'not_in_stock'            # Logged carton missing from stock and not deleted
+
+
+def reconcile_stock(json_file, stock_data=None):
+    """Compare every carton's quantity with the quantity its logs add up to.
+
+    ``stock_data`` defaults to the stock file. Returns a dict with
+    ``cartons`` checked, ``log_entries`` read, ``discrepancies`` (dicts with
+    carton_id, product_id, kind, purchased, sold, adjusted, expected and
+    actual, worst first), ``by_kind`` counts and the run's ``seconds``.
+    """
+    started = time.perf_counter()
+    if stock_data is None:
+        stock_data = load_stock_data(json_file)
+    tombstones = load_tombstones(json_file)
+    purchased, purchase_entries = sum_log_quantities(get_log_file_path(json_file, 'purchase'), tombstones)
+    sold, sales_entries = sum_log_quantities(get_log_file_path(json_file, 'sales'), tombstones)
+    adjusted = {}
+    adjustment_log = AdjustmentLog(json_file)
+    adjustment_log.refresh()
+    for record in adjustment_log.records:
+        carton_id = record.get('carton_id')
+        adjusted[carton_id] = adjusted.get(carton_id, 0) + record['new_quantity'] - record['old_quantity']
+
+    def row(carton_id, product_id, kind, actual):
+        expected = purchased.get(carton_id, 0) - sold.get(carton_id, 0) + adjusted.get(carton_id, 0)
+        return {'carton_id': carton_id, 'product_id': product_id, 'kind': kind,
+                'purchased': purchased.get(carton_id, 0), 'sold': sold.get(carton_id, 0),
+                'adjusted': adjusted.get(carton_id, 0), 'expected': expected, 'actual': actual}
+
+    discrepancies = []
+    in_stock = set()
+    for carton in stock_data:
+        carton_id = carton['carton_id']
+        in_stock.add(carton_id)
+        expected = purchased.get(carton_id, 0) - sold.get(carton_id, 0) + adjusted.get(carton_id, 0)
+        if carton_id not in purchased:
+            discrepancies.append(row(carton_id, carton['product_id'], NO_PURCHASE, carton['quantity_per_carton']))
+        elif expected != carton['quantity_per_carton']:
+            discrepancies.append(row(carton_id, carton['product_id'], QUANTITY_MISMATCH, carton['quantity_per_carton']))
+    for carton_id in (purchased.keys() | sold.keys()) - in_stock:
+        discrepancies.append(row(carton_id, '', NOT_IN_STOCK, 0))
+
+    discrepancies.sort(key=lambda d: (-abs(d['expected'] - d['actual']), d['carton_id']))
+    by_kind = {}
+    for discrepancy in discrepancies:
+        by_kind[discrepancy['kind']] = by_kind.get(discrepancy['kind'], 0) + 1
+    return {
+        'cartons': len(stock_data),
+        'log_entries': purchase_entries + sales_entries,
+        'discrepancies': discrepancies,
+        'by_kind': by_kind,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def format_reconciliation(company, report, limit=None):
+    """Render a reconciliation report as text for the command line."""
+    lines = [f"Reconciled {report['cartons']} cartons of {company} against {report['log_entries']} log entries "
+             f"in {report['seconds']:.2f}s."]
+    if not report['discrepancies']:
+        lines.append("Stock matches the logs.")
+        return "\n".join(lines)
+    lines.append(", ".join(f"{count} {kind.replace('_', ' ')}" for kind, count in sorted(report['by_kind'].items())))
+    for d in report['discrepancies'][:limit]:
+        lines.append(f"  {d['carton_id']:<16} {d['kind']:<18} purchased {d['purchased']:>6}  sold {d['sold']:>6}  "
+                     f"adjusted {d['adjusted']:>5}  expected {d['expected']:>6}  actual {d['actual']:>6}")
+    return "\n".join(lines)
@@ -0,0 +1,189 @@
+"""
+Sales summary report engine.
+
+Builds report sections from aggregated sales data and renders them to a
+paginated PDF with reportlab (optional dependency).
+"""
+
+import datetime
+from utils.money import format_rupees
+
+# Core PDF fonts have no rupee glyph
+CURRENCY = "Rs."
+
+REPORT_COLUMNS = [
+    # (heading, width, right aligned)
+    ("Month", 50, False),
+    ("Product ID", 70, False),
+    ("Product Name", 112, False),
+    ("Units Sold", 50, True),
+    (f"Sales ({CURRENCY})", 65, True),
+    (f"Purchase ({CURRENCY})", 65, True),
+    (f"Profit ({CURRENCY})", 65, True),
+    ("Margin %", 40, True),
+]
+
+PAGE_MARGIN = 40
+ROW_HEIGHT = 14
+FONT_SIZE = 8
+
+
+def _totals(rows):
+    totals = {'quantity': 0, 'sales_value': 0, 'purchase_value': 0}
+    for row in rows:
+        for name in totals:
+            totals[name] += row[name]
+    return totals
+
+
+def _margin(sales_value, purchase_value):
+    return (sales_value - purchase_value) / purchase_value * 100 if purchase_value > 0 else 0
+
+
+def build_report_sections(monthly_sales, group_by='month'):
+    """Group (month, product_id, product_name) aggregates into report sections.
+
+    Returns a list of ``(title, rows, subtotal)`` where each row is a dict with
+    month, product_id, product_name, quantity, sales_value and purchase_value
+    (values in paise).
+    ``group_by`` is 'month' or 'product'.
+    """
+    if group_by not in ('month', 'product'):
+        raise ValueError(f"Unknown report grouping: {group_by}")
+    groups = {}
+    for (month, product_id, product_name), data in monthly_sales.items():
+        row = dict(data, month=month, product_id=product_id, product_name=product_name)
+        key = month if group_by == 'month' else (product_id, product_name)
+        groups.setdefault(key, []).append(row)
+
+    sections = []
+    for key in sorted(groups):
+        rows = groups[key]
+        if group_by == 'month':
+            rows.sort(key=lambda r: (r['product_id'], r['product_name']))
+            title = f"Month {key}"
+        else:
+            rows.sort(key=lambda r: r['month'])
+            title = f"{key[0]} - {key[1]}"
+        sections.append((title, rows, _totals(rows)))
+    return sections
+
+
+def _row_cells(row):
+    sales_value = row['sales_value']
+    purchase_value = row['purchase_value']
+    return [
+        row.get('month', ''),
+        row.get('product_id', ''),
+        row.get('product_name', ''),
+        str(row['quantity']),
+        format_rupees(sales_value),
+        format_rupees(purchase_value),
+        format_rupees(sales_value - purchase_value),
+        f"{_margin(sales_value, purchase_value):.1f}",
+    ]
+
+
+def render_sales_report_pdf(file_path, company, monthly_sales, group_by='month', progress=None):
+    """Render the sales report to ``file_path``.
+
+    ``progress(done, total)`` is called as rows are drawn. Raises ImportError
+    when reportlab is not installed.
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+    from reportlab.lib import colors
+
+    sections = build_report_sections(monthly_sales, group_by)
+    total_rows = sum(len(rows) for _, rows, _ in sections)
+    grand = _totals([subtotal for _, _, subtotal in sections])
+
+    c = canvas.Canvas(file_path, pagesize=letter)
+    width, height = letter
+    column_x = []
+    x = PAGE_MARGIN
+    for _, col_width, right in REPORT_COLUMNS:
+        column_x.append(x + col_width if right else x)
+        x += col_width + 2
+    name_chars = REPORT_COLUMNS[2][1] // 4  # Rough fit for an 8pt name column
+    generated = datetime.datetime.now().strftime('%Y-%m-%d %H:%M')
+    state = {'page': 0, 'y': 0}
+
+    def draw_cells(cells, bold=False, color=colors.black):
+        c.setFont("Helvetica-Bold" if bold else "Helvetica", FONT_SIZE)
+        c.setFillColor(color)
+        for (_, _, right), cell_x, text in zip(REPORT_COLUMNS, column_x, cells):
+            if right:
+                c.drawRightString(cell_x, state['y'], text)
+            else:
+                c.drawString(cell_x, state['y'], text)
+        state['y'] -= ROW_HEIGHT
+
+    def new_page():
+        if state['page']:
+            c.showPage()
+        state['page'] += 1
+        y = height - PAGE_MARGIN
+        c.setFillColor(colors.black)
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(PAGE_MARGIN, y, "Stock Mitra - Sales Summary Report")
+        c.setFont("Helvetica", 9)
+        c.drawRightString(width - PAGE_MARGIN, y, f"Page {state['page']}")
+        y -= 16
+        c.drawString(PAGE_MARGIN, y, f"Company: {company}")
+        c.drawRightString(width - PAGE_MARGIN, y, f"Generated: {generated}")
+        state['y'] = y - 24
+        draw_cells([heading for heading, _, _ in REPORT_COLUMNS], bold=True)
+        c.line(PAGE_MARGIN, state['y'] + ROW_HEIGHT - 3, width - PAGE_MARGIN, state['y'] + ROW_HEIGHT - 3)
+
+    def ensure_space(lines, section_title=None):
+        if state['y'] - lines * ROW_HEIGHT < PAGE_MARGIN:
+            new_page()
+            if section_title:
+                draw_section_title(f"{section_title} (cont.)")
+
+    def draw_section_title(title):
+        c.setFont("Helvetica-Bold", 10)
+        c.setFillColor(colors.darkblue)
+        c.drawString(PAGE_MARGIN, state['y'], title)
+        state['y'] -= ROW_HEIGHT
+
+    new_page()
+    done = 0
+    for title, rows, subtotal in sections:
+        ensure_space(3)  # Keep a section title with at least one row
+        draw_section_title(title)
+        for row in rows:
+            ensure_space(1, title)
+            cells = _row_cells(row)
+            cells[2] = cells[2][:name_chars]
+            draw_cells(cells)
+            done += 1
+            if progress is not None and done % 500 == 0:
+                progress(done, total_rows)
+        ensure_space(1, title)
+        draw_cells(_row_cells(dict(subtotal, month='', product_id='', product_name='Subtotal')),
+                   bold=True, color=colors.darkblue)
+        state['y'] -= ROW_HEIGHT / 2
+
+    # Summary statistics
+    ensure_space(7)
+    draw_section_title("Summary Statistics")
+    profit = grand['sales_value'] - grand['purchase_value']
+    c.setFont("Helvetica", 10)
+    c.setFillColor(colors.black)
+    for line in (
+        f"Total Units Sold: {grand['quantity']}",
+        f"Total Sales Value: {CURRENCY} {format_rupees(grand['sales_value'])}",
+        f"Total Purchase Value: {CURRENCY} {format_rupees(grand['purchase_value'])}",
+        f"Total Profit/Loss: {CURRENCY} {format_rupees(profit)}",
+        f"Overall Profit Margin: {_margin(grand['sales_value'], grand['purchase_value']):.1f}%",
+        f"Total Rows: {total_rows}",
+    ):
+        c.drawString(PAGE_MARGIN, state['y'], line)
+        state['y'] -= ROW_HEIGHT + 2
+
+    c.save()
+    if progress is not None:
+        progress(total_rows, total_rows)
+    return state['page']
@@ -0,0 +1,105 @@
+"""
+Bounded LRU cache of loaded company sessions for fast company switching.
+"""
+
+import os
+from collections import OrderedDict
+
+from config.settings import SESSION_CACHE_MAX_COMPANIES, SESSION_CACHE_MEMORY_MB
+
+# Rough ratio between the JSON file size and the memory held by the parsed
+# stock data plus its derived index.
+MEMORY_PER_FILE_BYTE = 8
+
+
+def _file_stamp(filepath):
+    """Cheap change detector for a company file: (size, mtime_ns) or None."""
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+class CompanySession:
+    """Loaded stock data and lookup tables for one company file."""
+
+    def __init__(self, json_file, stock_data, stock_index):
+        self.json_file = json_file
+        self.stock_data = stock_data
+        self.stock_index = stock_index
+        self.file_stamp = _file_stamp(json_file)
+
+    @property
+    def size_estimate(self):
+        """Approximate memory held by this session in bytes."""
+        return (self.file_stamp[0] if self.file_stamp else 0) * MEMORY_PER_FILE_BYTE
+
+    def is_stale(self):
+        """Check whether the company file changed outside this session."""
+        return _file_stamp(self.json_file) != self.file_stamp
+
+    def mark_saved(self):
+        """Record that the file on disk now matches the in-memory data."""
+        self.file_stamp = _file_stamp(self.json_file)
+
+
+class CompanySessionCache:
+    """LRU of company sessions bounded by count and an approximate memory budget."""
+
+    def __init__(self, max_sessions=SESSION_CACHE_MAX_COMPANIES, memory_budget_mb=SESSION_CACHE_MEMORY_MB):
+        self.max_sessions = max(1, max_sessions)
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self._sessions = OrderedDict()
+
+    def __contains__(self, json_file):
+        return os.path.abspath(json_file) in self._sessions
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, json_file, loader):
+        """Return the session for ``json_file``, loading it with ``loader`` on a miss.
+
+        ``loader(json_file)`` must return a ``(stock_data, stock_index)`` tuple.
+        A cached session whose file changed on disk is reloaded.
+        """
+        key = os.path.abspath(json_file)
+        session = self._sessions.get(key)
+        if session is not None and not session.is_stale():
+            self._sessions.move_to_end(key)
+            return session
+
+        stock_data, stock_index = loader(json_file)
+        session = CompanySession(json_file, stock_data, stock_index)
+        self._sessions[key] = session
+        self._sessions.move_to_end(key)
+        self._evict(keep=key)
+        return session
+
+    def mark_saved(self, json_file):
+        """Re-stamp a session after the application itself saved its file."""
+        session = self._sessions.get(os.path.abspath(json_file))
+        if session is not None:
+            session.mark_saved()
+
+    def invalidate(self, json_file=None):
+        """Drop one session, or every session when no file is given."""
+        if json_file is None:
+            self._sessions.clear()
+        else:
+            self._sessions.pop(os.path.abspath(json_file), None)
+
+    def total_size_estimate(self):
+        """Approximate memory held by all cached sessions in bytes."""
+        return sum(session.size_estimate for session in self._sessions.values())
+
+    def _evict(self, keep):
+        """Evict least recently used sessions until within both limits."""
+        while len(self._sessions) > 1 and (
+                len(self._sessions) > self.max_sessions
+                or self.total_size_estimate() > self.memory_budget):
+            oldest_key = next(iter(self._sessions))
+            if oldest_key == keep:
+                break
+            self._sessions.popitem(last=False)
@@ -0,0 +1,316 @@
+"""
+Derived lookup tables for fast access to a company's stock data.
+"""
+
+import bisect
+import datetime
+from utils.date_utils import parse_date
+from utils.money import format_rupees
+
+
+class ExpiryIndex:
+    """Active cartons bucketed by expiry day, kept in day order.
+
+    "Expired" and "expiring within N days" are range lookups over the sorted
+    days instead of a date comparison per carton. ``today`` is the boundary
+    used when a query gives no date; ``advance`` moves it forward a day at a
+    time without rescanning the stock.
+    """
+
+    def __init__(self, today=None):
+        self.today = today or datetime.date.today()
+        self._days = []        # Sorted expiry days that have cartons
+        self._buckets = {}     # day -> set of carton_ids
+        self._day_of = {}      # carton_id -> day
+
+    def __len__(self):
+        return len(self._day_of)
+
+    def add(self, carton_id, day):
+        """Track a carton expiring on ``day`` (cartons without one are ignored)."""
+        if day is None:
+            return
+        self.remove(carton_id)
+        bucket = self._buckets.get(day)
+        if bucket is None:
+            bucket = self._buckets[day] = set()
+            bisect.insort(self._days, day)
+        bucket.add(carton_id)
+        self._day_of[carton_id] = day
+
+    def remove(self, carton_id):
+        """Stop tracking a carton."""
+        day = self._day_of.pop(carton_id, None)
+        if day is None:
+            return
+        bucket = self._buckets[day]
+        bucket.discard(carton_id)
+        if not bucket:
+            del self._buckets[day]
+            del self._days[bisect.bisect_left(self._days, day)]
+
+    def expiry_of(self, carton_id):
+        return self._day_of.get(carton_id)
+
+    def cartons_between(self, start=None, end=None):
+        """Yield ``(day, carton_id)`` for cartons expiring in [start, end], soonest first."""
+        low = 0 if start is None else bisect.bisect_left(self._days, start)
+        high = len(self._days) if end is None else bisect.bisect_right(self._days, end)
+        for day in self._days[low:high]:
+            for carton_id in self._buckets[day]:
+                yield day, carton_id
+
+    def expired(self, today=None):
+        """Carton IDs expiring on or before ``today``."""
+        return {carton_id for _, carton_id in self.cartons_between(end=today or self.today)}
+
+    def expiring_within(self, days, today=None):
+        """``(day, carton_id)`` pairs expiring after ``today`` and within ``days`` of it."""
+        today = today or self.today
+        return list(self.cartons_between(today + datetime.timedelta(days=1), today + datetime.timedelta(days=days)))
+
+    def is_expired(self, carton_id, today=None):
+        day = self._day_of.get(carton_id)
+        return day is not None and day <= (today or self.today)
+
+    def advance(self, today=None):
+        """Move the boundary to ``today``; returns the carton IDs that expired since the last one."""
+        today = today or datetime.date.today()
+        if today <= self.today:
+            self.today = today
+            return set()
+        newly_expired = {carton_id for _, carton_id in
+                         self.cartons_between(self.today + datetime.timedelta(days=1), today)}
+        self.today = today
+        return newly_expired
+
+
+def parse_location(location):
+    """Split a location code like 'W1-S01-L1-P01' into its path segments."""
+    return tuple(part for part in (location or '').strip().upper().split('-') if part) or ('UNASSIGNED',)
+
+
+class LocationNode:
+    """One level of the location tree with rollups of everything below it."""
+
+    def __init__(self):
+        self.children = {}        # segment -> LocationNode
+        self.carton_ids = set()   # Cartons stored at exactly this location
+        self.own_active = 0       # Active cartons at exactly this location
+        self.cartons = 0          # Active cartons in the subtree
+        self.units = 0
+        self.damaged = 0
+        self.value = 0
+        self.positions = 0        # Locations in the subtree that have held a carton
+        self.occupied = 0         # ... of which currently hold an active carton
+
+
+class LocationIndex:
+    """Cartons arranged by location path (warehouse -> section -> level -> position).
+
+    Each node keeps running totals for its subtree, so rollups for any
+    prefix are a walk down the path rather than a scan of the stock.
+    """
+
+    def __init__(self):
+        self.root = LocationNode()
+        self._entries = {}  # carton_id -> (path, (cartons, units, damaged, value) or None)
+
+    def add(self, carton):
+        carton_id = carton['carton_id']
+        self.remove(carton_id)
+        path = parse_location(carton.get('location'))
+        nodes = [self.root]
+        for segment in path:
+            nodes.append(nodes[-1].children.setdefault(segment, LocationNode()))
+        leaf = nodes[-1]
+        new_position = not leaf.carton_ids
+        leaf.carton_ids.add(carton_id)
+
+        contribution = None
+        newly_occupied = False
+        if carton.get('date_outwarded') is None:
+            quantity = carton['quantity_per_carton']
+            contribution = (1, quantity, carton['damaged_units'], quantity * carton.get('sales_price_paise', 0))
+            newly_occupied = leaf.own_active == 0
+            leaf.own_active += 1
+        for node in nodes:
+            node.positions += new_position
+            node.occupied += newly_occupied
+            if contribution:
+                node.cartons += contribution[0]
+                node.units += contribution[1]
+                node.damaged += contribution[2]
+                node.value += contribution[3]
+        self._entries[carton_id] = (path, contribution)
+
+    def remove(self, carton_id):
+        entry = self._entries.pop(carton_id, None)
+        if entry is None:
+            return
+        path, contribution = entry
+        nodes = [self.root]
+        for segment in path:
+            nodes.append(nodes[-1].children[segment])
+        leaf = nodes[-1]
+        leaf.carton_ids.discard(carton_id)
+        vacated = False
+        if contribution:
+            leaf.own_active -= 1
+            vacated = leaf.own_active == 0
+        lost_position = not leaf.carton_ids
+        for node in nodes:
+            node.positions -= lost_position
+            node.occupied -= vacated
+            if contribution:
+                node.cartons -= contribution[0]
+                node.units -= contribution[1]
+                node.damaged -= contribution[2]
+                node.value -= contribution[3]
+        # Prune locations that no longer hold anything
+        for depth in range(len(path), 0, -1):
+            node = nodes[depth]
+            if node.carton_ids or node.children:
+                break
+            del nodes[depth - 1].children[path[depth - 1]]
+
+    def node(self, prefix=''):
+        """The node for a location prefix like 'W1-S01', or None if nothing is stored there."""
+        node = self.root
+        for segment in (parse_location(prefix) if prefix and prefix.strip() else ()):
+            node = node.children.get(segment)
+            if node is None:
+                return None
+        return node
+
+    def carton_ids_under(self, prefix=''):
+        """Yield the IDs of every carton (active or not) stored under a prefix."""
+        start = self.node(prefix)
+        stack = [start] if start is not None else []
+        while stack:
+            node = stack.pop()
+            yield from node.carton_ids
+            stack.extend(node.children.values())
+
+
+class StockIndex:
+    """Lookup tables derived from a company's stock data."""
+
+    # Bump whenever the layout of the index changes so stale caches are rebuilt
+    VERSION = 5
+
+    def __init__(self, stock_data=None):
+        self.rebuild(stock_data or [])
+
+    def rebuild(self, stock_data):
+        """Rebuild every lookup table from scratch."""
+        self.cartons_by_id = {}
+        self.cartons_by_product = {}
+        self.product_names = {}
+        self.inward_dates = {}
+        self.expiry_dates = {}
+        self.expiry = ExpiryIndex()
+        self.locations = LocationIndex()
+        self.valuation = {}                   # product_id -> [units, at_sales, at_mrp] of active cartons (paise)
+        self.total_valuation = [0, 0, 0]
+        self._carton_values = {}
+        self.suggestion_counts = {}
+        self.suggestion_map = {}
+        self._sorted_suggestions = None
+        for carton in stock_data:
+            self.add_carton(carton)
+
+    def add_carton(self, carton):
+        """Index a single carton."""
+        carton_id = carton['carton_id']
+        product_id = carton['product_id']
+        self.cartons_by_id[carton_id] = carton
+        self.cartons_by_product.setdefault(product_id, []).append(carton)
+        self.product_names.setdefault(product_id, carton['product_name'])
+        self.inward_dates[carton_id] = parse_date(carton.get('date_inwarded'))
+        self.expiry_dates[carton_id] = parse_date(carton.get('expiry_date'))
+        self.locations.add(carton)
+        if carton.get('date_outwarded') is None:
+            self.expiry.add(carton_id, self.expiry_dates[carton_id])
+            quantity = carton['quantity_per_carton']
+            values = (quantity, quantity * carton.get('sales_price_paise', 0), quantity * carton.get('mrp_paise', 0))
+            self._carton_values[carton_id] = values
+            totals = self.valuation.setdefault(product_id, [0, 0, 0])
+            for i, value in enumerate(values):
+                totals[i] += value
+                self.total_valuation[i] += value
+
+        display = self._suggestion_display(carton)
+        self.suggestion_counts[display] = self.suggestion_counts.get(display, 0) + 1
+        if display not in self.suggestion_map:
+            self.suggestion_map[display] = (product_id, carton['product_name'], carton.get('mrp_paise', 0))
+            self._sorted_suggestions = None
+
+    def remove_carton(self, carton_id):
+        """Drop a carton from the index."""
+        carton = self.cartons_by_id.pop(carton_id, None)
+        if carton is None:
+            return
+        product_id = carton['product_id']
+        product_cartons = [c for c in self.cartons_by_product.get(product_id, []) if c is not carton]
+        if product_cartons:
+            self.cartons_by_product[product_id] = product_cartons
+        else:
+            self.cartons_by_product.pop(product_id, None)
+            self.product_names.pop(product_id, None)
+        self.inward_dates.pop(carton_id, None)
+        self.expiry_dates.pop(carton_id, None)
+        self.expiry.remove(carton_id)
+        self.locations.remove(carton_id)
+        values = self._carton_values.pop(carton_id, None)
+        if values is not None:
+            totals = self.valuation[product_id]
+            for i, value in enumerate(values):
+                totals[i] -= value
+                self.total_valuation[i] -= value
+        if not product_cartons:
+            self.valuation.pop(product_id, None)
+
+        display = self._suggestion_display(carton)
+        remaining = self.suggestion_counts.get(display, 0) - 1
+        if remaining > 0:
+            self.suggestion_counts[display] = remaining
+        else:
+            self.suggestion_counts.pop(display, None)
+            self.suggestion_map.pop(display, None)
+            self._sorted_suggestions = None
+
+    def apply_change(self, change):
+        """Re-index only the cartons a committed StockChange touched; returns their product IDs."""
+        touched_products = {c['product_id'] for c in change.added + change.updated + change.external_changed}
+        for carton_id in change.external_deleted_ids:
+            carton = self.cartons_by_id.get(carton_id)
+            if carton is not None:
+                touched_products.add(carton['product_id'])
+        for carton_id in change.deleted_ids + change.external_deleted_ids:
+            self.remove_carton(carton_id)
+        deleted_ids = set(change.deleted_ids)
+        for carton in change.updated + change.external_changed:
+            if carton['carton_id'] not in deleted_ids:
+                self.remove_carton(carton['carton_id'])
+                self.add_carton(carton)
+        for carton in change.added:
+            self.add_carton(carton)
+        return touched_products
+
+    def sellable_units(self, product_id):
+        """Units of a product that can be sold: active, unexpired cartons less damaged units."""
+        return sum(c['quantity_per_carton'] - c['damaged_units']
+                   for c in self.cartons_by_product.get(product_id, ())
+                   if c['date_outwarded'] is None and not self.expiry.is_expired(c['carton_id']))
+
+    @property
+    def suggestions(self):
+        """Sorted autocomplete strings for every product/MRP combination."""
+        if self._sorted_suggestions is None:
+            self._sorted_suggestions = sorted(self.suggestion_map)
+        return self._sorted_suggestions
+
+    @staticmethod
+    def _suggestion_display(carton):
+        return f"{carton['product_id']} - {carton['product_name']} (MRP: ₹{format_rupees(carton.get('mrp_paise', 0))})"
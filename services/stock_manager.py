@@ -3,58 +3,152 @@ Stock management business logic services.
 """
 
 import datetime
-from utils.date_utils import parse_date
-from config.settings import LOW_STOCK_THRESHOLD, EXPIRY_SOON_DAYS
+import heapq
+from utils.date_utils import parse_date, format_date
+from config.settings import DASHBOARD_ALERT_TOP_K
+from services.thresholds import ThresholdRules, low_stock_alert
+from utils.money import to_paise
 
 
 class StockAnalyzer:
     """Handles stock analysis and dashboard calculations."""
     
-    def __init__(self, stock_data):
+    def __init__(self, stock_data, stock_index=None, stock_alerts=None):
         self.stock_data = stock_data
+        self.stock_index = stock_index
+        self.stock_alerts = stock_alerts
+        self.rules = stock_alerts.rules if stock_alerts is not None else ThresholdRules()
     
-    def get_dashboard_stats(self):
-        """Calculate dashboard statistics."""
+    def _expiry_windows(self, current_date):
+        """Expired carton IDs and the live (expiry date, carton) pairs expiring soon.
+
+        "Soon" is each product's own expiry threshold. With an index these
+        are two range lookups on its expiry timeline; otherwise the stock is
+        scanned.
+        """
+        horizon = self.rules.max_expiry_soon_days
+        if self.stock_index is not None:
+            expiry = self.stock_index.expiry
+            cartons = self.stock_index.cartons_by_id
+            expiring = [(day, cartons[carton_id]) for day, carton_id in expiry.expiring_within(horizon, current_date)]
+            expired = expiry.expired(current_date)
+        else:
+            expired = set()
+            expiring = []
+            for c in self.stock_data:
+                if c['date_outwarded'] is not None or not c['expiry_date']:
+                    continue
+                expiry_date_obj = parse_date(c['expiry_date'])
+                if expiry_date_obj and expiry_date_obj <= current_date:
+                    expired.add(c['carton_id'])
+                elif expiry_date_obj and (expiry_date_obj - current_date).days <= horizon:
+                    expiring.append((expiry_date_obj, c))
+        if self.rules.products or self.rules.categories:
+            expiring = [(day, c) for day, c in expiring
+                        if (day - current_date).days <= self.rules.for_product(c['product_id'])['expiry_soon_days']]
+        return expired, expiring
+    
+    @staticmethod
+    def _collect_live_units(c, live):
+        """Fold one live, unexpired carton into the per-product live totals."""
+        totals = live.setdefault(c['product_id'], [c['product_name'], 0, 0])
+        totals[1] += c['quantity_per_carton'] - c['damaged_units']
+        totals[2] += 1
+    
+    def _low_stock(self, live, active_products):
+        """Low-stock alerts per product, from the incremental alert set when there is one."""
+        if self.stock_alerts is not None:
+            return self.stock_alerts.low_stock
+        low_stock = {}
+        for product_id, product_name in active_products.items():
+            product_name, live_units, live_cartons = live.get(product_id, (product_name, 0, 0))
+            alert = low_stock_alert(product_id, product_name, live_units, live_cartons,
+                                    self.rules.for_product(product_id)['low_stock_units'])
+            if alert:
+                low_stock[product_id] = alert
+        return low_stock
+    
+    @staticmethod
+    def _expiring_by_product(expiring):
+        """Aggregate (expiry date, carton) pairs into per-product expiry alerts."""
+        alerts = {}
+        for expiry_date_obj, c in expiring:
+            alert = alerts.setdefault(c['product_id'], {
+                'product_id': c['product_id'], 'product_name': c['product_name'],
+                'expiring_cartons': 0, 'soonest_expiry': expiry_date_obj})
+            alert['expiring_cartons'] += 1
+            alert['soonest_expiry'] = min(alert['soonest_expiry'], expiry_date_obj)
+        return alerts
+    
+    def _product_alerts(self, current_date):
+        """Aggregate low-stock products and expiring-soon cartons per product."""
+        expired, expiring = self._expiry_windows(current_date)
+        live = {}
+        active_products = {}
+        if self.stock_alerts is None:
+            for c in self.stock_data:
+                if c['date_outwarded'] is None:
+                    active_products.setdefault(c['product_id'], c['product_name'])
+                    if c['carton_id'] not in expired:
+                        self._collect_live_units(c, live)
+        return self._low_stock(live, active_products), self._expiring_by_product(expiring)
+    
+    @staticmethod
+    def _ranked(alerts, kind, count):
+        """The ``count`` most urgent alerts of a kind, most urgent first."""
+        if kind == 'low_stock':
+            # Furthest below its own threshold first
+            key = lambda a: (a['live_units'] / max(a['threshold'], 1), a['product_id'])
+        else:
+            key = lambda a: (a['soonest_expiry'], a['product_id'])
+        ranked = heapq.nsmallest(count, alerts.values(), key=key)
+        if kind == 'expiry':
+            ranked = [dict(a, soonest_expiry=format_date(a['soonest_expiry'])) for a in ranked]
+        return ranked
+    
+    def get_alerts(self, kind, limit, offset=0):
+        """One page of ranked per-product alerts ('low_stock' or 'expiry'); returns (alerts, total)."""
+        low_stock, expiring = self._product_alerts(datetime.date.today())
+        alerts = low_stock if kind == 'low_stock' else expiring
+        return self._ranked(alerts, kind, offset + limit)[offset:], len(alerts)
+    
+    def get_dashboard_stats(self, top_k=DASHBOARD_ALERT_TOP_K):
+        """Calculate dashboard statistics.
+        
+        Alerts are aggregated per product; only the ``top_k`` most urgent of
+        each kind are returned, with full counts alongside.
+        """
         current_date = datetime.date.today()
+        expired, expiring = self._expiry_windows(current_date)
         
         total_live = 0
         total_damaged_expired = 0
         total_stock_value = 0
-        low_stock_products = []
-        expiry_alerts = []
+        live = {}
+        active_products = {}
         
         for c in self.stock_data:
             if c['date_outwarded'] is None:
-                is_expired = False
-                if c['expiry_date']:
-                    expiry_date_obj = parse_date(c['expiry_date'])
-                    if expiry_date_obj and expiry_date_obj <= current_date:
-                        is_expired = True
-                        
-                if is_expired:
+                active_products.setdefault(c['product_id'], c['product_name'])
+                if c['carton_id'] in expired:
                     total_damaged_expired += c['quantity_per_carton']
                 else:
                     total_live += c['quantity_per_carton']
                     total_damaged_expired += c['damaged_units']
-                    total_stock_value += c['quantity_per_carton'] * c.get('sales_price', 0)
-                    
-                    # Low stock check
-                    if c['quantity_per_carton'] <= LOW_STOCK_THRESHOLD:
-                        low_stock_products.append(f"{c['product_name']} ({c['product_id']}) - {c['quantity_per_carton']} units")
-                    
-                    # Expiry soon check
-                    if c['expiry_date']:
-                        expiry_date_obj = parse_date(c['expiry_date'])
-                        if expiry_date_obj and 0 < (expiry_date_obj - current_date).days <= EXPIRY_SOON_DAYS:
-                            expiry_alerts.append(f"{c['product_name']} ({c['product_id']}) - Expires on {c['expiry_date']}")
+                    total_stock_value += c['quantity_per_carton'] * c.get('sales_price_paise', 0)
+                    self._collect_live_units(c, live)
+        low_stock = self._low_stock(live, active_products)
+        expiring = self._expiring_by_product(expiring)
         
         return {
             'total_live': total_live,
             'total_damaged_expired': total_damaged_expired,
             'total_cartons': len(self.stock_data),
             'total_stock_value': total_stock_value,
-            'low_stock_products': low_stock_products,
-            'expiry_alerts': expiry_alerts
+            'low_stock_products': self._ranked(low_stock, 'low_stock', top_k),
+            'low_stock_count': len(low_stock),
+            'expiry_alerts': self._ranked(expiring, 'expiry', top_k),
+            'expiry_alert_count': len(expiring)
         }
 
 
@@ -62,11 +156,11 @@ class StockValidator:
     """Handles stock validation operations."""
     
     @staticmethod
-    def validate_add_stock_data(form_data):
+    def validate_add_stock_data(form_data, require_carton_id=True):
         """Validate stock addition form data."""
         errors = []
         
-        if not form_data.get('carton_id'):
+        if require_carton_id and not form_data.get('carton_id'):
             errors.append("Carton ID is required")
         if not form_data.get('product_id'):
             errors.append("Product ID is required")
@@ -88,14 +182,14 @@ class StockValidator:
             errors.append("Damaged units must be a valid number")
         
         try:
-            sales_price = float(form_data.get('sales_price', 0))
+            sales_price = to_paise(form_data.get('sales_price', 0))
             if sales_price < 0:
                 errors.append("Sales price cannot be negative")
         except ValueError:
             errors.append("Sales price must be a valid number")
         
         try:
-            purchase_price = float(form_data.get('purchase_price', 0))
+            purchase_price = to_paise(form_data.get('purchase_price', 0))
             if purchase_price < 0:
                 errors.append("Purchase price cannot be negative")
         except ValueError:
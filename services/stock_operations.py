@@ -0,0 +1,368 @@
+"""
+Stock mutation operations shared by the UI and headless entry points.
+
+Each operation mutates the in-memory stock list and returns a StockChange
+describing what it touched. ``run_stock_transaction`` commits that change
+with optimistic concurrency and re-runs the operation on fresh data when
+another terminal changed the same cartons in the meantime.
+"""
+
+import bisect
+import datetime
+from config.settings import STOCK_COMMIT_RETRIES, ADJUSTMENT_REASONS, DEFAULT_ADJUSTMENT_REASON
+from database.stock_data import StockConflictError, commit_stock_changes, append_log_entries
+from database.log_store import record_tombstones, pack_sales_entries
+from database.lineage import record_lineage
+from database.adjustments import append_adjustments
+from models.stock import StockChange
+from utils.date_utils import parse_date, format_date
+from utils.file_utils import get_log_file_path
+
+
+class StockOperationError(Exception):
+    """Raised when a stock operation cannot be carried out (shown to the user as-is)."""
+
+
+def _now_str():
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _carton_number(carton_id):
+    """Get the sequence number from a carton ID like 'P001-C07', or 0."""
+    try:
+        parts = carton_id.split('-C')
+        if len(parts) > 1:
+            return int(parts[-1])
+    except (ValueError, IndexError):
+        pass
+    return 0
+
+
+def next_carton_number(stock_data, product_id):
+    """Get the next sequential carton number for a product."""
+    max_carton_num = 0
+    for carton in stock_data:
+        if carton['product_id'] == product_id:
+            max_carton_num = max(max_carton_num, _carton_number(carton['carton_id']))
+    return max_carton_num + 1
+
+
+def next_carton_numbers(stock_data):
+    """Get the next sequential carton number for every product in one pass."""
+    next_numbers = {}
+    for carton in stock_data:
+        number = _carton_number(carton['carton_id']) + 1
+        if number > next_numbers.get(carton['product_id'], 1):
+            next_numbers[carton['product_id']] = number
+    return next_numbers
+
+
+def _new_carton(carton_id, product_id, product_name, company, location, date_inwarded, expiry_date, carton_detail, now):
+    """Build a carton record and its purchase log entry."""
+    carton = {
+        "product_id": product_id,
+        "product_name": product_name,
+        "company": company,
+        "carton_id": carton_id,
+        "quantity_per_carton": carton_detail['quantity'],
+        "damaged_units": carton_detail['damaged'],
+        "location": location,
+        "date_inwarded": date_inwarded,
+        "expiry_date": expiry_date if expiry_date else None,
+        "last_updated": now,
+        "date_outwarded": None,
+        "sales_price_paise": carton_detail['sales_price_paise'],
+        "purchase_price_paise": carton_detail['purchase_price_paise'],
+        "mrp_paise": carton_detail['mrp_paise']
+    }
+    log_entry = {
+        'date': now,
+        'product_id': product_id,
+        'product_name': product_name,
+        'carton_id': carton_id,
+        'quantity': carton_detail['quantity'],
+        'sales_price_paise': carton_detail['sales_price_paise'],
+        'purchase_price_paise': carton_detail['purchase_price_paise'],
+        'mrp_paise': carton_detail['mrp_paise'],
+        'sales_value_paise': carton_detail['quantity'] * carton_detail['sales_price_paise'],
+        'purchase_value_paise': carton_detail['quantity'] * carton_detail['purchase_price_paise'],
+        'type': 'purchase',
+    }
+    return carton, log_entry
+
+
+def add_cartons(stock_data, product_id, product_name, company, location, date_inwarded, expiry_date, cartons_detail):
+    """Add new cartons for a product and log the purchase.
+
+    ``cartons_detail`` is a list of dicts with quantity, damaged,
+    sales_price_paise, purchase_price_paise and mrp_paise keys.
+    """
+    change = StockChange()
+    now = _now_str()
+    carton_num = next_carton_number(stock_data, product_id)
+    for carton_detail in cartons_detail:
+        carton_id = f"{product_id}-C{str(carton_num).zfill(2)}"
+        carton_num += 1
+        new_carton, log_entry = _new_carton(carton_id, product_id, product_name, company, location,
+                                            date_inwarded, expiry_date, carton_detail, now)
+        stock_data.append(new_carton)
+        change.added.append(new_carton)
+        change.purchase_log.append(log_entry)
+    change.summary = {'carton_ids': [c['carton_id'] for c in change.added]}
+    return change
+
+
+def import_cartons(stock_data, rows, company):
+    """Add many cartons across products in one change.
+
+    ``rows`` are validated import rows (see services.bulk_import) with
+    product_id, product_name, location, date_inwarded, expiry_date and the
+    carton_detail keys. Carton numbers are allocated for all products at once.
+    """
+    change = StockChange()
+    now = _now_str()
+    next_numbers = next_carton_numbers(stock_data)
+    for row in rows:
+        product_id = row['product_id']
+        carton_num = next_numbers.get(product_id, 1)
+        next_numbers[product_id] = carton_num + 1
+        carton_id = f"{product_id}-C{str(carton_num).zfill(2)}"
+        new_carton, log_entry = _new_carton(carton_id, product_id, row['product_name'], company, row['location'],
+                                            row['date_inwarded'], row['expiry_date'], row, now)
+        stock_data.append(new_carton)
+        change.added.append(new_carton)
+        change.purchase_log.append(log_entry)
+    change.summary = {'carton_ids': [c['carton_id'] for c in change.added]}
+    return change
+
+
+def sell_product(stock_data, product_id, full_cartons, loose_pieces):
+    """Sell units of a product using FEFO, then FIFO, carton allocation.
+
+    Expired cartons are never sold.
+    """
+    product_cartons = [c for c in stock_data
+                       if c['product_id'] == product_id
+                       and c['date_outwarded'] is None]
+
+    # Sort by expiry date first (FEFO), then by inward date (FIFO); expired
+    # cartons then form a prefix that is cut off with one range lookup
+    keyed = sorted((((parse_date(c['expiry_date']) or datetime.date(9999, 12, 31),
+                      parse_date(c['date_inwarded']) or datetime.date(1, 1, 1)), c)
+                    for c in product_cartons), key=lambda pair: pair[0])
+    first_sellable = bisect.bisect_right([key[0] for key, _ in keyed], datetime.date.today())
+    available_cartons = [c for _, c in keyed[first_sellable:]]
+    if not available_cartons:
+        if product_cartons:
+            raise StockOperationError('All remaining stock of this product has expired.')
+        raise StockOperationError('No available stock for this product.')
+
+    total_units_to_sell = full_cartons * available_cartons[0]['quantity_per_carton'] + loose_pieces
+    total_available = sum(c['quantity_per_carton'] - c['damaged_units'] for c in available_cartons)
+    if total_units_to_sell > total_available:
+        raise StockOperationError(f'Insufficient stock. Available: {total_available} units, Requested: {total_units_to_sell} units.')
+
+    change = StockChange()
+    now = _now_str()
+    units_remaining = total_units_to_sell
+    total_sales_value = 0
+    cartons_sold = []
+
+    for carton in available_cartons:
+        if units_remaining <= 0:
+            break
+
+        available_in_carton = carton['quantity_per_carton'] - carton['damaged_units']
+        if available_in_carton <= 0:
+            continue
+
+        units_from_this_carton = min(units_remaining, available_in_carton)
+
+        # Calculate sales value using actual sales price
+        sales_price_per_unit = carton.get('sales_price_paise', 0)
+        purchase_price_per_unit = carton.get('purchase_price_paise', 0)
+        sales_value = units_from_this_carton * sales_price_per_unit
+        purchase_value = units_from_this_carton * purchase_price_per_unit
+        total_sales_value += sales_value
+
+        # Update carton
+        change.touch(carton)
+        carton['quantity_per_carton'] -= units_from_this_carton
+        carton['last_updated'] = now
+        if carton['quantity_per_carton'] == 0:
+            carton['date_outwarded'] = format_date(datetime.date.today())
+
+        cartons_sold.append({'carton_id': carton['carton_id'], 'units_sold': units_from_this_carton})
+        change.sales_log.append({
+            'date': now,
+            'product_id': product_id,
+            'product_name': carton['product_name'],
+            'carton_id': carton['carton_id'],
+            'quantity': units_from_this_carton,
+            'sales_price_paise': sales_price_per_unit,
+            'purchase_price_paise': purchase_price_per_unit,
+            'mrp_paise': carton.get('mrp_paise', 0),
+            'sales_value_paise': sales_value,
+            'purchase_value_paise': purchase_value,
+            'type': 'sale'
+        })
+
+        units_remaining -= units_from_this_carton
+
+    change.summary = {
+        'total_units': total_units_to_sell,
+        'total_sales_value_paise': total_sales_value,
+        'cartons_sold': cartons_sold,
+    }
+    return change
+
+
+def sell_order(stock_data, lines):
+    """Sell several order lines of ``(product_id, full_cartons, loose_pieces)`` as one change.
+
+    Lines are allocated in order with ``sell_product``. If any line cannot
+    be filled the cartons touched by earlier lines are restored and the
+    error is re-raised, naming the product.
+    """
+    # Group once so each line only looks at its own product's cartons
+    cartons_by_product = {}
+    for carton in stock_data:
+        cartons_by_product.setdefault(carton['product_id'], []).append(carton)
+
+    change = StockChange()
+    total_units = 0
+    total_sales_value = 0
+    cartons_sold = []
+    try:
+        for product_id, full_cartons, loose_pieces in lines:
+            try:
+                line_change = sell_product(cartons_by_product.get(product_id, []), product_id, full_cartons, loose_pieces)
+            except StockOperationError as e:
+                raise StockOperationError(f"{product_id}: {e}") from e
+            for carton in line_change.updated:
+                carton_id = carton['carton_id']
+                if carton_id not in change.base_versions:
+                    change.base_versions[carton_id] = line_change.base_versions[carton_id]
+                    change.originals[carton_id] = line_change.originals[carton_id]
+                    change.updated.append(carton)
+            change.sales_log.extend(line_change.sales_log)
+            total_units += line_change.summary['total_units']
+            total_sales_value += line_change.summary['total_sales_value_paise']
+            cartons_sold.extend(line_change.summary['cartons_sold'])
+    except StockOperationError:
+        _restore_cartons(change)
+        raise
+    change.summary = {
+        'lines': len(lines),
+        'total_units': total_units,
+        'total_sales_value_paise': total_sales_value,
+        'cartons_sold': cartons_sold,
+    }
+    return change
+
+
+def _restore_cartons(change):
+    """Put the cartons a change touched back as they were, leaving the objects in place."""
+    for carton in change.updated:
+        original = change.originals[carton['carton_id']]
+        carton.clear()
+        carton.update(original)
+
+
+def update_carton_quantity(stock_data, carton_id, new_qty, new_damaged, reason=DEFAULT_ADJUSTMENT_REASON):
+    """Set a carton's quantity and damaged units, outwarding it when empty.
+
+    The old and new values are recorded in the adjustments log under
+    ``reason`` (a key of ``ADJUSTMENT_REASONS``).
+    """
+    if reason not in ADJUSTMENT_REASONS:
+        raise StockOperationError(f"Unknown adjustment reason '{reason}'.")
+    carton = next((c for c in stock_data if c['carton_id'] == carton_id), None)
+    if carton is None:
+        raise StockOperationError(f"Carton ID '{carton_id}' not found.")
+    if carton['date_outwarded'] is not None:
+        raise StockOperationError(f"Carton {carton_id} is already outwarded on {carton['date_outwarded']}. No further updates possible.")
+
+    change = StockChange()
+    change.touch(carton)
+    now = _now_str()
+    if (new_qty, new_damaged) != (carton['quantity_per_carton'], carton['damaged_units']):
+        change.adjustment_log.append({
+            'ts': now,
+            'carton_id': carton_id,
+            'product_id': carton['product_id'],
+            'product_name': carton['product_name'],
+            'reason': reason,
+            'old_quantity': carton['quantity_per_carton'],
+            'new_quantity': new_qty,
+            'old_damaged': carton['damaged_units'],
+            'new_damaged': new_damaged,
+            'purchase_price_paise': carton.get('purchase_price_paise', 0),
+        })
+    carton['quantity_per_carton'] = new_qty
+    carton['damaged_units'] = new_damaged
+    carton['last_updated'] = now
+    if new_qty == 0:
+        carton['date_outwarded'] = format_date(datetime.date.today())
+    change.summary = {'outwarded': new_qty == 0}
+    return change
+
+
+def delete_carton(stock_data, carton_id):
+    """Remove a carton from stock."""
+    carton = next((c for c in stock_data if c['carton_id'] == carton_id), None)
+    if carton is None:
+        raise StockOperationError(f"Carton ID '{carton_id}' not found.")
+    change = StockChange()
+    change.delete(carton)
+    stock_data[:] = [c for c in stock_data if c['carton_id'] != carton_id]
+    return change
+
+
+def _rollback(stock_data, cartons_before, change):
+    """Undo an uncommitted change in memory, leaving the carton objects in place."""
+    _restore_cartons(change)
+    stock_data[:] = cartons_before
+
+
+def run_stock_transaction(json_file, stock_data, operation, max_retries=STOCK_COMMIT_RETRIES):
+    """Apply ``operation(stock_data)`` and commit it, retrying on concurrent edits.
+
+    On a version conflict the in-memory data is refreshed from the file and the
+    operation runs again, so it must be safe to re-run from scratch. If the
+    commit fails for any other reason (lock timeout, I/O error) the operation
+    is undone in memory before the error is re-raised.
+
+    Log entries, adjustment records and tombstones for deleted cartons are
+    appended once the stock commit succeeds; each sale's per-carton entries
+    go to the sales log as one compact record, and log entries are indexed
+    in the carton lineage as they are written. Log entries and tombstones
+    carry the commit's event sequence number, which orders them exactly.
+    These appends run after the stock lock is released, so a crash in
+    between leaves the stock committed without its log entries; the
+    reconciliation check reports such gaps.
+    """
+    for attempt in range(max_retries + 1):
+        cartons_before = list(stock_data)
+        change = operation(stock_data)
+        change.reloaded = attempt > 0
+        try:
+            commit_stock_changes(json_file, stock_data, change)
+            break
+        except StockConflictError as e:
+            stock_data[:] = e.disk_data
+            if attempt == max_retries:
+                raise
+        except BaseException:
+            _rollback(stock_data, cartons_before, change)
+            raise
+    for entry in change.purchase_log + change.sales_log:
+        entry['seq'] = change.seq
+    for log_type, records in (('purchase', change.purchase_log), ('sales', pack_sales_entries(change.sales_log))):
+        spans = append_log_entries(get_log_file_path(json_file, log_type), records)
+        record_lineage(json_file, log_type, records, spans)
+    append_adjustments(json_file, change.adjustment_log)
+    if change.deleted_ids:
+        deleted_ids = set(change.deleted_ids)
+        record_tombstones(json_file, [c for c in change.updated if c['carton_id'] in deleted_ids], change.seq)
+    return change
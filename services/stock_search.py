@@ -4,6 +4,7 @@ Stock search and product identification service.
 
 import datetime
 from utils.date_utils import parse_date, format_date
+from utils.money import format_rupees
 
 
 def _get_product_for_action(query, all_stock_data):
@@ -33,31 +34,40 @@ def _get_product_for_action(query, all_stock_data):
         return product_id, product_name, ''
 
 
-def get_product_summary_text(query, all_stock_data):
-    """Get a detailed summary of a product's stock status."""
+def get_product_summary_text(query, all_stock_data, stock_index=None):
+    """Get a detailed summary of a product's stock status.
+
+    With a StockIndex the product's cartons and expiry dates come from its
+    lookups instead of scanning and parsing the whole stock.
+    """
     product_id_found, product_name_found, identification_message = _get_product_for_action(query, all_stock_data)
 
     if not product_id_found:
         return identification_message
 
-    found_cartons = [carton for carton in all_stock_data if carton['product_id'] == product_id_found]
+    if stock_index is not None:
+        found_cartons = stock_index.cartons_by_product.get(product_id_found, [])
+        expiry_of = lambda carton: stock_index.expiry.expiry_of(carton['carton_id'])
+    else:
+        found_cartons = [carton for carton in all_stock_data if carton['product_id'] == product_id_found]
+        expiry_of = lambda carton: parse_date(carton['expiry_date'])
 
     # Collect pricing information for this product
-    unique_sales_prices = sorted(set([carton.get('sales_price', 0) for carton in found_cartons if carton.get('sales_price') is not None]))
-    unique_mrps = sorted(set([carton.get('mrp', 0) for carton in found_cartons if carton.get('mrp') is not None and carton.get('mrp') > 0]))
+    unique_sales_prices = sorted(set([carton.get('sales_price_paise', 0) for carton in found_cartons if carton.get('sales_price_paise') is not None]))
+    unique_mrps = sorted(set([carton.get('mrp_paise', 0) for carton in found_cartons if carton.get('mrp_paise') is not None and carton.get('mrp_paise') > 0]))
     price_text = ''
     if unique_sales_prices:
         if len(unique_sales_prices) == 1:
-            price_text = f"Sales Price: ₹{unique_sales_prices[0]:.2f}"
+            price_text = f"Sales Price: ₹{format_rupees(unique_sales_prices[0])}"
         else:
-            price_text = "Sales Prices: " + ", ".join([f"₹{price:.2f}" for price in unique_sales_prices])
+            price_text = "Sales Prices: " + ", ".join([f"₹{format_rupees(price)}" for price in unique_sales_prices])
     
     mrp_text = ''
     if unique_mrps:
         if len(unique_mrps) == 1:
-            mrp_text = f"MRP: ₹{unique_mrps[0]:.2f}"
+            mrp_text = f"MRP: ₹{format_rupees(unique_mrps[0])}"
         else:
-            mrp_text = "MRPs: " + ", ".join([f"₹{mrp:.2f}" for mrp in unique_mrps])
+            mrp_text = "MRPs: " + ", ".join([f"₹{format_rupees(mrp)}" for mrp in unique_mrps])
 
     total_live_units = 0
     total_damaged_units = 0
@@ -80,7 +90,7 @@ def get_product_summary_text(query, all_stock_data):
             is_expired = False
             if carton['expiry_date']:
                 try:
-                    expiry_date_obj = parse_date(carton['expiry_date'])
+                    expiry_date_obj = expiry_of(carton)
                     if expiry_date_obj and expiry_date_obj <= current_date:
                         is_expired = True
                         total_expired_units += carton['quantity_per_carton']
@@ -0,0 +1,135 @@
+"""
+Per-product and per-category alert thresholds, with low-stock alerts kept
+current one product at a time.
+
+Rules are stored per company in ``<company>_thresholds.json`` beside its
+stock file::
+
+    {"categories": {"APX_P0": {"low_stock_units": 50}},
+     "products": {"APX_P001": {"low_stock_units": 200, "expiry_soon_days": 90}}}
+
+A category is a product ID prefix. Each setting falls back from the product
+to its longest matching category and then to the global default in
+config.settings. Low stock is judged on a product's live total (sellable
+units in its unexpired cartons) rather than carton by carton.
+"""
+
+from config.settings import LOW_STOCK_THRESHOLD, EXPIRY_SOON_DAYS
+
+THRESHOLD_DEFAULTS = {
+    'low_stock_units': LOW_STOCK_THRESHOLD,
+    'expiry_soon_days': EXPIRY_SOON_DAYS,
+}
+
+
+class ThresholdRules:
+    """Threshold overrides for products and product ID prefixes."""
+
+    def __init__(self, products=None, categories=None):
+        self.products = products or {}
+        self.categories = categories or {}
+        self._prefixes = sorted(self.categories, key=len, reverse=True)
+        self._resolved = {}
+        self.max_expiry_soon_days = max([EXPIRY_SOON_DAYS] + [
+            rule['expiry_soon_days'] for rule in list(self.products.values()) + list(self.categories.values())
+            if 'expiry_soon_days' in rule])
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build rules from their stored form, raising ValueError on bad settings."""
+        data = data or {}
+        if not isinstance(data, dict):
+            raise ValueError("Threshold rules must be a JSON object")
+        sections = {}
+        for section in ('products', 'categories'):
+            section_rules = data.get(section) or {}
+            if not isinstance(section_rules, dict):
+                raise ValueError(f"Threshold '{section}' must map IDs to settings")
+            rules = {}
+            for key, rule in section_rules.items():
+                key = key.strip().upper()
+                if not key:
+                    raise ValueError(f"Empty {section[:-1]} key in threshold rules")
+                if not isinstance(rule, dict):
+                    raise ValueError(f"Thresholds for {key} must map setting names to values")
+                rules[key] = {}
+                for name, value in rule.items():
+                    if name not in THRESHOLD_DEFAULTS:
+                        raise ValueError(f"Unknown threshold '{name}' for {key}")
+                    if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+                        raise ValueError(f"Threshold '{name}' for {key} must be a whole number of 0 or more")
+                    rules[key][name] = value
+            sections[section] = rules
+        return cls(sections['products'], sections['categories'])
+
+    def to_dict(self):
+        return {'products': self.products, 'categories': self.categories}
+
+    def category_of(self, product_id):
+        """The longest category prefix matching a product ID, or None."""
+        return next((prefix for prefix in self._prefixes if product_id.startswith(prefix)), None)
+
+    def for_product(self, product_id):
+        """Effective thresholds for a product."""
+        resolved = self._resolved.get(product_id)
+        if resolved is None:
+            resolved = dict(THRESHOLD_DEFAULTS)
+            category = self.category_of(product_id)
+            if category is not None:
+                resolved.update(self.categories[category])
+            resolved.update(self.products.get(product_id, {}))
+            self._resolved[product_id] = resolved
+        return resolved
+
+
+def low_stock_alert(product_id, product_name, live_units, live_cartons, threshold):
+    """The low-stock alert for a product's live total, or None if it is above its threshold."""
+    if live_units > threshold:
+        return None
+    return {'product_id': product_id, 'product_name': product_name, 'live_units': live_units,
+            'live_cartons': live_cartons, 'threshold': threshold}
+
+
+class StockAlerts:
+    """Products at or below their low-stock threshold, derived from a StockIndex.
+
+    ``refresh`` re-totals only the products it is given, so after a commit
+    the alert set is brought up to date without rescanning the stock.
+    Products with no active cartons left are not flagged; those show up in
+    the reorder list instead.
+    """
+
+    def __init__(self, stock_index, rules=None):
+        self.stock_index = stock_index
+        self.rules = rules or ThresholdRules()
+        self.rebuild()
+
+    def rebuild(self):
+        """Re-evaluate every product."""
+        self.low_stock = {}
+        self.refresh(*self.stock_index.cartons_by_product)
+
+    def set_rules(self, rules):
+        self.rules = rules
+        self.rebuild()
+
+    def refresh(self, *product_ids):
+        """Re-total the live stock of the given products and update their alerts."""
+        expiry = self.stock_index.expiry
+        for product_id in product_ids:
+            active = False
+            live_units = live_cartons = 0
+            for c in self.stock_index.cartons_by_product.get(product_id, ()):
+                if c['date_outwarded'] is not None:
+                    continue
+                active = True
+                if not expiry.is_expired(c['carton_id']):
+                    live_units += c['quantity_per_carton'] - c['damaged_units']
+                    live_cartons += 1
+            alert = active and low_stock_alert(product_id, self.stock_index.product_names.get(product_id, ''),
+                                               live_units, live_cartons,
+                                               self.rules.for_product(product_id)['low_stock_units'])
+            if alert:
+                self.low_stock[product_id] = alert
+            else:
+                self.low_stock.pop(product_id, None)
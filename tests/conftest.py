@@ -0,0 +1,62 @@
+"""
+Shared fixtures: a small company stock file in a temporary directory.
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_carton(carton_id, quantity=10, product_id=None, **fields):
+    """A carton record as the app stores it, with prices in paise."""
+    product_id = product_id or carton_id.split('-C')[0]
+    carton = {
+        "product_id": product_id,
+        "product_name": f"Product {product_id}",
+        "company": "Test",
+        "carton_id": carton_id,
+        "quantity_per_carton": quantity,
+        "damaged_units": 0,
+        "location": "A1",
+        "date_inwarded": "2024-01-01",
+        "expiry_date": None,
+        "last_updated": "2024-01-01 10:00:00",
+        "date_outwarded": None,
+        "sales_price_paise": 1500,
+        "purchase_price_paise": 1000,
+        "mrp_paise": 2000,
+        "version": 1,
+    }
+    carton.update(fields)
+    return carton
+
+
+def write_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=4)
+
+
+def read_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keep warm-start cache files out of the working directory."""
+    import database.stock_cache
+    path = tmp_path / "cache"
+    monkeypatch.setattr(database.stock_cache, 'DATA_DIR', str(path))
+    return path
+
+
+@pytest.fixture
+def company_file(tmp_path):
+    """A stock file holding two cartons of P001 and one of P002."""
+    path = str(tmp_path / "test_stock.json")
+    write_json(path, [make_carton("P001-C01"), make_carton("P001-C02"), make_carton("P002-C01", quantity=5)])
+    return path
@@ -0,0 +1,73 @@
+"""
+The adjustments log and the shrinkage report built from it.
+"""
+
+import datetime
+
+import pytest
+
+from database.adjustments import AdjustmentLog, append_adjustments
+from database.stock_data import load_stock_data
+from services.stock_operations import run_stock_transaction, update_carton_quantity, StockOperationError
+from utils.file_utils import get_adjustments_file_path
+
+
+def _adjustment(product_id, ts, old_quantity, new_quantity, old_damaged=0, new_damaged=0, reason='count', price=1000):
+    return {'ts': ts, 'carton_id': f"{product_id}-C01", 'product_id': product_id, 'product_name': f"Product {product_id}",
+            'reason': reason, 'old_quantity': old_quantity, 'new_quantity': new_quantity,
+            'old_damaged': old_damaged, 'new_damaged': new_damaged, 'purchase_price_paise': price}
+
+
+def test_update_carton_records_the_adjustment(company_file):
+    stock_data = load_stock_data(company_file)
+
+    run_stock_transaction(company_file, stock_data,
+                          lambda data: update_carton_quantity(data, 'P001-C01', 8, 1, reason='theft'))
+    # An update that changes nothing is not an adjustment
+    run_stock_transaction(company_file, stock_data, lambda data: update_carton_quantity(data, 'P001-C01', 8, 1))
+
+    records = AdjustmentLog(company_file).for_product('P001')
+    assert [(r['carton_id'], r['reason'], r['old_quantity'], r['new_quantity'], r['new_damaged']) for r in records] == [
+        ('P001-C01', 'theft', 10, 8, 1)]
+    assert records[0]['ts'].startswith(datetime.date.today().strftime("%Y-%m-%d"))
+
+
+def test_unknown_reason_is_rejected(company_file):
+    stock_data = load_stock_data(company_file)
+    with pytest.raises(StockOperationError):
+        update_carton_quantity(stock_data, 'P001-C01', 8, 0, reason='lost-in-transit')
+
+
+def test_date_range_and_incremental_reads(company_file):
+    log = AdjustmentLog(company_file)
+    append_adjustments(company_file, [_adjustment('P001', '2024-03-01 10:00:00', 10, 9),
+                                      _adjustment('P002', '2024-03-15 10:00:00', 5, 4)])
+    assert len(log.between('2024-03-01', '2024-03-14')) == 1
+
+    append_adjustments(company_file, [_adjustment('P001', '2024-03-20 10:00:00', 9, 8)])
+    with open(get_adjustments_file_path(company_file), 'a') as f:
+        f.write('{"ts": "2024-03-21 10:00:00", "carton_id": "P001-C0')  # A write still in progress
+
+    assert [r['ts'][:10] for r in log.between('2024-03-10', '2024-03-20')] == ['2024-03-15', '2024-03-20']
+    assert len(log.between()) == 3
+    assert [r['new_quantity'] for r in log.for_product('P001')] == [9, 8]
+
+
+def test_shrinkage_report_totals_losses_by_product_and_month(company_file):
+    append_adjustments(company_file, [
+        _adjustment('P001', '2024-03-01 10:00:00', 10, 7, reason='theft'),
+        _adjustment('P001', '2024-03-02 10:00:00', 7, 7, 0, 2, reason='damage'),
+        _adjustment('P001', '2024-03-03 10:00:00', 7, 8, 2, 2),
+        _adjustment('P002', '2024-03-05 10:00:00', 5, 4, price=8000, reason='expired'),
+        _adjustment('P001', '2024-04-01 10:00:00', 8, 6),
+    ])
+
+    report = AdjustmentLog(company_file).shrinkage_report()
+
+    assert [(row['month'], row['product_id']) for row in report] == [
+        ('2024-04', 'P001'), ('2024-03', 'P002'), ('2024-03', 'P001')]
+    march = report[2]
+    assert (march['adjustments'], march['units_lost'], march['units_found'], march['net_units']) == (3, 5, 1, -4)
+    assert march['value_lost'] == 5 * 1000
+    assert march['reasons'] == {'theft': 3, 'damage': 2}
+    assert [row['product_id'] for row in AdjustmentLog(company_file).shrinkage_report('2024-03')] == ['P002', 'P001']
@@ -0,0 +1,81 @@
+"""
+The API server's writer: commits swap in a new snapshot without disturbing readers.
+"""
+
+import asyncio
+
+import pytest
+
+from api.server import StockApiServer, ApiError
+from conftest import read_json, write_json
+
+
+def _call(server, handler, body):
+    """Run an async handler with the server's writer task going."""
+    async def run():
+        server._write_queue = asyncio.Queue()
+        writer_task = asyncio.create_task(server._writer_loop())
+        try:
+            return await handler({}, body)
+        finally:
+            writer_task.cancel()
+    return asyncio.run(run())
+
+
+def test_sale_reindexes_only_what_it_touched(company_file):
+    server = StockApiServer('Test', company_file)
+    old_data, index = server.stock_data, server.stock_index
+    old_cartons = {c['carton_id']: c for c in old_data}
+    before = {carton_id: dict(c) for carton_id, c in old_cartons.items()}
+
+    result = _call(server, server.handle_sell, {'product': 'P001', 'loose_pieces': 15})
+
+    assert result['total_units'] == 15
+    # The previous snapshot is left exactly as readers saw it
+    assert {c['carton_id']: c for c in old_data} == before
+    assert server.stock_data is not old_data
+    assert server.stock_index is index
+    new_cartons = {c['carton_id']: c for c in server.stock_data}
+    assert new_cartons['P002-C01'] is old_cartons['P002-C01']
+    assert index.cartons_by_id['P001-C01'] is new_cartons['P001-C01']
+    assert new_cartons['P001-C01']['date_outwarded'] is not None
+    assert index.sellable_units('P001') == 5
+    assert index.total_valuation[0] == 10
+    assert 'P001' in server.stock_alerts.low_stock
+    assert server.handle_stock_summary({'product': ['P001']}, {})['live_units'] == 5
+
+
+def test_conflict_reload_rebuilds_the_snapshot(company_file):
+    server = StockApiServer('Test', company_file)
+    # Another terminal sells from the carton after the server read it
+    disk = read_json(company_file)
+    disk[0].update(quantity_per_carton=4, version=2)
+    write_json(company_file, disk)
+
+    _call(server, server.handle_sell, {'product': 'P001', 'loose_pieces': 2})
+
+    assert server.stock_index.sellable_units('P001') == 12
+    assert server.stock_index.cartons_by_id['P001-C01']['quantity_per_carton'] == 2
+
+
+def test_failed_sale_leaves_the_snapshot_alone(company_file):
+    server = StockApiServer('Test', company_file)
+    old_data, old_index = server.stock_data, server.stock_index
+
+    with pytest.raises(ApiError) as excinfo:
+        _call(server, server.handle_sell, {'product': 'P002', 'loose_pieces': 50})
+
+    assert excinfo.value.status == 400
+    assert server.stock_data is old_data and server.stock_index is old_index
+    assert read_json(company_file) == old_data
+
+
+def test_inward_response_has_no_pick_list(company_file):
+    server = StockApiServer('Test', company_file)
+
+    result = _call(server, server.handle_inward, {
+        'product_id': 'p003', 'product_name': 'New', 'location': 'w1-s1',
+        'cartons': [{'quantity': 12, 'sales_price': '15.00', 'purchase_price': '10.00'}]})
+
+    assert result == {'product_id': 'P003', 'carton_ids': ['P003-C01']}
+    assert server.stock_index.sellable_units('P003') == 12
@@ -0,0 +1,92 @@
+"""
+Bulk CSV stock import.
+"""
+
+import pytest
+
+from database.stock_data import load_stock_data
+from services.bulk_import import BulkImportError, import_stock_csv, read_import_csv, validate_import_rows
+from utils.file_utils import get_log_file_path
+from conftest import read_json
+
+HEADER = ("product_id,product_name,location,date_inwarded,expiry_date,quantity_per_carton,"
+          "damaged_units,sales_price,purchase_price,mrp,cartons\n")
+
+
+def _csv(tmp_path, *rows, header=HEADER):
+    path = tmp_path / "import.csv"
+    path.write_text(header + ''.join(row + '\n' for row in rows), encoding='utf-8')
+    return str(path)
+
+
+def test_valid_file_is_imported_in_one_commit(company_file, tmp_path):
+    path = _csv(tmp_path,
+                "p001,Product P001,a2,2024-03-01,2025-03-01,12,1,15.50,10.25,20,2",
+                "",
+                "P009,New Item,B1,2024-03-01,,6,,9,7,,")
+    stock_data = load_stock_data(company_file)
+
+    change = import_stock_csv(path, company_file, stock_data, 'Test')
+
+    # Numbering carries on from the existing cartons of each product
+    assert change.summary['carton_ids'] == ['P001-C03', 'P001-C04', 'P009-C01']
+    disk = {c['carton_id']: c for c in read_json(company_file)}
+    assert disk['P001-C04']['location'] == 'A2'
+    assert (disk['P001-C04']['quantity_per_carton'], disk['P001-C04']['damaged_units']) == (12, 1)
+    assert (disk['P001-C04']['sales_price_paise'], disk['P001-C04']['purchase_price_paise'],
+            disk['P001-C04']['mrp_paise']) == (1550, 1025, 2000)
+    assert (disk['P009-C01']['expiry_date'], disk['P009-C01']['damaged_units'], disk['P009-C01']['mrp_paise']) == (
+        None, 0, 0)
+    purchases = read_json(get_log_file_path(company_file, 'purchase'))
+    assert [entry['carton_id'] for entry in purchases] == ['P001-C03', 'P001-C04', 'P009-C01']
+
+
+def test_every_bad_row_is_reported_and_nothing_is_imported(company_file, tmp_path):
+    path = _csv(tmp_path,
+                "P003,Good,A1,2024-03-01,,10,0,5,4,,1",
+                "P004,,A1,01/03/2024,,0,0,5,4,,1",
+                "P005,Bad Prices,A1,2024-03-01,2024-13-01,10,11,abc,4,-1,0",
+                "P001,Renamed Product,A1,2024-03-01,,10,0,5,4,,1")
+    stock_data = load_stock_data(company_file)
+    before = read_json(company_file)
+
+    with pytest.raises(BulkImportError) as excinfo:
+        import_stock_csv(path, company_file, stock_data, 'Test')
+
+    errors = excinfo.value.errors
+    assert sorted({line for line, _ in errors}) == [3, 4, 5]
+    messages = [message for _, message in errors]
+    assert "Product name is required" in messages
+    assert "Date inwarded must be YYYY-MM-DD" in messages
+    assert "Expiry date must be YYYY-MM-DD" in messages
+    assert "Sales price must be a valid number" in messages
+    assert "MRP cannot be negative" in messages
+    assert "Cartons must be a positive number" in messages
+    assert "Product ID P001 is already used for 'Product P001'" in messages
+    assert read_json(company_file) == before
+    assert stock_data == before
+
+
+def test_damaged_beyond_quantity_is_rejected():
+    rows = [(2, {'product_id': 'P001', 'product_name': 'X', 'location': 'A1', 'date_inwarded': '2024-03-01',
+                 'quantity_per_carton': '5', 'damaged_units': '6', 'sales_price': '1', 'purchase_price': '1'})]
+
+    cartons, errors = validate_import_rows(rows, [])
+
+    assert cartons == []
+    assert errors == [(2, "Damaged units cannot exceed quantity")]
+
+
+def test_missing_columns_are_reported(tmp_path):
+    path = _csv(tmp_path, "P001,Product,A1", header="product_id,product_name,location\n")
+
+    with pytest.raises(BulkImportError) as excinfo:
+        read_import_csv(path)
+
+    assert excinfo.value.errors == [
+        (1, "Missing column(s): date_inwarded, quantity_per_carton, sales_price, purchase_price")]
+
+
+def test_empty_file_is_rejected(company_file, tmp_path):
+    with pytest.raises(BulkImportError):
+        import_stock_csv(_csv(tmp_path), company_file, load_stock_data(company_file), 'Test')
@@ -0,0 +1,79 @@
+"""
+The consolidated report reads other companies' files without writing to them.
+"""
+
+import json
+import os
+import shutil
+
+from database.event_store import EventStore
+from database.stock_data import load_stock_data
+from services.consolidated import company_report, merge_reports
+from services.stock_operations import run_stock_transaction, sell_product
+from utils.file_utils import get_log_file_path
+from conftest import make_carton, read_json, write_json
+
+
+def _snapshot(directory):
+    """Every company file under ``directory`` (the test's cache aside), by path."""
+    contents = {}
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [name for name in dirs if name != 'cache']
+        for name in files:
+            with open(os.path.join(root, name), 'rb') as f:
+                contents[os.path.join(root, name)] = f.read()
+    return contents
+
+
+def _legacy_company(tmp_path):
+    """A company whose stock file and sales log still hold rupee floats."""
+    path = str(tmp_path / "old_stock.json")
+    carton = {k: v for k, v in make_carton("P001-C01").items() if not k.endswith('_paise')}
+    carton.update(sales_price=15.5, purchase_price=10.1, mrp=20.0)
+    write_json(path, [carton])
+    write_json(get_log_file_path(path, 'sales'), [{
+        'date': '2024-01-02 10:00:00', 'product_id': 'P001', 'carton_id': 'P001-C01', 'quantity': 3,
+        'sales_price': 15.5, 'purchase_price': 10.1, 'sales_value': 46.5, 'purchase_value': 30.3, 'type': 'sale'}])
+    return path
+
+
+def test_legacy_company_is_converted_in_memory_only(tmp_path):
+    path = _legacy_company(tmp_path)
+    before = _snapshot(tmp_path)
+
+    report = company_report('Old', path)
+
+    assert report['valuation'] == {'units': 10, 'at_sales': 15500, 'at_mrp': 20000}
+    assert report['monthly_sales'] == {'2024-01': [3, 4650, 3030]}
+    assert _snapshot(tmp_path) == before
+
+
+def test_interrupted_commit_is_replayed_in_memory_only(company_file, tmp_path):
+    stock_data = load_stock_data(company_file)
+    run_stock_transaction(company_file, stock_data, lambda data: sell_product(data, 'P001', 0, 1))
+    store = EventStore(company_file)
+    stale = read_json(company_file)
+    with open(store.head_file) as f:
+        stale_head = json.load(f)
+    run_stock_transaction(company_file, stock_data, lambda data: sell_product(data, 'P002', 0, 5))
+    # As if the last commit crashed after appending its events
+    write_json(company_file, stale)
+    with open(store.head_file, 'w') as f:
+        json.dump(stale_head, f)
+    before = _snapshot(tmp_path)
+
+    report = company_report('Test', company_file)
+
+    assert report['valuation']['units'] == 10 + 9 + 0
+    assert _snapshot(tmp_path) == before
+    assert store.needs_recovery()
+
+
+def test_reports_merge_across_companies(company_file, tmp_path):
+    other = str(tmp_path / "other_stock.json")
+    shutil.copy(company_file, other)
+
+    merged = merge_reports([company_report('Test', company_file), company_report('Other', other)])
+
+    assert merged['valuation'] == {'units': 50, 'at_sales': 50 * 1500, 'at_mrp': 50 * 2000}
+    assert merged['stats']['total_cartons'] == 6
@@ -0,0 +1,130 @@
+"""
+FIFO and average cost layers.
+"""
+
+import pytest
+
+from services.cost_layers import CostLedger
+
+
+def _purchase(carton_id, units, unit_cost, product_id='P001'):
+    return {'product_id': product_id, 'carton_id': carton_id, 'quantity': units, 'purchase_price_paise': unit_cost}
+
+
+def _sale(units, sales_price=2000, purchase_price=0, date='2024-03-05 10:00:00', product_id='P001'):
+    return {'product_id': product_id, 'product_name': 'Product', 'quantity': units, 'date': date,
+            'sales_value_paise': units * sales_price, 'purchase_price_paise': purchase_price}
+
+
+def test_fifo_consumes_the_oldest_layer_first_across_partial_cartons():
+    ledger = CostLedger('fifo')
+    ledger.record_purchase(_purchase('P001-C01', 10, 1000))
+    ledger.record_purchase(_purchase('P001-C02', 10, 1200))
+
+    assert ledger.record_sale(_sale(15)) == 10 * 1000 + 5 * 1200
+    assert ledger.inventory_cost('P001') == 5 * 1200
+    assert 'P001-C01' not in ledger.carton_layers
+    assert ledger.record_sale(_sale(3)) == 3 * 1200
+    assert ledger.on_hand['P001'] == [2, 2 * 1200]
+
+
+def test_fifo_costs_a_shortfall_at_the_entry_price():
+    ledger = CostLedger('fifo')
+    ledger.record_purchase(_purchase('P001-C01', 2, 1200))
+
+    # Stock sold that predates the logs is costed at the sale entry's own purchase price
+    assert ledger.record_sale(_sale(5, purchase_price=1300)) == 2 * 1200 + 3 * 1300
+    assert ledger.inventory_cost() == 0
+
+
+def test_average_cost_after_several_inwards():
+    ledger = CostLedger('average')
+    ledger.record_purchase(_purchase('P001-C01', 10, 1000))
+    ledger.record_purchase(_purchase('P001-C02', 20, 1300))
+
+    assert ledger.record_sale(_sale(7)) == 7 * 1200
+    ledger.record_purchase(_purchase('P001-C03', 7, 1500))
+    assert ledger.inventory_cost('P001') == 23 * 1200 + 7 * 1500
+    assert ledger.record_sale(_sale(10)) == 12700
+    assert ledger.on_hand['P001'] == [20, 38100 - 12700]
+
+
+def test_average_share_is_rounded_but_the_pool_stays_exact():
+    ledger = CostLedger('average')
+    ledger.record_purchase(_purchase('P001-C01', 10, 100))
+    ledger.record_purchase(_purchase('P001-C02', 1, 1))
+
+    cogs = [ledger.record_sale(_sale(3)) for _ in range(3)]
+
+    assert cogs == [273, 273, 273]
+    assert ledger.on_hand['P001'] == [2, 1001 - 819]
+    assert ledger.record_sale(_sale(2)) == 182
+    assert ledger.total_cost == ledger.total_units == 0
+
+
+def test_adjustments_change_the_cartons_own_layer():
+    ledger = CostLedger('fifo')
+    ledger.record_purchase(_purchase('P001-C01', 10, 1000))
+    ledger.record_purchase(_purchase('P001-C02', 10, 1200))
+
+    ledger.record_adjustment({'product_id': 'P001', 'carton_id': 'P001-C02', 'old_quantity': 10, 'new_quantity': 7,
+                              'purchase_price_paise': 1200})
+    ledger.record_adjustment({'product_id': 'P001', 'carton_id': 'P001-C01', 'old_quantity': 10, 'new_quantity': 12,
+                              'purchase_price_paise': 1000})
+
+    assert [layer[1] for layer in ledger.layers['P001']] == [12, 7]
+    assert ledger.inventory_cost('P001') == 12 * 1000 + 7 * 1200
+
+
+def test_deleted_carton_is_written_off():
+    ledger = CostLedger('fifo')
+    ledger.record_purchase(_purchase('P001-C01', 10, 1000))
+    ledger.record_purchase(_purchase('P001-C02', 10, 1200))
+
+    ledger.remove_carton({'carton_id': 'P001-C01', 'product_id': 'P001', 'quantity_per_carton': 10})
+
+    assert ledger.inventory_cost() == 10 * 1200
+    assert ledger.record_sale(_sale(4)) == 4 * 1200
+
+
+def test_margin_report_by_month_newest_first():
+    ledger = CostLedger('fifo')
+    ledger.record_purchase(_purchase('P001-C01', 10, 1000))
+    ledger.record_sale(_sale(2, date='2024-02-10 10:00:00'))
+    ledger.record_sale(_sale(3, date='2024-03-01 10:00:00'))
+
+    rows = ledger.margin_report()
+
+    assert [(r['month'], r['units'], r['revenue'], r['cogs'], r['profit']) for r in rows] == [
+        ('2024-03', 3, 6000, 3000, 3000), ('2024-02', 2, 4000, 2000, 2000)]
+    assert rows[0]['margin'] == 50
+    assert ledger.margin_report('2024-02') == [rows[1]]
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        CostLedger('lifo')
+
+
+def test_replaying_the_logs_matches_applying_each_change(tmp_path):
+    from database.stock_data import load_stock_data
+    from services.stock_operations import run_stock_transaction, add_cartons, sell_product, update_carton_quantity
+
+    path = str(tmp_path / "test_stock.json")
+    stock_data = load_stock_data(path)
+    live = CostLedger('fifo')
+    details = [{'quantity': 10, 'damaged': 0, 'sales_price_paise': 2000, 'purchase_price_paise': cost, 'mrp_paise': 0}
+               for cost in (1000, 1200)]
+    operations = [
+        lambda data: add_cartons(data, 'P001', 'Product', 'Test', 'A1', '2024-01-01', None, details),
+        lambda data: sell_product(data, 'P001', 0, 4),
+        lambda data: update_carton_quantity(data, 'P001-C02', 8, 0, 'damage'),
+        lambda data: sell_product(data, 'P001', 0, 7),
+    ]
+    for operation in operations:
+        live.apply_change(run_stock_transaction(path, stock_data, operation))
+
+    replayed = CostLedger.from_logs(path, stock_data, 'fifo')
+
+    assert replayed.on_hand == live.on_hand == {'P001': [7, 7 * 1200]}
+    assert replayed.margin_report() == live.margin_report()
@@ -0,0 +1,73 @@
+"""
+Dashboard alerts: aggregated per product and ranked, with only the top few returned.
+"""
+
+import datetime
+
+import pytest
+
+from services.stock_index import StockIndex
+from services.stock_manager import StockAnalyzer
+from services.thresholds import StockAlerts
+from conftest import make_carton
+
+
+def _day(offset):
+    return (datetime.date.today() + datetime.timedelta(days=offset)).strftime("%Y-%m-%d")
+
+
+@pytest.fixture
+def stock_data():
+    return [
+        # Low stock, in order of urgency: P003, P001 (two cartons), P002, P004
+        make_carton("P001-C01", quantity=2), make_carton("P001-C02", quantity=1),
+        make_carton("P002-C01", quantity=5),
+        make_carton("P003-C01", quantity=1),
+        make_carton("P004-C01", quantity=8, damaged_units=1),
+        make_carton("P005-C01", quantity=50),
+        # An expired carton counts as damaged/expired, not towards live stock
+        make_carton("P005-C02", quantity=20, expiry_date=_day(-1)),
+        # Expiring soon, soonest first: P007, P006, P008
+        make_carton("P006-C01", quantity=30, expiry_date=_day(20)),
+        make_carton("P006-C02", quantity=30, expiry_date=_day(40)),
+        make_carton("P007-C01", quantity=30, expiry_date=_day(3)),
+        make_carton("P008-C01", quantity=30, expiry_date=_day(50)),
+        make_carton("P009-C01", quantity=30, expiry_date=_day(400)),
+        # Sold out cartons are ignored
+        make_carton("P010-C01", quantity=0, date_outwarded="2024-02-01"),
+    ]
+
+
+def _analyzers(stock_data):
+    index = StockIndex(stock_data)
+    return [StockAnalyzer(stock_data), StockAnalyzer(stock_data, index, StockAlerts(index))]
+
+
+def test_top_k_alerts_are_ranked_by_urgency(stock_data):
+    for analyzer in _analyzers(stock_data):
+        stats = analyzer.get_dashboard_stats(top_k=2)
+
+        assert [a['product_id'] for a in stats['low_stock_products']] == ['P003', 'P001']
+        assert stats['low_stock_count'] == 4
+        assert stats['low_stock_products'][1]['live_cartons'] == 2
+        assert [(a['product_id'], a['soonest_expiry']) for a in stats['expiry_alerts']] == [
+            ('P007', _day(3)), ('P006', _day(20))]
+        assert stats['expiry_alert_count'] == 3
+
+
+def test_totals_split_expired_stock_from_live(stock_data):
+    stats = StockAnalyzer(stock_data).get_dashboard_stats()
+
+    assert stats['total_damaged_expired'] == 20 + 1
+    assert stats['total_live'] == 2 + 1 + 5 + 1 + 8 + 50 + 30 * 5
+    assert stats['total_cartons'] == len(stock_data)
+
+
+def test_alert_pages_follow_the_ranking(stock_data):
+    for analyzer in _analyzers(stock_data):
+        page, total = analyzer.get_alerts('low_stock', limit=2, offset=2)
+        assert ([a['product_id'] for a in page], total) == (['P002', 'P004'], 4)
+
+        page, total = analyzer.get_alerts('expiry', limit=5, offset=1)
+        assert ([a['product_id'] for a in page], total) == (['P006', 'P008'], 3)
+        assert page[0]['expiring_cartons'] == 2
@@ -0,0 +1,102 @@
+"""
+Rolling sales velocity in daily ring buffers, and reorder status.
+"""
+
+import datetime
+import random
+
+from config.settings import DEMAND_HISTORY_DAYS, VELOCITY_WINDOWS
+from services.demand import DemandTracker
+
+START = datetime.date(2024, 3, 1)
+
+
+def _sale(day, units, product_id='P001'):
+    return {'date': f"{day.isoformat()} 10:00:00", 'product_id': product_id, 'product_name': 'Product',
+            'quantity': units}
+
+
+def _expected_sums(sales, today):
+    return [sum(units for day, units in sales if 0 <= (today - day).days < window) for window in VELOCITY_WINDOWS]
+
+
+def test_sale_leaves_each_window_at_its_boundary():
+    tracker = DemandTracker(START)
+    tracker.record_sale(_sale(START - datetime.timedelta(days=6), 14))
+    assert tracker.window_sums['P001'] == [14, 14, 14]
+
+    tracker.advance(START + datetime.timedelta(days=1))
+    assert tracker.window_sums['P001'] == [0, 14, 14]
+    tracker.advance(START + datetime.timedelta(days=24))
+    assert tracker.window_sums['P001'] == [0, 0, 14]
+    tracker.advance(START + datetime.timedelta(days=83))
+    assert tracker.window_sums['P001'] == [0, 0, 14]
+    tracker.advance(START + datetime.timedelta(days=84))
+    assert tracker.window_sums['P001'] == [0, 0, 0]
+    assert tracker.buckets['P001'] == [0] * DEMAND_HISTORY_DAYS
+
+
+def test_buckets_are_reused_as_the_ring_wraps_around():
+    rng = random.Random(7)
+    tracker = DemandTracker(START)
+    sales = []
+    today = START
+    # Well past several trips round the ring, a day or a few at a time
+    while today < START + datetime.timedelta(days=4 * DEMAND_HISTORY_DAYS):
+        for _ in range(rng.randint(0, 3)):
+            day = today - datetime.timedelta(days=rng.randint(0, 10))
+            units = rng.randint(1, 9)
+            tracker.record_sale(_sale(day, units))
+            sales.append((day, units))
+        today += datetime.timedelta(days=rng.choice([1, 1, 2, 5]))
+        tracker.advance(today)
+        assert tracker.window_sums['P001'] == _expected_sums(sales, today)
+
+
+def test_sales_older_than_the_history_are_ignored():
+    tracker = DemandTracker(START)
+    tracker.record_sale(_sale(START - datetime.timedelta(days=DEMAND_HISTORY_DAYS), 5))
+    assert 'P001' not in tracker.window_sums
+
+
+def test_sale_dated_after_today_rolls_the_day_over():
+    tracker = DemandTracker(START)
+    tracker.record_sale(_sale(START - datetime.timedelta(days=3), 4))
+
+    tracker.record_sale(_sale(START + datetime.timedelta(days=5), 2))
+
+    assert tracker.today == START + datetime.timedelta(days=5)
+    assert tracker.window_sums['P001'] == [2, 6, 6]
+
+
+def test_long_gap_clears_the_history():
+    tracker = DemandTracker(START)
+    tracker.record_sale(_sale(START, 30))
+
+    tracker.advance(START + datetime.timedelta(days=DEMAND_HISTORY_DAYS + 10))
+
+    assert tracker.window_sums['P001'] == [0, 0, 0]
+    assert tracker.velocity('P001') == 0
+
+
+def test_reorder_list_tracks_cover_against_the_reorder_point():
+    tracker = DemandTracker(START)
+    for days_ago in range(7):
+        tracker.record_sale(_sale(START - datetime.timedelta(days=days_ago), 10, 'FAST'))
+        tracker.record_sale(_sale(START - datetime.timedelta(days=days_ago), 1, 'SLOW'))
+    tracker.set_on_hand('FAST', 50)
+    tracker.set_on_hand('SLOW', 100)
+
+    # 10 a day over 10 days of lead time and safety stock
+    assert tracker.product_demand('FAST')['reorder_point'] == 100
+    assert [d['product_id'] for d in tracker.reorder_list()] == ['FAST']
+    assert tracker.reorder['FAST']['days_of_cover'] == 5
+
+    tracker.set_on_hand('FAST', 150)
+    assert tracker.reorder_list() == []
+    # Once the sales age out of the 7-day window the 30-day average takes over
+    tracker.set_on_hand('FAST', 30)
+    tracker.advance(START + datetime.timedelta(days=7))
+    assert tracker.velocity('FAST', 7) == 0
+    assert tracker.product_demand('FAST')['reorder_point'] == 70 / 30 * 10
+    assert 'FAST' not in tracker.reorder
@@ -0,0 +1,65 @@
+"""
+Recovering the stock file from the event log after an interrupted commit.
+"""
+
+import os
+import shutil
+
+from database.event_store import EventStore
+from database.stock_data import load_stock_data, recover_stock_file
+from services.stock_operations import run_stock_transaction, sell_product
+from conftest import read_json
+
+
+def _crash_after_events(company_file, operation):
+    """Commit ``operation`` and then put back the stock file and head as they were before it.
+
+    This leaves the event log ahead of the stock file, as a crash between
+    appending the events and writing the state would. Returns the state the
+    commit wrote.
+    """
+    store = EventStore(company_file)
+    stock_data = load_stock_data(company_file)
+    # A first commit starts the event log
+    run_stock_transaction(company_file, stock_data, lambda data: sell_product(data, 'P001', 0, 1))
+    shutil.copy(company_file, f"{company_file}.before")
+    shutil.copy(store.head_file, f"{store.head_file}.before")
+    run_stock_transaction(company_file, stock_data, operation)
+    committed = read_json(company_file)
+    shutil.move(f"{company_file}.before", company_file)
+    shutil.move(f"{store.head_file}.before", store.head_file)
+    return committed
+
+
+def test_load_replays_events_missing_from_the_stock_file(company_file):
+    committed = _crash_after_events(company_file, lambda data: sell_product(data, 'P001', 1, 3))
+    store = EventStore(company_file)
+    assert store.needs_recovery()
+
+    assert load_stock_data(company_file) == committed
+    assert read_json(company_file) == committed
+    assert not store.needs_recovery()
+
+
+def test_recover_cuts_off_a_torn_final_event(company_file):
+    committed = _crash_after_events(company_file, lambda data: sell_product(data, 'P002', 0, 2))
+    store = EventStore(company_file)
+    with open(store.events_file, 'ab') as f:
+        f.write(b'{"type":"sale","carton_id":"P001-C0')
+
+    cartons, head = store.recover()
+
+    assert cartons == committed
+    assert os.path.getsize(store.events_file) == head['offset']
+
+
+def test_recover_without_checkpoints_starts_from_the_head(company_file):
+    committed = _crash_after_events(company_file, lambda data: sell_product(data, 'P002', 0, 2))
+    store = EventStore(company_file)
+    # As if bootstrap was interrupted before its genesis checkpoint was indexed
+    shutil.rmtree(store.checkpoint_dir)
+
+    recover_stock_file(company_file)
+
+    assert read_json(company_file) == committed
+    assert not store.needs_recovery()
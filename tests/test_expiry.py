@@ -0,0 +1,78 @@
+"""
+Expiry buckets, the midnight boundary, and selling around expired cartons.
+"""
+
+import datetime
+
+import pytest
+
+from services.stock_index import ExpiryIndex, StockIndex
+from services.stock_operations import StockOperationError, sell_product
+from utils.date_utils import format_date
+from conftest import make_carton
+
+TODAY = datetime.date.today()
+
+
+def _days(n):
+    return format_date(TODAY + datetime.timedelta(days=n))
+
+
+def test_expired_and_expiring_are_range_lookups():
+    index = ExpiryIndex(datetime.date(2024, 5, 10))
+    index.add('A', datetime.date(2024, 5, 9))
+    index.add('B', datetime.date(2024, 5, 10))
+    index.add('C', datetime.date(2024, 5, 11))
+    index.add('D', datetime.date(2024, 6, 30))
+    index.add('E', None)
+
+    assert index.expired() == {'A', 'B'}
+    assert index.expiring_within(30) == [(datetime.date(2024, 5, 11), 'C')]
+    assert not index.is_expired('E')
+    assert len(index) == 4
+
+    index.remove('B')
+    index.add('C', datetime.date(2024, 5, 1))  # Re-adding moves a carton to its new day
+    assert index.expired() == {'A', 'C'}
+    assert list(index.cartons_between()) == [(datetime.date(2024, 5, 1), 'C'), (datetime.date(2024, 5, 9), 'A'),
+                                             (datetime.date(2024, 6, 30), 'D')]
+
+
+def test_advance_reports_only_cartons_crossed():
+    index = ExpiryIndex(datetime.date(2024, 5, 10))
+    index.add('A', datetime.date(2024, 5, 10))
+    index.add('B', datetime.date(2024, 5, 11))
+    index.add('C', datetime.date(2024, 5, 13))
+
+    assert index.advance(datetime.date(2024, 5, 12)) == {'B'}
+    assert index.advance(datetime.date(2024, 5, 12)) == set()
+    assert index.is_expired('B') and not index.is_expired('C')
+    assert index.advance(datetime.date(2024, 5, 20)) == {'C'}
+
+
+def test_sale_skips_expired_cartons():
+    stock_data = [make_carton('P001-C01', quantity=10, expiry_date=_days(-1)),
+                  make_carton('P001-C02', quantity=10, expiry_date=_days(0)),
+                  make_carton('P001-C03', quantity=10, expiry_date=_days(20)),
+                  make_carton('P001-C04', quantity=10, expiry_date=_days(5))]
+
+    change = sell_product(stock_data, 'P001', 0, 15)
+
+    assert [(e['carton_id'], e['quantity']) for e in change.sales_log] == [('P001-C04', 10), ('P001-C03', 5)]
+    assert [c['quantity_per_carton'] for c in stock_data[:2]] == [10, 10]
+
+
+def test_expired_units_do_not_count_as_available():
+    stock_data = [make_carton('P001-C01', quantity=10, expiry_date=_days(-3)),
+                  make_carton('P001-C02', quantity=4, expiry_date=_days(3))]
+
+    with pytest.raises(StockOperationError, match='Available: 4 units'):
+        sell_product(stock_data, 'P001', 0, 5)
+    assert StockIndex(stock_data).sellable_units('P001') == 4
+
+
+def test_only_expired_stock_left_is_reported():
+    stock_data = [make_carton('P001-C01', quantity=10, expiry_date=_days(-3))]
+
+    with pytest.raises(StockOperationError, match='expired'):
+        sell_product(stock_data, 'P001', 0, 1)
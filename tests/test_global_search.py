@@ -0,0 +1,63 @@
+"""
+Product search across companies.
+"""
+
+import os
+
+from services.global_search import GlobalProductSearch
+from services.stock_index import StockIndex
+from conftest import make_carton, write_json
+
+
+def _company(tmp_path, name, cartons):
+    path = str(tmp_path / f"{name}_stock.json")
+    write_json(path, cartons)
+    return path
+
+
+def test_hits_are_ranked_by_match_then_stock(tmp_path):
+    companies = {
+        'North': _company(tmp_path, 'north', [make_carton('SOAP1-C01', product_name='Soap Bar', quantity=5),
+                                              make_carton('SOAP-C01', product_name='Soap', quantity=3)]),
+        'South': _company(tmp_path, 'south', [make_carton('SOAP1-C01', product_name='Soap Bar', quantity=20),
+                                              make_carton('XYZ-C01', product_name='Liquid soap', quantity=50)]),
+    }
+
+    hits, timed_out, errors = GlobalProductSearch().search('soap', companies, timeout=5)
+
+    assert (timed_out, errors) == ([], [])
+    assert [(h['company'], h['product_id'], h['live_units']) for h in hits] == [
+        ('North', 'SOAP', 3), ('South', 'SOAP1', 20), ('North', 'SOAP1', 5), ('South', 'XYZ', 50)]
+
+
+def test_live_index_is_used_instead_of_the_file(tmp_path):
+    path = _company(tmp_path, 'north', [make_carton('P001-C01', quantity=5)])
+    in_memory = [make_carton('P001-C01', quantity=2)]
+
+    hits, _, _ = GlobalProductSearch().search('p001', {'North': path}, {path: StockIndex(in_memory)}, timeout=5)
+
+    assert [h['live_units'] for h in hits] == [2]
+
+
+def test_search_leaves_unmigrated_companies_untouched(tmp_path):
+    carton = {k: v for k, v in make_carton('P001-C01').items() if not k.endswith('_paise')}
+    carton.update(sales_price=15.5, purchase_price=10.1, mrp=20.0)
+    path = _company(tmp_path, 'old', [carton])
+    with open(path, 'rb') as f:
+        before = f.read()
+
+    hits, _, errors = GlobalProductSearch().search('p001', {'Old': path}, timeout=5)
+
+    assert errors == []
+    assert [h['live_units'] for h in hits] == [10]
+    with open(path, 'rb') as f:
+        assert f.read() == before
+    # No lock or sidecar files were created beside it
+    assert set(os.listdir(tmp_path)) <= {'cache', 'old_stock.json'}
+
+
+def test_missing_company_is_reported_as_an_error(tmp_path):
+    hits, _, errors = GlobalProductSearch().search('p001', {'Gone': str(tmp_path / 'gone_stock.json')}, timeout=5)
+
+    assert hits == []
+    assert [company for company, _ in errors] == ['Gone']
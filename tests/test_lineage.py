@@ -0,0 +1,75 @@
+"""
+The carton lineage index: a carton's history read from its own log entries.
+"""
+
+import os
+
+from database.lineage import CartonLineage, get_lineage_file_path
+from database.log_store import record_tombstones, compact_logs
+from database.stock_data import load_stock_data, append_log_entries
+from services.stock_operations import run_stock_transaction, sell_product
+from utils.file_utils import get_log_file_path
+
+
+def _inward(carton_id, quantity=10):
+    return {'date': '2024-01-01 09:00:00', 'product_id': carton_id.split('-C')[0], 'carton_id': carton_id,
+            'quantity': quantity, 'type': 'purchase'}
+
+
+def _history(company_file, carton_id):
+    return [(source, entry.get('type'), entry.get('quantity')) for source, entry in
+            CartonLineage(company_file).history(carton_id)]
+
+
+def _sell(company_file, product_id, quantity):
+    stock_data = load_stock_data(company_file)
+    run_stock_transaction(company_file, stock_data, lambda data: sell_product(data, product_id, 0, quantity))
+
+
+def test_history_joins_purchase_and_sales_for_one_carton(company_file):
+    append_log_entries(get_log_file_path(company_file, 'purchase'), [_inward('P001-C01'), _inward('P002-C01', 5)])
+    _sell(company_file, 'P001', 12)
+
+    # Emptying the carton outwards it; that event comes from the inventory event log
+    assert _history(company_file, 'P001-C01') == [
+        ('purchase', 'purchase', 10), ('sales', 'sale', 10), ('events', 'outward', None)]
+    assert _history(company_file, 'P001-C02') == [('sales', 'sale', 2)]
+    assert _history(company_file, 'P002-C01') == [('purchase', 'purchase', 5)]
+
+
+def test_transactions_extend_a_built_index(company_file):
+    lineage = CartonLineage(company_file)
+    lineage.history('P002-C01')
+    assert os.path.exists(get_lineage_file_path(company_file))
+
+    _sell(company_file, 'P002', 2)
+    _sell(company_file, 'P002', 1)
+
+    # The new sales were indexed as they were logged, without a rescan
+    lineage._load_new_lines()
+    assert sum(source == 'sales' for source, _, _ in lineage.offsets['P002-C01']) == 2
+    assert [q for source, _, q in _history(company_file, 'P002-C01') if source == 'sales'] == [2, 1]
+
+
+def test_entries_written_elsewhere_are_caught_up(company_file):
+    CartonLineage(company_file).history('P001-C01')
+
+    append_log_entries(get_log_file_path(company_file, 'purchase'), [_inward('P001-C01')])
+
+    assert _history(company_file, 'P001-C01') == [('purchase', 'purchase', 10)]
+
+
+def test_rewritten_logs_rebuild_the_index(company_file):
+    append_log_entries(get_log_file_path(company_file, 'purchase'), [_inward('P001-C01'), _inward('P002-C01', 5)])
+    _sell(company_file, 'P002', 2)
+    lineage = CartonLineage(company_file)
+    assert len(lineage.history('P002-C01')) == 2
+
+    record_tombstones(company_file, [{'carton_id': 'P001-C01', 'product_id': 'P001'}])
+    compact_logs(company_file)
+
+    assert not os.path.exists(get_lineage_file_path(company_file))
+    assert _history(company_file, 'P001-C01') == []
+    assert [q for _, _, q in _history(company_file, 'P002-C01')] == [5, 2]
+    # A stale in-memory view notices the moved entries and rebuilds too
+    assert [entry['quantity'] for _, entry in lineage.history('P002-C01')] == [5, 2]
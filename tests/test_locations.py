@@ -0,0 +1,68 @@
+"""
+Location rollups and prefix queries on the StockIndex location tree.
+"""
+
+from services.locations import location_summary, child_locations, cartons_at_location, normalise_location
+from services.stock_index import StockIndex, parse_location
+from conftest import make_carton
+
+
+def _stock():
+    return [
+        make_carton("P001-C01", quantity=10, location="W1-S01-L1-P01"),
+        make_carton("P001-C02", quantity=5, location="w1-s01-l1-p01", damaged_units=1),
+        make_carton("P002-C01", quantity=4, location="W1-S01-L2-P01"),
+        make_carton("P002-C02", quantity=0, location="W1-S02-L1-P01", date_outwarded="2024-02-01"),
+        make_carton("P003-C01", quantity=7, location="W2-S01-L1-P01"),
+        make_carton("P004-C01", quantity=3, location=""),
+    ]
+
+
+def _rollup(index, prefix):
+    summary = location_summary(index, prefix)
+    return summary and {k: summary[k] for k in ('cartons', 'units', 'damaged_units', 'positions', 'occupied_positions')}
+
+
+def test_parse_location_normalises_segments():
+    assert parse_location(" w1-S01--l1 ") == ('W1', 'S01', 'L1')
+    assert parse_location(None) == ('UNASSIGNED',)
+    assert normalise_location("w1-s01") == "W1-S01"
+    assert normalise_location("  ") == ""
+
+
+def test_rollups_cover_the_subtree():
+    index = StockIndex(_stock())
+
+    assert _rollup(index, "W1") == {'cartons': 3, 'units': 19, 'damaged_units': 1, 'positions': 3,
+                                    'occupied_positions': 2}
+    assert _rollup(index, "")['cartons'] == 5
+    assert location_summary(index, "w1-s01")['level'] == 'Section'
+    assert location_summary(index, "W1-S01")['stock_value'] == 19 * 1500
+    assert location_summary(index, "W9") is None
+
+
+def test_children_and_cartons_under_a_prefix():
+    index = StockIndex(_stock())
+
+    assert [(c['location'], c['level'], c['cartons']) for c in child_locations(index, "W1")] == [
+        ('W1-S01', 'Section', 3), ('W1-S02', 'Section', 0)]
+    assert [c['location'] for c in child_locations(index)] == ['UNASSIGNED', 'W1', 'W2']
+    assert [c['carton_id'] for c in cartons_at_location(index, "W1")] == ['P001-C01', 'P002-C01', 'P001-C02']
+    assert [c['carton_id'] for c in cartons_at_location(index, "W1-S02", include_outwarded=True)] == ['P002-C02']
+    assert child_locations(index, "W9") == []
+
+
+def test_moves_and_removals_keep_rollups_in_step_with_a_rebuild():
+    stock = _stock()
+    index = StockIndex(stock)
+
+    moved = dict(stock[0], location="W2-S01-L1-P02")
+    index.add_carton(moved)
+    index.remove_carton("P002-C02")
+    stock = [moved] + stock[1:3] + stock[4:]
+    rebuilt = StockIndex(stock)
+
+    for prefix in ("", "W1", "W1-S01", "W1-S01-L1-P01", "W2", "W2-S01"):
+        assert _rollup(index, prefix) == _rollup(rebuilt, prefix)
+    # Positions that no longer hold anything are pruned
+    assert location_summary(index, "W1-S02") is None
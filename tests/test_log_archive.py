@@ -0,0 +1,97 @@
+"""
+Archiving closed months of the logs and reading the archive and live log together.
+"""
+
+import datetime
+import shutil
+
+from database.log_archive import archive_logs, load_manifest, logs_need_archiving
+from database.log_store import iter_log_entries, pack_sales_entries
+from utils.file_utils import get_log_file_path
+from conftest import make_carton, read_json, write_json
+
+TODAY = datetime.date(2024, 4, 15)
+
+
+def _purchase(carton_id, date, quantity=10):
+    return {'date': date, 'product_id': carton_id.split('-C')[0], 'product_name': 'Product', 'carton_id': carton_id,
+            'quantity': quantity, 'sales_price_paise': 1500, 'purchase_price_paise': 1000, 'mrp_paise': 2000,
+            'sales_value_paise': quantity * 1500, 'purchase_value_paise': quantity * 1000, 'type': 'purchase'}
+
+
+def _sale(carton_id, date, quantity):
+    return dict(_purchase(carton_id, date, quantity), type='sale')
+
+
+def _company(tmp_path):
+    path = str(tmp_path / "test_stock.json")
+    write_json(path, [make_carton("P001-C01"), make_carton("P001-C02"), make_carton("P002-C01")])
+    write_json(get_log_file_path(path, 'purchase'), [
+        _purchase('P001-C01', '2024-01-05 09:00:00'),
+        _purchase('P002-C01', '2024-02-10 09:00:00'),
+        _purchase('P001-C02', '2024-04-02 09:00:00'),
+    ])
+    write_json(get_log_file_path(path, 'sales'), pack_sales_entries([
+        _sale('P001-C01', '2024-01-20 12:00:00', 4),
+        _sale('P001-C01', '2024-02-03 12:00:00', 1),
+        _sale('P002-C01', '2024-02-03 12:00:00', 2),
+        _sale('P001-C02', '2024-04-10 12:00:00', 3),
+    ]))
+    return path
+
+
+def _read(path, log_type, **filters):
+    return list(iter_log_entries(get_log_file_path(path, log_type), **filters))
+
+
+def test_archived_entries_read_back_with_the_live_log(tmp_path):
+    path = _company(tmp_path)
+    before = {log_type: _read(path, log_type) for log_type in ('purchase', 'sales')}
+
+    assert logs_need_archiving(path, TODAY)
+    assert archive_logs(path, TODAY) == 5
+
+    assert not logs_need_archiving(path, TODAY)
+    assert [segment['month'] for segment in load_manifest(get_log_file_path(path, 'purchase'))] == ['2024-01', '2024-02']
+    assert [e['carton_id'] for e in read_json(get_log_file_path(path, 'purchase'))] == ['P001-C02']
+    for log_type in ('purchase', 'sales'):
+        assert _read(path, log_type) == before[log_type]
+
+
+def test_reads_skip_segments_outside_the_dates(tmp_path):
+    path = _company(tmp_path)
+    archive_logs(path, TODAY)
+
+    february = _read(path, 'sales', start='2024-02-01', end='2024-02-29')
+    assert [(e['carton_id'], e['quantity']) for e in february] == [('P001-C01', 1), ('P002-C01', 2)]
+    assert [e['carton_id'] for e in _read(path, 'purchase', product_ids={'P002'})] == ['P002-C01']
+
+
+def test_interrupted_archive_run_does_not_duplicate_entries(tmp_path):
+    path = _company(tmp_path)
+    sales_log = get_log_file_path(path, 'sales')
+    before = _read(path, 'sales')
+    shutil.copy(sales_log, f"{sales_log}.before")
+    archive_logs(path, TODAY)
+    # As if the run stopped after writing the segments but before rewriting the live log
+    shutil.move(f"{sales_log}.before", sales_log)
+
+    assert _read(path, 'sales') == before
+    assert archive_logs(path, TODAY) == 0
+    assert [e['date'][:7] for e in _read(path, 'sales')] == ['2024-01', '2024-02', '2024-02', '2024-04']
+    assert len(read_json(sales_log)) == 1
+
+
+def test_late_entries_are_merged_into_their_segment(tmp_path):
+    path = _company(tmp_path)
+    archive_logs(path, TODAY)
+    purchase_log = get_log_file_path(path, 'purchase')
+    late = _purchase('P003-C01', '2024-01-30 17:00:00', 4)
+    write_json(purchase_log, read_json(purchase_log) + [late])
+
+    assert archive_logs(path, TODAY) == 1
+
+    january = load_manifest(purchase_log)[0]
+    assert (january['month'], january['entries'], january['last_date']) == ('2024-01', 2, '2024-01-30 17:00:00')
+    assert read_json(purchase_log) == [_purchase('P001-C02', '2024-04-02 09:00:00')]
+    assert [e['carton_id'] for e in _read(path, 'purchase')] == ['P001-C01', 'P003-C01', 'P002-C01', 'P001-C02']
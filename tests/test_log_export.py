@@ -0,0 +1,83 @@
+"""
+Streaming CSV export of the transaction logs.
+"""
+
+import csv
+import os
+import threading
+
+import pytest
+
+from database.log_store import pack_sales_entries
+from services.log_export import EXPORT_COLUMNS, ExportCancelled, export_transactions_csv
+from utils.file_utils import get_log_file_path
+from conftest import write_json
+
+
+def _entry(carton_id, date, quantity, log_type):
+    return {'date': date, 'product_id': carton_id.split('-C')[0], 'product_name': 'Product', 'carton_id': carton_id,
+            'quantity': quantity, 'sales_price_paise': 1550, 'purchase_price_paise': 1000, 'mrp_paise': 2000,
+            'sales_value_paise': quantity * 1550, 'purchase_value_paise': quantity * 1000, 'type': log_type}
+
+
+@pytest.fixture
+def company(tmp_path):
+    path = str(tmp_path / "test_stock.json")
+    write_json(path, [])
+    write_json(get_log_file_path(path, 'purchase'), [
+        _entry('P001-C01', '2024-03-01 09:00:00', 10, 'purchase'),
+        _entry('P002-C01', '2024-03-03 09:00:00', 10, 'purchase'),
+    ])
+    write_json(get_log_file_path(path, 'sales'), pack_sales_entries([
+        _entry('P001-C01', '2024-03-02 12:00:00', 3, 'sale'),
+        _entry('P002-C01', '2024-03-04 12:00:00', 2, 'sale'),
+    ]))
+    return path
+
+
+def _read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
+
+
+def test_logs_are_merged_in_date_order(company, tmp_path):
+    out = str(tmp_path / "export.csv")
+
+    assert export_transactions_csv(company, out) == 4
+
+    rows = _read_csv(out)
+    assert rows[0] == EXPORT_COLUMNS
+    assert [(r[0][:10], r[1], r[4]) for r in rows[1:]] == [
+        ('2024-03-01', 'purchase', 'P001-C01'), ('2024-03-02', 'sale', 'P001-C01'),
+        ('2024-03-03', 'purchase', 'P002-C01'), ('2024-03-04', 'sale', 'P002-C01')]
+    # Money is exact rupees; profit only on sales
+    assert rows[2][5:] == ['3', '10.00', '15.50', '20.00', '30.00', '46.50', '16.50']
+    assert rows[1][-1] == ''
+
+
+def test_dates_and_products_filter_the_rows(company, tmp_path):
+    out = str(tmp_path / "export.csv")
+
+    assert export_transactions_csv(company, out, start='2024-03-02', end='2024-03-03', product_ids={'P002'}) == 1
+    assert _read_csv(out)[1][4] == 'P002-C01'
+
+
+def test_progress_is_reported_per_chunk(company, tmp_path):
+    calls = []
+
+    export_transactions_csv(company, str(tmp_path / "export.csv"), progress=lambda *args: calls.append(args),
+                            chunk_rows=1)
+
+    assert [rows for rows, _, _ in calls] == [1, 2, 3, 4, 4]
+    assert calls[-1][1] == calls[-1][2] > 0
+
+
+def test_cancel_removes_the_partial_file(company, tmp_path):
+    out = str(tmp_path / "export.csv")
+    cancel = threading.Event()
+    cancel.set()
+
+    with pytest.raises(ExportCancelled):
+        export_transactions_csv(company, out, cancel_event=cancel, chunk_rows=1)
+
+    assert not os.path.exists(out) and not os.path.exists(f"{out}.tmp")
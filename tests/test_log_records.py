@@ -0,0 +1,69 @@
+"""
+Compact sale records: packing per-carton entries and expanding them back.
+"""
+
+from database.log_store import pack_sales_entries, expand_log_record, iter_log_entries
+from database.stock_data import load_stock_data
+from services.stock_operations import run_stock_transaction, sell_product
+from utils.file_utils import get_log_file_path
+from conftest import make_carton, write_json
+
+
+def _sale_entry(carton_id, quantity, sales_price=1500, purchase_price=1000, mrp=2000, date='2024-03-01 10:00:00', seq=7):
+    return {
+        'date': date,
+        'product_id': carton_id.split('-C')[0],
+        'product_name': 'Product',
+        'carton_id': carton_id,
+        'quantity': quantity,
+        'sales_price_paise': sales_price,
+        'purchase_price_paise': purchase_price,
+        'mrp_paise': mrp,
+        'sales_value_paise': quantity * sales_price,
+        'purchase_value_paise': quantity * purchase_price,
+        'type': 'sale',
+        'seq': seq,
+    }
+
+
+def test_pack_then_expand_gives_the_entries_back():
+    entries = [_sale_entry('P001-C01', 4), _sale_entry('P001-C02', 6, sales_price=1600, mrp=2100)]
+
+    records = pack_sales_entries(entries)
+
+    assert len(records) == 1
+    record = records[0]
+    assert record['quantity'] == 10
+    assert record['sales_value_paise'] == 4 * 1500 + 6 * 1600
+    # Prices shared with the record are held once; only differing ones go on the line
+    assert record['lines'][0] == {'carton_id': 'P001-C01', 'quantity': 4}
+    assert record['lines'][1] == {'carton_id': 'P001-C02', 'quantity': 6, 'sales_price_paise': 1600, 'mrp_paise': 2100}
+    assert expand_log_record(record) == entries
+
+
+def test_pack_keeps_separate_sales_apart():
+    entries = [_sale_entry('P001-C01', 4), _sale_entry('P002-C01', 1),
+               _sale_entry('P001-C01', 2, seq=8), _sale_entry('P001-C02', 3, date='2024-03-02 09:00:00', seq=8)]
+
+    records = pack_sales_entries(entries)
+
+    assert [(r['product_id'], r['quantity']) for r in records] == [('P001', 4), ('P002', 1), ('P001', 2), ('P001', 3)]
+    assert [e for r in records for e in expand_log_record(r)] == entries
+
+
+def test_non_sale_entries_expand_to_themselves():
+    entry = dict(_sale_entry('P001-C01', 10), type='purchase')
+    assert expand_log_record(entry) == [entry]
+
+
+def test_a_logged_sale_reads_back_per_carton(tmp_path):
+    path = str(tmp_path / "test_stock.json")
+    write_json(path, [make_carton("P001-C01", quantity=3), make_carton("P001-C02", quantity=10, sales_price_paise=1600)])
+    stock_data = load_stock_data(path)
+
+    change = run_stock_transaction(path, stock_data, lambda data: sell_product(data, 'P001', 0, 5))
+
+    entries = list(iter_log_entries(get_log_file_path(path, 'sales')))
+    assert [(e['carton_id'], e['quantity'], e['sales_value_paise']) for e in entries] == [
+        ('P001-C01', 3, 4500), ('P001-C02', 2, 3200)]
+    assert entries == change.sales_log
@@ -0,0 +1,70 @@
+"""
+The pattern-matching quantity scan behind reconciliation, checked against decoding.
+"""
+
+import pytest
+
+import database.log_store as log_store
+from database.log_store import sum_log_quantities, pack_sales_entries, Tombstones
+from database.stock_data import append_log_entries
+
+
+def _sale(carton_id, quantity, date):
+    return {'date': date, 'product_id': carton_id.split('-C')[0], 'product_name': 'Product',
+            'carton_id': carton_id, 'quantity': quantity, 'sales_price_paise': 1500,
+            'purchase_price_paise': 1000, 'mrp_paise': 2000, 'sales_value_paise': quantity * 1500,
+            'purchase_value_paise': quantity * 1000, 'type': 'sale'}
+
+
+@pytest.fixture
+def sales_log(tmp_path):
+    """A sales log in the app's layout: per-carton entries followed by compact records."""
+    path = str(tmp_path / "test_stock_sales_log.json")
+    append_log_entries(path, [_sale('P001-C01', 2, '2024-03-01 10:00:00'), _sale('P002-C01', 1, '2024-03-01 11:00:00')])
+    append_log_entries(path, pack_sales_entries([
+        _sale('P001-C01', 3, '2024-03-02 10:00:00'), _sale('P001-C02', 4, '2024-03-02 10:00:00')]))
+    append_log_entries(path, pack_sales_entries([
+        _sale('P002-C01', 5, '2024-03-03 10:00:00'), _sale('P002-C02', 6, '2024-03-03 10:00:00')]))
+    return path
+
+
+def _decoded(path, tombstones, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(log_store, '_scan_quantities', lambda f, chunk_size, tombstones: None)
+        return sum_log_quantities(path, tombstones)
+
+
+@pytest.mark.parametrize('chunk_size', [64, 1 << 20])
+@pytest.mark.parametrize('tombstones', [
+    None,
+    Tombstones({'P001-C01': '2024-03-05 09:00:00'}),  # Deleted after all its entries
+    Tombstones({'P002-C01': '2024-03-02 12:00:00'}),  # Deleted between its entries (the ID was reused)
+])
+def test_scan_matches_decoding(sales_log, tombstones, chunk_size, monkeypatch):
+    with open(sales_log, 'rb') as f:
+        scanned = log_store._scan_quantities(f, chunk_size, tombstones)
+
+    assert scanned is not None
+    assert scanned == _decoded(sales_log, tombstones, monkeypatch)
+
+
+def test_tombstoned_lines_are_not_counted(sales_log):
+    totals, entries = sum_log_quantities(sales_log, Tombstones({'P001-C01': '2024-03-05 09:00:00'}))
+
+    assert 'P001-C01' not in totals
+    assert totals == {'P002-C01': 6, 'P001-C02': 4, 'P002-C02': 6}
+    assert entries == 4
+
+
+def test_same_second_tombstone_falls_back_to_decoding(sales_log):
+    with open(sales_log, 'rb') as f:
+        assert log_store._scan_quantities(f, 1 << 20, Tombstones({'P001-C01': '2024-03-02 10:00:00'})) is None
+
+
+def test_other_layouts_fall_back_to_decoding(tmp_path):
+    path = tmp_path / "compact_sales_log.json"
+    path.write_text('[{"date": "2024-03-01", "carton_id": "P001-C01", "quantity": 2}]')
+
+    with open(path, 'rb') as f:
+        assert log_store._scan_quantities(f, 1 << 20, None) is None
+    assert sum_log_quantities(str(path)) == ({'P001-C01': 2}, 1)
@@ -0,0 +1,83 @@
+"""
+Moving a company's rupee amounts to integer paise.
+"""
+
+import json
+
+from database.stock_data import migrate_money_to_paise
+from utils.file_utils import get_log_file_path, get_adjustments_file_path
+from utils.money import to_paise
+from conftest import make_carton, read_json, write_json
+
+
+def _legacy(record, **rupees):
+    """A record with its paise fields replaced by rupee floats."""
+    record = {k: v for k, v in record.items() if not k.endswith('_paise')}
+    record.update(rupees)
+    return record
+
+
+def _write_legacy_company(tmp_path):
+    path = str(tmp_path / "old_stock.json")
+    write_json(path, [_legacy(make_carton("P001-C01"), sales_price=15.5, purchase_price=10.1, mrp=20.0)])
+    write_json(get_log_file_path(path, 'purchase'), [{
+        'date': '2024-01-01 10:00:00', 'product_id': 'P001', 'carton_id': 'P001-C01', 'quantity': 10,
+        'sales_price': 15.5, 'purchase_price': 10.1, 'mrp': 20.0, 'sales_value': 155.0, 'purchase_value': 101.0,
+        'type': 'purchase'}])
+    write_json(get_log_file_path(path, 'sales'), [{
+        'date': '2024-01-02 10:00:00', 'product_id': 'P001', 'carton_id': 'P001-C01', 'quantity': 3,
+        'sales_price': 15.5, 'purchase_price': 10.1, 'sales_value': 46.5, 'purchase_value': 30.3, 'type': 'sale'}])
+    with open(get_adjustments_file_path(path), 'w') as f:
+        f.write(json.dumps({'ts': '2024-01-03 10:00:00', 'carton_id': 'P001-C01', 'product_id': 'P001',
+                            'old_quantity': 7, 'new_quantity': 6, 'purchase_price': 10.1}) + '\n')
+    return path
+
+
+def _snapshot(path):
+    files = [path, get_log_file_path(path, 'purchase'), get_log_file_path(path, 'sales'),
+             get_adjustments_file_path(path)]
+    contents = {}
+    for name in files:
+        with open(name, 'rb') as f:
+            contents[name] = f.read()
+    return contents
+
+
+def test_to_paise_rounds_half_up():
+    assert to_paise(10.1) == 1010
+    assert to_paise('1,250.505') == 125051
+    assert to_paise(3) == 300
+
+
+def test_migration_converts_every_file(tmp_path):
+    path = _write_legacy_company(tmp_path)
+
+    assert migrate_money_to_paise(path)
+
+    carton = read_json(path)[0]
+    assert (carton['sales_price_paise'], carton['purchase_price_paise'], carton['mrp_paise']) == (1550, 1010, 2000)
+    assert 'sales_price' not in carton
+    purchase = read_json(get_log_file_path(path, 'purchase'))[0]
+    assert (purchase['sales_value_paise'], purchase['purchase_value_paise']) == (15500, 10100)
+    sale = read_json(get_log_file_path(path, 'sales'))[0]
+    assert (sale['sales_value_paise'], sale['purchase_value_paise']) == (4650, 3030)
+    with open(get_adjustments_file_path(path)) as f:
+        assert json.loads(f.readline())['purchase_price_paise'] == 1010
+
+
+def test_migration_is_a_no_op_once_done(tmp_path):
+    path = _write_legacy_company(tmp_path)
+    migrate_money_to_paise(path)
+    migrated = _snapshot(path)
+
+    assert not migrate_money_to_paise(path)
+    assert _snapshot(path) == migrated
+
+
+def test_migration_leaves_a_paise_company_alone(company_file):
+    with open(company_file, 'rb') as f:
+        before = f.read()
+
+    assert not migrate_money_to_paise(company_file)
+    with open(company_file, 'rb') as f:
+        assert f.read() == before
@@ -0,0 +1,53 @@
+"""
+Sales summary report sections and PDF rendering.
+"""
+
+import pytest
+
+from services.sales_report import build_report_sections, render_sales_report_pdf, _row_cells
+
+MONTHLY_SALES = {
+    ('2024-02', 'P002', 'Beta'): {'quantity': 4, 'sales_value': 8000, 'purchase_value': 6000},
+    ('2024-01', 'P002', 'Beta'): {'quantity': 1, 'sales_value': 2000, 'purchase_value': 1500},
+    ('2024-01', 'P001', 'Alpha'): {'quantity': 3, 'sales_value': 4500, 'purchase_value': 3000},
+}
+
+
+def test_sections_by_month_with_subtotals():
+    sections = build_report_sections(MONTHLY_SALES)
+
+    assert [(title, [r['product_id'] for r in rows]) for title, rows, _ in sections] == [
+        ('Month 2024-01', ['P001', 'P002']), ('Month 2024-02', ['P002'])]
+    assert sections[0][2] == {'quantity': 4, 'sales_value': 6500, 'purchase_value': 4500}
+
+
+def test_sections_by_product_in_month_order():
+    sections = build_report_sections(MONTHLY_SALES, group_by='product')
+
+    assert [(title, [r['month'] for r in rows]) for title, rows, _ in sections] == [
+        ('P001 - Alpha', ['2024-01']), ('P002 - Beta', ['2024-01', '2024-02'])]
+    assert sections[1][2]['sales_value'] == 10000
+
+
+def test_unknown_grouping_is_rejected():
+    with pytest.raises(ValueError):
+        build_report_sections(MONTHLY_SALES, group_by='week')
+
+
+def test_row_cells_show_rupees_and_margin_on_cost():
+    row = dict(MONTHLY_SALES[('2024-01', 'P001', 'Alpha')], month='2024-01', product_id='P001', product_name='Alpha')
+    assert _row_cells(row) == ['2024-01', 'P001', 'Alpha', '3', '45.00', '30.00', '15.00', '50.0']
+
+
+def test_pdf_paginates_and_reports_progress(tmp_path):
+    pytest.importorskip('reportlab')
+    many = {(f"2024-{month:02d}", f"P{n:03d}", 'Item'): {'quantity': 1, 'sales_value': 100, 'purchase_value': 80}
+            for month in range(1, 13) for n in range(60)}
+    calls = []
+
+    pages = render_sales_report_pdf(str(tmp_path / "report.pdf"), 'Test', many,
+                                    progress=lambda done, total: calls.append((done, total)))
+
+    assert pages > 1
+    assert calls[-1] == (720, 720)
+    assert (tmp_path / "report.pdf").read_bytes().startswith(b'%PDF')
@@ -0,0 +1,47 @@
+"""
+Multi-line orders and their pick lists.
+"""
+
+import pytest
+
+from services.pick_list import build_pick_list, location_sort_key
+from services.stock_operations import StockOperationError, sell_order
+from conftest import make_carton
+
+
+@pytest.fixture
+def stock_data():
+    return [make_carton('P001-C01', quantity=4, location='W1-S10-L1'),
+            make_carton('P001-C02', quantity=10, location='W1-S2-L1'),
+            make_carton('P002-C01', quantity=6, location='W1-S2-L3'),
+            make_carton('P003-C01', quantity=2, location='W2-S1-L1')]
+
+
+def test_failed_line_leaves_earlier_lines_cartons_as_they_were(stock_data):
+    before = [dict(c) for c in stock_data]
+    objects = list(stock_data)
+
+    with pytest.raises(StockOperationError, match='P003'):
+        sell_order(stock_data, [('P001', 0, 6), ('P002', 1, 0), ('P003', 0, 5)])
+
+    assert stock_data == before
+    assert all(a is b for a, b in zip(stock_data, objects))
+
+
+def test_order_is_one_change_across_products(stock_data):
+    change = sell_order(stock_data, [('P001', 0, 6), ('P002', 0, 2)])
+
+    assert change.summary['total_units'] == 8
+    assert change.summary['lines'] == 2
+    assert {c['carton_id'] for c in change.updated} == {'P001-C01', 'P001-C02', 'P002-C01'}
+    assert stock_data[0]['date_outwarded'] is not None
+    assert stock_data[1]['quantity_per_carton'] == 8
+
+
+def test_pick_list_walks_locations_in_natural_order(stock_data):
+    stops = build_pick_list(sell_order(stock_data, [('P001', 0, 6), ('P002', 0, 2)]))
+
+    assert [stop['location'] for stop in stops] == ['W1-S2-L1', 'W1-S2-L3', 'W1-S10-L1']
+    assert [(p['carton_id'], p['quantity'], p['empties_carton']) for stop in stops for p in stop['picks']] == [
+        ('P001-C02', 2, False), ('P002-C01', 2, False), ('P001-C01', 4, True)]
+    assert location_sort_key('W1-S2') < location_sort_key('W1-S10')
@@ -0,0 +1,91 @@
+"""
+The bounded LRU of company sessions.
+"""
+
+import os
+
+from services.session_cache import CompanySessionCache, MEMORY_PER_FILE_BYTE
+from conftest import make_carton, write_json
+
+
+class Loader:
+    """Records which company files were loaded."""
+
+    def __init__(self):
+        self.loaded = []
+
+    def __call__(self, json_file):
+        self.loaded.append(os.path.basename(json_file))
+        return [], None
+
+
+def _companies(tmp_path, count):
+    paths = []
+    for n in range(count):
+        path = str(tmp_path / f"c{n}_stock.json")
+        write_json(path, [make_carton(f"P{n:03d}-C01")])
+        paths.append(path)
+    return paths
+
+
+def test_switching_back_reuses_the_session(tmp_path):
+    a, b = _companies(tmp_path, 2)
+    cache, loader = CompanySessionCache(), Loader()
+
+    first = cache.get(a, loader)
+    cache.get(b, loader)
+
+    assert cache.get(a, loader) is first
+    assert loader.loaded == ['c0_stock.json', 'c1_stock.json']
+
+
+def test_least_recently_used_is_evicted_past_the_count(tmp_path):
+    a, b, c = _companies(tmp_path, 3)
+    cache, loader = CompanySessionCache(max_sessions=2), Loader()
+    cache.get(a, loader)
+    cache.get(b, loader)
+    cache.get(a, loader)
+
+    cache.get(c, loader)
+
+    assert a in cache and c in cache and b not in cache
+    assert len(cache) == 2
+
+
+def test_memory_budget_evicts_but_keeps_the_current_company(tmp_path):
+    a, b = _companies(tmp_path, 2)
+    size = os.path.getsize(a) * MEMORY_PER_FILE_BYTE
+    cache, loader = CompanySessionCache(memory_budget_mb=(size * 1.5) / (1024 * 1024)), Loader()
+    cache.get(a, loader)
+
+    cache.get(b, loader)
+
+    assert b in cache and a not in cache
+    assert cache.total_size_estimate() == os.path.getsize(b) * MEMORY_PER_FILE_BYTE
+
+
+def test_file_changed_elsewhere_is_reloaded_but_own_saves_are_not(tmp_path):
+    a, = _companies(tmp_path, 1)
+    cache, loader = CompanySessionCache(), Loader()
+    cache.get(a, loader)
+
+    write_json(a, [make_carton("P000-C01"), make_carton("P000-C02")])
+    cache.mark_saved(a)
+    cache.get(a, loader)
+    assert loader.loaded == ['c0_stock.json']
+
+    write_json(a, [])
+    cache.get(a, loader)
+    assert loader.loaded == ['c0_stock.json', 'c0_stock.json']
+
+
+def test_invalidate_drops_sessions(tmp_path):
+    a, b = _companies(tmp_path, 2)
+    cache, loader = CompanySessionCache(), Loader()
+    cache.get(a, loader)
+    cache.get(b, loader)
+
+    cache.invalidate(a)
+    assert a not in cache and b in cache
+    cache.invalidate()
+    assert len(cache) == 0
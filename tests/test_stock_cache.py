@@ -0,0 +1,91 @@
+"""
+Warm-start cache of loaded stock data and its index.
+"""
+
+import os
+
+from database.stock_cache import load_stock_data_cached, get_cache_file_path
+from services.stock_index import StockIndex
+from conftest import make_carton, read_json, write_json
+
+
+class CountingIndex(StockIndex):
+    """A StockIndex that counts how often one is built."""
+    builds = 0
+
+    def __init__(self, stock_data=None):
+        CountingIndex.builds += 1
+        super().__init__(stock_data)
+
+
+def _load(path):
+    return load_stock_data_cached(path, CountingIndex)
+
+
+def test_unchanged_file_is_served_from_the_cache(company_file):
+    CountingIndex.builds = 0
+    stock_data, index = _load(company_file)
+    assert os.path.exists(get_cache_file_path(company_file))
+
+    cached_data, cached_index = _load(company_file)
+
+    assert CountingIndex.builds == 1
+    assert cached_data == stock_data == read_json(company_file)
+    assert cached_index.sellable_units('P001') == 20
+
+
+def test_changed_file_is_reloaded(company_file):
+    CountingIndex.builds = 0
+    _load(company_file)
+    write_json(company_file, read_json(company_file) + [make_carton('P003-C01')])
+
+    stock_data, index = _load(company_file)
+
+    assert CountingIndex.builds == 2
+    assert 'P003-C01' in index.cartons_by_id
+
+
+def test_same_size_and_time_with_new_content_is_reloaded(company_file):
+    CountingIndex.builds = 0
+    _load(company_file)
+    st = os.stat(company_file)
+    with open(company_file, 'rb') as f:
+        raw = f.read()
+    with open(company_file, 'wb') as f:
+        f.write(raw.replace(b'"A1"', b'"B2"'))
+    os.utime(company_file, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    stock_data, _ = _load(company_file)
+
+    assert CountingIndex.builds == 2
+    assert {c['location'] for c in stock_data} == {'B2'}
+
+
+def test_unreadable_cache_falls_back_to_a_full_load(company_file):
+    _load(company_file)
+    with open(get_cache_file_path(company_file), 'wb') as f:
+        f.write(b'not a pickle')
+
+    stock_data, index = _load(company_file)
+
+    assert stock_data == read_json(company_file)
+    assert len(index.cartons_by_id) == 3
+
+
+def test_index_version_change_invalidates_the_cache(company_file):
+    CountingIndex.builds = 0
+    _load(company_file)
+    CountingIndex.VERSION = StockIndex.VERSION + 1
+    try:
+        _load(company_file)
+    finally:
+        del CountingIndex.VERSION
+    assert CountingIndex.builds == 2
+
+
+def test_missing_file_is_created_empty(tmp_path):
+    path = str(tmp_path / "new_stock.json")
+
+    stock_data, index = _load(path)
+
+    assert stock_data == [] and read_json(path) == []
@@ -0,0 +1,117 @@
+"""
+Committing stock changes: version conflicts, retries and rollback of failed commits.
+"""
+
+import os
+
+import pytest
+
+import services.stock_operations as stock_operations
+from database.stock_data import StockConflictError, load_stock_data
+from services.stock_operations import run_stock_transaction, sell_product, delete_carton
+from utils.file_lock import LockTimeoutError
+from utils.file_utils import get_log_file_path
+from conftest import read_json, write_json
+
+
+def _by_id(cartons):
+    return {c['carton_id']: c for c in cartons}
+
+
+def test_commit_bumps_versions_and_logs_the_sale(company_file):
+    stock_data = load_stock_data(company_file)
+    change = run_stock_transaction(company_file, stock_data, lambda data: sell_product(data, 'P001', 0, 4))
+
+    disk = _by_id(read_json(company_file))
+    assert disk['P001-C01']['quantity_per_carton'] == 6
+    assert disk['P001-C01']['version'] == 2
+    assert disk['P001-C02']['version'] == 1
+    assert not change.reloaded
+    sales = read_json(get_log_file_path(company_file, 'sales'))
+    assert [record['quantity'] for record in sales] == [4]
+
+
+def test_conflict_reruns_the_operation_on_fresh_data(company_file):
+    stock_data = load_stock_data(company_file)
+    calls = []
+
+    def operation(data):
+        if not calls:
+            # Another terminal sells from the same carton after we read it
+            disk = read_json(company_file)
+            disk[0].update(quantity_per_carton=7, version=2)
+            write_json(company_file, disk)
+        calls.append(1)
+        return sell_product(data, 'P001', 0, 3)
+
+    change = run_stock_transaction(company_file, stock_data, operation)
+
+    assert len(calls) == 2
+    assert change.reloaded
+    disk = _by_id(read_json(company_file))
+    assert disk['P001-C01']['quantity_per_carton'] == 4
+    assert disk['P001-C01']['version'] == 3
+    assert _by_id(stock_data)['P001-C01']['quantity_per_carton'] == 4
+
+
+def test_conflict_is_raised_once_retries_run_out(company_file):
+    stock_data = load_stock_data(company_file)
+
+    def operation(data):
+        disk = read_json(company_file)
+        disk[0]['version'] += 1
+        write_json(company_file, disk)
+        return sell_product(data, 'P001', 0, 3)
+
+    with pytest.raises(StockConflictError) as excinfo:
+        run_stock_transaction(company_file, stock_data, operation, max_retries=1)
+    assert excinfo.value.carton_id == 'P001-C01'
+    assert not os.path.exists(get_log_file_path(company_file, 'sales'))
+
+
+def test_failed_commit_rolls_back_memory(company_file, monkeypatch):
+    stock_data = load_stock_data(company_file)
+    before = [dict(c) for c in stock_data]
+    carton_objects = list(stock_data)
+
+    def fail(*args):
+        raise LockTimeoutError("Timed out waiting for lock")
+
+    monkeypatch.setattr(stock_operations, 'commit_stock_changes', fail)
+    with pytest.raises(LockTimeoutError):
+        run_stock_transaction(company_file, stock_data, lambda data: sell_product(data, 'P001', 1, 5))
+
+    assert stock_data == before
+    assert all(a is b for a, b in zip(stock_data, carton_objects))
+    assert read_json(company_file) == before
+
+
+def test_failed_delete_puts_the_carton_back(company_file, monkeypatch):
+    stock_data = load_stock_data(company_file)
+    before = [dict(c) for c in stock_data]
+
+    def fail(*args):
+        raise OSError("Disk full")
+
+    monkeypatch.setattr(stock_operations, 'commit_stock_changes', fail)
+    with pytest.raises(OSError):
+        run_stock_transaction(company_file, stock_data, lambda data: delete_carton(data, 'P002-C01'))
+
+    assert stock_data == before
+
+
+def test_merge_keeps_other_cartons_as_they_are_on_disk(company_file):
+    stock_data = load_stock_data(company_file)
+    # An edit made in memory but never committed, and a change from another terminal
+    _by_id(stock_data)['P002-C01']['location'] = 'Z9'
+    disk = read_json(company_file)
+    disk[1].update(quantity_per_carton=8, version=2)
+    write_json(company_file, disk)
+
+    change = run_stock_transaction(company_file, stock_data, lambda data: sell_product(data, 'P001', 0, 2))
+
+    disk = _by_id(read_json(company_file))
+    assert disk['P002-C01']['location'] == 'A1'
+    assert disk['P001-C02']['quantity_per_carton'] == 8
+    assert _by_id(stock_data)['P001-C02']['quantity_per_carton'] == 8
+    assert {c['carton_id'] for c in change.external_changed} == {'P001-C02', 'P002-C01'}
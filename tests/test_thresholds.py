@@ -0,0 +1,81 @@
+"""
+Alert threshold rules and incremental low-stock alerts.
+"""
+
+import pytest
+
+from config.settings import LOW_STOCK_THRESHOLD, EXPIRY_SOON_DAYS
+from services.stock_index import StockIndex
+from services.thresholds import ThresholdRules, StockAlerts
+from conftest import make_carton
+
+
+def test_product_beats_longest_category_beats_default():
+    rules = ThresholdRules.from_dict({
+        'categories': {'apx_': {'low_stock_units': 20, 'expiry_soon_days': 30}, 'APX_P0': {'low_stock_units': 50}},
+        'products': {'apx_p001': {'low_stock_units': 200}},
+    })
+
+    # Only the longest matching category applies; its missing settings come from the defaults
+    assert rules.for_product('APX_P001') == {'low_stock_units': 200, 'expiry_soon_days': EXPIRY_SOON_DAYS}
+    assert rules.for_product('APX_P002') == {'low_stock_units': 50, 'expiry_soon_days': EXPIRY_SOON_DAYS}
+    assert rules.for_product('APX_Q001') == {'low_stock_units': 20, 'expiry_soon_days': 30}
+    assert rules.for_product('TEC_P001') == {'low_stock_units': LOW_STOCK_THRESHOLD,
+                                             'expiry_soon_days': EXPIRY_SOON_DAYS}
+    assert rules.category_of('APX_P002') == 'APX_P0'
+    assert rules.max_expiry_soon_days == max(EXPIRY_SOON_DAYS, 30)
+
+
+@pytest.mark.parametrize('data', [
+    'low_stock_units',
+    {'products': ['P001']},
+    {'products': {'P001': 5}},
+    {'products': {'  ': {'low_stock_units': 5}}},
+    {'products': {'P001': {'reorder_units': 5}}},
+    {'products': {'P001': {'low_stock_units': -1}}},
+    {'categories': {'P0': {'low_stock_units': '5'}}},
+    {'categories': {'P0': {'expiry_soon_days': True}}},
+])
+def test_malformed_rules_are_rejected(data):
+    with pytest.raises(ValueError):
+        ThresholdRules.from_dict(data)
+
+
+def test_alert_fires_when_live_stock_crosses_the_threshold():
+    stock_data = [make_carton('P001-C01', quantity=8), make_carton('P001-C02', quantity=8),
+                  make_carton('P002-C01', quantity=30)]
+    index = StockIndex(stock_data)
+    alerts = StockAlerts(index, ThresholdRules.from_dict({'products': {'P001': {'low_stock_units': 12}}}))
+    assert alerts.low_stock == {}
+
+    # Sell one carton's worth down to 4 units; the total, not each carton, is judged
+    stock_data[0].update(quantity_per_carton=0, date_outwarded='2024-03-01')
+    index.remove_carton('P001-C01')
+    index.add_carton(stock_data[0])
+    alerts.refresh('P001')
+
+    assert alerts.low_stock['P001'] == {'product_id': 'P001', 'product_name': 'Product P001', 'live_units': 8,
+                                        'live_cartons': 1, 'threshold': 12}
+    assert 'P002' not in alerts.low_stock
+
+
+def test_damaged_and_expired_units_do_not_count_as_live():
+    stock_data = [make_carton('P001-C01', quantity=20, damaged_units=12),
+                  make_carton('P001-C02', quantity=50, expiry_date='2000-01-01')]
+    alerts = StockAlerts(StockIndex(stock_data))
+
+    assert alerts.low_stock['P001']['live_units'] == 8
+
+
+def test_sold_out_products_are_not_flagged():
+    stock_data = [make_carton('P001-C01', quantity=0, date_outwarded='2024-03-01')]
+    assert StockAlerts(StockIndex(stock_data)).low_stock == {}
+
+
+def test_new_rules_re_evaluate_every_product():
+    alerts = StockAlerts(StockIndex([make_carton('P001-C01', quantity=40)]))
+    assert alerts.low_stock == {}
+
+    alerts.set_rules(ThresholdRules.from_dict({'categories': {'P0': {'low_stock_units': 40}}}))
+
+    assert list(alerts.low_stock) == ['P001']
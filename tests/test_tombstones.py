@@ -0,0 +1,85 @@
+"""
+Deleting cartons with tombstones, and compacting them out of the logs.
+"""
+
+from database.log_store import (Tombstones, is_tombstoned, load_tombstones, read_company_log, record_tombstones,
+                                tombstone_count, compact_logs, iter_log_entries)
+from database.stock_data import load_stock_data
+from services.stock_operations import run_stock_transaction, delete_carton
+from utils.file_utils import get_log_file_path
+from conftest import read_json, write_json
+
+
+def _entry(carton_id, date, quantity=1, seq=None, kind='purchase'):
+    entry = {'date': date, 'product_id': carton_id.split('-C')[0], 'carton_id': carton_id, 'quantity': quantity,
+             'type': kind}
+    if seq is not None:
+        entry['seq'] = seq
+    return entry
+
+
+def _write_logs(company_file):
+    write_json(get_log_file_path(company_file, 'purchase'), [
+        _entry('P001-C01', '2024-01-01 09:00:00', 10), _entry('P002-C01', '2024-01-01 09:00:00', 5)])
+    write_json(get_log_file_path(company_file, 'sales'), [
+        _entry('P001-C01', '2024-01-02 09:00:00', 2, kind='sale'), _entry('P002-C01', '2024-01-02 09:00:00', 1, kind='sale')])
+
+
+def test_delete_records_a_tombstone_and_hides_history(company_file):
+    _write_logs(company_file)
+    purchase_log = get_log_file_path(company_file, 'purchase')
+    with open(purchase_log, 'rb') as f:
+        before = f.read()
+    stock_data = load_stock_data(company_file)
+
+    run_stock_transaction(company_file, stock_data, lambda data: delete_carton(data, 'P002-C01'))
+
+    assert tombstone_count(company_file) == 1
+    assert 'P002-C01' in load_tombstones(company_file)
+    # The logs are not rewritten, only read through the tombstones
+    with open(purchase_log, 'rb') as f:
+        assert f.read() == before
+    assert [e['carton_id'] for e in read_company_log(company_file, 'purchase')] == ['P001-C01']
+    assert [e['carton_id'] for e in read_company_log(company_file, 'sales')] == ['P001-C01']
+
+
+def test_a_reused_carton_id_keeps_its_own_history():
+    tombstones = Tombstones({'P001-C01': '2024-02-01 10:00:00'})
+
+    assert is_tombstoned(_entry('P001-C01', '2024-01-31 10:00:00'), tombstones)
+    assert not is_tombstoned(_entry('P001-C01', '2024-02-01 10:00:01'), tombstones)
+    assert not is_tombstoned(_entry('P001-C02', '2024-01-31 10:00:00'), tombstones)
+    assert not is_tombstoned(_entry('P001-C01', '2024-01-31 10:00:00'), None)
+
+
+def test_same_second_entries_are_ordered_by_seq():
+    tombstones = Tombstones({'P001-C01': '2024-02-01 10:00:00'})
+    tombstones.seqs['P001-C01'] = 5
+
+    assert is_tombstoned(_entry('P001-C01', '2024-02-01 10:00:00', seq=5), tombstones)
+    assert not is_tombstoned(_entry('P001-C01', '2024-02-01 10:00:00', seq=6), tombstones)
+    # Without a seq on either side the entry is taken to predate the delete
+    assert is_tombstoned(_entry('P001-C01', '2024-02-01 10:00:00'), tombstones)
+
+
+def test_latest_tombstone_wins(company_file):
+    write_json(get_log_file_path(company_file, 'tombstones'), [
+        {'date': '2024-03-01 10:00:00', 'carton_id': 'P001-C01', 'seq': 9, 'type': 'tombstone'},
+        {'date': '2024-02-01 10:00:00', 'carton_id': 'P001-C01', 'seq': 3, 'type': 'tombstone'}])
+
+    tombstones = load_tombstones(company_file)
+
+    assert tombstones.position('P001-C01') == ('2024-03-01 10:00:00', 9)
+
+
+def test_compaction_purges_entries_and_clears_tombstones(company_file):
+    _write_logs(company_file)
+    record_tombstones(company_file, [{'carton_id': 'P002-C01', 'product_id': 'P002'}])
+
+    assert compact_logs(company_file) == 2
+
+    purchase_log = get_log_file_path(company_file, 'purchase')
+    assert [e['carton_id'] for e in read_json(purchase_log)] == ['P001-C01']
+    assert [e['carton_id'] for e in iter_log_entries(get_log_file_path(company_file, 'sales'))] == ['P001-C01']
+    assert tombstone_count(company_file) == 0
+    assert compact_logs(company_file) == 0
@@ -3,12 +3,14 @@ Add Stock UI component for adding new stock inventory.
 """
 
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import datetime
 from ui.base import BaseUIComponent
-from database.stock_data import save_stock_data, append_log_entry
+from database.stock_data import StockConflictError
+from services.stock_operations import StockOperationError, add_cartons, run_stock_transaction
+from services.bulk_import import import_stock_csv, BulkImportError
 from utils.date_utils import parse_date
-from utils.file_utils import get_log_file_path
+from utils.money import to_paise, format_rupees
 from config.colors import *
 
 
@@ -133,6 +135,7 @@ class AddStockUI(BaseUIComponent):
         button_frame.pack(pady=18)
         ttk.Button(button_frame, text="Clear Form", command=self.clear_add_stock_form).pack(side='left', padx=16)
         ttk.Button(button_frame, text="Add Stock", command=self.perform_add_stock).pack(side='left', padx=16)
+        ttk.Button(button_frame, text="Bulk Import CSV", command=self.perform_bulk_import).pack(side='left', padx=16)
     
     def update_add_carton_details_fields(self):
         """Update carton detail fields based on number of cartons."""
@@ -207,17 +210,17 @@ class AddStockUI(BaseUIComponent):
             try:
                 qty = int(entry_set['qty_entry'].get())
                 damaged = int(entry_set['damaged_entry'].get())
-                sales_price = float(entry_set['sales_price_entry'].get())
-                purchase_price = float(entry_set['purchase_price_entry'].get())
-                mrp = float(entry_set['mrp_entry'].get()) if entry_set['mrp_entry'].get().strip() else 0
+                sales_price = to_paise(entry_set['sales_price_entry'].get())
+                purchase_price = to_paise(entry_set['purchase_price_entry'].get())
+                mrp = to_paise(entry_set['mrp_entry'].get()) if entry_set['mrp_entry'].get().strip() else 0
                 if qty <= 0 or damaged < 0 or damaged > qty or sales_price < 0 or purchase_price < 0 or mrp < 0:
                     raise ValueError
                 cartons_data_for_add.append({
                     'quantity': qty, 
                     'damaged': damaged, 
-                    'sales_price': sales_price,
-                    'purchase_price': purchase_price,
-                    'mrp': mrp
+                    'sales_price_paise': sales_price,
+                    'purchase_price_paise': purchase_price,
+                    'mrp_paise': mrp
                 })
             except ValueError:
                 messagebox.showerror('Error', 'Please enter valid positive numbers for sales price, purchase price and quantity, and non-negative for damaged units (damaged <= quantity).')
@@ -230,64 +233,44 @@ class AddStockUI(BaseUIComponent):
                 messagebox.showinfo('Info', 'Stock addition cancelled.')
                 return
         
-        added_carton_ids = []
-        for carton_detail in cartons_data_for_add:
-            existing_cartons_for_product = [c for c in self.stock_app.stock_data if c['product_id'] == product_id]
-            max_carton_num = 0
-            for carton in existing_cartons_for_product:
-                try:
-                    parts = carton['carton_id'].split('-C')
-                    if len(parts) > 1:
-                        max_carton_num = max(max_carton_num, int(parts[-1]))
-                except (ValueError, IndexError):
-                    pass
-            new_carton_num = max_carton_num + 1
-            carton_id = f"{product_id}-C{str(new_carton_num).zfill(2)}"
-            
-            new_carton = {
-                "product_id": product_id,
-                "product_name": product_name,
-                "company": self.stock_app.selected_company,
-                "carton_id": carton_id,
-                "quantity_per_carton": carton_detail['quantity'],
-                "damaged_units": carton_detail['damaged'],
-                "location": location,
-                "date_inwarded": date_inwarded_str,
-                "expiry_date": expiry_date_str if expiry_date_str else None,
-                "last_updated": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "date_outwarded": None,
-                "sales_price": carton_detail['sales_price'],
-                "purchase_price": carton_detail['purchase_price'],
-                "mrp": carton_detail['mrp']
-            }
-            self.stock_app.stock_data.append(new_carton)
-            added_carton_ids.append(carton_id)
-            
-            # Log purchase
-            purchase_log_file = get_log_file_path(self.stock_app.selected_json_file, 'purchase')
-            append_log_entry(purchase_log_file, {
-                'date': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'product_id': product_id,
-                'product_name': product_name,
-                'carton_id': carton_id,
-                'quantity': carton_detail['quantity'],
-                'sales_price': carton_detail['sales_price'],
-                'purchase_price': carton_detail['purchase_price'],
-                'mrp': carton_detail['mrp'],
-                'sales_value': carton_detail['quantity'] * carton_detail['sales_price'],
-                'purchase_value': carton_detail['quantity'] * carton_detail['purchase_price'],
-                'type': 'purchase',
-            })
+        def operation(stock_data):
+            return add_cartons(stock_data, product_id, product_name, self.stock_app.selected_company,
+                               location, date_inwarded_str, expiry_date_str, cartons_data_for_add)
         
-        save_stock_data(self.stock_app.stock_data, self.stock_app.selected_json_file)
+        try:
+            change = run_stock_transaction(self.stock_app.selected_json_file, self.stock_app.stock_data, operation)
+        except (StockOperationError, StockConflictError, OSError) as e:
+            self.stock_app.on_stock_data_changed()
+            messagebox.showerror('Error', str(e))
+            return
+        added_carton_ids = change.summary['carton_ids']
         messagebox.showinfo('Success', f"Successfully added {len(cartons_data_for_add)} new carton(s) for '{product_name}' ({product_id}). New Carton IDs: {', '.join(added_carton_ids)}")
         self.clear_add_stock_form()
         
-        # Refresh dashboard and suggestions
-        if hasattr(self.stock_app, 'dashboard_ui'):
-            self.stock_app.dashboard_ui.update_dashboard()
-        if hasattr(self.stock_app, 'find_stock_ui'):
-            self.stock_app.find_stock_ui.update_find_stock_suggestions()
+        # Notify the other tabs
+        self.stock_app.on_stock_data_changed(change)
+    
+    def perform_bulk_import(self):
+        """Import many cartons from a CSV file in one commit."""
+        file_path = filedialog.askopenfilename(title="Import Stock CSV", filetypes=[("CSV files", "*.csv")])
+        if not file_path:
+            return
+        try:
+            change = import_stock_csv(file_path, self.stock_app.selected_json_file,
+                                      self.stock_app.stock_data, self.stock_app.selected_company)
+        except BulkImportError as e:
+            shown = '\n'.join(f"Line {line}: {message}" for line, message in e.errors[:20])
+            more = f"\n...and {len(e.errors) - 20} more" if len(e.errors) > 20 else ''
+            messagebox.showerror('Import Failed', f"Nothing was imported. Fix these rows and try again:\n\n{shown}{more}")
+            return
+        except (StockOperationError, StockConflictError, OSError) as e:
+            self.stock_app.on_stock_data_changed()
+            messagebox.showerror('Error', str(e))
+            return
+        
+        products = {c['product_id'] for c in change.added}
+        messagebox.showinfo('Success', f"Imported {len(change.added)} carton(s) for {len(products)} product(s).")
+        self.stock_app.on_stock_data_changed(change)
     
     def clear_add_stock_form(self):
         """Clear the add stock form."""
@@ -325,9 +308,9 @@ class AddStockUI(BaseUIComponent):
                         'product_id': item['product_id'],
                         'product_name': item['product_name'],
                         'location': item.get('location', ''),
-                        'sales_price': item.get('sales_price', 0),
-                        'purchase_price': item.get('purchase_price', 0),
-                        'mrp': item.get('mrp', 0),
+                        'sales_price_paise': item.get('sales_price_paise', 0),
+                        'purchase_price_paise': item.get('purchase_price_paise', 0),
+                        'mrp_paise': item.get('mrp_paise', 0),
                         'display': f"{item['product_id']} - {item['product_name']}"
                     })
                     seen_products.add(product_key)
@@ -411,14 +394,14 @@ class AddStockUI(BaseUIComponent):
                 self.add_location_entry.insert(0, selected_suggestion['location'])
             
             # Auto-fill price fields for all cartons if they have pricing info
-            if selected_suggestion.get('sales_price', 0) > 0 or selected_suggestion.get('purchase_price', 0) > 0 or selected_suggestion.get('mrp', 0) > 0:
+            if selected_suggestion.get('sales_price_paise', 0) > 0 or selected_suggestion.get('purchase_price_paise', 0) > 0 or selected_suggestion.get('mrp_paise', 0) > 0:
                 for carton_entry in self.carton_entries:
-                    if selected_suggestion.get('sales_price', 0) > 0 and not carton_entry['sales_price_entry'].get():
-                        carton_entry['sales_price_entry'].insert(0, str(selected_suggestion['sales_price']))
-                    if selected_suggestion.get('purchase_price', 0) > 0 and not carton_entry['purchase_price_entry'].get():
-                        carton_entry['purchase_price_entry'].insert(0, str(selected_suggestion['purchase_price']))
-                    if selected_suggestion.get('mrp', 0) > 0 and not carton_entry['mrp_entry'].get():
-                        carton_entry['mrp_entry'].insert(0, str(selected_suggestion['mrp']))
+                    if selected_suggestion.get('sales_price_paise', 0) > 0 and not carton_entry['sales_price_entry'].get():
+                        carton_entry['sales_price_entry'].insert(0, format_rupees(selected_suggestion['sales_price_paise'], grouping=False))
+                    if selected_suggestion.get('purchase_price_paise', 0) > 0 and not carton_entry['purchase_price_entry'].get():
+                        carton_entry['purchase_price_entry'].insert(0, format_rupees(selected_suggestion['purchase_price_paise'], grouping=False))
+                    if selected_suggestion.get('mrp_paise', 0) > 0 and not carton_entry['mrp_entry'].get():
+                        carton_entry['mrp_entry'].insert(0, format_rupees(selected_suggestion['mrp_paise'], grouping=False))
             
             # Hide suggestions
             self.hide_suggestions()
@@ -505,12 +488,12 @@ class AddStockUI(BaseUIComponent):
                 self.add_location_entry.insert(0, selected_suggestion['location'])
             
             # Auto-fill price fields for all cartons if they have pricing info
-            if selected_suggestion.get('sales_price', 0) > 0 or selected_suggestion.get('purchase_price', 0) > 0:
+            if selected_suggestion.get('sales_price_paise', 0) > 0 or selected_suggestion.get('purchase_price_paise', 0) > 0:
                 for carton_entry in self.carton_entries:
-                    if selected_suggestion.get('sales_price', 0) > 0 and not carton_entry['sales_price_entry'].get():
-                        carton_entry['sales_price_entry'].insert(0, str(selected_suggestion['sales_price']))
-                    if selected_suggestion.get('purchase_price', 0) > 0 and not carton_entry['purchase_price_entry'].get():
-                        carton_entry['purchase_price_entry'].insert(0, str(selected_suggestion['purchase_price']))
+                    if selected_suggestion.get('sales_price_paise', 0) > 0 and not carton_entry['sales_price_entry'].get():
+                        carton_entry['sales_price_entry'].insert(0, format_rupees(selected_suggestion['sales_price_paise'], grouping=False))
+                    if selected_suggestion.get('purchase_price_paise', 0) > 0 and not carton_entry['purchase_price_entry'].get():
+                        carton_entry['purchase_price_entry'].insert(0, format_rupees(selected_suggestion['purchase_price_paise'], grouping=False))
             
             # Hide suggestions
             self.hide_name_suggestions()
@@ -19,6 +19,11 @@ class BaseUIComponent:
         """Create a styled frame."""
         frame = ttk.Frame(self.parent, padding=padding)
         return frame
+    
+    def is_shown(self):
+        """True if this component's tab is the selected one."""
+        notebook = getattr(self.stock_app, 'notebook', None)
+        return notebook is not None and notebook.select() == str(self.frame)
 
 
 def configure_styles(style):
@@ -6,6 +6,9 @@ import tkinter as tk
 from tkinter import ttk
 import datetime
 from ui.base import BaseUIComponent
+from services.event_bus import STOCK_EVENTS
+from config.settings import EXPIRY_WARNING_DAYS
+from utils.money import format_rupees
 
 
 class CompanyStockViewUI(BaseUIComponent):
@@ -17,6 +20,10 @@ class CompanyStockViewUI(BaseUIComponent):
         self.create_widgets()
         self.update_company_stock_view()
     
+    def subscribe(self, event_bus):
+        """Refresh the view once per burst of stock changes."""
+        event_bus.subscribe(lambda events: self.update_company_stock_view(), STOCK_EVENTS)
+    
     def create_widgets(self):
         """Create company stock view widgets."""
         # Main scrollable frame
@@ -84,6 +91,8 @@ class CompanyStockViewUI(BaseUIComponent):
         
         company_stock = self.stock_app.stock_data
         current_date = datetime.date.today()
+        expiry = self.stock_app.stock_index.expiry
+        expired_ids = expiry.expired(current_date)
         
         # Aggregate data by product_id (matching original logic exactly)
         aggregated_products = {}
@@ -115,27 +124,27 @@ class CompanyStockViewUI(BaseUIComponent):
             product['locations'].add(carton['location'])
 
             # Calculate per piece prices (prices in our data model are already per piece)
-            if carton.get('purchase_price') is not None:
-                product['purchase_per_piece_sum'] += carton['purchase_price']
+            if carton.get('purchase_price_paise') is not None:
+                product['purchase_per_piece_sum'] += carton['purchase_price_paise']
                 product['purchase_per_piece_count'] += 1
-            if carton.get('sales_price') is not None:
-                product['sales_per_piece_sum'] += carton['sales_price']
+            if carton.get('sales_price_paise') is not None:
+                product['sales_per_piece_sum'] += carton['sales_price_paise']
                 product['sales_per_piece_count'] += 1
-            if carton.get('mrp') is not None and carton.get('mrp') > 0:
-                product['mrp_sum'] += carton['mrp']
+            if carton.get('mrp_paise') is not None and carton.get('mrp_paise') > 0:
+                product['mrp_sum'] += carton['mrp_paise']
                 product['mrp_count'] += 1
 
             if carton['date_outwarded'] is None:
                 product['hasActiveStock'] = True
                 is_expired = False
-                if carton['expiry_date']:
-                    expiry_date_obj = self.parse_date(carton['expiry_date'])
-                    if expiry_date_obj and expiry_date_obj <= current_date:
-                        is_expired = True
-                        product['hasExpiredStock'] = True
-                        product['totalExpiredUnits'] += carton['quantity_per_carton']
-                        product['totalDamagedUnits'] += carton['quantity_per_carton']
-                    elif expiry_date_obj and expiry_date_obj < product['earliestExpiry']:
+                if carton['carton_id'] in expired_ids:
+                    is_expired = True
+                    product['hasExpiredStock'] = True
+                    product['totalExpiredUnits'] += carton['quantity_per_carton']
+                    product['totalDamagedUnits'] += carton['quantity_per_carton']
+                else:
+                    expiry_date_obj = expiry.expiry_of(carton['carton_id'])
+                    if expiry_date_obj and expiry_date_obj < product['earliestExpiry']:
                         product['earliestExpiry'] = expiry_date_obj
                 if not is_expired:
                     product['totalLiveCartons'] += 1
@@ -230,9 +239,9 @@ class CompanyStockViewUI(BaseUIComponent):
             elif product['hasExpiredStock'] or product['hasDamagedStock']:
                 status_text = 'Some Damaged/Expired'
             
-            avg_purchase_per_piece = product['purchase_per_piece_sum'] / product['purchase_per_piece_count'] if product['purchase_per_piece_count'] else 0
-            avg_sales_per_piece = product['sales_per_piece_sum'] / product['sales_per_piece_count'] if product['sales_per_piece_count'] else 0
-            avg_mrp = product['mrp_sum'] / product['mrp_count'] if product['mrp_count'] else 0
+            avg_purchase_per_piece = round(product['purchase_per_piece_sum'] / product['purchase_per_piece_count']) if product['purchase_per_piece_count'] else 0
+            avg_sales_per_piece = round(product['sales_per_piece_sum'] / product['sales_per_piece_count']) if product['sales_per_piece_count'] else 0
+            avg_mrp = round(product['mrp_sum'] / product['mrp_count']) if product['mrp_count'] else 0
             
             # Insert row with proper formatting
             item_id = self.tree.insert("", tk.END, values=(
@@ -244,9 +253,9 @@ class CompanyStockViewUI(BaseUIComponent):
                 self.format_date(product['earliestInwarded']) if product['earliestInwarded'].year != 9999 else 'N/A',
                 self.format_date(product['earliestExpiry']) if product['earliestExpiry'].year != 9999 else 'N/A',
                 self.format_date(product['latestOutwarded']) if product['latestOutwarded'].year != 1 else 'N/A',
-                f"₹{avg_purchase_per_piece:.2f}" if avg_purchase_per_piece else 'N/A',
-                f"₹{avg_sales_per_piece:.2f}" if avg_sales_per_piece else 'N/A',
-                f"₹{avg_mrp:.2f}" if avg_mrp else 'N/A',
+                f"₹{format_rupees(avg_purchase_per_piece)}" if avg_purchase_per_piece else 'N/A',
+                f"₹{format_rupees(avg_sales_per_piece)}" if avg_sales_per_piece else 'N/A',
+                f"₹{format_rupees(avg_mrp)}" if avg_mrp else 'N/A',
                 ", ".join(sorted(list(product['locations']))),
                 status_text
             ))
@@ -305,6 +314,9 @@ class CompanyStockViewUI(BaseUIComponent):
         # Sort cartons by Product ID, then by Carton ID
         sorted_cartons = sorted(company_stock, key=lambda x: (x['product_id'], x['carton_id']))
         current_date = datetime.date.today()
+        expiry = self.stock_app.stock_index.expiry
+        expired_ids = expiry.expired(current_date)
+        expiring_ids = {carton_id for _, carton_id in expiry.expiring_within(EXPIRY_WARNING_DAYS, current_date)}
         
         # Populate detailed carton information
         for carton in sorted_cartons:
@@ -312,15 +324,10 @@ class CompanyStockViewUI(BaseUIComponent):
             carton_status = "Active"
             if carton['date_outwarded']:
                 carton_status = "Outwarded"
-            elif carton['expiry_date']:
-                try:
-                    expiry_date_obj = self.parse_date(carton['expiry_date'])
-                    if expiry_date_obj and expiry_date_obj <= current_date:
-                        carton_status = "Expired"
-                    elif expiry_date_obj and (expiry_date_obj - current_date).days <= 30:
-                        carton_status = "Expiring Soon"
-                except:
-                    pass
+            elif carton['carton_id'] in expired_ids:
+                carton_status = "Expired"
+            elif carton['carton_id'] in expiring_ids:
+                carton_status = "Expiring Soon"
             
             if carton['damaged_units'] > 0 and carton_status == "Active":
                 carton_status = "Has Damage"
@@ -333,9 +340,9 @@ class CompanyStockViewUI(BaseUIComponent):
                 carton['location'],
                 carton['quantity_per_carton'],
                 carton['damaged_units'],
-                f"₹{carton.get('purchase_price', 0):.2f}",
-                f"₹{carton.get('sales_price', 0):.2f}",
-                f"₹{carton.get('mrp', 0):.2f}" if carton.get('mrp', 0) > 0 else 'N/A',
+                f"₹{format_rupees(carton.get('purchase_price_paise', 0))}",
+                f"₹{format_rupees(carton.get('sales_price_paise', 0))}",
+                f"₹{format_rupees(carton.get('mrp_paise', 0))}" if carton.get('mrp_paise', 0) > 0 else 'N/A',
                 carton['date_inwarded'],
                 carton['expiry_date'] if carton['expiry_date'] else 'N/A',
                 carton_status
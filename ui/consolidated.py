@@ -0,0 +1,118 @@
+"""
+Consolidated report UI component with totals across every company.
+"""
+
+import queue
+import threading
+from tkinter import ttk, messagebox
+from ui.base import BaseUIComponent
+from services.consolidated import build_consolidated_report
+from utils.money import format_rupees
+
+
+class ConsolidatedUI(BaseUIComponent):
+    """All-companies interface component."""
+
+    def __init__(self, parent, stock_app_ref):
+        super().__init__(parent, stock_app_ref)
+        self.frame = self.create_frame()
+        self.report_thread = None
+        self.loaded = False
+        self.create_widgets()
+
+    def create_widgets(self):
+        """Create consolidated report widgets."""
+        ttk.Label(self.frame, text="All Companies", style='SubHeader.TLabel').pack(pady=(0, 18))
+
+        btn_frame = ttk.Frame(self.frame)
+        btn_frame.pack(fill='x', pady=(0, 10))
+        ttk.Button(btn_frame, text="Refresh", command=self.load_report).pack(side='left', padx=5)
+        self.status_label = ttk.Label(btn_frame, text="")
+        self.status_label.pack(side='left', padx=15)
+
+        # One row per company plus a totals row
+        columns = ("Company", "Live Units", "Damaged/Expired", "Cartons", "Stock Value (₹)", "Value at MRP (₹)",
+                   "Low Stock", "Expiring", "Sales (₹)")
+        self.company_tree = ttk.Treeview(self.frame, columns=columns, show='headings', height=8)
+        for col, width in zip(columns, [180, 100, 120, 80, 140, 140, 90, 90, 130]):
+            self.company_tree.heading(col, text=col)
+            self.company_tree.column(col, width=width, anchor='center')
+        self.company_tree.tag_configure('total', font=('Segoe UI', 12, 'bold'))
+        self.company_tree.pack(fill='x', pady=5)
+
+        # Sales per month across all companies
+        columns = ("Month", "Units Sold", "Sales Value (₹)", "Purchase Value (₹)", "Profit/Loss (₹)", "Profit Margin (%)")
+        self.monthly_tree = ttk.Treeview(self.frame, columns=columns, show='headings', height=10)
+        for col, width in zip(columns, [100, 100, 150, 150, 150, 130]):
+            self.monthly_tree.heading(col, text=col)
+            self.monthly_tree.column(col, width=width, anchor='center')
+        self.monthly_tree.pack(expand=True, fill='both', pady=10)
+
+    def on_show(self):
+        """Build the report the first time the tab is opened."""
+        if not self.loaded:
+            self.load_report()
+
+    def load_report(self):
+        """Summarise every configured company in the background."""
+        if self.report_thread is not None:
+            return
+        company_configs = dict(self.stock_app.company_configs)
+        self.report_updates = queue.Queue()
+
+        def worker():
+            try:
+                self.report_updates.put(('done', build_consolidated_report(company_configs)))
+            except Exception as e:
+                self.report_updates.put(('error', e))
+
+        self.loaded = True
+        self.status_label.config(text=f"Loading {len(company_configs)} companies...")
+        self.report_thread = threading.Thread(target=worker, daemon=True)
+        self.report_thread.start()
+        self.frame.after(100, self.poll_report)
+
+    def poll_report(self):
+        """Show the report once the worker has finished."""
+        try:
+            kind, payload = self.report_updates.get_nowait()
+        except queue.Empty:
+            self.frame.after(100, self.poll_report)
+            return
+        self.report_thread = None
+        if kind == 'error':
+            self.status_label.config(text="")
+            messagebox.showerror("Error", f"Error building consolidated report: {payload}")
+            return
+        self.show_report(payload)
+
+    def show_report(self, report):
+        """Fill the company and monthly tables from a consolidated report."""
+        self.company_tree.delete(*self.company_tree.get_children())
+        self.monthly_tree.delete(*self.monthly_tree.get_children())
+
+        def company_row(name, stats, valuation, sales_value, tags=()):
+            self.company_tree.insert('', 'end', tags=tags, values=(
+                name, stats['total_live'], stats['total_damaged_expired'], stats['total_cartons'],
+                format_rupees(stats['total_stock_value']), format_rupees(valuation['at_mrp']),
+                stats['low_stock_count'], stats['expiry_alert_count'], format_rupees(sales_value)))
+
+        for company in report['companies']:
+            company_row(company['company'], company['stats'], company['valuation'],
+                        sum(month[1] for month in company['monthly_sales'].values()))
+        totals = report['totals']
+        company_row("All Companies", totals['stats'], totals['valuation'],
+                    sum(month[1] for month in totals['monthly_sales'].values()), ('total',))
+
+        for month, (units, sales_value, purchase_value) in sorted(totals['monthly_sales'].items(), reverse=True):
+            profit = sales_value - purchase_value
+            margin = profit / sales_value * 100 if sales_value else 0
+            self.monthly_tree.insert('', 'end', values=(month, units, format_rupees(sales_value), format_rupees(purchase_value),
+                                                        format_rupees(profit), f"{margin:.1f}"))
+
+        status = f"{len(report['companies'])} companies in {report['seconds']:.1f}s"
+        if report['errors']:
+            status += f" ({len(report['errors'])} could not be read)"
+            messagebox.showwarning("Consolidated Report", "Some companies could not be read:\n\n" +
+                                   "\n".join(f"{company}: {error}" for company, error in report['errors']))
+        self.status_label.config(text=status)
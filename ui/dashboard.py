@@ -6,6 +6,9 @@ import tkinter as tk
 from tkinter import ttk
 from ui.base import BaseUIComponent
 from services.stock_manager import StockAnalyzer
+from services.event_bus import STOCK_EVENTS, THRESHOLDS_CHANGED
+from config.settings import ALERT_PAGE_SIZE, DASHBOARD_ALERT_TOP_K
+from utils.money import format_rupees
 
 
 class DashboardUI(BaseUIComponent):
@@ -58,6 +61,13 @@ class DashboardUI(BaseUIComponent):
         self.total_stock_value_label = ttk.Label(value_frame, text="₹0.00", font=('Segoe UI', 16, 'bold'))
         self.total_stock_value_label.pack(side='right')
         
+        # Stock value at MRP
+        mrp_value_frame = ttk.Frame(metrics_frame)
+        mrp_value_frame.pack(fill='x', pady=(0, 10))
+        ttk.Label(mrp_value_frame, text="Stock Value at MRP:").pack(side='left')
+        self.mrp_value_label = ttk.Label(mrp_value_frame, text="₹0.00", font=('Segoe UI', 16, 'bold'))
+        self.mrp_value_label.pack(side='right')
+        
         # Alerts Frame
         alerts_frame = ttk.LabelFrame(stats_frame, text="Alerts & Notifications", padding="15")
         alerts_frame.pack(fill='x', pady=(10, 0))
@@ -74,6 +84,38 @@ class DashboardUI(BaseUIComponent):
         self.expiry_alerts_label = ttk.Label(expiry_frame, text="Expiry Alerts: None", foreground="#059669")
         self.expiry_alerts_label.pack(anchor='w')
         
+        # Products at or below their reorder point
+        reorder_frame = ttk.Frame(alerts_frame)
+        reorder_frame.pack(fill='x', pady=(10, 0))
+        self.reorder_label = ttk.Label(reorder_frame, text="Reorder Now: None", foreground="#059669")
+        self.reorder_label.pack(anchor='w')
+        
+        # Full alert list, paged and hidden until asked for
+        self.alert_list_button = ttk.Button(alerts_frame, text="Show All Alerts ▸", command=self.toggle_alert_list)
+        self.alert_list_button.pack(anchor='w', pady=(10, 0))
+        self.alert_list_frame = ttk.Frame(alerts_frame)
+        self.alert_list_visible = False
+        self.alert_page = 0
+        
+        controls = ttk.Frame(self.alert_list_frame)
+        controls.pack(fill='x', pady=(10, 5))
+        self.alert_kind_var = tk.StringVar(value='Low Stock')
+        kind_box = ttk.Combobox(controls, textvariable=self.alert_kind_var, values=('Low Stock', 'Expiring Soon', 'Reorder Now'),
+                                state='readonly', width=14)
+        kind_box.pack(side='left')
+        kind_box.bind('<<ComboboxSelected>>', lambda e: self.show_alert_page(0))
+        ttk.Button(controls, text="◂ Prev", command=lambda: self.show_alert_page(self.alert_page - 1)).pack(side='left', padx=(10, 0))
+        ttk.Button(controls, text="Next ▸", command=lambda: self.show_alert_page(self.alert_page + 1)).pack(side='left', padx=(5, 0))
+        self.alert_page_label = ttk.Label(controls, text="")
+        self.alert_page_label.pack(side='left', padx=10)
+        
+        self.alert_tree = ttk.Treeview(self.alert_list_frame, columns=("Product ID", "Product Name", "Detail", "Cartons"),
+                                       show='headings', height=8)
+        for col, width in zip(("Product ID", "Product Name", "Detail", "Cartons"), [120, 260, 220, 90]):
+            self.alert_tree.heading(col, text=col)
+            self.alert_tree.column(col, width=width, anchor='center')
+        self.alert_tree.pack(fill='x')
+        
         # Quick Actions Frame
         actions_frame = ttk.LabelFrame(self.frame, text="Quick Actions", padding="15")
         actions_frame.pack(fill='x', pady=(20, 0))
@@ -101,28 +143,99 @@ class DashboardUI(BaseUIComponent):
                                             command=self.show_company_stock_view)
         self.company_view_button.pack(side='left', padx=(15, 0))
     
+    def subscribe(self, event_bus):
+        """Recompute the dashboard once per burst of stock changes."""
+        event_bus.subscribe(lambda events: self.update_dashboard(), STOCK_EVENTS + (THRESHOLDS_CHANGED,))
+    
     def update_dashboard(self):
         """Update dashboard with current stock data."""
-        analyzer = StockAnalyzer(self.stock_app.stock_data)
+        analyzer = StockAnalyzer(self.stock_app.stock_data, self.stock_app.stock_index, self.stock_app.stock_alerts)
         stats = analyzer.get_dashboard_stats()
         
         self.total_live_label.config(text=f"{stats['total_live']}")
         self.total_damaged_expired_label.config(text=f"{stats['total_damaged_expired']}")
         self.total_cartons_label.config(text=f"{stats['total_cartons']}")
-        self.total_stock_value_label.config(text=f"₹{stats['total_stock_value']:,.2f}")
+        self.total_stock_value_label.config(text=f"₹{format_rupees(stats['total_stock_value'])}")
+        self.mrp_value_label.config(text=f"₹{format_rupees(self.stock_app.stock_index.total_valuation[2])}")
         
-        # Update alerts
+        # Update alerts (most urgent few inline, counts for the rest)
         if stats['low_stock_products']:
-            self.low_stock_label.config(text="Low Stock: " + ", ".join(stats['low_stock_products']), 
+            self.low_stock_label.config(text=self.alert_summary("Low Stock", stats['low_stock_products'], stats['low_stock_count']),
                                       foreground="#dc2626")
         else:
             self.low_stock_label.config(text="Low Stock: None", foreground="#059669")
         
         if stats['expiry_alerts']:
-            self.expiry_alerts_label.config(text="Expiry Alerts: " + ", ".join(stats['expiry_alerts']), 
+            self.expiry_alerts_label.config(text=self.alert_summary("Expiry Alerts", stats['expiry_alerts'], stats['expiry_alert_count']),
                                           foreground="#dc2626")
         else:
             self.expiry_alerts_label.config(text="Expiry Alerts: None", foreground="#059669")
+        
+        demand = self.stock_app.get_demand_tracker()
+        reorder = demand.reorder_list(DASHBOARD_ALERT_TOP_K) if demand is not None else []
+        if demand is None:
+            # Refreshed again once the sales history has been read
+            self.reorder_label.config(text="Reorder Now: reading sales history...", foreground="#6b7280")
+        elif reorder:
+            self.reorder_label.config(text=self.alert_summary("Reorder Now", reorder, len(demand.reorder)),
+                                      foreground="#dc2626")
+        else:
+            self.reorder_label.config(text="Reorder Now: None", foreground="#059669")
+        
+        if self.alert_list_visible:
+            self.show_alert_page(self.alert_page)
+    
+    @staticmethod
+    def alert_summary(title, alerts, total):
+        """One-line summary of the top alerts and how many more there are."""
+        names = ", ".join(f"{a['product_name']} ({a['product_id']})" for a in alerts)
+        more = f" and {total - len(alerts)} more" if total > len(alerts) else ""
+        return f"{title} ({total} product{'s' if total != 1 else ''}): {names}{more}"
+    
+    def toggle_alert_list(self):
+        """Expand or collapse the full alert list."""
+        self.alert_list_visible = not self.alert_list_visible
+        if self.alert_list_visible:
+            self.alert_list_frame.pack(fill='x')
+            self.alert_list_button.config(text="Hide Alerts ▾")
+            self.show_alert_page(0)
+        else:
+            self.alert_list_frame.pack_forget()
+            self.alert_list_button.config(text="Show All Alerts ▸")
+    
+    def show_alert_page(self, page):
+        """Show one page of ranked alerts of the selected kind."""
+        kind = {'Low Stock': 'low_stock', 'Expiring Soon': 'expiry'}.get(self.alert_kind_var.get(), 'reorder')
+        analyzer = StockAnalyzer(self.stock_app.stock_data, self.stock_app.stock_index, self.stock_app.stock_alerts)
+        
+        def get_page(page):
+            if kind == 'reorder':
+                demand = self.stock_app.get_demand_tracker()
+                if demand is None:
+                    return [], 0
+                return demand.reorder_list(page * ALERT_PAGE_SIZE + ALERT_PAGE_SIZE)[page * ALERT_PAGE_SIZE:], len(demand.reorder)
+            return analyzer.get_alerts(kind, ALERT_PAGE_SIZE, page * ALERT_PAGE_SIZE)
+        
+        page = max(page, 0)
+        alerts, total = get_page(page)
+        last_page = max((total - 1) // ALERT_PAGE_SIZE, 0)
+        if page > last_page:
+            page = last_page
+            alerts, total = get_page(page)
+        self.alert_page = page
+        
+        self.alert_tree.delete(*self.alert_tree.get_children())
+        for a in alerts:
+            if kind == 'low_stock':
+                detail, cartons = f"{a['live_units']} live units (alert at {a['threshold']})", a['live_cartons']
+            elif kind == 'expiry':
+                detail, cartons = f"Expires on {a['soonest_expiry']}", a['expiring_cartons']
+            else:
+                detail = (f"{a['on_hand']} units, {a['days_of_cover']:.1f} days of cover "
+                          f"(reorder at {a['reorder_point']:.0f}, {a['velocity_30']:.1f}/day over 30 days)")
+                cartons = ''
+            self.alert_tree.insert('', 'end', values=(a['product_id'], a['product_name'], detail, cartons))
+        self.alert_page_label.config(text=f"Page {page + 1} of {last_page + 1} ({total} products)")
     
     def show_company_stock_view(self):
         """Show the company stock view tab."""
@@ -131,6 +244,7 @@ class DashboardUI(BaseUIComponent):
             from ui.company_stock_view import CompanyStockViewUI
             self.stock_app.company_stock_view_ui = CompanyStockViewUI(self.stock_app.notebook, self.stock_app)
             self.stock_app.notebook.add(self.stock_app.company_stock_view_ui.frame, text=f"{self.stock_app.selected_company} Stock")
+            self.stock_app.company_stock_view_ui.subscribe(self.stock_app.event_bus)
         else:
             # Update the tab title and refresh data
             tab_index = None
@@ -7,6 +7,8 @@ from tkinter import ttk, messagebox
 import difflib
 from ui.base import BaseUIComponent
 from services.stock_search import get_product_summary_text
+from services.global_search import format_search_hits
+from services.event_bus import CARTON_ADDED, CARTON_DELETED, STOCK_RELOADED
 from config.colors import *
 
 
@@ -39,6 +41,9 @@ class FindStockUI(BaseUIComponent):
         
         ttk.Button(search_frame, text="Search", command=self.perform_find_stock).grid(row=0, column=2, padx=5, pady=5)
         ttk.Button(search_frame, text="Clear", command=self.clear_find_stock).grid(row=0, column=3, padx=5, pady=5)
+        self.all_companies_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(search_frame, text="All companies", variable=self.all_companies_var,
+                        command=self.on_all_companies_toggled).grid(row=0, column=4, padx=5, pady=5)
         
         # Results Text Area
         self.find_stock_results_text = tk.Text(
@@ -49,16 +54,16 @@ class FindStockUI(BaseUIComponent):
         self.find_stock_results_text.pack(pady=16, padx=5, fill='both', expand=True)
         self.find_stock_results_text.config(state=tk.DISABLED)  # Make it read-only
     
+    def subscribe(self, event_bus):
+        """Pick up new or removed products for autocomplete."""
+        event_bus.subscribe(lambda events: self.update_find_stock_suggestions(),
+                            (CARTON_ADDED, CARTON_DELETED, STOCK_RELOADED))
+    
     def update_find_stock_suggestions(self):
         """Update product suggestions for autocomplete."""
-        all_stock = self.stock_app.stock_data
-        suggestions = set()
-        self.suggestion_map = {}  # Map display string to (product_id, product_name, mrp)
-        for item in all_stock:
-            display = f"{item['product_id']} - {item['product_name']} (MRP: ₹{item.get('mrp', 0):.2f})"
-            suggestions.add(display)
-            self.suggestion_map[display] = (item['product_id'], item['product_name'], item.get('mrp', 0))
-        self.all_product_suggestions = sorted(suggestions)
+        stock_index = self.stock_app.stock_index
+        self.suggestion_map = stock_index.suggestion_map  # Map display string to (product_id, product_name, mrp)
+        self.all_product_suggestions = stock_index.suggestions
     
     def show_find_stock_suggestions(self, event):
         """Show autocomplete suggestions."""
@@ -159,8 +164,12 @@ class FindStockUI(BaseUIComponent):
             messagebox.showerror('Error', 'Please enter a product ID or name to search.')
             return
         
+        if self.all_companies_var.get():
+            self.perform_global_search(query)
+            return
+        
         all_stock_data_combined = self.stock_app.stock_data
-        summary = get_product_summary_text(query, all_stock_data_combined)
+        summary = get_product_summary_text(query, all_stock_data_combined, self.stock_app.stock_index)
         self.find_stock_results_text.config(state=tk.NORMAL)  # Enable editing
         self.find_stock_results_text.delete(1.0, tk.END)  # Clear previous
         self.find_stock_results_text.insert(tk.END, summary)
@@ -187,6 +196,21 @@ class FindStockUI(BaseUIComponent):
         else:
             messagebox.showinfo('Success', 'Search results displayed.')
     
+    def on_all_companies_toggled(self):
+        """Start loading the other companies as soon as cross-company search is switched on."""
+        if self.all_companies_var.get():
+            self.stock_app.global_search.warm(self.stock_app.company_configs)
+    
+    def perform_global_search(self, query):
+        """Search every configured company and list the hits by company."""
+        hits, timed_out, errors = self.stock_app.global_search.search(
+            query, self.stock_app.company_configs,
+            live_indexes={self.stock_app.selected_json_file: self.stock_app.stock_index})
+        self.find_stock_results_text.config(state=tk.NORMAL)
+        self.find_stock_results_text.delete(1.0, tk.END)
+        self.find_stock_results_text.insert(tk.END, format_search_hits(query, hits, timed_out, errors))
+        self.find_stock_results_text.config(state=tk.DISABLED)
+    
     def clear_find_stock(self):
         """Clear the search form."""
         self.find_stock_query_entry.delete(0, tk.END)
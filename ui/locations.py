@@ -0,0 +1,130 @@
+"""
+Locations UI component for browsing stock by warehouse location.
+"""
+
+from tkinter import ttk, messagebox
+from ui.base import BaseUIComponent
+from services.locations import location_summary, child_locations, cartons_at_location, normalise_location
+from services.event_bus import STOCK_EVENTS
+from utils.money import format_rupees
+
+
+class LocationsUI(BaseUIComponent):
+    """Locations interface component."""
+
+    def __init__(self, parent, stock_app_ref):
+        super().__init__(parent, stock_app_ref)
+        self.frame = self.create_frame()
+        self.selected_location = ''
+        self.create_widgets()
+        self.update_locations()
+
+    def create_widgets(self):
+        """Create locations widgets."""
+        ttk.Label(self.frame, text="Stock by Location", style='SubHeader.TLabel').pack(pady=(0, 18))
+
+        # Location lookup
+        search_frame = ttk.Frame(self.frame)
+        search_frame.pack(fill='x', pady=(0, 10))
+        ttk.Label(search_frame, text="Location (e.g. W1-S01):").pack(side='left')
+        self.location_entry = ttk.Entry(search_frame, width=24)
+        self.location_entry.pack(side='left', padx=5)
+        self.location_entry.bind("<Return>", lambda event: self.show_location(self.location_entry.get()))
+        ttk.Button(search_frame, text="Show", command=lambda: self.show_location(self.location_entry.get())).pack(side='left', padx=5)
+        ttk.Button(search_frame, text="Show All", command=lambda: self.show_location('')).pack(side='left', padx=5)
+        self.summary_label = ttk.Label(search_frame, text="")
+        self.summary_label.pack(side='left', padx=15)
+
+        # Location hierarchy, children filled in when a node is opened
+        columns = ("Level", "Cartons", "Units", "Damaged", "Value (₹)", "Occupancy")
+        self.location_tree = ttk.Treeview(self.frame, columns=columns, show='tree headings', height=8)
+        self.location_tree.heading('#0', text="Location")
+        self.location_tree.column('#0', width=200)
+        for col, width in zip(columns, [100, 80, 90, 80, 120, 140]):
+            self.location_tree.heading(col, text=col)
+            self.location_tree.column(col, width=width, anchor='center')
+        self.location_tree.pack(fill='x', pady=5)
+        self.location_tree.bind('<<TreeviewOpen>>', self.on_location_open)
+        self.location_tree.bind('<<TreeviewSelect>>', self.on_location_select)
+
+        # Cartons stored at the selected location
+        carton_columns = ("Location", "Carton ID", "Product ID", "Product Name", "Quantity", "Damaged", "Expiry Date")
+        carton_frame = ttk.Frame(self.frame)
+        carton_frame.pack(expand=True, fill='both', pady=10)
+        self.carton_tree = ttk.Treeview(carton_frame, columns=carton_columns, show='headings', height=8)
+        for col, width in zip(carton_columns, [140, 100, 100, 220, 80, 80, 110]):
+            self.carton_tree.heading(col, text=col)
+            self.carton_tree.column(col, width=width, anchor='center')
+        scrollbar = ttk.Scrollbar(carton_frame, orient="vertical", command=self.carton_tree.yview)
+        self.carton_tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side='right', fill='y')
+        self.carton_tree.pack(side='left', expand=True, fill='both')
+
+    def subscribe(self, event_bus):
+        """Refresh rollups once per burst of stock changes."""
+        event_bus.subscribe(lambda events: self.update_locations(), STOCK_EVENTS)
+
+    def _row_values(self, summary):
+        return (
+            summary['level'],
+            summary['cartons'],
+            summary['units'],
+            summary['damaged_units'],
+            f"₹{format_rupees(summary['stock_value'])}",
+            f"{summary['occupied_positions']}/{summary['positions']} ({summary['occupancy']:.0f}%)",
+        )
+
+    def _insert_children(self, parent_item, location):
+        for summary in child_locations(self.stock_app.stock_index, location):
+            segment = summary['location'].rsplit('-', 1)[-1]
+            item = self.location_tree.insert(parent_item, 'end', iid=f"loc:{summary['location']}", text=segment,
+                                             values=self._row_values(summary))
+            if self.stock_app.stock_index.locations.node(summary['location']).children:
+                self.location_tree.insert(item, 'end', text="…")  # Placeholder until opened
+
+    def update_locations(self):
+        """Rebuild the warehouse level of the tree and refresh the selected location."""
+        self.location_tree.delete(*self.location_tree.get_children())
+        self._insert_children('', '')
+        self.show_location(self.selected_location, quiet=True)
+
+    def on_location_open(self, event):
+        """Load the next level below the node being expanded."""
+        item = self.location_tree.focus()
+        children = self.location_tree.get_children(item)
+        if item.startswith('loc:') and children and not children[0].startswith('loc:'):
+            self.location_tree.delete(*children)
+            self._insert_children(item, item[len('loc:'):])
+
+    def on_location_select(self, event):
+        selection = self.location_tree.selection()
+        if selection and selection[0].startswith('loc:'):
+            self.show_location(selection[0][len('loc:'):], quiet=True)
+
+    def show_location(self, location, quiet=False):
+        """Show the rollup and cartons for a location prefix."""
+        location = normalise_location(location)
+        stock_index = self.stock_app.stock_index
+        summary = location_summary(stock_index, location)
+        if summary is None:
+            if not quiet:
+                messagebox.showerror('Error', f"No stock is stored at location '{location}'.")
+            location = ''
+            summary = location_summary(stock_index, '')
+        self.selected_location = location
+        self.summary_label.config(
+            text=f"{location or 'All locations'}: {summary['cartons']} carton(s), {summary['units']} units, "
+                 f"₹{format_rupees(summary['stock_value'])}, {summary['occupied_positions']}/{summary['positions']} positions occupied")
+
+        # Listing every carton is left to the company stock view
+        self.carton_tree.delete(*self.carton_tree.get_children())
+        for carton in (cartons_at_location(stock_index, location) if location else []):
+            self.carton_tree.insert('', 'end', values=(
+                carton['location'],
+                carton['carton_id'],
+                carton['product_id'],
+                carton['product_name'],
+                carton['quantity_per_carton'],
+                carton['damaged_units'],
+                carton['expiry_date'] or 'N/A',
+            ))
@@ -0,0 +1,87 @@
+"""
+Stock reconciliation window.
+"""
+
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk, messagebox
+from ui.base import BaseUIComponent
+from services.reconciliation import reconcile_stock
+
+KIND_LABELS = {
+    'quantity_mismatch': "Quantity mismatch",
+    'no_purchase': "No purchase logged",
+    'not_in_stock': "Not in stock",
+}
+
+
+class ReconciliationWindow(BaseUIComponent):
+    """Check the selected company's stock against its transaction logs."""
+
+    def __init__(self, stock_app_ref):
+        super().__init__(stock_app_ref, stock_app_ref)
+        self.window = tk.Toplevel(self.parent)
+        self.window.title(f"Reconcile Stock - {self.stock_app.selected_company}")
+        self.create_widgets()
+        self.run_reconciliation()
+
+    def create_widgets(self):
+        """Create reconciliation widgets."""
+        self.status_label = ttk.Label(self.window, text="")
+        self.status_label.pack(padx=10, pady=10, anchor='w')
+
+        columns = ("Carton ID", "Product ID", "Problem", "Purchased", "Sold", "Adjusted", "Expected", "Actual")
+        self.result_tree = ttk.Treeview(self.window, columns=columns, show='headings', height=18)
+        for col, width in zip(columns, [150, 110, 150, 90, 90, 90, 90, 90]):
+            self.result_tree.heading(col, text=col)
+            self.result_tree.column(col, width=width, anchor='center')
+        self.result_tree.pack(expand=True, fill='both', padx=10)
+
+        ttk.Button(self.window, text="Run Again", command=self.run_reconciliation).pack(pady=10)
+
+    def run_reconciliation(self):
+        """Reconcile on a background thread against a snapshot of the stock."""
+        json_file = self.stock_app.selected_json_file
+        stock_data = [dict(carton) for carton in self.stock_app.stock_data]
+        self.updates = queue.Queue()
+
+        def worker():
+            try:
+                self.updates.put(('done', reconcile_stock(json_file, stock_data)))
+            except Exception as e:
+                self.updates.put(('error', e))
+
+        self.status_label.config(text=f"Reconciling {len(stock_data)} cartons against the transaction logs...")
+        threading.Thread(target=worker, daemon=True).start()
+        self.window.after(100, self.poll_reconciliation)
+
+    def poll_reconciliation(self):
+        """Show the result once the worker has finished."""
+        if not self.window.winfo_exists():
+            return
+        try:
+            kind, payload = self.updates.get_nowait()
+        except queue.Empty:
+            self.window.after(100, self.poll_reconciliation)
+            return
+        if kind == 'error':
+            self.status_label.config(text="")
+            messagebox.showerror("Error", f"Error reconciling stock: {payload}", parent=self.window)
+            return
+        self.show_report(payload)
+
+    def show_report(self, report):
+        """List the discrepancies found, largest first."""
+        self.result_tree.delete(*self.result_tree.get_children())
+        for d in report['discrepancies']:
+            self.result_tree.insert('', 'end', values=(
+                d['carton_id'], d['product_id'], KIND_LABELS.get(d['kind'], d['kind']),
+                d['purchased'], d['sold'], d['adjusted'], d['expected'], d['actual']))
+        status = (f"Checked {report['cartons']} cartons against {report['log_entries']:,} log entries "
+                  f"in {report['seconds']:.2f}s. ")
+        if report['discrepancies']:
+            status += ", ".join(f"{count} {KIND_LABELS.get(kind, kind).lower()}" for kind, count in sorted(report['by_kind'].items()))
+        else:
+            status += "Stock matches the logs."
+        self.status_label.config(text=status)
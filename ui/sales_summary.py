@@ -4,13 +4,16 @@ Sales Summary UI component for displaying sales reports and analytics.
 
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import json
-import datetime
-import os
+import queue
+import threading
 from ui.base import BaseUIComponent
-from database.stock_data import load_log
+from database.log_archive import clear_log
+from database.lineage import invalidate_lineage
+from database.log_store import read_company_log
+from services.sales_report import render_sales_report_pdf
+from services.event_bus import InventoryEvent, CARTON_SOLD, CARTON_DELETED, LOGS_CLEARED, STOCK_RELOADED
 from utils.file_utils import get_log_file_path
-from config.colors import *
+from utils.money import format_rupees
 
 
 class SalesSummaryUI(BaseUIComponent):
@@ -21,6 +24,11 @@ class SalesSummaryUI(BaseUIComponent):
         self.frame = self.create_frame()
         self.sales_chart_canvas = None
         self.sales_pie_canvas = None
+        self.monthly_sales = {}  # (month, product_id, product_name) -> totals
+        self.summary_rows = {}  # Same keys -> tree item
+        self.carton_sales = {}  # carton_id -> [(key, sales log entry)], to undo deletes
+        self.pdf_thread = None
+        self.loaded = False  # Aggregates are read from the sales log when the tab is first shown
         self.create_widgets()
     
     def create_widgets(self):
@@ -67,114 +75,164 @@ class SalesSummaryUI(BaseUIComponent):
         ttk.Button(btn_frame, text="Refresh", command=self.update_sales_summary).pack(side='left', padx=5)
         ttk.Button(btn_frame, text="Clear Sales Summary", command=self.clear_sales_summary).pack(side='left', padx=5)
         ttk.Button(btn_frame, text="Export to PDF", command=self.export_sales_summary_pdf).pack(side='left', padx=5)
-        
-        # Initial data load
-        self.update_sales_summary()
+        ttk.Button(btn_frame, text="Margin Report", command=self.show_margin_report).pack(side='left', padx=5)
+        ttk.Label(btn_frame, text="Group PDF by:").pack(side='left', padx=(15, 5))
+        self.pdf_group_var = tk.StringVar(value='Month')
+        ttk.Combobox(btn_frame, textvariable=self.pdf_group_var, values=('Month', 'Product'),
+                     state='readonly', width=9).pack(side='left', padx=5)
+        self.pdf_status_label = ttk.Label(self.frame, text="")
+        self.pdf_status_label.pack()
+    
+    def on_show(self):
+        """Read the sales log if it changed wholesale while the tab was hidden."""
+        if not self.loaded:
+            self.load_sales_summary()
+    
+    def subscribe(self, event_bus):
+        """Keep the summary in sync with sales."""
+        event_bus.subscribe(self.on_inventory_events, (CARTON_SOLD, CARTON_DELETED, LOGS_CLEARED, STOCK_RELOADED))
+    
+    def on_inventory_events(self, events):
+        """Fold new sales into the monthly aggregates; reload when history was rewritten."""
+        if any(e.type in (LOGS_CLEARED, STOCK_RELOADED) for e in events):
+            # Rereading the whole log is slow; only do it now if the tab is in view
+            self.loaded = False
+            if self.is_shown():
+                self.load_sales_summary()
+            return
+        if not self.loaded:
+            return
+        for event in events:
+            if event.type == CARTON_DELETED:
+                self.remove_carton_from_summary(event.carton_id)
+            elif event.log_entry is not None:
+                key = self.add_sale_to_summary(event.log_entry)
+                if key is not None:
+                    self.render_summary_row(key)
+        self.update_summary_totals(self.monthly_sales)
     
     def update_sales_summary(self):
         """Update the sales summary display."""
-        # Clear existing data
-        for item in self.sales_summary_tree.get_children():
-            self.sales_summary_tree.delete(item)
-        
         try:
-            # Load sales log
-            sales_log_file = get_log_file_path(self.stock_app.selected_json_file, 'sales')
-            sales_log = load_log(sales_log_file)
-            
-            if not sales_log:
+            if not self.load_sales_summary():
                 messagebox.showinfo('Info', 'No sales data found.')
                 return
-            
-            # Group sales by month and product
-            monthly_sales = {}
-            
-            for entry in sales_log:
-                if entry.get('type') == 'sale':
-                    date_str = entry.get('date', '')
-                    if date_str:
-                        month = date_str[:7]  # Extract YYYY-MM
-                        product_id = entry.get('product_id', '')
-                        product_name = entry.get('product_name', '')
-                        quantity = entry.get('quantity', 0)
-                        sales_value = entry.get('sales_value', 0)
-                        purchase_value = entry.get('purchase_value', 0)
-                        
-                        key = (month, product_id, product_name)
-                        if key in monthly_sales:
-                            monthly_sales[key]['quantity'] += quantity
-                            monthly_sales[key]['sales_value'] += sales_value
-                            monthly_sales[key]['purchase_value'] += purchase_value
-                        else:
-                            monthly_sales[key] = {
-                                'quantity': quantity,
-                                'sales_value': sales_value,
-                                'purchase_value': purchase_value
-                            }
-            
-            # Insert data into tree with profit/loss calculations
-            for (month, product_id, product_name), data in sorted(monthly_sales.items()):
-                sales_value = data['sales_value']
-                purchase_value = data['purchase_value']
-                profit_loss = sales_value - purchase_value
-                
-                # Calculate profit margin percentage
-                if purchase_value > 0:
-                    profit_margin = (profit_loss / purchase_value) * 100
-                else:
-                    profit_margin = 0
-                
-                # Color coding for profit/loss
-                profit_loss_display = f"₹{profit_loss:.2f}"
-                margin_display = f"{profit_margin:.1f}%"
-                
-                item = self.sales_summary_tree.insert('', 'end', values=(
-                    month,
-                    product_id,
-                    product_name,
-                    data['quantity'],
-                    f"₹{sales_value:.2f}",
-                    f"₹{purchase_value:.2f}",
-                    profit_loss_display,
-                    margin_display
-                ))
-                
-                # Color coding for profit/loss (green for profit, red for loss)
-                if profit_loss > 0:
-                    self.sales_summary_tree.set(item, "Profit/Loss (₹)", f"🟢 {profit_loss_display}")
-                elif profit_loss < 0:
-                    self.sales_summary_tree.set(item, "Profit/Loss (₹)", f"🔴 {profit_loss_display}")
-                else:
-                    self.sales_summary_tree.set(item, "Profit/Loss (₹)", f"⚪ {profit_loss_display}")
-            
-            # Update summary totals
-            self.update_summary_totals(monthly_sales)
-            
             messagebox.showinfo('Success', 'Sales summary updated successfully.')
-            
         except Exception as e:
             messagebox.showerror('Error', f'Error updating sales summary: {str(e)}')
     
+    def load_sales_summary(self):
+        """Rebuild the monthly aggregates from the sales log; returns the number of log entries."""
+        # Clear existing data
+        self.sales_summary_tree.delete(*self.sales_summary_tree.get_children())
+        self.monthly_sales = {}
+        self.summary_rows = {}
+        self.carton_sales = {}
+        
+        # Load sales log, without deleted cartons
+        sales_log = list(read_company_log(self.stock_app.selected_json_file, 'sales'))
+        
+        # Group sales by month and product
+        for entry in sales_log:
+            self.add_sale_to_summary(entry)
+        for key in sorted(self.monthly_sales):
+            self.render_summary_row(key)
+        
+        # Update summary totals
+        self.update_summary_totals(self.monthly_sales)
+        self.loaded = True
+        return len(sales_log)
+    
+    def add_sale_to_summary(self, entry):
+        """Add one sales log entry to the monthly aggregates; returns its (month, product) key."""
+        date_str = entry.get('date', '')
+        if entry.get('type') != 'sale' or not date_str:
+            return None
+        month = date_str[:7]  # Extract YYYY-MM
+        key = (month, entry.get('product_id', ''), entry.get('product_name', ''))
+        data = self.monthly_sales.setdefault(key, {'quantity': 0, 'sales_value': 0, 'purchase_value': 0})
+        data['quantity'] += entry.get('quantity', 0)
+        data['sales_value'] += entry.get('sales_value_paise', 0)
+        data['purchase_value'] += entry.get('purchase_value_paise', 0)
+        self.carton_sales.setdefault(entry.get('carton_id'), []).append((key, entry))
+        return key
+    
+    def remove_carton_from_summary(self, carton_id):
+        """Take a deleted carton's sales back out of the aggregates."""
+        for key, entry in self.carton_sales.pop(carton_id, []):
+            data = self.monthly_sales[key]
+            data['quantity'] -= entry.get('quantity', 0)
+            data['sales_value'] -= entry.get('sales_value_paise', 0)
+            data['purchase_value'] -= entry.get('purchase_value_paise', 0)
+            if data['quantity'] <= 0:
+                del self.monthly_sales[key]
+                item = self.summary_rows.pop(key, None)
+                if item is not None:
+                    self.sales_summary_tree.delete(item)
+            else:
+                self.render_summary_row(key)
+    
+    def render_summary_row(self, key):
+        """Insert or refresh the table row for one (month, product) aggregate."""
+        month, product_id, product_name = key
+        data = self.monthly_sales[key]
+        sales_value = data['sales_value']
+        purchase_value = data['purchase_value']
+        profit_loss = sales_value - purchase_value
+        
+        # Calculate profit margin percentage
+        if purchase_value > 0:
+            profit_margin = (profit_loss / purchase_value) * 100
+        else:
+            profit_margin = 0
+        
+        # Color coding for profit/loss (green for profit, red for loss)
+        profit_loss_display = f"₹{format_rupees(profit_loss)}"
+        if profit_loss > 0:
+            profit_loss_display = f"🟢 {profit_loss_display}"
+        elif profit_loss < 0:
+            profit_loss_display = f"🔴 {profit_loss_display}"
+        else:
+            profit_loss_display = f"⚪ {profit_loss_display}"
+        
+        values = (
+            month,
+            product_id,
+            product_name,
+            data['quantity'],
+            f"₹{format_rupees(sales_value)}",
+            f"₹{format_rupees(purchase_value)}",
+            profit_loss_display,
+            f"{profit_margin:.1f}%"
+        )
+        item = self.summary_rows.get(key)
+        if item is not None:
+            self.sales_summary_tree.item(item, values=values)
+        else:
+            # Keep rows in key order
+            position = sorted(self.monthly_sales).index(key)
+            self.summary_rows[key] = self.sales_summary_tree.insert('', position, values=values)
+    
     def update_summary_totals(self, monthly_sales):
-        """Update the summary totals display."""
+        """Update the summary totals display (amounts are summed in paise)."""
         total_sales = sum(data['sales_value'] for data in monthly_sales.values())
         total_purchase = sum(data['purchase_value'] for data in monthly_sales.values())
         total_profit = total_sales - total_purchase
         profit_margin = (total_profit / total_purchase * 100) if total_purchase > 0 else 0
         
         # Update labels
-        self.total_sales_label.config(text=f"Total Sales: ₹{total_sales:,.2f}")
-        self.total_purchase_label.config(text=f"Total Purchase: ₹{total_purchase:,.2f}")
+        self.total_sales_label.config(text=f"Total Sales: ₹{format_rupees(total_sales)}")
+        self.total_purchase_label.config(text=f"Total Purchase: ₹{format_rupees(total_purchase)}")
         
         # Color coding for profit/loss
         if total_profit > 0:
-            self.total_profit_label.config(text=f"Total Profit: 🟢 ₹{total_profit:,.2f}", foreground="#059669")
+            self.total_profit_label.config(text=f"Total Profit: 🟢 ₹{format_rupees(total_profit)}", foreground="#059669")
             self.profit_margin_label.config(text=f"Profit Margin: {profit_margin:.1f}%", foreground="#059669")
         elif total_profit < 0:
-            self.total_profit_label.config(text=f"Total Loss: 🔴 ₹{abs(total_profit):,.2f}", foreground="#dc2626")
+            self.total_profit_label.config(text=f"Total Loss: 🔴 ₹{format_rupees(abs(total_profit))}", foreground="#dc2626")
             self.profit_margin_label.config(text=f"Loss Margin: {abs(profit_margin):.1f}%", foreground="#dc2626")
         else:
-            self.total_profit_label.config(text=f"Break-even: ⚪ ₹{total_profit:,.2f}", foreground="#6b7280")
+            self.total_profit_label.config(text=f"Break-even: ⚪ ₹{format_rupees(total_profit)}", foreground="#6b7280")
             self.profit_margin_label.config(text=f"Margin: {profit_margin:.1f}%", foreground="#6b7280")
     
     def clear_sales_summary(self):
@@ -184,19 +242,20 @@ class SalesSummaryUI(BaseUIComponent):
         
         try:
             sales_log_file = get_log_file_path(self.stock_app.selected_json_file, 'sales')
-            with open(sales_log_file, 'w') as f:
-                json.dump([], f)
-            self.update_sales_summary()
+            clear_log(sales_log_file)
+            invalidate_lineage(self.stock_app.selected_json_file)
+            self.stock_app.event_bus.publish(InventoryEvent(LOGS_CLEARED))
             messagebox.showinfo('Success', 'Sales summary cleared.')
         except Exception as e:
             messagebox.showerror('Error', f'Error clearing sales summary: {str(e)}')
     
     def export_sales_summary_pdf(self):
-        """Export sales summary to PDF."""
+        """Export sales summary to PDF on a worker thread."""
+        if self.pdf_thread is not None:
+            messagebox.showinfo('Info', 'A PDF export is already running.')
+            return
         try:
-            from reportlab.lib.pagesizes import letter
-            from reportlab.pdfgen import canvas
-            from reportlab.lib import colors
+            import reportlab  # noqa: F401
         except ImportError:
             messagebox.showerror('Error', 'reportlab is not installed. Please install it with "pip install reportlab".')
             return
@@ -210,85 +269,89 @@ class SalesSummaryUI(BaseUIComponent):
         if not file_path:
             return
         
+        # Render from a snapshot of the aggregates so new sales can't change them mid-export
+        monthly_sales = {key: dict(data) for key, data in self.monthly_sales.items()}
+        company = self.stock_app.selected_company
+        group_by = 'product' if self.pdf_group_var.get() == 'Product' else 'month'
+        self.pdf_updates = queue.Queue()
+        
+        def worker():
+            try:
+                pages = render_sales_report_pdf(file_path, company, monthly_sales, group_by,
+                                                progress=lambda done, total: self.pdf_updates.put(('progress', (done, total))))
+                self.pdf_updates.put(('done', pages))
+            except Exception as e:
+                self.pdf_updates.put(('error', e))
+        
+        self.pdf_file_path = file_path
+        self.pdf_status_label.config(text="Exporting PDF...")
+        self.pdf_thread = threading.Thread(target=worker, daemon=True)
+        self.pdf_thread.start()
+        self.frame.after(100, self.poll_pdf_export)
+    
+    def poll_pdf_export(self):
+        """Show progress from the PDF worker thread."""
+        finished = None
+        while True:
+            try:
+                kind, payload = self.pdf_updates.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                self.pdf_status_label.config(text=f"Exporting PDF... {payload[0]}/{payload[1]} rows")
+            else:
+                finished = (kind, payload)
+        
+        if finished is None:
+            self.frame.after(100, self.poll_pdf_export)
+            return
+        
+        self.pdf_thread = None
+        self.pdf_status_label.config(text="")
+        kind, payload = finished
+        if kind == 'done':
+            messagebox.showinfo('Success', f'Sales summary exported to {self.pdf_file_path} ({payload} pages)')
+        else:
+            messagebox.showerror('Error', f'Error exporting PDF: {str(payload)}')
+    
+    def show_margin_report(self):
+        """Show inventory valuation and per-month, per-product margins at layer cost."""
         try:
-            # Gather table data from the treeview
-            table_data = [("Month", "Product ID", "Product Name", "Units Sold", "Sales Value (₹)", "Purchase Value (₹)", "Profit/Loss (₹)", "Profit Margin (%)")]
-            for row in self.sales_summary_tree.get_children():
-                table_data.append(self.sales_summary_tree.item(row)['values'])
-            
-            # Create PDF
-            c = canvas.Canvas(file_path, pagesize=letter)
-            width, height = letter
-            y = height - 40
-            
-            # Title
-            c.setFont("Helvetica-Bold", 18)
-            c.drawString(40, y, f"Stock Mitra - Sales Summary Report")
-            
-            # Company and date info
-            c.setFont("Helvetica", 12)
-            y -= 25
-            c.drawString(40, y, f"Company: {self.stock_app.selected_company}")
-            c.drawString(350, y, f"Date: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}")
-            
-            # Table title
-            y -= 30
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(40, y, "Monthly Sales Summary Table:")
-            y -= 20
-            
-            # Draw table
-            col_widths = [60, 80, 120, 60, 80, 80, 80, 70]
-            for i, row in enumerate(table_data):
-                for j, val in enumerate(row):
-                    c.setFont("Helvetica-Bold" if i == 0 else "Helvetica", 8)
-                    c.setFillColor(colors.black if i == 0 else colors.darkblue)
-                    c.drawString(40 + sum(col_widths[:j]), y, str(val))
-                y -= 18
-                if y < 120:  # Start new page if running out of space
-                    c.showPage()
-                    y = height - 40
-            
-            # Add summary statistics
-            y -= 30
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(40, y, "Summary Statistics:")
-            y -= 20
-            
-            # Calculate totals
-            total_units = 0
-            total_sales = 0.0
-            total_purchase = 0.0
-            total_profit = 0.0
-            for row in self.sales_summary_tree.get_children():
-                values = self.sales_summary_tree.item(row)['values']
-                total_units += int(values[3])
-                # Remove ₹ symbol and convert to float
-                sales_str = str(values[4]).replace('₹', '').replace(',', '')
-                purchase_str = str(values[5]).replace('₹', '').replace(',', '')
-                profit_str = str(values[6]).replace('₹', '').replace(',', '')
-                total_sales += float(sales_str)
-                total_purchase += float(purchase_str)
-                total_profit += float(profit_str)
-            
-            # Calculate overall profit margin
-            overall_margin = (total_profit / total_purchase * 100) if total_purchase > 0 else 0
-            
-            c.setFont("Helvetica", 12)
-            c.drawString(40, y, f"Total Units Sold: {total_units}")
-            y -= 20
-            c.drawString(40, y, f"Total Sales Value: ₹{total_sales:,.2f}")
-            y -= 20
-            c.drawString(40, y, f"Total Purchase Value: ₹{total_purchase:,.2f}")
-            y -= 20
-            c.drawString(40, y, f"Total Profit/Loss: ₹{total_profit:,.2f}")
-            y -= 20
-            c.drawString(40, y, f"Overall Profit Margin: {overall_margin:.1f}%")
-            y -= 20
-            c.drawString(40, y, f"Total Products: {len(table_data) - 1}")  # -1 for header
-            
-            c.save()
-            messagebox.showinfo('Success', f'Sales summary exported to {file_path}')
-            
+            ledger = self.stock_app.get_cost_ledger()
         except Exception as e:
-            messagebox.showerror('Error', f'Error exporting PDF: {str(e)}')
\ No newline at end of file
+            messagebox.showerror('Error', f'Error building cost layers: {str(e)}')
+            return
+        units, at_sales, at_mrp = self.stock_app.stock_index.total_valuation
+        method = 'FIFO' if ledger.method == 'fifo' else 'Weighted Average'
+        
+        window = tk.Toplevel(self.frame)
+        window.title(f"Margin Report ({method})")
+        ttk.Label(window, text=f"Inventory on hand: {units} units  |  At cost ({method}): ₹{format_rupees(ledger.inventory_cost())}  |  "
+                               f"At sales price: ₹{format_rupees(at_sales)}  |  At MRP: ₹{format_rupees(at_mrp)}").pack(padx=10, pady=10)
+        
+        rows = ledger.margin_report()
+        months = sorted({row['month'] for row in rows}, reverse=True)
+        filter_frame = ttk.Frame(window)
+        filter_frame.pack(fill='x', padx=10)
+        ttk.Label(filter_frame, text="Month:").pack(side='left')
+        month_var = tk.StringVar(value='All')
+        month_box = ttk.Combobox(filter_frame, textvariable=month_var, values=['All'] + months, state='readonly', width=10)
+        month_box.pack(side='left', padx=5)
+        
+        columns = ("Month", "Product ID", "Product Name", "Units Sold", "Revenue (₹)", "COGS (₹)", "Profit (₹)", "Margin (%)")
+        tree = ttk.Treeview(window, columns=columns, show='headings', height=15)
+        for col, width in zip(columns, [80, 100, 200, 80, 110, 110, 110, 90]):
+            tree.heading(col, text=col)
+            tree.column(col, width=width, anchor='center')
+        tree.pack(expand=True, fill='both', padx=10, pady=10)
+        
+        def show_rows(event=None):
+            tree.delete(*tree.get_children())
+            month = month_var.get()
+            for row in (rows if month == 'All' else [r for r in rows if r['month'] == month]):
+                tree.insert('', 'end', values=(row['month'], row['product_id'], row['product_name'], row['units'],
+                                               format_rupees(row['revenue']), format_rupees(row['cogs']),
+                                               format_rupees(row['profit']), f"{row['margin']:.1f}"))
+        
+        month_box.bind('<<ComboboxSelected>>', show_rows)
+        show_rows()
@@ -3,13 +3,13 @@ Sell Stock UI component for processing stock sales.
 """
 
 import tkinter as tk
-from tkinter import ttk, messagebox
-import datetime
+from tkinter import ttk, messagebox, filedialog
 from ui.base import BaseUIComponent
 from services.stock_search import _get_product_for_action, get_product_summary_text
-from database.stock_data import save_stock_data, append_log_entry
-from utils.file_utils import get_log_file_path
-from utils.date_utils import format_date
+from database.stock_data import StockConflictError
+from services.stock_operations import StockOperationError, sell_product, sell_order, run_stock_transaction
+from services.pick_list import build_pick_list, format_pick_list
+from utils.money import format_rupees
 from config.colors import *
 
 
@@ -20,6 +20,8 @@ class SellStockUI(BaseUIComponent):
         super().__init__(parent, stock_app_ref)
         self.frame = self.create_frame()
         self.identified_product_id_for_sale = None
+        self.order_lines = []  # (product_id, product_name, full_cartons, loose_pieces)
+        self.last_pick_list = None
         self.sell_stock_suggestion_window = None
         self.sell_stock_suggestion_listbox = None
         self.create_widgets()
@@ -64,7 +66,23 @@ class SellStockUI(BaseUIComponent):
         button_frame = ttk.Frame(self.frame)
         button_frame.pack(pady=10)
         ttk.Button(button_frame, text="Clear Form", command=self.clear_sell_stock_form).grid(row=0, column=0, padx=5)
-        ttk.Button(button_frame, text="Process Sale", command=self.perform_sell_stock).grid(row=0, column=1, padx=5)
+        ttk.Button(button_frame, text="Add to Order", command=self.add_order_line).grid(row=0, column=1, padx=5)
+        ttk.Button(button_frame, text="Process Sale", command=self.perform_sell_stock).grid(row=0, column=2, padx=5)
+        ttk.Button(button_frame, text="Pick List", command=self.show_last_pick_list).grid(row=0, column=3, padx=5)
+        
+        # Pending order lines, sold together in one transaction
+        order_frame = ttk.LabelFrame(self.frame, text="Order Lines", padding="10")
+        order_frame.pack(fill='both', expand=True, padx=5, pady=5)
+        self.order_tree = ttk.Treeview(order_frame, columns=("Product ID", "Product Name", "Full Cartons", "Loose Pieces"),
+                                       show='headings', height=5)
+        for col, width in zip(("Product ID", "Product Name", "Full Cartons", "Loose Pieces"), [120, 260, 100, 100]):
+            self.order_tree.heading(col, text=col)
+            self.order_tree.column(col, width=width, anchor='center')
+        self.order_tree.pack(side='left', fill='both', expand=True)
+        order_buttons = ttk.Frame(order_frame)
+        order_buttons.pack(side='left', padx=5)
+        ttk.Button(order_buttons, text="Remove Line", command=self.remove_order_line).pack(pady=2)
+        ttk.Button(order_buttons, text="Clear Order", command=self.clear_order).pack(pady=2)
     
     def identify_product_for_sale(self):
         """Identify product for sale."""
@@ -78,7 +96,7 @@ class SellStockUI(BaseUIComponent):
         
         if product_id:
             self.identified_product_id_for_sale = product_id
-            summary_text = get_product_summary_text(product_id, all_stock_data_combined)
+            summary_text = get_product_summary_text(product_id, all_stock_data_combined, self.stock_app.stock_index)
             self.sell_product_summary_text.config(state=tk.NORMAL)
             self.sell_product_summary_text.delete(1.0, tk.END)
             self.sell_product_summary_text.insert(tk.END, summary_text)
@@ -92,12 +110,8 @@ class SellStockUI(BaseUIComponent):
             self.sell_product_summary_text.config(state=tk.DISABLED)
             messagebox.showerror('Error', message)
     
-    def perform_sell_stock(self):
-        """Process the stock sale."""
-        if not self.identified_product_id_for_sale:
-            messagebox.showerror('Error', 'Please identify a product first.')
-            return
-        
+    def read_sale_quantities(self):
+        """Validate the quantity entries; returns (full_cartons, loose_pieces) or None."""
         try:
             full_cartons = int(self.sell_num_full_cartons_entry.get())
             loose_pieces = int(self.sell_num_loose_pieces_entry.get())
@@ -105,102 +119,104 @@ class SellStockUI(BaseUIComponent):
                 raise ValueError
         except ValueError:
             messagebox.showerror('Error', 'Please enter valid non-negative numbers for quantities.')
-            return
+            return None
         
         if full_cartons == 0 and loose_pieces == 0:
             messagebox.showerror('Error', 'Please enter a quantity to sell.')
+            return None
+        return full_cartons, loose_pieces
+    
+    def add_order_line(self):
+        """Add the identified product and quantities to the pending order."""
+        if not self.identified_product_id_for_sale:
+            messagebox.showerror('Error', 'Please identify a product first.')
             return
-        
-        # Find available cartons for this product (FIFO/FEFO logic)
-        available_cartons = [c for c in self.stock_app.stock_data 
-                           if c['product_id'] == self.identified_product_id_for_sale 
-                           and c['date_outwarded'] is None]
-        
-        if not available_cartons:
-            messagebox.showerror('Error', 'No available stock for this product.')
-            return
-        
-        # Sort by expiry date first (FEFO), then by inward date (FIFO)
-        from utils.date_utils import parse_date
-        available_cartons.sort(key=lambda x: (
-            parse_date(x['expiry_date']) or datetime.date(9999, 12, 31),
-            parse_date(x['date_inwarded']) or datetime.date(1, 1, 1)
-        ))
-        
-        total_units_to_sell = full_cartons * available_cartons[0]['quantity_per_carton'] + loose_pieces
-        total_available = sum(c['quantity_per_carton'] - c['damaged_units'] for c in available_cartons)
-        
-        if total_units_to_sell > total_available:
-            messagebox.showerror('Error', f'Insufficient stock. Available: {total_available} units, Requested: {total_units_to_sell} units.')
+        quantities = self.read_sale_quantities()
+        if quantities is None:
             return
-        
-        # Process the sale
-        units_remaining = total_units_to_sell
-        total_sales_value = 0
-        cartons_sold = []
-        
-        for carton in available_cartons:
-            if units_remaining <= 0:
-                break
-            
-            available_in_carton = carton['quantity_per_carton'] - carton['damaged_units']
-            if available_in_carton <= 0:
-                continue
-            
-            units_from_this_carton = min(units_remaining, available_in_carton)
-            
-            # Calculate sales value using actual sales price
-            sales_price_per_unit = carton.get('sales_price', 0)
-            purchase_price_per_unit = carton.get('purchase_price', 0)
-            sales_value = units_from_this_carton * sales_price_per_unit
-            purchase_value = units_from_this_carton * purchase_price_per_unit
-            total_sales_value += sales_value
-            
-            # Update carton
-            carton['quantity_per_carton'] -= units_from_this_carton
-            if carton['quantity_per_carton'] == 0:
-                carton['date_outwarded'] = format_date(datetime.date.today())
+        product_id = self.identified_product_id_for_sale
+        product_name = self.stock_app.stock_index.product_names.get(product_id, '')
+        self.order_lines.append((product_id, product_name) + quantities)
+        self.order_tree.insert('', 'end', values=(product_id, product_name) + quantities)
+        self.clear_sell_stock_form()
+    
+    def remove_order_line(self):
+        """Drop the selected lines from the pending order."""
+        items = self.order_tree.get_children()
+        for item in self.order_tree.selection():
+            self.order_lines[items.index(item)] = None
+        self.order_lines = [line for line in self.order_lines if line is not None]
+        self.order_tree.delete(*self.order_tree.selection())
+    
+    def clear_order(self):
+        self.order_lines = []
+        self.order_tree.delete(*self.order_tree.get_children())
+    
+    def perform_sell_stock(self):
+        """Process the pending order, or a single sale of the identified product."""
+        if self.order_lines:
+            lines = [(product_id, full, loose) for product_id, _, full, loose in self.order_lines]
             
-            cartons_sold.append({
-                'carton_id': carton['carton_id'],
-                'units_sold': units_from_this_carton,
-                'sales_value': sales_value,
-                'purchase_value': purchase_value,
-                'sales_price': sales_price_per_unit,
-                'purchase_price': purchase_price_per_unit
-            })
+            def operation(stock_data):
+                return sell_order(stock_data, lines)
+        else:
+            if not self.identified_product_id_for_sale:
+                messagebox.showerror('Error', 'Please identify a product first.')
+                return
+            quantities = self.read_sale_quantities()
+            if quantities is None:
+                return
+            product_id = self.identified_product_id_for_sale
+            full_cartons, loose_pieces = quantities
             
-            units_remaining -= units_from_this_carton
+            def operation(stock_data):
+                return sell_product(stock_data, product_id, full_cartons, loose_pieces)
         
-        # Save updated stock data
-        save_stock_data(self.stock_app.stock_data, self.stock_app.selected_json_file)
-        
-        # Log the sale
-        sales_log_file = get_log_file_path(self.stock_app.selected_json_file, 'sales')
-        for sale in cartons_sold:
-            # Find the original carton to get MRP
-            original_carton = next((c for c in self.stock_app.stock_data if c['carton_id'] == sale['carton_id']), {})
-            append_log_entry(sales_log_file, {
-                'date': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'product_id': self.identified_product_id_for_sale,
-                'product_name': next(c['product_name'] for c in self.stock_app.stock_data if c['product_id'] == self.identified_product_id_for_sale),
-                'carton_id': sale['carton_id'],
-                'quantity': sale['units_sold'],
-                'sales_price': sale['sales_price'],
-                'purchase_price': sale['purchase_price'],
-                'mrp': original_carton.get('mrp', 0),
-                'sales_value': sale['sales_value'],
-                'purchase_value': sale['purchase_value'],
-                'type': 'sale'
-            })
+        try:
+            change = run_stock_transaction(self.stock_app.selected_json_file, self.stock_app.stock_data, operation)
+        except (StockOperationError, StockConflictError, OSError) as e:
+            self.stock_app.on_stock_data_changed()
+            messagebox.showerror('Error', str(e))
+            return
         
-        # Show success message
-        messagebox.showinfo('Success', f"Sale processed successfully!\nTotal units sold: {total_units_to_sell}\nTotal sales value: ₹{total_sales_value:.2f}")
+        self.last_pick_list = format_pick_list(build_pick_list(change), self.stock_app.selected_company,
+                                               change.sales_log[0]['date'] if change.sales_log else '')
         
         # Clear form and refresh UI
         self.clear_sell_stock_form()
-        if hasattr(self.stock_app, 'dashboard_ui'):
-            self.stock_app.dashboard_ui.update_dashboard()
+        self.stock_app.on_stock_data_changed(change)
+        if self.order_lines:
+            self.clear_order()
+            self.show_last_pick_list()
+        else:
+            messagebox.showinfo('Success', f"Sale processed successfully!\nTotal units sold: {change.summary['total_units']}\nTotal sales value: ₹{format_rupees(change.summary['total_sales_value_paise'])}")
+    
+    def show_last_pick_list(self):
+        """Show the pick list of the last sale, ready to save or print."""
+        if not self.last_pick_list:
+            messagebox.showinfo('Pick List', 'No sale has been processed yet.')
+            return
+        window = tk.Toplevel(self.frame)
+        window.title("Pick List")
+        text = tk.Text(window, width=80, height=30, font=('Courier New', 10))
+        text.insert(tk.END, self.last_pick_list)
+        text.config(state=tk.DISABLED)
+        text.pack(fill='both', expand=True, padx=10, pady=10)
+        buttons = ttk.Frame(window)
+        buttons.pack(pady=(0, 10))
+        ttk.Button(buttons, text="Save...", command=lambda: self.save_pick_list(self.last_pick_list)).pack(side='left', padx=5)
+        ttk.Button(buttons, text="Close", command=window.destroy).pack(side='left', padx=5)
+    
+    def save_pick_list(self, pick_list):
+        file_path = filedialog.asksaveasfilename(defaultextension=".txt", filetypes=[("Text files", "*.txt")],
+                                                 title="Save Pick List")
+        if not file_path:
+            return
+        try:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(pick_list)
+        except OSError as e:
+            messagebox.showerror('Error', f"Could not save pick list: {e}")
     
     def clear_sell_stock_form(self):
         """Clear the sell stock form."""
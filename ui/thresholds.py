@@ -0,0 +1,126 @@
+"""
+Alert threshold settings window.
+"""
+
+import copy
+import tkinter as tk
+from tkinter import ttk, messagebox
+from ui.base import BaseUIComponent
+from database.stock_data import save_threshold_rules
+from services.thresholds import ThresholdRules
+from services.event_bus import InventoryEvent, THRESHOLDS_CHANGED
+from config.settings import LOW_STOCK_THRESHOLD, EXPIRY_SOON_DAYS
+
+
+class ThresholdSettingsWindow(BaseUIComponent):
+    """Edit the selected company's per-product and per-category alert thresholds."""
+
+    SCOPES = {'Product': 'products', 'Category': 'categories'}
+
+    def __init__(self, stock_app_ref):
+        super().__init__(stock_app_ref, stock_app_ref)
+        self.rules = copy.deepcopy(self.stock_app.stock_alerts.rules.to_dict())
+        self.window = tk.Toplevel(self.parent)
+        self.window.title(f"Alert Thresholds - {self.stock_app.selected_company}")
+        self.create_widgets()
+        self.show_rules()
+
+    def create_widgets(self):
+        """Create threshold settings widgets."""
+        ttk.Label(self.window, text=f"Defaults: low stock at {LOW_STOCK_THRESHOLD} live units or fewer, "
+                                    f"expiring within {EXPIRY_SOON_DAYS} days.\n"
+                                    "A category rule applies to every product ID starting with its prefix; "
+                                    "product rules override category rules. Leave a field blank to inherit it."
+                  ).pack(padx=10, pady=10, anchor='w')
+
+        columns = ("Scope", "Product ID / Prefix", "Product Name", "Low Stock Units", "Expiry Soon Days")
+        self.rule_tree = ttk.Treeview(self.window, columns=columns, show='headings', height=10)
+        for col, width in zip(columns, [100, 160, 220, 140, 140]):
+            self.rule_tree.heading(col, text=col)
+            self.rule_tree.column(col, width=width, anchor='center')
+        self.rule_tree.pack(expand=True, fill='both', padx=10)
+        self.rule_tree.bind('<<TreeviewSelect>>', self.on_rule_select)
+
+        form = ttk.Frame(self.window)
+        form.pack(fill='x', padx=10, pady=10)
+        self.scope_var = tk.StringVar(value='Product')
+        ttk.Combobox(form, textvariable=self.scope_var, values=tuple(self.SCOPES), state='readonly', width=10).grid(row=0, column=0, padx=5)
+        self.key_entry = ttk.Entry(form, width=16)
+        self.low_stock_entry = ttk.Entry(form, width=8)
+        self.expiry_entry = ttk.Entry(form, width=8)
+        for column, (label, entry) in enumerate([("ID / Prefix:", self.key_entry), ("Low Stock Units:", self.low_stock_entry),
+                                                 ("Expiry Soon Days:", self.expiry_entry)]):
+            ttk.Label(form, text=label).grid(row=0, column=1 + 2 * column, padx=(10, 2))
+            entry.grid(row=0, column=2 + 2 * column)
+
+        buttons = ttk.Frame(self.window)
+        buttons.pack(fill='x', padx=10, pady=(0, 10))
+        ttk.Button(buttons, text="Set Rule", command=self.set_rule).pack(side='left', padx=5)
+        ttk.Button(buttons, text="Remove Rule", command=self.remove_rule).pack(side='left', padx=5)
+        ttk.Button(buttons, text="Save", command=self.save_rules).pack(side='right', padx=5)
+
+    def show_rules(self):
+        """List the rules being edited, categories first."""
+        self.rule_tree.delete(*self.rule_tree.get_children())
+        product_names = self.stock_app.stock_index.product_names
+        for scope, section in sorted(self.SCOPES.items()):
+            for key, rule in sorted(self.rules[section].items()):
+                self.rule_tree.insert('', 'end', iid=f"{section}:{key}", values=(
+                    scope, key, product_names.get(key, '') if section == 'products' else '',
+                    rule.get('low_stock_units', ''), rule.get('expiry_soon_days', '')))
+
+    def on_rule_select(self, event):
+        selection = self.rule_tree.selection()
+        if not selection:
+            return
+        scope, key, _, low_stock, expiry = self.rule_tree.item(selection[0], 'values')
+        self.scope_var.set(scope)
+        for entry, value in ((self.key_entry, key), (self.low_stock_entry, low_stock), (self.expiry_entry, expiry)):
+            entry.delete(0, tk.END)
+            entry.insert(0, value)
+
+    def set_rule(self):
+        """Add or replace the rule described by the form."""
+        key = self.key_entry.get().strip().upper()
+        if not key:
+            messagebox.showerror("Input Error", "Enter a product ID or category prefix.", parent=self.window)
+            return
+        rule = {}
+        for name, entry in (('low_stock_units', self.low_stock_entry), ('expiry_soon_days', self.expiry_entry)):
+            value = entry.get().strip()
+            if not value:
+                continue
+            try:
+                rule[name] = int(value)
+            except ValueError:
+                messagebox.showerror("Input Error", "Thresholds must be whole numbers.", parent=self.window)
+                return
+            if rule[name] < 0:
+                messagebox.showerror("Input Error", "Thresholds cannot be negative.", parent=self.window)
+                return
+        if not rule:
+            messagebox.showerror("Input Error", "Set at least one threshold.", parent=self.window)
+            return
+        self.rules[self.SCOPES[self.scope_var.get()]][key] = rule
+        self.show_rules()
+
+    def remove_rule(self):
+        selection = self.rule_tree.selection()
+        if not selection:
+            messagebox.showwarning("No Selection", "Select a rule to remove.", parent=self.window)
+            return
+        section, key = selection[0].split(':', 1)
+        self.rules[section].pop(key, None)
+        self.show_rules()
+
+    def save_rules(self):
+        """Store the rules with the company and re-evaluate alerts."""
+        try:
+            rules = ThresholdRules.from_dict(self.rules)
+            save_threshold_rules(self.stock_app.selected_json_file, rules.to_dict())
+        except (ValueError, OSError) as e:
+            messagebox.showerror("Save Error", f"Could not save thresholds: {e}", parent=self.window)
+            return
+        self.stock_app.stock_alerts.set_rules(rules)
+        self.stock_app.event_bus.publish(InventoryEvent(THRESHOLDS_CHANGED))
+        self.window.destroy()
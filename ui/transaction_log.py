@@ -2,13 +2,18 @@
 Transaction Log UI component for displaying purchase and sales transaction history.
 """
 
-import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import csv
+import queue
+import threading
 from ui.base import BaseUIComponent
-from database.stock_data import load_log
+from database.log_archive import clear_log
+from database.lineage import invalidate_lineage
+from utils.money import format_rupees
+from database.log_store import read_company_log, load_tombstones
+from services.log_export import export_transactions_csv, ExportCancelled
+from services.event_bus import InventoryEvent, CARTON_ADDED, CARTON_SOLD, CARTON_DELETED, LOGS_CLEARED, STOCK_RELOADED
 from utils.file_utils import get_log_file_path
-from config.colors import *
+from utils.date_utils import parse_date
 
 
 class TransactionLogUI(BaseUIComponent):
@@ -17,6 +22,8 @@ class TransactionLogUI(BaseUIComponent):
     def __init__(self, parent, stock_app_ref):
         super().__init__(parent, stock_app_ref)
         self.frame = self.create_frame()
+        self.export_thread = None
+        self.loaded = False  # Rows are read from the logs when the tab is first shown
         self.create_widgets()
     
     def create_widgets(self):
@@ -59,131 +66,198 @@ class TransactionLogUI(BaseUIComponent):
         ttk.Button(btn_frame, text="Export to CSV", command=self.export_transaction_log_csv).pack(side='left', padx=5)
         ttk.Button(btn_frame, text="Clear Logs", command=self.clear_transaction_logs).pack(side='left', padx=5)
         
-        # Initial data load
-        self.update_transaction_log()
+        # CSV export filters and progress
+        export_frame = ttk.LabelFrame(self.frame, text="CSV Export", padding="10")
+        export_frame.pack(fill='x', pady=5)
+        ttk.Label(export_frame, text="From (YYYY-MM-DD):").grid(row=0, column=0, sticky='w', padx=5)
+        self.export_from_entry = ttk.Entry(export_frame, width=12)
+        self.export_from_entry.grid(row=0, column=1, padx=5)
+        ttk.Label(export_frame, text="To:").grid(row=0, column=2, sticky='w', padx=5)
+        self.export_to_entry = ttk.Entry(export_frame, width=12)
+        self.export_to_entry.grid(row=0, column=3, padx=5)
+        ttk.Label(export_frame, text="Product IDs (comma separated):").grid(row=0, column=4, sticky='w', padx=5)
+        self.export_products_entry = ttk.Entry(export_frame, width=20)
+        self.export_products_entry.grid(row=0, column=5, padx=5)
+        self.export_progress = ttk.Progressbar(export_frame, maximum=100, length=300)
+        self.export_progress.grid(row=1, column=0, columnspan=4, sticky='ew', padx=5, pady=(8, 0))
+        self.export_status_label = ttk.Label(export_frame, text="")
+        self.export_status_label.grid(row=1, column=4, sticky='w', padx=5, pady=(8, 0))
+        self.export_cancel_button = ttk.Button(export_frame, text="Cancel Export", command=self.cancel_export, state='disabled')
+        self.export_cancel_button.grid(row=1, column=5, padx=5, pady=(8, 0))
+    
+    def on_show(self):
+        """Read the logs if they changed wholesale while the tab was hidden."""
+        if not self.loaded:
+            self.load_transaction_log()
+    
+    def subscribe(self, event_bus):
+        """Keep the log in sync with stock changes."""
+        event_bus.subscribe(self.on_inventory_events)
+    
+    def on_inventory_events(self, events):
+        """Apply a batch of inventory events as row inserts and removals."""
+        if any(e.type in (STOCK_RELOADED, LOGS_CLEARED) for e in events):
+            # Rereading every log is slow; only do it now if the tab is in view
+            self.loaded = False
+            if self.is_shown():
+                self.load_transaction_log()
+            return
+        if not self.loaded:
+            return
+        deleted_ids = {e.carton_id for e in events if e.type == CARTON_DELETED}
+        if deleted_ids:
+            for item in self.transaction_tree.get_children():
+                if self.transaction_tree.set(item, 'Carton ID') in deleted_ids:
+                    self.transaction_tree.delete(item)
+        new_entries = [(e.log_entry, e.type == CARTON_SOLD) for e in events
+                       if e.type in (CARTON_ADDED, CARTON_SOLD) and e.log_entry is not None]
+        # Newest first, as in a full load
+        for entry, is_sale in sorted(new_entries, key=lambda x: x[0].get('date', '')):
+            self.insert_transaction(entry, is_sale, index=0)
     
     def update_transaction_log(self):
         """Update the transaction log display."""
-        # Clear existing data
-        for item in self.transaction_tree.get_children():
-            self.transaction_tree.delete(item)
-        
         try:
-            # Load both purchase and sales logs
-            purchase_log_file = get_log_file_path(self.stock_app.selected_json_file, 'purchase')
-            sales_log_file = get_log_file_path(self.stock_app.selected_json_file, 'sales')
-            
-            purchase_log = load_log(purchase_log_file)
-            sales_log = load_log(sales_log_file)
-            
-            # Combine and sort all transactions by date
-            all_transactions = []
-            
-            # Add purchase transactions
-            for entry in purchase_log:
-                all_transactions.append({
-                    'date': entry.get('date', ''),
-                    'type': 'Purchase',
-                    'product_id': entry.get('product_id', ''),
-                    'product_name': entry.get('product_name', ''),
-                    'carton_id': entry.get('carton_id', ''),
-                    'quantity': entry.get('quantity', 0),
-                    'purchase_price': entry.get('purchase_price', 0),
-                    'sales_price': entry.get('sales_price', 0),
-                    'mrp': entry.get('mrp', 0),
-                    'purchase_value': entry.get('purchase_value', 0),
-                    'sales_value': entry.get('sales_value', 0),
-                    'profit_loss': 0  # No profit/loss for purchases
-                })
-            
-            # Add sales transactions
-            for entry in sales_log:
-                purchase_value = entry.get('purchase_value', 0)
-                sales_value = entry.get('sales_value', 0)
-                profit_loss = sales_value - purchase_value
-                all_transactions.append({
-                    'date': entry.get('date', ''),
-                    'type': 'Sale',
-                    'product_id': entry.get('product_id', ''),
-                    'product_name': entry.get('product_name', ''),
-                    'carton_id': entry.get('carton_id', ''),
-                    'quantity': entry.get('quantity', 0),
-                    'purchase_price': entry.get('purchase_price', 0),
-                    'sales_price': entry.get('sales_price', 0),
-                    'mrp': entry.get('mrp', 0),
-                    'purchase_value': purchase_value,
-                    'sales_value': sales_value,
-                    'profit_loss': profit_loss
-                })
-            
-            # Sort by date (newest first)
-            all_transactions.sort(key=lambda x: x['date'], reverse=True)
-            
-            # Insert data into tree
-            for trans in all_transactions:
-                purchase_display = f"₹{trans['purchase_value']:.2f}" if trans['purchase_value'] > 0 else "N/A"
-                sales_display = f"₹{trans['sales_value']:.2f}" if trans['sales_value'] > 0 else "N/A"
-                
-                if trans['type'] == 'Purchase':
-                    profit_display = "N/A"  # No profit/loss for purchases
-                else:
-                    profit_loss = trans['profit_loss']
-                    if profit_loss > 0:
-                        profit_display = f"🟢 ₹{profit_loss:.2f}"
-                    elif profit_loss < 0:
-                        profit_display = f"🔴 ₹{abs(profit_loss):.2f}"
-                    else:
-                        profit_display = f"⚪ ₹{profit_loss:.2f}"
-                
-                self.transaction_tree.insert('', 'end', values=(
-                    trans['date'],
-                    trans['type'],
-                    trans['product_id'],
-                    trans['product_name'],
-                    trans['carton_id'],
-                    trans['quantity'],
-                    f"₹{trans.get('purchase_price', 0):.2f}",
-                    f"₹{trans.get('sales_price', 0):.2f}",
-                    f"₹{trans.get('mrp', 0):.2f}" if trans.get('mrp', 0) > 0 else 'N/A',
-                    purchase_display,
-                    sales_display,
-                    profit_display
-                ))
-            
-            total_transactions = len(all_transactions)
+            total_transactions = self.load_transaction_log()
             messagebox.showinfo('Success', f'Transaction log updated. Total transactions: {total_transactions}')
-            
         except Exception as e:
             messagebox.showerror('Error', f'Error updating transaction log: {str(e)}')
     
+    def load_transaction_log(self):
+        """Reload every row from the purchase and sales logs; returns the row count."""
+        # Clear existing data
+        self.transaction_tree.delete(*self.transaction_tree.get_children())
+        
+        # Load both purchase and sales logs, without deleted cartons
+        json_file = self.stock_app.selected_json_file
+        tombstones = load_tombstones(json_file)
+        all_transactions = ([(entry, False) for entry in read_company_log(json_file, 'purchase', tombstones=tombstones)] +
+                            [(entry, True) for entry in read_company_log(json_file, 'sales', tombstones=tombstones)])
+        
+        # Sort by date (newest first)
+        all_transactions.sort(key=lambda x: x[0].get('date', ''), reverse=True)
+        
+        for entry, is_sale in all_transactions:
+            self.insert_transaction(entry, is_sale)
+        self.loaded = True
+        return len(all_transactions)
+    
+    def insert_transaction(self, entry, is_sale, index='end'):
+        """Insert one purchase or sales log entry into the table."""
+        purchase_value = entry.get('purchase_value_paise', 0)
+        sales_value = entry.get('sales_value_paise', 0)
+        purchase_display = f"₹{format_rupees(purchase_value)}" if purchase_value > 0 else "N/A"
+        sales_display = f"₹{format_rupees(sales_value)}" if sales_value > 0 else "N/A"
+        
+        if not is_sale:
+            profit_display = "N/A"  # No profit/loss for purchases
+        else:
+            profit_loss = sales_value - purchase_value
+            if profit_loss > 0:
+                profit_display = f"🟢 ₹{format_rupees(profit_loss)}"
+            elif profit_loss < 0:
+                profit_display = f"🔴 ₹{format_rupees(abs(profit_loss))}"
+            else:
+                profit_display = f"⚪ ₹{format_rupees(profit_loss)}"
+        
+        mrp = entry.get('mrp_paise', 0)
+        self.transaction_tree.insert('', index, values=(
+            entry.get('date', ''),
+            'Sale' if is_sale else 'Purchase',
+            entry.get('product_id', ''),
+            entry.get('product_name', ''),
+            entry.get('carton_id', ''),
+            entry.get('quantity', 0),
+            f"₹{format_rupees(entry.get('purchase_price_paise', 0))}",
+            f"₹{format_rupees(entry.get('sales_price_paise', 0))}",
+            f"₹{format_rupees(mrp)}" if mrp > 0 else 'N/A',
+            purchase_display,
+            sales_display,
+            profit_display
+        ))
+    
     def export_transaction_log_csv(self):
-        """Export transaction log to CSV file."""
-        try:
-            file_path = filedialog.asksaveasfilename(
-                title="Export Transaction Log",
-                defaultextension=".csv",
-                filetypes=[("CSV files", "*.csv")]
-            )
-            
-            if not file_path:
+        """Stream the purchase and sales logs to a CSV file on a worker thread."""
+        if self.export_thread is not None:
+            messagebox.showinfo('Info', 'An export is already running.')
+            return
+        
+        start = self.export_from_entry.get().strip() or None
+        end = self.export_to_entry.get().strip() or None
+        for value in (start, end):
+            if value and parse_date(value) is None:
+                messagebox.showerror('Error', 'Invalid date format. Please use YYYY-MM-DD.')
                 return
-            
-            # Get data from tree
-            with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                
-                # Write header
-                writer.writerow(["Date", "Type", "Product ID", "Product Name", "Carton ID", "Quantity", "Purchase Price", "Sales Price", "MRP", "Purchase Value (₹)", "Sales Value (₹)", "Profit/Loss (₹)"])
-                
-                # Write data
-                for item in self.transaction_tree.get_children():
-                    values = self.transaction_tree.item(item)['values']
-                    writer.writerow(values)
-            
-            messagebox.showinfo('Success', f'Transaction log exported to {file_path}')
-            
-        except Exception as e:
-            messagebox.showerror('Error', f'Error exporting transaction log: {str(e)}')
+        products = [p.strip().upper() for p in self.export_products_entry.get().split(',') if p.strip()]
+        
+        file_path = filedialog.asksaveasfilename(
+            title="Export Transaction Log",
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv")]
+        )
+        if not file_path:
+            return
+        
+        self.export_cancel = threading.Event()
+        self.export_updates = queue.Queue()
+        json_file = self.stock_app.selected_json_file
+        
+        def worker():
+            try:
+                rows = export_transactions_csv(
+                    json_file, file_path, start, end, products or None,
+                    progress=lambda *p: self.export_updates.put(('progress', p)),
+                    cancel_event=self.export_cancel)
+                self.export_updates.put(('done', rows))
+            except ExportCancelled:
+                self.export_updates.put(('cancelled', None))
+            except Exception as e:
+                self.export_updates.put(('error', e))
+        
+        self.export_file_path = file_path
+        self.export_progress['value'] = 0
+        self.export_cancel_button.config(state='normal')
+        self.export_status_label.config(text="Exporting...")
+        self.export_thread = threading.Thread(target=worker, daemon=True)
+        self.export_thread.start()
+        self.frame.after(100, self.poll_export)
+    
+    def poll_export(self):
+        """Apply progress reported by the export thread (Tk is only touched here)."""
+        finished = None
+        while True:
+            try:
+                kind, payload = self.export_updates.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                rows, bytes_read, total_bytes = payload
+                self.export_progress['value'] = 100 * bytes_read / total_bytes if total_bytes else 100
+                self.export_status_label.config(text=f"Exported {rows} rows")
+            else:
+                finished = (kind, payload)
+        
+        if finished is None:
+            self.frame.after(100, self.poll_export)
+            return
+        
+        self.export_thread = None
+        self.export_cancel_button.config(state='disabled')
+        kind, payload = finished
+        if kind == 'done':
+            self.export_status_label.config(text=f"Exported {payload} rows")
+            messagebox.showinfo('Success', f'Transaction log exported to {self.export_file_path} ({payload} rows)')
+        elif kind == 'cancelled':
+            self.export_progress['value'] = 0
+            self.export_status_label.config(text="Export cancelled")
+        else:
+            self.export_status_label.config(text="")
+            messagebox.showerror('Error', f'Error exporting transaction log: {str(payload)}')
+    
+    def cancel_export(self):
+        """Ask the running export to stop after its current chunk."""
+        if self.export_thread is not None:
+            self.export_cancel.set()
     
     def clear_transaction_logs(self):
         """Clear all transaction logs."""
@@ -192,16 +266,14 @@ class TransactionLogUI(BaseUIComponent):
         
         try:
             # Clear both purchase and sales logs
-            import json
             purchase_log_file = get_log_file_path(self.stock_app.selected_json_file, 'purchase')
             sales_log_file = get_log_file_path(self.stock_app.selected_json_file, 'sales')
             
-            with open(purchase_log_file, 'w') as f:
-                json.dump([], f)
-            with open(sales_log_file, 'w') as f:
-                json.dump([], f)
+            clear_log(purchase_log_file)
+            clear_log(sales_log_file)
+            invalidate_lineage(self.stock_app.selected_json_file)
             
-            self.update_transaction_log()
+            self.stock_app.event_bus.publish(InventoryEvent(LOGS_CLEARED))
             messagebox.showinfo('Success', 'All transaction logs cleared.')
             
         except Exception as e:
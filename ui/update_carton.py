@@ -4,11 +4,14 @@ Update Carton UI component for updating individual carton details.
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-import datetime
+import threading
 from ui.base import BaseUIComponent
-from database.stock_data import save_stock_data
-from utils.date_utils import format_date
-from config.colors import *
+from config.settings import TOMBSTONE_COMPACT_THRESHOLD, ADJUSTMENT_REASONS, DEFAULT_ADJUSTMENT_REASON
+from database.stock_data import StockConflictError
+from database.log_store import compact_logs, tombstone_count
+from database.event_store import ADJUST, DAMAGE, OUTWARD, DELETE
+from services.stock_operations import StockOperationError, update_carton_quantity, delete_carton, run_stock_transaction
+from utils.money import format_rupees
 
 
 class UpdateCartonUI(BaseUIComponent):
@@ -33,6 +36,7 @@ class UpdateCartonUI(BaseUIComponent):
         self.update_carton_id_entry.grid(row=0, column=1, padx=5, pady=5, sticky='ew')
         self.update_carton_id_entry.bind("<Return>", lambda event: self.find_carton_for_update())
         ttk.Button(carton_id_frame, text="Find Carton", command=self.find_carton_for_update).grid(row=0, column=2, padx=5, pady=5)
+        ttk.Button(carton_id_frame, text="Carton History", command=self.show_carton_history).grid(row=0, column=3, padx=5, pady=5)
         
         # Carton details display
         self.update_carton_details_label = ttk.Label(self.frame, text="", wraplength=500)
@@ -61,6 +65,12 @@ class UpdateCartonUI(BaseUIComponent):
         self.update_new_damaged_entry = ttk.Entry(self.update_fields_frame)
         self.update_new_damaged_entry.grid(row=1, column=1, padx=5, pady=5, sticky='ew')
         
+        ttk.Label(self.update_fields_frame, text="Reason:").grid(row=2, column=0, padx=5, pady=5, sticky='w')
+        self.reason_codes = {label: code for code, label in ADJUSTMENT_REASONS.items()}
+        self.update_reason_var = tk.StringVar(value=ADJUSTMENT_REASONS[DEFAULT_ADJUSTMENT_REASON])
+        ttk.Combobox(self.update_fields_frame, textvariable=self.update_reason_var, values=tuple(self.reason_codes),
+                     state='readonly').grid(row=2, column=1, padx=5, pady=5, sticky='ew')
+        
         self.update_fields_frame.columnconfigure(1, weight=1)
         self.toggle_update_fields()  # Initial call
         
@@ -69,39 +79,21 @@ class UpdateCartonUI(BaseUIComponent):
         button_frame.pack(pady=10)
         ttk.Button(button_frame, text="Clear Form", command=self.clear_update_carton_form).grid(row=0, column=0, padx=5)
         ttk.Button(button_frame, text="Perform Action", command=self.perform_update_carton).grid(row=0, column=1, padx=5)
+        ttk.Button(button_frame, text="Shrinkage Report", command=self.show_shrinkage_report).grid(row=0, column=2, padx=5)
     
-    def cleanup_transaction_logs(self, carton_id):
-        """Remove transaction entries for deleted carton."""
-        try:
-            from utils.file_utils import get_log_file_path
-            import json
-            
-            # Clean purchase log
-            purchase_log_file = get_log_file_path(self.stock_app.selected_json_file, 'purchase')
-            try:
-                with open(purchase_log_file, 'r') as f:
-                    purchase_log = json.load(f)
-                # Remove entries for deleted carton
-                purchase_log = [entry for entry in purchase_log if entry.get('carton_id') != carton_id]
-                with open(purchase_log_file, 'w') as f:
-                    json.dump(purchase_log, f, indent=2)
-            except (FileNotFoundError, json.JSONDecodeError):
-                pass  # Log file doesn't exist or is empty
-            
-            # Clean sales log
-            sales_log_file = get_log_file_path(self.stock_app.selected_json_file, 'sales')
+    def compact_logs_if_due(self):
+        """Purge deleted cartons from the logs on a background thread once enough have piled up."""
+        json_file = self.stock_app.selected_json_file
+        if tombstone_count(json_file) < TOMBSTONE_COMPACT_THRESHOLD:
+            return
+        
+        def worker():
             try:
-                with open(sales_log_file, 'r') as f:
-                    sales_log = json.load(f)
-                # Remove entries for deleted carton
-                sales_log = [entry for entry in sales_log if entry.get('carton_id') != carton_id]
-                with open(sales_log_file, 'w') as f:
-                    json.dump(sales_log, f, indent=2)
-            except (FileNotFoundError, json.JSONDecodeError):
-                pass  # Log file doesn't exist or is empty
-                
-        except Exception as e:
-            print(f"Error cleaning up transaction logs: {e}")
+                compact_logs(json_file)
+            except Exception as e:
+                print(f"Error compacting transaction logs: {e}")
+        
+        threading.Thread(target=worker, daemon=True).start()
     
     def find_carton_for_update(self):
         """Find carton by ID for updating."""
@@ -110,8 +102,7 @@ class UpdateCartonUI(BaseUIComponent):
             messagebox.showerror('Error', 'Please enter a Carton ID to find.')
             return
         
-        all_stock_data_combined = self.stock_app.stock_data
-        carton = next((c for c in all_stock_data_combined if c['carton_id'] == query_carton_id), None)
+        carton = self.stock_app.stock_index.cartons_by_id.get(query_carton_id)
         
         if carton:
             if carton['date_outwarded'] is not None:
@@ -135,6 +126,88 @@ class UpdateCartonUI(BaseUIComponent):
             self.current_carton_for_update = None
             self.update_carton_details_label.config(text="")
     
+    def describe_history_entry(self, source, entry):
+        """Event name, quantity and details for one row of a carton's history."""
+        if source == 'purchase':
+            return ("Inward", entry.get('quantity', ''),
+                    f"Purchase ₹{format_rupees(entry.get('purchase_price_paise', 0))}, Sales ₹{format_rupees(entry.get('sales_price_paise', 0))}, MRP ₹{format_rupees(entry.get('mrp_paise', 0))} per unit")
+        if source == 'sales':
+            return ("Sale", entry.get('quantity', ''),
+                    f"₹{format_rupees(entry.get('sales_value_paise', 0))} at ₹{format_rupees(entry.get('sales_price_paise', 0))} per unit")
+        data = entry.get('data', {})
+        if entry['type'] == ADJUST:
+            return ("Adjust", data.get('quantity_per_carton', ''), "Quantity corrected")
+        if entry['type'] == DAMAGE:
+            return ("Damage", data.get('damaged_units', ''), "Damaged units set")
+        if entry['type'] == OUTWARD:
+            outwarded = data.get('date_outwarded')
+            return ("Outward", '', f"Outwarded on {outwarded}" if outwarded else "Returned to stock")
+        if entry['type'] == DELETE:
+            return ("Delete", '', "Carton deleted")
+        return (entry['type'].title(), '', '')
+    
+    def show_carton_history(self):
+        """Show every inward, sale and adjustment logged for a carton, including outwarded or deleted ones."""
+        carton_id = self.update_carton_id_entry.get().strip().upper()
+        if not carton_id:
+            messagebox.showerror('Error', 'Please enter a Carton ID to show its history.')
+            return
+        try:
+            rows = self.stock_app.get_carton_lineage().history(carton_id)
+        except OSError as e:
+            messagebox.showerror('Error', f'Error reading carton history: {str(e)}')
+            return
+        if not rows:
+            messagebox.showinfo('Info', f"No logged history for carton '{carton_id}'.")
+            return
+        
+        window = tk.Toplevel(self.parent)
+        window.title(f"Carton History - {carton_id}")
+        carton = self.stock_app.stock_index.cartons_by_id.get(carton_id)
+        if carton is None:
+            state = "No longer in stock."
+        elif carton['date_outwarded'] is not None:
+            state = f"Outwarded on {carton['date_outwarded']}."
+        else:
+            state = f"In stock at {carton['location']}: {carton['quantity_per_carton']} units, {carton['damaged_units']} damaged."
+        ttk.Label(window, text=f"{rows[0][1].get('product_id', '')} - {rows[0][1].get('product_name', '')}. {state}").pack(padx=10, pady=10, anchor='w')
+        
+        columns = ("Date", "Event", "Quantity", "Details")
+        history_tree = ttk.Treeview(window, columns=columns, show='headings', height=15)
+        for col, width in zip(columns, [160, 90, 90, 420]):
+            history_tree.heading(col, text=col)
+            history_tree.column(col, width=width, anchor='center' if col != "Details" else 'w')
+        for source, entry in rows:
+            history_tree.insert('', 'end', values=(entry.get('ts') or entry.get('date', ''),) + self.describe_history_entry(source, entry))
+        history_tree.pack(expand=True, fill='both', padx=10, pady=(0, 10))
+    
+    def show_shrinkage_report(self):
+        """Show units and value lost to adjustments per product and month."""
+        try:
+            rows = self.stock_app.get_adjustment_log().shrinkage_report()
+        except OSError as e:
+            messagebox.showerror('Error', f'Error reading adjustments log: {str(e)}')
+            return
+        if not rows:
+            messagebox.showinfo('Info', 'No carton adjustments recorded yet.')
+            return
+        
+        window = tk.Toplevel(self.parent)
+        window.title(f"Shrinkage Report - {self.stock_app.selected_company}")
+        columns = ("Month", "Product ID", "Product Name", "Adjustments", "Units Lost", "Units Found", "Net Units",
+                   "Value Lost (₹)", "Lost By Reason")
+        report_tree = ttk.Treeview(window, columns=columns, show='headings', height=18)
+        for col, width in zip(columns, [80, 110, 180, 90, 90, 90, 90, 120, 260]):
+            report_tree.heading(col, text=col)
+            report_tree.column(col, width=width, anchor='center' if col != "Lost By Reason" else 'w')
+        for row in rows:
+            reasons = ", ".join(f"{ADJUSTMENT_REASONS.get(code, code)}: {units}"
+                                for code, units in sorted(row['reasons'].items(), key=lambda r: -r[1]))
+            report_tree.insert('', 'end', values=(row['month'], row['product_id'], row['product_name'], row['adjustments'],
+                                                  row['units_lost'], row['units_found'], row['net_units'],
+                                                  format_rupees(row['value_lost']), reasons))
+        report_tree.pack(expand=True, fill='both', padx=10, pady=10)
+    
     def toggle_update_fields(self):
         """Toggle update fields based on action selection."""
         action = self.update_action_var.get()
@@ -161,28 +234,33 @@ class UpdateCartonUI(BaseUIComponent):
                 messagebox.showerror('Error', 'Invalid quantity or damaged units. Please enter non-negative numbers, with damaged <= quantity.')
                 return
             
-            # Find and update the carton in the actual list
-            for i, carton in enumerate(self.stock_app.stock_data):
-                if carton['carton_id'] == target_carton_id:
-                    self.stock_app.stock_data[i]['quantity_per_carton'] = new_qty
-                    self.stock_app.stock_data[i]['damaged_units'] = new_damaged
-                    self.stock_app.stock_data[i]['last_updated'] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    if new_qty == 0:
-                        self.stock_app.stock_data[i]['date_outwarded'] = format_date(datetime.date.today())
-                        messagebox.showinfo('Info', f"Carton {target_carton_id} is now empty and marked as outwarded.")
-                    break
+            reason = self.reason_codes[self.update_reason_var.get()]
             
-            save_stock_data(self.stock_app.stock_data, self.stock_app.selected_json_file)
+            def operation(stock_data):
+                return update_carton_quantity(stock_data, target_carton_id, new_qty, new_damaged, reason)
+            
+            try:
+                change = run_stock_transaction(self.stock_app.selected_json_file, self.stock_app.stock_data, operation)
+            except (StockOperationError, StockConflictError, OSError) as e:
+                self.stock_app.on_stock_data_changed()
+                messagebox.showerror('Error', str(e))
+                return
+            if change.summary['outwarded']:
+                messagebox.showinfo('Info', f"Carton {target_carton_id} is now empty and marked as outwarded.")
             messagebox.showinfo('Success', f"Carton {target_carton_id} updated successfully. New Quantity: {new_qty}, New Damaged: {new_damaged}.")
         
         elif self.update_action_var.get() == 'delete':
             if messagebox.askyesno("Confirm Delete", f"WARNING: This will PERMANENTLY DELETE Carton {target_carton_id} from records. This action cannot be undone. Are you absolutely sure?"):
-                # Remove the carton from the list
-                self.stock_app.stock_data[:] = [c for c in self.stock_app.stock_data if c['carton_id'] != target_carton_id]
-                save_stock_data(self.stock_app.stock_data, self.stock_app.selected_json_file)
+                try:
+                    change = run_stock_transaction(self.stock_app.selected_json_file, self.stock_app.stock_data,
+                                          lambda stock_data: delete_carton(stock_data, target_carton_id))
+                except (StockOperationError, StockConflictError, OSError) as e:
+                    self.stock_app.on_stock_data_changed()
+                    messagebox.showerror('Error', str(e))
+                    return
                 
-                # Clean up transaction logs - remove entries for deleted carton
-                self.cleanup_transaction_logs(target_carton_id)
+                # Its log entries are hidden by a tombstone; purge them in bulk later
+                self.compact_logs_if_due()
                 
                 messagebox.showinfo('Success', f"Carton {target_carton_id} has been permanently DELETED and removed from transaction logs.")
             else:
@@ -190,9 +268,8 @@ class UpdateCartonUI(BaseUIComponent):
                 return
         
         self.clear_update_carton_form()
-        # Refresh dashboard after update/delete
-        if hasattr(self.stock_app, 'dashboard_ui'):
-            self.stock_app.dashboard_ui.update_dashboard()
+        # Notify the other tabs of the update/delete
+        self.stock_app.on_stock_data_changed(change)
     
     def clear_update_carton_form(self):
         """Clear the update carton form."""
@@ -201,5 +278,6 @@ class UpdateCartonUI(BaseUIComponent):
         self.update_new_qty_entry.delete(0, tk.END)
         self.update_new_damaged_entry.delete(0, tk.END)
         self.update_action_var.set("update")
+        self.update_reason_var.set(ADJUSTMENT_REASONS[DEFAULT_ADJUSTMENT_REASON])
         self.toggle_update_fields()
         self.current_carton_for_update = None
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""
+Cross-process advisory file locking for shared company files.
+"""
+
+import os
+import time
+
+from config.settings import FILE_LOCK_TIMEOUT_SECONDS
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+class LockTimeoutError(TimeoutError):
+    """Raised when a file lock cannot be acquired in time."""
+
+
+class FileLock:
+    """Exclusive advisory lock held on a ``<path>.lock`` sidecar file.
+
+    Locks are held only around the read-compare-write of a single file so
+    several terminals can share a folder without blocking each other for long.
+    """
+
+    def __init__(self, path, timeout=FILE_LOCK_TIMEOUT_SECONDS, poll_interval=0.05):
+        self.lock_path = f"{path}.lock"
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._handle = None
+
+    def acquire(self):
+        """Block until the lock is acquired or the timeout expires."""
+        handle = open(self.lock_path, 'a+b')
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                self._try_lock(handle)
+                self._handle = handle
+                return
+            except OSError:
+                if time.monotonic() >= deadline:
+                    handle.close()
+                    raise LockTimeoutError(f"Timed out waiting for lock on {self.lock_path}. "
+                                           f"Another terminal may be saving; please try again.")
+                time.sleep(self.poll_interval)
+
+    def release(self):
+        """Release the lock if held."""
+        if self._handle is None:
+            return
+        try:
+            self._unlock(self._handle)
+        finally:
+            self._handle.close()
+            self._handle = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    @staticmethod
+    def _try_lock(handle):
+        if os.name == 'nt':
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    @staticmethod
+    def _unlock(handle):
+        if os.name == 'nt':
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
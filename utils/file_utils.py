@@ -10,4 +10,18 @@ def get_log_file_path(company_json_file, log_type):
     # log_type: 'sales' or 'purchase'
     base_dir = os.path.dirname(company_json_file)
     company_name = os.path.splitext(os.path.basename(company_json_file))[0]
-    return os.path.join(base_dir, f"{company_name}_{log_type}_log.json")
\ No newline at end of file
+    return os.path.join(base_dir, f"{company_name}_{log_type}_log.json")
+
+
+def get_thresholds_file_path(company_json_file):
+    """Get the path of a company's alert threshold rules."""
+    base_dir = os.path.dirname(company_json_file)
+    company_name = os.path.splitext(os.path.basename(company_json_file))[0]
+    return os.path.join(base_dir, f"{company_name}_thresholds.json")
+
+
+def get_adjustments_file_path(company_json_file):
+    """Get the path of a company's carton adjustments log."""
+    base_dir = os.path.dirname(company_json_file)
+    company_name = os.path.splitext(os.path.basename(company_json_file))[0]
+    return os.path.join(base_dir, f"{company_name}_adjustments.jsonl")
@@ -0,0 +1,51 @@
+"""
+Money as whole paise.
+
+Prices and values are stored and summed as integers in paise, so totals
+are exact and come out the same however they are added up. Rupees only
+appear where money is typed in, shown or sent over the API.
+"""
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+PAISE_PER_RUPEE = 100
+
+# Fields that used to hold rupees as floats; they are now stored as <name>_paise
+MONEY_FIELDS = ('sales_price', 'purchase_price', 'mrp', 'sales_value', 'purchase_value')
+
+
+def to_paise(rupees):
+    """Convert rupees (a number or text such as '1,250.50') to whole paise, rounding half up."""
+    if isinstance(rupees, int):
+        return rupees * PAISE_PER_RUPEE
+    try:
+        amount = Decimal(str(rupees).strip().replace(',', '')) * PAISE_PER_RUPEE
+        return int(amount.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"Invalid amount: {rupees!r}")
+
+
+def to_rupees(paise):
+    """Paise as rupees, for JSON output."""
+    return paise / PAISE_PER_RUPEE
+
+
+def format_rupees(paise, grouping=True):
+    """Exact '1,234.56' text for an amount in paise ('1234.56' without ``grouping``)."""
+    sign = '-' if paise < 0 else ''
+    rupees, rest = divmod(abs(paise), PAISE_PER_RUPEE)
+    return f"{sign}{rupees:,}.{rest:02d}" if grouping else f"{sign}{rupees}.{rest:02d}"
+
+
+def migrate_money_fields(record):
+    """Move a record's rupee fields to ``<name>_paise`` in place; returns True if any were found."""
+    changed = False
+    for name in MONEY_FIELDS:
+        if name in record:
+            value = record.pop(name)
+            try:
+                record[f"{name}_paise"] = to_paise(value or 0)
+            except ValueError:
+                record[f"{name}_paise"] = 0
+            changed = True
+    return changed